@@ -1,6 +1,9 @@
 from abc import ABC, abstractmethod
 
 class BasePathwayAPI(ABC):
+    # Bump when parse_pathway output changes so cached pathway layouts are rebuilt.
+    parser_version = 1
+
     @abstractmethod
     def download_pathway_data(self, pathway_id, species_hint=None):
         pass
@@ -11,5 +14,5 @@ class BasePathwayAPI(ABC):
 
     @abstractmethod
     def parse_pathway(self, file_path):
-        """Returns: entries, groups"""
+        """Returns: PathwayTopology (unpacks to entries, groups, arrows)"""
         pass
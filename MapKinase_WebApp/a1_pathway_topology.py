@@ -0,0 +1,87 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+@dataclass
+class PathwayTopology:
+    """Parsed pathway entries, groups and arrows with id lookups built once.
+
+    Unpacks like the old ``(entries, groups, arrows)`` tuple, so existing
+    ``entries, groups, arrows = api.parse_pathway(path)`` callers keep working.
+    ``complete`` is False when the parser hit an error and the topology may be
+    missing entries or identifiers; such topologies are not cached.
+    """
+
+    entries: List[Dict[str, Any]] = field(default_factory=list)
+    groups: List[Dict[str, Any]] = field(default_factory=list)
+    arrows: List[Dict[str, Any]] = field(default_factory=list)
+    source: str = ""
+    complete: bool = True
+    entries_by_id: Dict[Any, Dict[str, Any]] = field(default_factory=dict, init=False, repr=False)
+    entries_by_str_id: Dict[str, Dict[str, Any]] = field(default_factory=dict, init=False, repr=False)
+    groups_by_id: Dict[Any, Dict[str, Any]] = field(default_factory=dict, init=False, repr=False)
+    adjacency: Dict[str, Set[str]] = field(default_factory=dict, init=False, repr=False)
+    binding_edges: List[Tuple[str, str]] = field(default_factory=list, init=False, repr=False)
+    binding_neighbors: Dict[str, Set[str]] = field(default_factory=dict, init=False, repr=False)
+    non_binding_arrows: List[Dict[str, Any]] = field(default_factory=list, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.reindex()
+
+    def __iter__(self):
+        return iter((self.entries, self.groups, self.arrows))
+
+    def reindex(self) -> None:
+        """Rebuild every lookup; call after mutating entries, groups or arrows."""
+        self.entries_by_id = {}
+        self.entries_by_str_id = {}
+        for entry in self.entries:
+            # First occurrence wins, matching the linear scans this replaces.
+            self.entries_by_id.setdefault(entry.get("id"), entry)
+            self.entries_by_str_id.setdefault(str(entry.get("id")), entry)
+        self.groups_by_id = {}
+        for group in self.groups:
+            self.groups_by_id.setdefault(group.get("id"), group)
+
+        adjacency: Dict[str, Set[str]] = defaultdict(set)
+        binding_neighbors: Dict[str, Set[str]] = defaultdict(set)
+        self.binding_edges = []
+        self.non_binding_arrows = []
+        for arrow in self.arrows:
+            entry1_id = arrow.get("entry1")
+            entry2_id = arrow.get("entry2")
+            if entry1_id and entry2_id:
+                adjacency[str(entry1_id)].add(str(entry2_id))
+                adjacency[str(entry2_id)].add(str(entry1_id))
+            if arrow.get("binding") or str(arrow.get("type", "")).lower() == "binding/association":
+                if entry1_id and entry2_id:
+                    self.binding_edges.append((str(entry1_id), str(entry2_id)))
+                    binding_neighbors[str(entry1_id)].add(str(entry2_id))
+                    binding_neighbors[str(entry2_id)].add(str(entry1_id))
+                continue
+            self.non_binding_arrows.append(arrow)
+        self.adjacency = dict(adjacency)
+        self.binding_neighbors = dict(binding_neighbors)
+
+    @property
+    def cacheable(self) -> bool:
+        """True when the parse succeeded and produced entries, so results built on it may be reused."""
+        return self.complete and bool(self.entries)
+
+    def find_entry(self, entry_id: Any) -> Optional[Dict[str, Any]]:
+        """Entry whose id matches ``entry_id`` as a string (groups are not searched)."""
+        return self.entries_by_str_id.get(str(entry_id))
+
+    def find_entry_or_group(self, entry_id: Any) -> Optional[Dict[str, Any]]:
+        entry = self.entries_by_id.get(entry_id)
+        if entry is not None:
+            return entry
+        group = self.groups_by_id.get(entry_id)
+        if group is not None:
+            group["type"] = "group"
+        return group
+
+    def binding_hubs(self, min_links: int = 2) -> List[Tuple[str, Set[str]]]:
+        """Entries bound to at least ``min_links`` partners, in first-seen order."""
+        return [(hub_id, linked) for hub_id, linked in self.binding_neighbors.items() if len(linked) >= min_links]
@@ -4,6 +4,7 @@ from PIL import Image
 import io
 from pathlib import Path
 from MapKinase_WebApp.a1_base_api import BasePathwayAPI
+from MapKinase_WebApp.a1_pathway_topology import PathwayTopology
 
 
 def _derive_species_folder(pathway_id: str) -> str:
@@ -142,7 +143,7 @@ class KeggAPI(BasePathwayAPI):
                         'type': rel_type
                     })
 
-            return entries, groups, arrows
+            return PathwayTopology(entries, groups, arrows, source="kegg")
         except Exception as e:
             print(f"Error parsing pathway file {file_path}: {e}")
-            return [], [], []
+            return PathwayTopology(source="kegg", complete=False)
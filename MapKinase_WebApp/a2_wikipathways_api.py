@@ -4,11 +4,13 @@ import os
 import re
 import sys
 import xml.etree.ElementTree as ET
+from collections import defaultdict
 from pathlib import Path
 
 import requests
 from PIL import Image
 from MapKinase_WebApp.a1_base_api import BasePathwayAPI
+from MapKinase_WebApp.a1_pathway_topology import PathwayTopology
 from pywikipathways import get_pathway, get_pathway_info
 from MapKinase_WebApp.d3_entrez_to_uniprot import entrez_to_uniprot, ensembl_to_uniprot
 
@@ -346,13 +348,15 @@ class WikiPathwaysAPI(BasePathwayAPI):
                 print(f"Added group {group_id}")
 
             # Link DataNodes to Groups via GroupRef
+            groups_by_ref = defaultdict(list)
+            for group in groups:
+                groups_by_ref[group["id"]].append(group)
             for entry in entries:
                 group_ref = entry.get("group_ref")
                 if group_ref:
-                    for group in groups:
-                        if group["id"] == group_ref:
-                            group["components"].append(entry["id"])
-                            print(f"Linked DataNode {entry['id']} to group {group_ref}")
+                    for group in groups_by_ref.get(group_ref, []):
+                        group["components"].append(entry["id"])
+                        print(f"Linked DataNode {entry['id']} to group {group_ref}")
 
             # Parse Interaction elements for arrows
             interactions = root.findall(f".//gpml:Interaction", namespaces=ns)
@@ -649,6 +653,7 @@ class WikiPathwaysAPI(BasePathwayAPI):
 
             # Map IDs to UniProt using a local mapping table when available, otherwise fall back to UniProt API.
             mapping = None
+            mapping_complete = True
             species_code = (getattr(self, "species_code", None) or "").strip()
             if species_code:
                 mapping = _load_id_mapping_table(species_code)
@@ -673,6 +678,7 @@ class WikiPathwaysAPI(BasePathwayAPI):
                         entry["first_name"] = entry.get("backup_label") or entry.get("label") or entry.get("first_name") or uni
                 except Exception as map_exc:
                     print(f"Warning: failed to map IDs via mapping table: {map_exc}")
+                    mapping_complete = False
             elif entrez_ids or ensembl_ids:
                 id_to_uniprot: dict[str, str] = {}
                 id_db_map: dict[str, str] = {}  # track which DB each id belongs to
@@ -685,6 +691,7 @@ class WikiPathwaysAPI(BasePathwayAPI):
                                 id_db_map[eid] = "entrez gene"
                         except Exception as one_exc:
                             print(f"Entrez->UniProt lookup failed for {eid}: {one_exc}")
+                            mapping_complete = False
                     for ens in sorted(ensembl_ids):
                         try:
                             uni = ensembl_to_uniprot(ens)
@@ -693,6 +700,7 @@ class WikiPathwaysAPI(BasePathwayAPI):
                                 id_db_map[ens] = "ensembl"
                         except Exception as one_exc:
                             print(f"Ensembl->UniProt lookup failed for {ens}: {one_exc}")
+                            mapping_complete = False
                     if id_to_uniprot:
                         for entry in entries:
                             xref = entry.get("xref") or {}
@@ -710,13 +718,14 @@ class WikiPathwaysAPI(BasePathwayAPI):
                                 entry["first_name"] = entry.get("backup_label") or entry.get("label") or entry.get("first_name") or uni
                 except Exception as map_exc:
                     print(f"Warning: failed to map IDs to UniProt: {map_exc}")
+                    mapping_complete = False
 
             print(f"Parsed {len(entries)} entries, {len(groups)} groups, and {len(arrows)} arrows")
-            return entries, groups, arrows
+            return PathwayTopology(entries, groups, arrows, source="wikipathways", complete=mapping_complete)
 
         except ET.ParseError as e:
             print(f"XML Parse Error for pathway file {file_path}: {e}")
-            return [], [], []
+            return PathwayTopology(source="wikipathways", complete=False)
         except Exception as e:
             print(f"Error parsing pathway file {file_path}: {e}")
-            return [], [], []
+            return PathwayTopology(source="wikipathways", complete=False)
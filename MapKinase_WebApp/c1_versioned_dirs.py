@@ -0,0 +1,94 @@
+import itertools
+import os
+import shutil
+import threading
+import time
+from typing import Optional
+
+CURRENT_FILE = "CURRENT"
+_VERSION_PREFIX = "v-"
+_TMP_MARKER = ".tmp-"
+_REPLACE_ATTEMPTS = 5
+_counter = itertools.count()
+_publish_lock = threading.Lock()
+
+
+def _unique_suffix() -> str:
+    return f"{os.getpid()}-{threading.get_ident()}-{next(_counter)}"
+
+
+def new_version_dir(directory: str) -> str:
+    """Create an empty, private directory inside ``directory`` to write one version into.
+
+    The name is unique per process, thread and call, so concurrent writers never share
+    it, and it is ignored by readers and pruning until publish_version renames it.
+    """
+    path = os.path.join(directory, f"{_VERSION_PREFIX}{_unique_suffix()}{_TMP_MARKER}")
+    os.makedirs(path)
+    return path
+
+
+def current_version_dir(directory: str) -> Optional[str]:
+    """The published version directory inside ``directory``, or None when there is none."""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), "r", encoding="utf-8") as fh:
+            name = fh.read().strip()
+    except OSError:
+        return None
+    if not name.startswith(_VERSION_PREFIX) or os.sep in name or "/" in name:
+        return None
+    path = os.path.join(directory, name)
+    return path if os.path.isdir(path) else None
+
+
+def publish_version(directory: str, version_dir: str) -> str:
+    """Make ``version_dir`` (from new_version_dir) the current version of ``directory``.
+
+    Only the small CURRENT pointer file is replaced, so files of older versions that are
+    still memory-mapped are never moved or overwritten; they are removed once nothing
+    holds them (on Windows a mapped file cannot be deleted, so removal is retried on the
+    next publish). Raises OSError when the pointer cannot be replaced; the previous
+    version then stays current.
+    """
+    final_dir = version_dir[: -len(_TMP_MARKER)] if version_dir.endswith(_TMP_MARKER) else version_dir
+    with _publish_lock:
+        if final_dir != version_dir:
+            os.replace(version_dir, final_dir)
+        pointer_tmp = os.path.join(directory, f"{CURRENT_FILE}{_TMP_MARKER}{_unique_suffix()}")
+        with open(pointer_tmp, "w", encoding="utf-8") as fh:
+            fh.write(os.path.basename(final_dir))
+        for attempt in range(_REPLACE_ATTEMPTS):
+            try:
+                os.replace(pointer_tmp, os.path.join(directory, CURRENT_FILE))
+                break
+            except PermissionError:
+                # Windows refuses the replace while a reader has CURRENT open.
+                if attempt == _REPLACE_ATTEMPTS - 1:
+                    _remove(pointer_tmp)
+                    shutil.rmtree(final_dir, ignore_errors=True)
+                    raise
+                time.sleep(0.05 * (attempt + 1))
+        _prune(directory, keep=os.path.basename(final_dir))
+    return final_dir
+
+
+def _remove(path: str) -> None:
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+    except OSError:
+        pass
+
+
+def _prune(directory: str, keep: str) -> None:
+    """Best-effort removal of everything but the CURRENT pointer, ``keep`` and in-progress writes."""
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for name in names:
+        if name in (CURRENT_FILE, keep) or _TMP_MARKER in name:
+            continue
+        _remove(os.path.join(directory, name))
@@ -87,4 +87,6 @@ def annotate_protein_with_kegg(dataset: Dict[str, Any], species: str, kegg_map:
         uni = (row_vals[0] or "").strip()
         row_vals[kegg_idx] = kegg_map.get(uni, "")
         out_rows.append(row_vals)
-    return {"headers": headers, "rows": out_rows}
+    annotated = dict(dataset)
+    annotated.update({"headers": headers, "rows": out_rows})
+    return annotated
@@ -1,16 +1,32 @@
 import csv
 import gzip
 import re
-import sys
-from pathlib import Path
 from typing import Dict, Tuple, Any, List, Optional
 
+from MapKinase_WebApp.d2_psp_site_index import (
+    PSPIndexSpec,
+    PSPSiteIndex,
+    annotation_file_candidates,
+    find_annotation_file,
+    lookup_sites,
+    open_psp_site_index,
+)
+
 PSP_KINASE_COLUMNS = [
     "PSP: in_vivo_kinases",
     "PSP: in_vitro_kinases",
     "PSP: uniprot_in_vivo_kinases",
     "PSP: uniprot_in_vitro_kinases",
 ]
+KINASE_SUBSTRATE_INDEX = PSPIndexSpec(
+    header_markers=("SUB_ACC_ID", "SUB_MOD_RSD"),
+    acc_column="SUB_ACC_ID",
+    site_column="SUB_MOD_RSD",
+    organism_column="SUB_ORGANISM",
+    columns=("KINASE", "KIN_ACC_ID", "IN_VIVO_RXN", "IN_VITRO_RXN"),
+    site_pattern=r"^\D*(\d+)",
+    multi=True,
+)
 
 
 def _parse_sub_mod_rsd(mod_rsd: str) -> Optional[str]:
@@ -27,19 +43,8 @@ def load_kinase_substrate_map(base_dir: str, compressed_file: str = "Kinase_Subs
     Load PSP kinase-substrate data from compressed file in annotation_files.
     Returns mapping: (SUB_ACC_ID, site_number, sub_organism_lower) -> list of entries.
     """
-    base_path = Path(base_dir)
-    candidates = [base_path / "annotation_files"]
-    if getattr(sys, "frozen", False) and hasattr(sys, "_MEIPASS"):
-        candidates.extend([
-            Path(sys._MEIPASS) / "MapKinase_WebApp" / "annotation_files",
-            Path(sys._MEIPASS) / "annotation_files",
-        ])
-    full_path = None
-    for folder in candidates:
-        candidate = folder / compressed_file
-        if candidate.exists():
-            full_path = candidate
-            break
+    candidates = annotation_file_candidates(base_dir)
+    full_path = find_annotation_file(base_dir, compressed_file)
     data: Dict[Tuple[str, str, str], List[Dict[str, str]]] = {}
     if not full_path:
         print(f"PSP kinase-substrate: file not found (searched: {[str(p) for p in candidates]})")
@@ -72,10 +77,20 @@ def load_kinase_substrate_map(base_dir: str, compressed_file: str = "Kinase_Subs
     return data
 
 
-def annotate_ptm_dataset_with_kinases(dataset: Dict[str, Any], species: str, ks_map: Dict[Tuple[str, str, str], List[Dict[str, str]]]) -> Dict[str, Any]:
+def load_kinase_substrate_index(base_dir: str, species: str, compressed_file: str = "Kinase_Substrate_Dataset.gz") -> Optional[PSPSiteIndex]:
+    """
+    Kinase-substrate rows for one substrate species from the compact on-disk index
+    (see d2_psp_site_index), keeping only the kinase name, accession and reaction flags.
+    Lookups return every matching row in file order, like load_kinase_substrate_map.
+    """
+    return open_psp_site_index(base_dir, compressed_file, KINASE_SUBSTRATE_INDEX, species)
+
+
+def annotate_ptm_dataset_with_kinases(dataset: Dict[str, Any], species: str, ks_map: Any) -> Dict[str, Any]:
     """
     Annotate PTM dataset with PSP kinase-substrate associations.
     Adds PSP: in_vivo_kinases, PSP: in_vitro_kinases, PSP: uniprot_in_vivo_kinases, PSP: uniprot_in_vitro_kinases.
+    ks_map is the dict from load_kinase_substrate_map or the species' PSPSiteIndex.
     """
     species_key = (species or "").strip().lower()
     if species_key not in {"human", "mouse", "rat"}:
@@ -83,7 +98,8 @@ def annotate_ptm_dataset_with_kinases(dataset: Dict[str, Any], species: str, ks_
     headers: List[str] = list(dataset.get("headers") or [])
     rows: List[List[str]] = list(dataset.get("rows") or [])
     new_headers = headers + PSP_KINASE_COLUMNS
-    out_rows: List[List[str]] = []
+    padded_rows: List[List[str]] = []
+    keys: List[Optional[Tuple[str, str, str]]] = []
     for row in rows:
         row_vals = list(row)
         if len(row_vals) < len(headers):
@@ -96,25 +112,27 @@ def annotate_ptm_dataset_with_kinases(dataset: Dict[str, Any], species: str, ks_
                 site_num = str(int(float(site_raw)))
         except ValueError:
             site_num = None
+        padded_rows.append(row_vals)
+        keys.append((uniprot, site_num, species_key) if uniprot and site_num else None)
+    out_rows: List[List[str]] = []
+    for row_vals, matches in zip(padded_rows, lookup_sites(ks_map, keys)):
         vivo_kin = []
         vitro_kin = []
         vivo_uni = []
         vitro_uni = []
-        if uniprot and site_num:
-            matches = ks_map.get((uniprot, site_num, species_key), [])
-            for hit in matches:
-                kinase = (hit.get("KINASE") or "").strip()
-                kin_acc = (hit.get("KIN_ACC_ID") or "").strip()
-                if (hit.get("IN_VIVO_RXN") or "").strip().upper() == "X":
-                    if kinase:
-                        vivo_kin.append(kinase)
-                    if kin_acc:
-                        vivo_uni.append(kin_acc)
-                if (hit.get("IN_VITRO_RXN") or "").strip().upper() == "X":
-                    if kinase:
-                        vitro_kin.append(kinase)
-                    if kin_acc:
-                        vitro_uni.append(kin_acc)
+        for hit in matches or []:
+            kinase = (hit.get("KINASE") or "").strip()
+            kin_acc = (hit.get("KIN_ACC_ID") or "").strip()
+            if (hit.get("IN_VIVO_RXN") or "").strip().upper() == "X":
+                if kinase:
+                    vivo_kin.append(kinase)
+                if kin_acc:
+                    vivo_uni.append(kin_acc)
+            if (hit.get("IN_VITRO_RXN") or "").strip().upper() == "X":
+                if kinase:
+                    vitro_kin.append(kinase)
+                if kin_acc:
+                    vitro_uni.append(kin_acc)
         row_vals.extend([
             "; ".join(vivo_kin),
             "; ".join(vitro_kin),
@@ -122,4 +140,6 @@ def annotate_ptm_dataset_with_kinases(dataset: Dict[str, Any], species: str, ks_
             "; ".join(vitro_uni),
         ])
         out_rows.append(row_vals)
-    return {"headers": new_headers, "rows": out_rows}
+    annotated = dict(dataset)
+    annotated.update({"headers": new_headers, "rows": out_rows})
+    return annotated
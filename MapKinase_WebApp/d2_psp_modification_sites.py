@@ -0,0 +1,47 @@
+from typing import Dict, List, Optional
+
+from MapKinase_WebApp.d2_psp_site_index import PSPIndexSpec, PSPSiteIndex, open_psp_site_index
+
+MODIFICATION_DATASETS: Dict[str, str] = {
+    "acetylation": "Acetylation_site_dataset.gz",
+    "ubiquitination": "Ubiquitination_site_dataset.gz",
+}
+MODIFICATION_SITE_FIELDS = ["DOMAIN", "LT_LIT", "MS_LIT"]
+MODIFICATION_SITES_INDEX = PSPIndexSpec(
+    header_markers=("ACC_ID", "MOD_RSD", "ORGANISM"),
+    acc_column="ACC_ID",
+    site_column="MOD_RSD",
+    organism_column="ORGANISM",
+    columns=tuple(MODIFICATION_SITE_FIELDS),
+)
+
+
+def modification_columns(modification: str) -> List[str]:
+    """Annotation headers for one modification: a '+' site marker, then domain and literature counts."""
+    return [
+        f"PSP: {modification}_site",
+        f"PSP: {modification}_domain",
+        f"PSP: {modification}_lt_lit",
+        f"PSP: {modification}_ms_lit",
+    ]
+
+
+def load_modification_site_index(base_dir: str, modification: str, species: str) -> Optional[PSPSiteIndex]:
+    """
+    Known PSP sites of ``modification`` ('acetylation' or 'ubiquitination') for one species,
+    from the compact on-disk index (see d2_psp_site_index). Sites are keyed by accession and
+    residue number (K5-ac -> 5); when a site is listed twice the later row wins.
+    """
+    file_name = MODIFICATION_DATASETS.get((modification or "").strip().lower())
+    if not file_name:
+        print(f"PSP modification sites: unknown modification '{modification}'")
+        return None
+    return open_psp_site_index(base_dir, file_name, MODIFICATION_SITES_INDEX, species)
+
+
+def load_acetylation_site_index(base_dir: str, species: str) -> Optional[PSPSiteIndex]:
+    return load_modification_site_index(base_dir, "acetylation", species)
+
+
+def load_ubiquitination_site_index(base_dir: str, species: str) -> Optional[PSPSiteIndex]:
+    return load_modification_site_index(base_dir, "ubiquitination", species)
@@ -2,12 +2,26 @@ import csv
 import gzip
 import os
 import re
-import sys
-from pathlib import Path
 from typing import Dict, Tuple, Any, List, Optional
 
+from MapKinase_WebApp.d2_psp_site_index import (
+    PSPIndexSpec,
+    PSPSiteIndex,
+    annotation_file_candidates,
+    find_annotation_file,
+    lookup_sites,
+    open_psp_site_index,
+)
+
 
 PSP_FIELDS = ["DOMAIN", "ON_FUNCTION", "ON_PROCESS", "ON_PROT_INTERACT", "ON_OTHER_INTERACT", "NOTES"]
+REGULATORY_SITES_INDEX = PSPIndexSpec(
+    header_markers=("GENE", "PROTEIN"),
+    acc_column="ACC_ID",
+    site_column="MOD_RSD",
+    organism_column="ORGANISM",
+    columns=tuple(PSP_FIELDS),
+)
 
 
 def _parse_mod_rsd(mod_rsd: str) -> Optional[str]:
@@ -24,19 +38,8 @@ def load_regulatory_sites(base_dir: str, compressed_file: str = "Regulatory_site
     Load PSP regulatory site data from the compressed file in annotation_files.
     Returns mapping: (ACC_ID, site_number, organism_lower) -> row dict.
     """
-    base_path = Path(base_dir)
-    candidates = [base_path / "annotation_files"]
-    if getattr(sys, "frozen", False) and hasattr(sys, "_MEIPASS"):
-        candidates.extend([
-            Path(sys._MEIPASS) / "MapKinase_WebApp" / "annotation_files",
-            Path(sys._MEIPASS) / "annotation_files",
-        ])
-    full_path = None
-    for folder in candidates:
-        candidate = folder / compressed_file
-        if candidate.exists():
-            full_path = candidate
-            break
+    candidates = annotation_file_candidates(base_dir)
+    full_path = find_annotation_file(base_dir, compressed_file)
     data: Dict[Tuple[str, str, str], Dict[str, str]] = {}
     if not full_path:
         print(f"PSP regulatory sites: file not found (searched: {[str(p) for p in candidates]})")
@@ -70,11 +73,22 @@ def load_regulatory_sites(base_dir: str, compressed_file: str = "Regulatory_site
     return data
 
 
-def annotate_ptm_dataset(dataset: Dict[str, Any], species: str, regulatory_map: Dict[Tuple[str, str, str], Dict[str, str]]) -> Dict[str, Any]:
+def load_regulatory_site_index(base_dir: str, species: str, compressed_file: str = "Regulatory_sites.gz") -> Optional[PSPSiteIndex]:
+    """
+    Regulatory sites for one species from the compact on-disk index (see d2_psp_site_index).
+    The index is built from the compressed file on first use and whenever the file changes;
+    it keeps only the PSP_FIELDS columns. Returns None if the file is missing or the species
+    has no entries.
+    """
+    return open_psp_site_index(base_dir, compressed_file, REGULATORY_SITES_INDEX, species)
+
+
+def annotate_ptm_dataset(dataset: Dict[str, Any], species: str, regulatory_map: Any) -> Dict[str, Any]:
     """
     Annotate PTM dataset (dict with 'headers' and 'rows') with PSP info.
     Adds PSP: fields and 'regulatory_site' column.
     Only applies for species in {'human','mouse','rat'}.
+    regulatory_map is the dict from load_regulatory_sites or the species' PSPSiteIndex.
     """
     species_key = (species or "").strip().lower()
     if species_key not in {"human", "mouse", "rat"}:
@@ -83,7 +97,8 @@ def annotate_ptm_dataset(dataset: Dict[str, Any], species: str, regulatory_map:
     rows: List[List[str]] = list(dataset.get("rows") or [])
     psp_headers = [f"PSP: {field}" for field in PSP_FIELDS]
     new_headers = headers + ["PSP: regulatory_site"] + psp_headers
-    out_rows: List[List[str]] = []
+    padded_rows: List[List[str]] = []
+    keys: List[Optional[Tuple[str, str, str]]] = []
     for row in rows:
         row_vals = list(row)
         # Ensure row has base columns
@@ -97,16 +112,20 @@ def annotate_ptm_dataset(dataset: Dict[str, Any], species: str, regulatory_map:
                 site_num = str(int(float(site_raw)))
         except ValueError:
             site_num = None
+        padded_rows.append(row_vals)
+        keys.append((uniprot, site_num, species_key) if uniprot and site_num else None)
+    out_rows: List[List[str]] = []
+    for row_vals, hit in zip(padded_rows, lookup_sites(regulatory_map, keys)):
         # Defaults
         reg_mark = ""
         psp_values = {field: "" for field in PSP_FIELDS}
-        if uniprot and site_num:
-            hit = regulatory_map.get((uniprot, site_num, species_key))
-            if hit:
-                reg_mark = "+"
-                for field in PSP_FIELDS:
-                    psp_values[field] = hit.get(field, "")
+        if hit:
+            reg_mark = "+"
+            for field in PSP_FIELDS:
+                psp_values[field] = hit.get(field, "")
         row_vals.append(reg_mark)
         row_vals.extend([psp_values[f] for f in PSP_FIELDS])
         out_rows.append(row_vals)
-    return {"headers": new_headers, "rows": out_rows}
+    annotated = dict(dataset)
+    annotated.update({"headers": new_headers, "rows": out_rows})
+    return annotated
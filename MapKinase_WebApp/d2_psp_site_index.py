@@ -0,0 +1,339 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from MapKinase_WebApp.c1_versioned_dirs import current_version_dir, new_version_dir, publish_version
+
+PSP_SITE_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "psp_site_index")
+PSP_SITE_INDEX_VERSION = 1
+
+
+@dataclass(frozen=True)
+class PSPIndexSpec:
+    """How to turn one PhosphoSitePlus dataset into per-organism site indexes.
+
+    ``header_markers`` identify the real header row below the licence preamble,
+    ``site_pattern`` pulls the residue number out of the MOD_RSD column, and only
+    ``columns`` are kept for each row. With ``multi`` an index lookup returns every
+    row for a site (file order); otherwise the last row for the site wins.
+    """
+
+    header_markers: Tuple[str, ...]
+    acc_column: str
+    site_column: str
+    organism_column: str
+    columns: Tuple[str, ...]
+    site_pattern: str = r"^\D+(\d+)"
+    multi: bool = False
+
+
+def annotation_file_candidates(base_dir: str) -> List[Path]:
+    candidates = [Path(base_dir) / "annotation_files"]
+    if getattr(sys, "frozen", False) and hasattr(sys, "_MEIPASS"):
+        candidates.extend([
+            Path(sys._MEIPASS) / "MapKinase_WebApp" / "annotation_files",
+            Path(sys._MEIPASS) / "annotation_files",
+        ])
+    return candidates
+
+
+def find_annotation_file(base_dir: str, file_name: str) -> Optional[Path]:
+    for folder in annotation_file_candidates(base_dir):
+        candidate = folder / file_name
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def _organism_dir(organism: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", organism) or "_"
+
+
+def _site_key(accession: Any, site: Any) -> str:
+    return f"{accession}|{site}"
+
+
+class PSPSiteIndex:
+    """Memory-mapped PSP rows for one organism, keyed by (accession, site number).
+
+    Supports the ``.get((accession, site, organism))`` lookups the annotators make on
+    the dicts returned by the legacy loaders, so either can be passed to them.
+    """
+
+    def __init__(self, directory: str, organism: str, columns: List[str], multi: bool) -> None:
+        self.directory = directory
+        self.organism = organism
+        self.columns = list(columns)
+        self.multi = multi
+        self.keys = np.load(os.path.join(directory, "keys.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r")
+        records_path = os.path.join(directory, "records.bin")
+        if os.path.getsize(records_path):
+            self._records = np.memmap(records_path, dtype=np.uint8, mode="r")
+        else:
+            self._records = np.zeros(0, dtype=np.uint8)
+        self._frame: Optional[pd.DataFrame] = None
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: Any) -> bool:
+        return self.get(key) is not None
+
+    def record_at(self, row: int) -> Dict[str, str]:
+        start, stop = int(self.offsets[row]), int(self.offsets[row + 1])
+        values = json.loads(self._records[start:stop].tobytes().decode("utf-8"))
+        return dict(zip(self.columns, values))
+
+    def frame(self) -> pd.DataFrame:
+        """All rows as a DataFrame with a ``site_key`` ("ACC|site") column, for joins.
+
+        Rows are in key order and, within a key, in file order. Built on first use.
+        """
+        if self._frame is None:
+            offsets = self.offsets.tolist()
+            raw = self._records.tobytes()
+            values = json.loads(b"[" + b",".join(raw[start:stop] for start, stop in zip(offsets, offsets[1:])) + b"]")
+            frame = pd.DataFrame(values, columns=self.columns, dtype=object)
+            frame.insert(0, "site_key", np.asarray(self.keys).astype(object))
+            self._frame = frame
+        return self._frame
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Bytes memory-mapped from disk, and bytes held on the heap by the join frame (if built)."""
+        mapped = int(self.keys.nbytes + self.offsets.nbytes + self._records.nbytes)
+        heap = int(self._frame.memory_usage(index=True, deep=True).sum()) if self._frame is not None else 0
+        return {"mapped_bytes": mapped, "heap_bytes": heap}
+
+    def match(self, accessions: Iterable[Any], sites: Iterable[Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """Row ranges ``[start, stop)`` for each (accession, site) pair, in one vectorized search."""
+        queries = np.asarray([_site_key(acc, site) for acc, site in zip(accessions, sites)], dtype=str)
+        if not len(self.keys) or not len(queries):
+            empty = np.zeros(len(queries), dtype=np.int64)
+            return empty, empty.copy()
+        starts = np.searchsorted(self.keys, queries, side="left").astype(np.int64)
+        stops = np.searchsorted(self.keys, queries, side="right").astype(np.int64)
+        return starts, stops
+
+    def rows_for(self, accession: Any, site: Any) -> List[Dict[str, str]]:
+        if not len(self.keys):
+            return []
+        key = _site_key(accession, site)
+        start = int(np.searchsorted(self.keys, key, side="left"))
+        stop = int(np.searchsorted(self.keys, key, side="right"))
+        return [self.record_at(row) for row in range(start, stop)]
+
+    def get_many(self, keys: List[Optional[Tuple[Any, Any, Any]]], default: Any = None) -> List[Any]:
+        """``[self.get(key, default) for key in keys]`` with a single search; None keys give ``default``."""
+        results = [default] * len(keys)
+        wanted = [
+            pos for pos, key in enumerate(keys)
+            if key is not None and str(key[2] or "").strip().lower() == self.organism
+        ]
+        starts, stops = self.match([keys[pos][0] for pos in wanted], [keys[pos][1] for pos in wanted])
+        for pos, start, stop in zip(wanted, starts.tolist(), stops.tolist()):
+            if stop > start:
+                results[pos] = [self.record_at(row) for row in range(start, stop)] if self.multi else self.record_at(stop - 1)
+        return results
+
+    def get(self, key: Tuple[Any, Any, Any], default: Any = None) -> Any:
+        accession, site, organism = key
+        if str(organism or "").strip().lower() != self.organism:
+            return default
+        rows = self.rows_for(accession, site)
+        if not rows:
+            return default
+        return rows if self.multi else rows[-1]
+
+
+def lookup_sites(mapping: Any, keys: List[Optional[Tuple[Any, Any, Any]]]) -> List[Any]:
+    """Hits for each (accession, site, organism) key from a PSPSiteIndex or a legacy dict; None keys give None."""
+    if isinstance(mapping, PSPSiteIndex):
+        return mapping.get_many(keys)
+    return [None if key is None else mapping.get(key) for key in keys]
+
+
+def _file_stamp(path: Path) -> Dict[str, int]:
+    stat = path.stat()
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def _file_sha1(path: Path) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _spec_signature(spec: PSPIndexSpec) -> str:
+    return hashlib.sha1(repr(spec).encode("utf-8")).hexdigest()
+
+
+def _read_meta(directory: Optional[str]) -> Optional[Dict[str, Any]]:
+    if directory is None:
+        return None
+    try:
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("version") == PSP_SITE_INDEX_VERSION else None
+
+
+def _parse_source(source: Path, spec: PSPIndexSpec) -> Dict[str, List[Tuple[str, List[str]]]]:
+    """(key, kept values) pairs per organism, in file order."""
+    site_re = re.compile(spec.site_pattern)
+    by_organism: Dict[str, List[Tuple[str, List[str]]]] = {}
+    with gzip.open(source, "rt", encoding="utf-8", errors="replace") as fh:
+        header: List[str] = []
+        for line in fh:
+            if not line.strip():
+                continue
+            parts = line.rstrip("\n").split("\t")
+            if not header:
+                if all(marker in parts for marker in spec.header_markers):
+                    header = [col.strip() for col in parts]
+                    positions = {col: idx for idx, col in enumerate(header)}
+                    acc_idx = positions.get(spec.acc_column)
+                    site_idx = positions.get(spec.site_column)
+                    org_idx = positions.get(spec.organism_column)
+                    value_idx = [positions.get(col) for col in spec.columns]
+                continue
+            if len(parts) < len(header):
+                parts.extend([""] * (len(header) - len(parts)))
+            acc = parts[acc_idx].strip() if acc_idx is not None else ""
+            site_match = site_re.match(parts[site_idx]) if site_idx is not None else None
+            organism = parts[org_idx].strip().lower() if org_idx is not None else ""
+            if not acc or not site_match or not organism:
+                continue
+            values = ["" if idx is None else parts[idx] for idx in value_idx]
+            by_organism.setdefault(organism, []).append((_site_key(acc, site_match.group(1)), values))
+    return by_organism
+
+
+def _write_index(directory: str, source: Path, spec: PSPIndexSpec, sha1: str) -> str:
+    """Write a new version of the index into ``directory`` and publish it; returns the version directory.
+
+    Versions that PSPSiteIndex objects still have mapped are left in place (see publish_version).
+    """
+    by_organism = _parse_source(source, spec)
+    os.makedirs(directory, exist_ok=True)
+    tmp_dir = new_version_dir(directory)
+    try:
+        return publish_version(directory, _write_version(tmp_dir, by_organism, source, spec, sha1))
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def _write_version(
+    tmp_dir: str,
+    by_organism: Dict[str, List[Tuple[str, List[str]]]],
+    source: Path,
+    spec: PSPIndexSpec,
+    sha1: str,
+) -> str:
+    counts: Dict[str, int] = {}
+    for organism, entries in by_organism.items():
+        # Stable sort keeps duplicate sites in file order.
+        entries.sort(key=lambda item: item[0])
+        org_dir = os.path.join(tmp_dir, _organism_dir(organism))
+        os.makedirs(org_dir)
+        blobs = [json.dumps(values, separators=(",", ":")).encode("utf-8") for _, values in entries]
+        offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+        np.cumsum([len(blob) for blob in blobs], out=offsets[1:])
+        np.save(os.path.join(org_dir, "keys.npy"), np.asarray([key for key, _ in entries], dtype=str))
+        np.save(os.path.join(org_dir, "offsets.npy"), offsets)
+        with open(os.path.join(org_dir, "records.bin"), "wb") as fh:
+            for blob in blobs:
+                fh.write(blob)
+        counts[organism] = len(entries)
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as fh:
+        json.dump(
+            {
+                "version": PSP_SITE_INDEX_VERSION,
+                "source": str(source),
+                "sha1": sha1,
+                "spec": _spec_signature(spec),
+                "organisms": counts,
+                **_file_stamp(source),
+            },
+            fh,
+        )
+    return tmp_dir
+
+
+_INDEX_LOCK = threading.Lock()
+_OPEN_INDEXES: Dict[Tuple[str, str], Tuple[str, int, PSPSiteIndex]] = {}
+
+
+def _ensure_index(source: Path, spec: PSPIndexSpec) -> Optional[str]:
+    """Version directory of an up-to-date index for ``source``, building it if needed.
+
+    A changed mtime or size only triggers a rebuild when the file's SHA-1 changed too.
+    Falls back to the temp directory when the cache folder is not writable.
+    """
+    for root in (PSP_SITE_INDEX_DIR, os.path.join(tempfile.gettempdir(), "MapKinase_psp_site_index")):
+        directory = os.path.join(root, source.name.split(".", 1)[0])
+        version_dir = current_version_dir(directory)
+        meta = _read_meta(version_dir)
+        if meta and meta.get("spec") != _spec_signature(spec):
+            meta = None
+        stamp = _file_stamp(source)
+        if meta and meta.get("mtime_ns") == stamp["mtime_ns"] and meta.get("size") == stamp["size"]:
+            return version_dir
+        try:
+            sha1 = _file_sha1(source)
+            if meta and meta.get("sha1") == sha1:
+                meta.update(stamp)
+                with open(os.path.join(version_dir, "meta.json"), "w", encoding="utf-8") as fh:
+                    json.dump(meta, fh)
+                return version_dir
+            print(f"PSP site index: building index for {source}")
+            return _write_index(directory, source, spec, sha1)
+        except OSError as exc:
+            print(f"Warning: could not write PSP site index in {root}: {exc}")
+    return None
+
+
+def open_psp_site_index(base_dir: str, file_name: str, spec: PSPIndexSpec, organism: str) -> Optional[PSPSiteIndex]:
+    """Index of ``file_name`` for ``organism``; None when the source file is missing or unreadable.
+
+    Opened indexes are shared process-wide and reopened only after a rebuild.
+    """
+    organism_key = (organism or "").strip().lower()
+    source = find_annotation_file(base_dir, file_name)
+    if source is None:
+        print(f"PSP site index: {file_name} not found (searched: {[str(p) for p in annotation_file_candidates(base_dir)]})")
+        return None
+    with _INDEX_LOCK:
+        try:
+            directory = _ensure_index(source, spec)
+        except Exception as exc:
+            print(f"Warning: failed to build PSP site index for {file_name}: {exc}")
+            return None
+        if directory is None:
+            return None
+        meta_mtime = os.stat(os.path.join(directory, "meta.json")).st_mtime_ns
+        cached = _OPEN_INDEXES.get((str(source), organism_key))
+        if cached is not None and cached[0] == directory and cached[1] == meta_mtime:
+            return cached[2]
+        org_dir = os.path.join(directory, _organism_dir(organism_key))
+        if not organism_key or not os.path.isdir(org_dir):
+            return None
+        index = PSPSiteIndex(org_dir, organism_key, list(spec.columns), spec.multi)
+        _OPEN_INDEXES[(str(source), organism_key)] = (directory, meta_mtime, index)
+        return index
@@ -0,0 +1,285 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from MapKinase_WebApp.d1_transfer_kegg_annotations import KEGG_COL
+from MapKinase_WebApp.d2_psp_kinasesubstrates import KINASE_SUBSTRATE_INDEX, PSP_KINASE_COLUMNS
+from MapKinase_WebApp.d2_psp_modification_sites import MODIFICATION_SITE_FIELDS, modification_columns
+from MapKinase_WebApp.d2_psp_regulatorysites import PSP_FIELDS, REGULATORY_SITES_INDEX
+from MapKinase_WebApp.d2_psp_site_index import PSPSiteIndex, lookup_sites
+
+PSP_SPECIES = {"human", "mouse", "rat"}
+REGULATORY_COLUMNS = ["PSP: regulatory_site"] + [f"PSP: {field}" for field in PSP_FIELDS]
+
+# Join tables derived from an index or legacy dict, keyed by the source object's id.
+# The source is kept alongside so the id cannot be reused while the entry is cached.
+_TABLE_CACHE: "OrderedDict[Tuple[str, int, str], Tuple[Any, pd.DataFrame]]" = OrderedDict()
+_TABLE_CACHE_MAX = 16
+_TABLE_CACHE_LOCK = threading.Lock()
+
+
+def _cached_table(kind: str, source: Any, species: str, builder) -> pd.DataFrame:
+    key = (kind, id(source), species)
+    with _TABLE_CACHE_LOCK:
+        cached = _TABLE_CACHE.get(key)
+        if cached is not None and cached[0] is source:
+            _TABLE_CACHE.move_to_end(key)
+            return cached[1]
+    table = builder()
+    with _TABLE_CACHE_LOCK:
+        _TABLE_CACHE[key] = (source, table)
+        _TABLE_CACHE.move_to_end(key)
+        while len(_TABLE_CACHE) > _TABLE_CACHE_MAX:
+            _TABLE_CACHE.popitem(last=False)
+    return table
+
+
+def join_table_bytes() -> int:
+    """Heap bytes held by the cached join tables."""
+    with _TABLE_CACHE_LOCK:
+        tables = [table for _, table in _TABLE_CACHE.values()]
+    return int(sum(table.memory_usage(index=True, deep=True).sum() for table in tables))
+
+
+def _site_rows(source: Any, species: str, columns: List[str]) -> pd.DataFrame:
+    """``site_key`` plus ``columns`` for every row of a PSPSiteIndex or legacy (acc, site, organism) dict."""
+    if isinstance(source, PSPSiteIndex):
+        return source.frame()
+    records = []
+    for (acc, site, organism), value in (source or {}).items():
+        if organism != species:
+            continue
+        for entry in value if isinstance(value, list) else [value]:
+            records.append([f"{acc}|{site}"] + [entry.get(col, "") for col in columns])
+    return pd.DataFrame(records, columns=["site_key"] + list(columns), dtype=object)
+
+
+def _regulatory_table(source: Any, species: str) -> pd.DataFrame:
+    def build() -> pd.DataFrame:
+        rows = _site_rows(source, species, list(REGULATORY_SITES_INDEX.columns))
+        # Later rows for a site replace earlier ones, as in load_regulatory_sites.
+        rows = rows.drop_duplicates("site_key", keep="last")
+        table = pd.DataFrame({"site_key": rows["site_key"].to_numpy(), REGULATORY_COLUMNS[0]: "+"})
+        for field, column in zip(PSP_FIELDS, REGULATORY_COLUMNS[1:]):
+            table[column] = rows[field].fillna("").to_numpy()
+        return table
+
+    return _cached_table("regulatory", source, species, build)
+
+
+def _kinase_table(source: Any, species: str) -> pd.DataFrame:
+    def build() -> pd.DataFrame:
+        rows = _site_rows(source, species, list(KINASE_SUBSTRATE_INDEX.columns))
+        kinase = rows["KINASE"].fillna("").str.strip().tolist()
+        kin_acc = rows["KIN_ACC_ID"].fillna("").str.strip().tolist()
+        in_vivo = (rows["IN_VIVO_RXN"].fillna("").str.strip().str.upper() == "X").tolist()
+        in_vitro = (rows["IN_VITRO_RXN"].fillna("").str.strip().str.upper() == "X").tolist()
+        # One pass in row (file) order; sites need not be contiguous for legacy dict sources.
+        joined: Dict[str, List[List[str]]] = {}
+        for site_key, name, acc, vivo, vitro in zip(rows["site_key"].tolist(), kinase, kin_acc, in_vivo, in_vitro):
+            lists = joined.setdefault(site_key, [[], [], [], []])
+            if vivo:
+                if name:
+                    lists[0].append(name)
+                if acc:
+                    lists[2].append(acc)
+            if vitro:
+                if name:
+                    lists[1].append(name)
+                if acc:
+                    lists[3].append(acc)
+        table = pd.DataFrame(
+            [[site_key] + ["; ".join(values) for values in lists] for site_key, lists in joined.items()],
+            columns=["site_key"] + PSP_KINASE_COLUMNS,
+            dtype=object,
+        )
+        return table
+
+    return _cached_table("kinase", source, species, build)
+
+
+def _kegg_table(kegg_map: Dict[str, str]) -> pd.DataFrame:
+    def build() -> pd.DataFrame:
+        return pd.DataFrame(
+            {"uniprot": list(kegg_map.keys()), KEGG_COL: list(kegg_map.values())},
+            dtype=object,
+        )
+
+    return _cached_table("kegg", kegg_map, "", build)
+
+
+def _padded_rows(rows: List[List[Any]], width: int) -> List[List[Any]]:
+    padded = []
+    for row in rows:
+        row_vals = list(row)
+        if len(row_vals) < width:
+            row_vals.extend([""] * (width - len(row_vals)))
+        padded.append(row_vals)
+    return padded
+
+
+def _column(rows: List[List[Any]], idx: int) -> pd.Series:
+    return pd.Series([row[idx] if len(row) > idx else "" for row in rows], dtype=object).fillna("").astype(str).str.strip()
+
+
+def _site_numbers(sites: pd.Series) -> np.ndarray:
+    """``str(int(float(site)))`` per cell, "" where that fails or the cell is empty."""
+    raw = sites.to_numpy(dtype=object)
+    out = np.full(len(raw), "", dtype=object)
+    try:
+        numbers = raw.astype(float)
+    except (TypeError, ValueError):
+        numbers = None
+    if numbers is not None:
+        exact = np.isfinite(numbers) & (np.abs(numbers) < 2.0 ** 62)
+        out[exact] = np.trunc(numbers[exact]).astype(np.int64).astype(str).astype(object)
+        pending = np.flatnonzero(~exact)
+    else:
+        pending = range(len(raw))
+    for pos in pending:
+        value = raw[pos]
+        if not value:
+            continue
+        try:
+            out[pos] = str(int(float(value)))
+        except (ValueError, OverflowError):
+            out[pos] = ""
+    return out
+
+
+def _join(keys: pd.Series, table: pd.DataFrame, key_column: str, columns: List[str]) -> List[np.ndarray]:
+    """Left-join ``keys`` against ``table``; one array per output column, "" where nothing matched."""
+    merged = pd.DataFrame({key_column: keys}).merge(table, on=key_column, how="left", sort=False)
+    return [merged[column].fillna("").to_numpy(dtype=object) for column in columns]
+
+
+def _lookup_columns(
+    uniprots: np.ndarray,
+    sites: np.ndarray,
+    valid: np.ndarray,
+    species: str,
+    source: Any,
+    fields: List[str],
+) -> List[np.ndarray]:
+    """'+' marker plus ``fields`` per row, looked up for the uploaded sites only.
+
+    With a PSPSiteIndex this is one searchsorted over the uploaded keys and decodes just
+    the matching records, so the cost follows the upload rather than the PSP table.
+    """
+    positions = np.flatnonzero(valid)
+    hits = lookup_sites(source, [(uniprots[pos], sites[pos], species) for pos in positions])
+    columns = [np.full(len(valid), "", dtype=object) for _ in range(len(fields) + 1)]
+    for pos, hit in zip(positions.tolist(), hits):
+        if not hit:
+            continue
+        columns[0][pos] = "+"
+        for column, field in zip(columns[1:], fields):
+            column[pos] = hit.get(field, "")
+    return columns
+
+
+def _report(label: str, n_rows: int, timings: Dict[str, float]) -> None:
+    parts = ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in timings.items())
+    print(f"{label}: {n_rows} rows; {parts}")
+
+
+def annotate_ptm_sites(
+    dataset: Dict[str, Any],
+    species: str,
+    regulatory_map: Any = None,
+    ks_map: Any = None,
+    modification_maps: Optional[Dict[str, Any]] = None,
+    timings: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    """
+    Add the PSP regulatory-site and kinase-substrate columns to a PTM dataset in one pass.
+    Produces the same headers and rows as annotate_ptm_dataset followed by
+    annotate_ptm_dataset_with_kinases: accession/site keys are normalized once, then each
+    source is a single left join. Either map may be a PSPSiteIndex or the legacy dict;
+    a None map skips its columns. ``modification_maps`` ({'acetylation': index, ...}) adds
+    modification_columns(name) for each entry. Per-step seconds are added to ``timings``
+    and printed. When kinase columns are added, ``psp_species`` records the species they
+    were looked up for.
+    """
+    species_key = (species or "").strip().lower()
+    modification_maps = {name: index for name, index in (modification_maps or {}).items() if index is not None}
+    if species_key not in PSP_SPECIES or (regulatory_map is None and ks_map is None and not modification_maps):
+        return dataset
+    timings = timings if timings is not None else {}
+    headers: List[str] = list(dataset.get("headers") or [])
+    start = time.perf_counter()
+    rows = _padded_rows(list(dataset.get("rows") or []), len(headers))
+    uniprots = _column(rows, 0)
+    sites = _site_numbers(_column(rows, 1))
+    valid = (uniprots != "").to_numpy() & (sites != "")
+    keys = pd.Series(np.where(valid, uniprots.to_numpy(dtype=object) + "|" + sites, None), dtype=object)
+    timings["keys"] = time.perf_counter() - start
+
+    new_headers = list(headers)
+    columns: List[np.ndarray] = []
+    if regulatory_map is not None:
+        start = time.perf_counter()
+        table = _regulatory_table(regulatory_map, species_key)
+        columns.extend(_join(keys, table, "site_key", REGULATORY_COLUMNS))
+        new_headers.extend(REGULATORY_COLUMNS)
+        timings["regulatory join"] = time.perf_counter() - start
+    if ks_map is not None:
+        start = time.perf_counter()
+        table = _kinase_table(ks_map, species_key)
+        columns.extend(_join(keys, table, "site_key", PSP_KINASE_COLUMNS))
+        new_headers.extend(PSP_KINASE_COLUMNS)
+        timings["kinase join"] = time.perf_counter() - start
+    for modification, index in modification_maps.items():
+        start = time.perf_counter()
+        columns.extend(_lookup_columns(
+            uniprots.to_numpy(dtype=object), sites, valid, species_key, index, MODIFICATION_SITE_FIELDS
+        ))
+        new_headers.extend(modification_columns(modification))
+        timings[f"{modification} lookup"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    out_rows = [row_vals + list(extra) for row_vals, extra in zip(rows, zip(*[col.tolist() for col in columns]))]
+    timings["assemble"] = time.perf_counter() - start
+    _report("PTM annotation", len(out_rows), timings)
+    annotated = dict(dataset)
+    annotated.update({"headers": new_headers, "rows": out_rows})
+    if ks_map is not None:
+        annotated["psp_species"] = species_key
+    return annotated
+
+
+def annotate_protein_kegg(
+    dataset: Dict[str, Any],
+    kegg_map: Dict[str, str],
+    timings: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    """
+    Fill the KEGG_Gene_ID column of a protein dataset with one join on the UniProt column.
+    Same output as annotate_protein_with_kegg (the column is appended when missing).
+    """
+    timings = timings if timings is not None else {}
+    headers: List[str] = list(dataset.get("headers") or [])
+    if KEGG_COL not in headers:
+        headers.append(KEGG_COL)
+    kegg_idx = headers.index(KEGG_COL)
+    start = time.perf_counter()
+    rows = _padded_rows(list(dataset.get("rows") or []), len(headers))
+    uniprots = _column(rows, 0)
+    timings["keys"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    (kegg_ids,) = _join(uniprots, _kegg_table(kegg_map or {}), "uniprot", [KEGG_COL])
+    timings["kegg join"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for row_vals, kegg_id in zip(rows, kegg_ids.tolist()):
+        row_vals[kegg_idx] = kegg_id
+    timings["assemble"] = time.perf_counter() - start
+    _report("KEGG annotation", len(rows), timings)
+    annotated = dict(dataset)
+    annotated.update({"headers": headers, "rows": rows})
+    return annotated
@@ -0,0 +1,150 @@
+import os
+import sys
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from MapKinase_WebApp.d1_transfer_kegg_annotations import load_kegg_map
+from MapKinase_WebApp.d2_psp_kinasesubstrates import load_kinase_substrate_index
+from MapKinase_WebApp.d2_psp_modification_sites import MODIFICATION_DATASETS, load_modification_site_index
+from MapKinase_WebApp.d2_psp_regulatorysites import load_regulatory_site_index
+from MapKinase_WebApp.d2_psp_site_index import PSPSiteIndex, find_annotation_file
+from MapKinase_WebApp.d5_annotation_pipeline import join_table_bytes
+from MapKinase_WebApp.d7_kinase_site_matrix import KinaseSiteMatrix, build_kinase_site_matrix
+
+# Source file behind each PSP dataset; its mtime/size decides when an entry is reloaded.
+PSP_SOURCE_FILES: Dict[str, str] = {
+    "regulatory_sites": "Regulatory_sites.gz",
+    "kinase_substrates": "Kinase_Substrate_Dataset.gz",
+    "kinase_site_matrix": "Kinase_Substrate_Dataset.gz",
+    **MODIFICATION_DATASETS,
+}
+
+
+def _memory_usage(value: Any) -> Dict[str, int]:
+    if isinstance(value, (PSPSiteIndex, KinaseSiteMatrix)):
+        return value.memory_usage()
+    if isinstance(value, MappingProxyType):
+        heap = sys.getsizeof(value) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+        return {"mapped_bytes": 0, "heap_bytes": heap}
+    return {"mapped_bytes": 0, "heap_bytes": 0}
+
+
+class AnnotationRegistry:
+    """Process-wide, read-only annotation tables shared by every session.
+
+    Holds one instance per (dataset, organism). Each is loaded on first request under its
+    own lock, so concurrent sessions wait for a single load instead of each parsing the
+    same file. PSP entries are reloaded once their source file changes; KEGG maps are
+    loaded once and handed out as read-only mappings. ``stats()`` reports per-entry
+    mapped and heap bytes, plus the join tables the annotation pipeline derives from them.
+    """
+
+    def __init__(self, base_dir: str) -> None:
+        self.base_dir = base_dir
+        self._entries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._build_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+
+    def _loader(self, dataset: str) -> Callable[[str], Any]:
+        if dataset == "regulatory_sites":
+            return lambda organism: load_regulatory_site_index(self.base_dir, organism)
+        if dataset == "kinase_substrates":
+            return lambda organism: load_kinase_substrate_index(self.base_dir, organism)
+        if dataset == "kinase_site_matrix":
+            return lambda organism: build_kinase_site_matrix(self.kinase_substrates(organism))
+        if dataset in MODIFICATION_DATASETS:
+            return lambda organism: load_modification_site_index(self.base_dir, dataset, organism)
+        if dataset == "kegg":
+            return lambda organism: MappingProxyType(load_kegg_map(self.base_dir, organism))
+        raise KeyError(f"Unknown annotation dataset '{dataset}'")
+
+    def _source_stamp(self, dataset: str) -> Optional[Tuple[int, int]]:
+        file_name = PSP_SOURCE_FILES.get(dataset)
+        if not file_name:
+            return None
+        path = find_annotation_file(self.base_dir, file_name)
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self, dataset: str, organism: str) -> Any:
+        """The shared table for ``dataset`` and ``organism`` (None when it is unavailable)."""
+        key = (dataset, (organism or "").strip().lower())
+        loader = self._loader(dataset)
+        stamp = self._source_stamp(dataset)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["stamp"] == stamp:
+                self.hits += 1
+                entry["hits"] += 1
+                return entry["value"]
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry["stamp"] == stamp:
+                    self.hits += 1
+                    entry["hits"] += 1
+                    return entry["value"]
+            start = time.perf_counter()
+            value = loader(key[1])
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self._entries[key] = {"value": value, "stamp": stamp, "load_seconds": seconds, "hits": 0}
+                self.loads += 1
+            usage = _memory_usage(value)
+            print(
+                f"Annotation registry: loaded {dataset}/{key[1]} in {seconds:.2f}s "
+                f"({usage['mapped_bytes'] / 1e6:.1f} MB mapped, {usage['heap_bytes'] / 1e6:.1f} MB heap)"
+            )
+            return value
+
+    def regulatory_sites(self, species: str) -> Optional[PSPSiteIndex]:
+        return self.get("regulatory_sites", species)
+
+    def kinase_substrates(self, species: str) -> Optional[PSPSiteIndex]:
+        return self.get("kinase_substrates", species)
+
+    def kinase_site_matrix(self, species: str) -> Optional[KinaseSiteMatrix]:
+        return self.get("kinase_site_matrix", species)
+
+    def modification_sites(self, species: str) -> Dict[str, Optional[PSPSiteIndex]]:
+        return {name: self.get(name, species) for name in MODIFICATION_DATASETS}
+
+    def kegg_map(self, species_code: str) -> MappingProxyType:
+        return self.get("kegg", species_code)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            items = list(self._entries.items())
+            hits, loads = self.hits, self.loads
+        entries: List[Dict[str, Any]] = []
+        for (dataset, organism), entry in items:
+            usage = _memory_usage(entry["value"])
+            entries.append({
+                "dataset": dataset,
+                "organism": organism,
+                "available": entry["value"] is not None,
+                "load_seconds": round(entry["load_seconds"], 4),
+                "hits": entry["hits"],
+                **usage,
+            })
+        return {
+            "entries": entries,
+            "mapped_bytes": sum(item["mapped_bytes"] for item in entries),
+            "heap_bytes": sum(item["heap_bytes"] for item in entries),
+            "join_table_bytes": join_table_bytes(),
+            "hits": hits,
+            "loads": loads,
+        }
+
+
+ANNOTATIONS = AnnotationRegistry(os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,241 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from MapKinase_WebApp.d2_psp_site_index import PSPSiteIndex
+from MapKinase_WebApp.d5_annotation_pipeline import _site_numbers
+
+# Evidence bits stored per kinase-site pair.
+IN_VIVO = 1
+IN_VITRO = 2
+EVIDENCE_TYPES = {"in_vivo": IN_VIVO, "in_vitro": IN_VITRO}
+
+
+def evidence_mask(types: Iterable[str]) -> int:
+    """Bit mask for a set of evidence types ('in_vivo', 'in_vitro')."""
+    mask = 0
+    for name in types or ():
+        mask |= EVIDENCE_TYPES.get(name, 0)
+    return mask
+
+
+def evidence_types(bits: int) -> Set[str]:
+    return {name for name, bit in EVIDENCE_TYPES.items() if int(bits) & bit}
+
+
+def _indptr(codes: np.ndarray, size: int) -> np.ndarray:
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=size), out=indptr[1:])
+    return indptr
+
+
+def _gather(indptr: np.ndarray, codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Positions into the CSR data for rows ``codes``, and which query each position belongs to."""
+    starts = indptr[codes]
+    counts = indptr[codes + 1] - starts
+    owners = np.repeat(np.arange(len(codes)), counts)
+    offsets = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + offsets, owners
+
+
+def _collapse_pairs(rows: np.ndarray, cols: np.ndarray, bits: np.ndarray, n_cols: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Unique (row, col) pairs in order of first appearance, with their evidence bits OR-ed."""
+    codes, first = pd.factorize(rows.astype(np.int64) * max(n_cols, 1) + cols, sort=False)
+    merged = np.zeros(len(first), dtype=np.uint8)
+    np.bitwise_or.at(merged, codes, bits)
+    return (first // max(n_cols, 1)).astype(np.int64), (first % max(n_cols, 1)).astype(np.int64), merged
+
+
+class KinaseSiteMatrix:
+    """PSP kinase x substrate-site incidence for one organism, in compressed sparse form.
+
+    Kinases (KIN_ACC_ID) and sites ("ACC|site") are integer-coded by their sorted values.
+    ``site_indptr``/``site_kinases``/``site_evidence`` hold each site's kinases in the order
+    the kinase annotation columns list them (in vivo first, then in vitro, file order
+    within each); ``kinase_indptr``/``kinase_sites``/``kinase_evidence`` are the same pairs
+    grouped by kinase. Evidence is a bit mask of IN_VIVO and IN_VITRO.
+    """
+
+    def __init__(self, organism: str, kinases: np.ndarray, sites: np.ndarray, pair_sites: np.ndarray,
+                 pair_kinases: np.ndarray, pair_evidence: np.ndarray) -> None:
+        self.organism = organism
+        self.kinases = kinases
+        self.sites = sites
+        self.site_indptr = _indptr(pair_sites, len(sites))
+        self.site_kinases = pair_kinases.astype(np.int32)
+        self.site_evidence = pair_evidence.astype(np.uint8)
+        order = np.argsort(pair_kinases, kind="stable")
+        self.kinase_indptr = _indptr(pair_kinases, len(kinases))
+        self.kinase_sites = pair_sites[order].astype(np.int32)
+        self.kinase_evidence = self.site_evidence[order]
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return (len(self.kinases), len(self.sites))
+
+    @property
+    def nnz(self) -> int:
+        return len(self.site_kinases)
+
+    def memory_usage(self) -> Dict[str, int]:
+        arrays = [
+            self.kinases, self.sites, self.site_indptr, self.site_kinases, self.site_evidence,
+            self.kinase_indptr, self.kinase_sites, self.kinase_evidence,
+        ]
+        return {"mapped_bytes": 0, "heap_bytes": int(sum(array.nbytes for array in arrays))}
+
+    def kinase_code(self, accession: str) -> int:
+        pos = int(np.searchsorted(self.kinases, accession))
+        return pos if pos < len(self.kinases) and self.kinases[pos] == accession else -1
+
+    def site_codes(self, accessions: Sequence[Any], sites: Sequence[Any]) -> np.ndarray:
+        """Site code per uploaded (accession, site) cell pair, -1 where PSP has no kinase for it.
+
+        Cells are normalized like the annotation pipeline does (stripped accession,
+        ``str(int(float(site)))``), so a row matches exactly when it was annotated with kinases.
+        """
+        accessions = pd.Series(list(accessions), dtype=object).fillna("").astype(str).str.strip()
+        numbers = _site_numbers(pd.Series(list(sites), dtype=object).fillna("").astype(str).str.strip())
+        valid = (accessions != "").to_numpy() & (numbers != "")
+        codes = np.full(len(accessions), -1, dtype=np.int64)
+        if not len(self.sites) or not valid.any():
+            return codes
+        queries = (accessions.to_numpy(dtype=object)[valid] + "|" + numbers[valid]).astype(str)
+        found = np.searchsorted(self.sites, queries)
+        found[found >= len(self.sites)] = 0
+        codes[np.flatnonzero(valid)] = np.where(self.sites[found] == queries, found, -1)
+        return codes
+
+    def substrate_counts(self, mask: int = IN_VIVO | IN_VITRO) -> np.ndarray:
+        """Number of PSP substrate sites per kinase code with evidence in ``mask``."""
+        keep = (self.kinase_evidence & mask) != 0
+        owners = np.repeat(np.arange(len(self.kinases)), np.diff(self.kinase_indptr))
+        return np.bincount(owners[keep], minlength=len(self.kinases))
+
+    def overlap(self, accessions: Sequence[Any], sites: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Kinase edges for uploaded rows: (row position, kinase code, evidence), in row order."""
+        codes = self.site_codes(accessions, sites)
+        matched = np.flatnonzero(codes >= 0)
+        positions, owners = _gather(self.site_indptr, codes[matched])
+        return matched[owners], self.site_kinases[positions].astype(np.int64), self.site_evidence[positions]
+
+
+def build_kinase_site_matrix(index: Optional[PSPSiteIndex]) -> Optional[KinaseSiteMatrix]:
+    """Kinase x site matrix from a kinase-substrate PSPSiteIndex (None when the index is)."""
+    if index is None:
+        return None
+    frame = index.frame()
+    kin_ids = frame["KIN_ACC_ID"].fillna("").astype(str).str.split(r"[;,]", regex=True)
+    in_vivo = (frame["IN_VIVO_RXN"].fillna("").str.strip().str.upper() == "X").to_numpy()
+    in_vitro = (frame["IN_VITRO_RXN"].fillna("").str.strip().str.upper() == "X").to_numpy()
+    parts = pd.DataFrame({
+        "site_key": frame["site_key"].to_numpy(),
+        "kinase": kin_ids.to_numpy(),
+        "row": np.arange(len(frame)),
+        "vivo": in_vivo,
+        "vitro": in_vitro,
+    }).explode("kinase")
+    parts["kinase"] = parts["kinase"].fillna("").astype(str).str.strip()
+    parts = parts[parts["kinase"] != ""]
+    # One entry per reaction flag: the annotation lists in vivo kinases before in vitro ones.
+    entries = pd.concat([
+        parts.loc[parts["vivo"], ["site_key", "kinase", "row"]].assign(evidence=IN_VIVO),
+        parts.loc[parts["vitro"], ["site_key", "kinase", "row"]].assign(evidence=IN_VITRO),
+    ], ignore_index=True)
+    sites, site_codes = np.unique(entries["site_key"].to_numpy(dtype=str), return_inverse=True)
+    kinases, kinase_codes = np.unique(entries["kinase"].to_numpy(dtype=str), return_inverse=True)
+    evidence = entries["evidence"].to_numpy(dtype=np.uint8)
+    order = np.lexsort((entries["row"].to_numpy(), evidence, site_codes))
+    pair_sites, pair_kinases, pair_evidence = _collapse_pairs(
+        site_codes[order], kinase_codes[order], evidence[order], len(kinases)
+    )
+    matrix = KinaseSiteMatrix(index.organism, kinases, sites, pair_sites, pair_kinases, pair_evidence)
+    print(
+        f"Kinase-site matrix ({index.organism}): {matrix.shape[0]} kinases x {matrix.shape[1]} sites, "
+        f"{matrix.nnz} pairs"
+    )
+    return matrix
+
+
+class KinaseSiteOverlap:
+    """Kinase-substrate pairs found in one uploaded PTM dataset.
+
+    Substrates (upload "UNIPROT:site" keys) and kinases are coded in order of first
+    appearance; ``pair_substrates``/``pair_kinases``/``pair_evidence`` list each distinct
+    pair once with its evidence bits. Per-kinase and per-substrate summaries are bincounts
+    over the pairs selected by an evidence mask.
+    """
+
+    def __init__(self, substrate_keys: List[str], substrate_rows: np.ndarray, kinase_ids: List[str],
+                 pair_substrates: np.ndarray, pair_kinases: np.ndarray, pair_evidence: np.ndarray) -> None:
+        self.substrate_keys = substrate_keys
+        self.substrate_rows = substrate_rows
+        self.kinase_ids = kinase_ids
+        self.pair_substrates = pair_substrates
+        self.pair_kinases = pair_kinases
+        self.pair_evidence = pair_evidence
+        self.substrate_codes = {key: code for code, key in enumerate(substrate_keys)}
+        self.kinase_codes = {kin: code for code, kin in enumerate(kinase_ids)}
+
+    @classmethod
+    def from_edges(cls, rows: np.ndarray, substrate_keys: Sequence[str], kinase_ids: Sequence[str],
+                   evidence: np.ndarray) -> "KinaseSiteOverlap":
+        """Collapse (upload row, substrate key, kinase, evidence) edges given in row order."""
+        sub_codes, sub_keys = pd.factorize(pd.Series(list(substrate_keys), dtype=object), sort=False)
+        kin_codes, kin_ids = pd.factorize(pd.Series(list(kinase_ids), dtype=object), sort=False)
+        first_edge = np.full(len(sub_keys), len(sub_codes), dtype=np.int64)
+        np.minimum.at(first_edge, sub_codes, np.arange(len(sub_codes)))
+        pair_subs, pair_kins, pair_bits = _collapse_pairs(
+            sub_codes, kin_codes, np.asarray(evidence, dtype=np.uint8), len(kin_ids)
+        )
+        return cls(
+            [str(key) for key in sub_keys],
+            np.asarray(rows, dtype=np.int64)[first_edge],
+            [str(kin) for kin in kin_ids],
+            pair_subs,
+            pair_kins,
+            pair_bits,
+        )
+
+    def _selected(self, mask: int) -> np.ndarray:
+        return (self.pair_evidence & mask) != 0
+
+    def substrate_counts(self, mask: int) -> np.ndarray:
+        """Substrates per kinase with evidence in ``mask``."""
+        keep = self._selected(mask)
+        return np.bincount(self.pair_kinases[keep], minlength=len(self.kinase_ids))
+
+    def kinase_counts(self, mask: int) -> np.ndarray:
+        """Kinases per substrate with evidence in ``mask``."""
+        keep = self._selected(mask)
+        return np.bincount(self.pair_substrates[keep], minlength=len(self.substrate_keys))
+
+    def kinase_evidence(self, mask: int) -> np.ndarray:
+        """Evidence bits per kinase, over its pairs with evidence in ``mask``."""
+        keep = self._selected(mask)
+        bits = np.zeros(len(self.kinase_ids), dtype=np.uint8)
+        np.bitwise_or.at(bits, self.pair_kinases[keep], self.pair_evidence[keep] & mask)
+        return bits
+
+    def substrate_evidence(self, mask: int) -> np.ndarray:
+        keep = self._selected(mask)
+        bits = np.zeros(len(self.substrate_keys), dtype=np.uint8)
+        np.bitwise_or.at(bits, self.pair_substrates[keep], self.pair_evidence[keep] & mask)
+        return bits
+
+    def kinase_totals(self, values: np.ndarray, mask: int) -> np.ndarray:
+        """Sum over each kinase's substrates of a per-substrate value (NaN counts as 0)."""
+        keep = self._selected(mask)
+        weights = np.nan_to_num(np.asarray(values, dtype=float), nan=0.0)[self.pair_substrates[keep]]
+        return np.bincount(self.pair_kinases[keep], weights=weights, minlength=len(self.kinase_ids))
+
+    def kinase_means(self, values: np.ndarray, mask: int) -> np.ndarray:
+        """Mean of a per-substrate value over each kinase's substrates, ignoring NaN (NaN if none)."""
+        values = np.asarray(values, dtype=float)
+        keep = self._selected(mask)
+        present = ~np.isnan(values)[self.pair_substrates[keep]]
+        counts = np.bincount(self.pair_kinases[keep][present], minlength=len(self.kinase_ids))
+        totals = self.kinase_totals(values, mask)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, totals / np.maximum(counts, 1), np.nan)
@@ -0,0 +1,303 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse, special
+
+from MapKinase_WebApp.d7_kinase_site_matrix import IN_VITRO, IN_VIVO, KinaseSiteOverlap
+from MapKinase_WebApp.m1_file_processor import dataset_frame
+
+LOGGER = logging.getLogger("d8_kinase_activity")
+
+ACTIVITY_PERMUTATIONS = 1000
+# Permutations are drawn in batches so each sparse product covers many of them at once,
+# and split into fixed-size chunks (one random stream each) that workers take in turn.
+_PERMUTATION_BATCH = 64
+# Cap on the gathered site values of one batch (sites x columns x permutations, ~32 MB),
+# so wide uploads take fewer permutations per batch instead of more memory.
+_PERMUTATION_BATCH_CELLS = 1 << 22
+_PERMUTATION_CHUNK = 250
+# Below this many permutations a process pool costs more than it saves.
+_MIN_PERMUTATIONS_FOR_PROCESSES = 200
+# 'serial' runs permutations in the calling process; 'process' opts in to a process pool
+# (frozen builds need multiprocessing.freeze_support() in their entry point for that).
+_ACTIVITY_EXECUTION_MODES = ('serial', 'process')
+
+_ACTIVITY_CACHE: "OrderedDict[Tuple[Any, ...], KinaseActivity]" = OrderedDict()
+_ACTIVITY_CACHE_MAX = 16
+_ACTIVITY_CACHE_LOCK = threading.Lock()
+_ACTIVITY_BUILD_LOCKS: Dict[Tuple[Any, ...], threading.Lock] = {}
+_ACTIVITY_WORKER_STATE: Dict[str, Any] = {}
+
+
+@dataclass
+class KinaseActivity:
+    """Kinase activity scores for every kinase (rows) and comparison column (columns).
+
+    ``z_score`` is the KSEA score (mean substrate fold change minus the mean over all
+    sites, scaled by sqrt(substrates) / sd over all sites), ``p_value`` its two-sided
+    normal p-value, and ``perm_p_value`` the fraction of random site sets of the same
+    size whose mean deviates at least as much. Cells are NaN where a kinase has no
+    substrate with a value in that column.
+    """
+
+    kinases: List[str]
+    columns: List[str]
+    substrates: np.ndarray
+    mean_fc: np.ndarray
+    median_fc: np.ndarray
+    z_score: np.ndarray
+    p_value: np.ndarray
+    perm_p_value: np.ndarray
+    permutations: int
+    seconds: float = 0.0
+
+    def frame(self, column: str) -> pd.DataFrame:
+        """Scores for one comparison column, indexed by kinase."""
+        pos = self.columns.index(column)
+        return pd.DataFrame(
+            {
+                "substrates": self.substrates[:, pos],
+                "mean_fc": self.mean_fc[:, pos],
+                "median_fc": self.median_fc[:, pos],
+                "z_score": self.z_score[:, pos],
+                "p_value": self.p_value[:, pos],
+                "perm_p_value": self.perm_p_value[:, pos],
+            },
+            index=pd.Index(self.kinases, name="kinase"),
+        )
+
+
+def comparison_values(payload: Dict[str, Any]) -> Tuple[List[str], np.ndarray]:
+    """The C: columns of a PTM payload and their values (rows x columns, NaN where not numeric)."""
+    frame = dataset_frame(payload, "ptm")
+    columns = [col for col in frame.columns if str(col).startswith("C:")]
+    values = np.column_stack([pd.to_numeric(frame[col], errors="coerce").to_numpy(dtype=float) for col in columns]) \
+        if columns else np.zeros((len(frame), 0))
+    return columns, values
+
+
+def _incidence(overlap: KinaseSiteOverlap, mask: int) -> sparse.csr_matrix:
+    keep = (overlap.pair_evidence & mask) != 0
+    return sparse.csr_matrix(
+        (np.ones(int(keep.sum())), (overlap.pair_kinases[keep], overlap.pair_substrates[keep])),
+        shape=(len(overlap.kinase_ids), len(overlap.substrate_keys)),
+    )
+
+
+def _group_medians(incidence: sparse.csr_matrix, values: np.ndarray) -> np.ndarray:
+    """Median of ``values`` rows over each incidence row's columns, ignoring NaN."""
+    n_groups, n_cols = incidence.shape[0], values.shape[1]
+    medians = np.full((n_groups, n_cols), np.nan)
+    if not incidence.nnz or not n_cols:
+        return medians
+    groups = np.repeat(np.arange(n_groups), np.diff(incidence.indptr))
+    starts = incidence.indptr[:-1]
+    for col in range(n_cols):
+        gathered = values[incidence.indices, col]
+        # NaN sorts last within each group, so the first ``counts`` entries are the values.
+        ordered = gathered[np.lexsort((gathered, groups))]
+        counts = np.bincount(groups, weights=(~np.isnan(gathered)).astype(float), minlength=n_groups).astype(np.int64)
+        has = counts > 0
+        low = starts[has] + (counts[has] - 1) // 2
+        high = starts[has] + counts[has] // 2
+        medians[has, col] = (ordered[low] + ordered[high]) / 2.0
+    return medians
+
+
+def _permutation_exceedances(
+    incidence: sparse.csr_matrix,
+    values: np.ndarray,
+    center: np.ndarray,
+    observed: np.ndarray,
+    seed: Any,
+    count: int,
+) -> np.ndarray:
+    """How often a random site set of each kinase's size deviates from ``center`` by >= ``observed``."""
+    rng = np.random.default_rng(seed)
+    n_sites, n_cols = values.shape
+    n_draw = incidence.shape[1]
+    filled = np.nan_to_num(values)
+    present = (~np.isnan(values)).astype(float)
+    exceed = np.zeros(observed.shape, dtype=np.int64)
+    batch_size = max(1, min(_PERMUTATION_BATCH, _PERMUTATION_BATCH_CELLS // max(n_draw * n_cols, 1)))
+    done = 0
+    while done < count:
+        batch = min(batch_size, count - done)
+        picks = [rng.choice(n_sites, n_draw, replace=False) for _ in range(batch)]
+        sums = incidence @ np.hstack([filled[pick] for pick in picks])
+        counts = incidence @ np.hstack([present[pick] for pick in picks])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            deviation = np.abs(sums / counts - np.tile(center, batch))
+        hits = deviation + 1e-12 >= np.tile(observed, (1, batch))
+        exceed += hits.reshape(observed.shape[0], batch, n_cols).sum(axis=1)
+        done += batch
+    return exceed
+
+
+def _init_activity_worker(incidence, values, center, observed) -> None:
+    _ACTIVITY_WORKER_STATE.update(incidence=incidence, values=values, center=center, observed=observed)
+
+
+def _run_activity_chunk(seed: Any, count: int) -> np.ndarray:
+    state = _ACTIVITY_WORKER_STATE
+    return _permutation_exceedances(state["incidence"], state["values"], state["center"], state["observed"], seed, count)
+
+
+def _permutation_p_values(
+    incidence: sparse.csr_matrix,
+    values: np.ndarray,
+    center: np.ndarray,
+    observed: np.ndarray,
+    permutations: int,
+    seed: int,
+    workers: int,
+) -> np.ndarray:
+    chunk_count = -(-permutations // _PERMUTATION_CHUNK)
+    sizes = [len(part) for part in np.array_split(np.arange(permutations), chunk_count)]
+    # One seed per chunk, so the result does not depend on how many processes ran them.
+    seeds = np.random.SeedSequence(seed).spawn(chunk_count)
+    exceed = np.zeros(observed.shape, dtype=np.int64)
+    if workers > 1 and chunk_count > 1 and permutations >= _MIN_PERMUTATIONS_FOR_PROCESSES:
+        try:
+            with ProcessPoolExecutor(
+                max_workers=min(workers, chunk_count),
+                initializer=_init_activity_worker,
+                initargs=(incidence, values, center, observed),
+            ) as executor:
+                for result in executor.map(_run_activity_chunk, seeds, sizes):
+                    exceed += result
+            return np.where(np.isnan(observed), np.nan, (exceed + 1.0) / (permutations + 1.0))
+        except Exception as exc:
+            print(f"Warning: kinase activity process pool failed ({exc}); running permutations serially.")
+            exceed[:] = 0
+    for chunk_seed, size in zip(seeds, sizes):
+        exceed += _permutation_exceedances(incidence, values, center, observed, chunk_seed, size)
+    return np.where(np.isnan(observed), np.nan, (exceed + 1.0) / (permutations + 1.0))
+
+
+def _digest(*arrays: np.ndarray) -> str:
+    digest = hashlib.sha1()
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array).tobytes())
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+def score_kinase_activity(
+    overlap: KinaseSiteOverlap,
+    payload: Dict[str, Any],
+    mask: int = IN_VIVO | IN_VITRO,
+    permutations: int = ACTIVITY_PERMUTATIONS,
+    seed: int = 0,
+    execution_mode: str = "serial",
+    workers: Optional[int] = None,
+) -> KinaseActivity:
+    """
+    Score every kinase in ``overlap`` against every C: column of the PTM ``payload``.
+    Substrate counts, sums and means come from one sparse product of the kinase x substrate
+    incidence (pairs with evidence in ``mask``) with the substrate value matrix; the
+    background mean and sd are taken over all uploaded sites. Permutation p-values
+    resample site sets in this process, or across ``workers`` processes (default: all
+    cores) with ``execution_mode='process'``. Results are cached by the payload's dataset
+    hash and the kinase-substrate pairs; concurrent calls for the same key wait for one
+    computation instead of repeating it.
+    """
+    execution_mode = str(execution_mode or "serial").lower()
+    if execution_mode not in _ACTIVITY_EXECUTION_MODES:
+        print(f"Warning: unknown kinase activity execution_mode {execution_mode!r}; using 'serial'.")
+        execution_mode = "serial"
+    columns: List[str] = []
+    values: Optional[np.ndarray] = None
+    dataset_key = payload.get("dataset_key")
+    if not dataset_key:
+        columns, values = comparison_values(payload)
+        dataset_key = _digest(values)
+    cache_key = (
+        dataset_key,
+        tuple(h for h in payload.get("headers") or [] if str(h).startswith("C:")),
+        _digest(overlap.substrate_rows, overlap.pair_kinases, overlap.pair_substrates, overlap.pair_evidence),
+        tuple(overlap.kinase_ids),
+        mask,
+        permutations,
+        seed,
+    )
+    with _ACTIVITY_CACHE_LOCK:
+        cached = _ACTIVITY_CACHE.get(cache_key)
+        if cached is not None:
+            _ACTIVITY_CACHE.move_to_end(cache_key)
+            return cached
+        build_lock = _ACTIVITY_BUILD_LOCKS.setdefault(cache_key, threading.Lock())
+    with build_lock:
+        with _ACTIVITY_CACHE_LOCK:
+            cached = _ACTIVITY_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+        try:
+            if values is None:
+                columns, values = comparison_values(payload)
+            activity = _score(overlap, columns, values, mask, permutations, seed, execution_mode, workers)
+            with _ACTIVITY_CACHE_LOCK:
+                _ACTIVITY_CACHE[cache_key] = activity
+                _ACTIVITY_CACHE.move_to_end(cache_key)
+                while len(_ACTIVITY_CACHE) > _ACTIVITY_CACHE_MAX:
+                    _ACTIVITY_CACHE.popitem(last=False)
+        finally:
+            with _ACTIVITY_CACHE_LOCK:
+                _ACTIVITY_BUILD_LOCKS.pop(cache_key, None)
+    return activity
+
+
+def _score(
+    overlap: KinaseSiteOverlap,
+    columns: List[str],
+    values: np.ndarray,
+    mask: int,
+    permutations: int,
+    seed: int,
+    execution_mode: str,
+    workers: Optional[int],
+) -> KinaseActivity:
+    start = time.perf_counter()
+    incidence = _incidence(overlap, mask)
+    site_values = values[overlap.substrate_rows] if len(overlap.substrate_rows) else np.zeros((0, len(columns)))
+    present = ~np.isnan(site_values)
+    counts = incidence @ present.astype(float)
+    sums = incidence @ np.nan_to_num(site_values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, sums / counts, np.nan)
+        center = np.nanmean(values, axis=0, keepdims=True) if len(values) else np.full((1, len(columns)), np.nan)
+        spread = np.nanstd(values, axis=0, ddof=1, keepdims=True) if len(values) > 1 else np.full((1, len(columns)), np.nan)
+        z_scores = (means - center) * np.sqrt(counts) / spread
+    p_values = 2.0 * special.ndtr(-np.abs(z_scores))
+    observed = np.abs(means - center)
+    if permutations > 0 and len(values) and incidence.nnz:
+        worker_count = (workers or os.cpu_count() or 1) if execution_mode == "process" else 1
+        perm_p = _permutation_p_values(incidence, values, center, observed, permutations, seed, worker_count)
+    else:
+        perm_p = np.full(observed.shape, np.nan)
+    activity = KinaseActivity(
+        kinases=list(overlap.kinase_ids),
+        columns=list(columns),
+        substrates=counts.astype(np.int64),
+        mean_fc=means,
+        median_fc=_group_medians(incidence, site_values),
+        z_score=z_scores,
+        p_value=p_values,
+        perm_p_value=perm_p,
+        permutations=permutations,
+        seconds=time.perf_counter() - start,
+    )
+    LOGGER.info(
+        "Kinase activity: %s kinases x %s comparisons, %s permutations in %.2fs",
+        len(activity.kinases), len(columns), permutations, activity.seconds,
+    )
+    return activity
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import math
+from functools import lru_cache
+from typing import Any, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+
+MISSING_COLOR = (128, 128, 128)
+_WHITE = 255.0
+
+
+def _as_float(value: Any) -> float:
+    if value is None or isinstance(value, bool):
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _as_rgb(color: Sequence[Any]) -> Tuple[int, int, int]:
+    return tuple(int(c) for c in list(color)[:3])
+
+
+class ColorGradient:
+    """White-centred two-sided gradient used for fold-change fills and outlines.
+
+    Negative values blend from white towards ``negative_color`` and saturate at
+    ``max_negative``; non-negative values blend towards ``positive_color`` and saturate
+    at ``max_positive``. Missing or non-finite values map to ``missing_color``.
+    """
+
+    def __init__(
+        self,
+        negative_color: Sequence[Any],
+        positive_color: Sequence[Any],
+        max_negative: Any,
+        max_positive: Any,
+        missing_color: Sequence[Any] = MISSING_COLOR,
+    ) -> None:
+        self.negative_color = _as_rgb(negative_color)
+        self.positive_color = _as_rgb(positive_color)
+        self.missing_color = _as_rgb(missing_color)
+        self.neg_limit = abs(float(max_negative)) if max_negative else 1.0
+        self.pos_limit = float(max_positive) if max_positive else 1.0
+        self._neg = np.asarray(self.negative_color, dtype=float)
+        self._pos = np.asarray(self.positive_color, dtype=float)
+        self._missing = np.asarray(self.missing_color, dtype=np.int64)
+
+    def color(self, value: Any) -> List[int]:
+        """Colour for a single value (same arithmetic as ``map``, without array overhead)."""
+        fold = _as_float(value)
+        if not math.isfinite(fold):
+            return list(self.missing_color)
+        if fold < 0:
+            t = min(abs(fold) / self.neg_limit, 1.0)
+            target = self.negative_color
+        else:
+            t = min(fold / self.pos_limit, 1.0)
+            target = self.positive_color
+        return [int((1 - t) * _WHITE + t * channel) for channel in target]
+
+    def map(self, values: Iterable[Any]) -> np.ndarray:
+        """Colours for an array of values as an (n, 3) int64 array."""
+        try:
+            folds = np.asarray(values, dtype=float).reshape(-1)
+        except (TypeError, ValueError):
+            folds = np.fromiter((_as_float(v) for v in values), dtype=float)
+        missing = ~np.isfinite(folds)
+        folds = np.where(missing, 0.0, folds)
+        is_negative = folds < 0
+        t = np.where(is_negative, np.abs(folds) / self.neg_limit, folds / self.pos_limit)
+        t = np.minimum(t, 1.0)[:, None]
+        target = np.where(is_negative[:, None], self._neg, self._pos)
+        rgb = np.trunc((1 - t) * _WHITE + t * target).astype(np.int64)
+        rgb[missing] = self._missing
+        return rgb
+
+    def map_lists(self, values: Iterable[Any]) -> List[List[int]]:
+        return self.map(values).tolist()
+
+
+@lru_cache(maxsize=32)
+def _cached_gradient(negative_color, positive_color, max_negative, max_positive, missing_color):
+    return ColorGradient(negative_color, positive_color, max_negative, max_positive, missing_color)
+
+
+def get_gradient(
+    negative_color: Sequence[Any],
+    positive_color: Sequence[Any],
+    max_negative: Any,
+    max_positive: Any,
+    missing_color: Sequence[Any] = MISSING_COLOR,
+) -> ColorGradient:
+    """Shared ColorGradient for these settings (built once per distinct combination)."""
+    return _cached_gradient(
+        _as_rgb(negative_color),
+        _as_rgb(positive_color),
+        float(max_negative) if max_negative else 0.0,
+        float(max_positive) if max_positive else 0.0,
+        _as_rgb(missing_color),
+    )
+
+
+def gradient_color(
+    value: Any,
+    negative_color: Sequence[Any],
+    positive_color: Sequence[Any],
+    max_negative: Any,
+    max_positive: Any,
+) -> List[int]:
+    return get_gradient(negative_color, positive_color, max_negative, max_positive).color(value)
+
+
+def gradient_colors(
+    values: Iterable[Any],
+    negative_color: Sequence[Any],
+    positive_color: Sequence[Any],
+    max_negative: Any,
+    max_positive: Any,
+) -> np.ndarray:
+    return get_gradient(negative_color, positive_color, max_negative, max_positive).map(values)
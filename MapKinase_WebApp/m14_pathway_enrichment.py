@@ -0,0 +1,243 @@
+"""
+m14_pathway_enrichment.py
+
+Pathway x UniProt incidence matrices for Fisher pathway enrichment.
+
+Each pathway index (KEGG or WikiPathways JSON) is turned once into a sparse 0/1 matrix
+of pathways by the UniProt IDs their nodes map to (candidate_uniprots_for_node with the
+species' gene -> UniProt map). Overlap counts for an upload then come from one sparse
+product of that matrix with per-UniProt indicator columns, for every pathway and every
+comparison column at once.
+
+The enrichment statistics work on those count arrays as well: right-tail hypergeometric
+(one-sided Fisher) p-values from a shared log-factorial table, and Benjamini-Hochberg
+q-values over every pathway and column together.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse, special
+
+from MapKinase_WebApp.m6_rank_pathways import (
+    build_gene_to_uniprot_map,
+    candidate_uniprots_for_node,
+    load_kegg_index,
+    normalize_uniprot,
+)
+
+_INCIDENCE_CACHE: "OrderedDict[Tuple[Any, ...], PathwayIncidence]" = OrderedDict()
+_INCIDENCE_CACHE_MAX = 8
+_INCIDENCE_CACHE_LOCK = threading.Lock()
+
+# log(n!) for n = 0..len-1, grown on demand and shared by all sessions.
+_LOG_FACTORIALS = np.zeros(1)
+_LOG_FACTORIALS_LOCK = threading.Lock()
+# Upper bound on tail terms evaluated at once by hypergeometric_right_tail (~8 MB per array).
+_TAIL_TERMS_PER_CHUNK = 1 << 20
+
+
+@dataclass
+class PathwayIncidence:
+    """Pathways (rows, in index order) by UniProt IDs (columns, sorted), as a 0/1 CSR matrix.
+
+    Pathways without an id are left out; ``pathway_ids`` are lower-cased like the Fisher
+    result rows. ``uniprots`` is the sorted universe of IDs any pathway maps to.
+    """
+
+    pathway_ids: List[str]
+    names: List[str]
+    uniprots: np.ndarray
+    matrix: sparse.csr_matrix
+
+    @property
+    def sizes(self) -> np.ndarray:
+        """Distinct UniProt IDs per pathway."""
+        return np.diff(self.matrix.indptr)
+
+    def uniprot_codes(self, uniprots: Sequence[Any]) -> np.ndarray:
+        """Column of each (already normalized) UniProt ID, -1 where no pathway has it."""
+        queries = np.asarray([str(uni) for uni in uniprots], dtype=str)
+        codes = np.full(len(queries), -1, dtype=np.int64)
+        if not len(self.uniprots) or not len(queries):
+            return codes
+        found = np.searchsorted(self.uniprots, queries)
+        found[found >= len(self.uniprots)] = 0
+        matched = self.uniprots[found] == queries
+        codes[matched] = found[matched]
+        return codes
+
+    def overlap_counts(self, codes: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Per pathway, the sum of ``values`` rows whose UniProt (``codes``) is in it.
+
+        ``values`` is rows x k; rows are first summed per UniProt column, so the result
+        (pathways x k) is a single sparse-dense product.
+        """
+        values = np.asarray(values, dtype=float).reshape(len(codes), -1)
+        per_uniprot = np.zeros((len(self.uniprots), values.shape[1]))
+        keep = codes >= 0
+        np.add.at(per_uniprot, codes[keep], values[keep])
+        return np.asarray(self.matrix @ per_uniprot)
+
+
+def log_factorials(n: int) -> np.ndarray:
+    """Table of log(k!) for k = 0..n (at least; the shared table is only ever extended)."""
+    global _LOG_FACTORIALS
+    table = _LOG_FACTORIALS
+    if len(table) > n:
+        return table
+    with _LOG_FACTORIALS_LOCK:
+        table = _LOG_FACTORIALS
+        if len(table) <= n:
+            size = max(int(n) + 1, 2 * len(table))
+            # gammaln per entry rather than a running sum of logs, which drifts for large k.
+            table = special.gammaln(np.arange(1, size + 1, dtype=float))
+            _LOG_FACTORIALS = table
+    return table
+
+
+def hypergeometric_right_tail(total_n: Any, pathway_n: Any, sig_n: Any, hits: Any) -> np.ndarray:
+    """
+    P(X >= hits) for X ~ Hypergeometric(total_n, sig_n, pathway_n), elementwise over
+    broadcast integer arrays; 1.0 wherever the counts are inconsistent (as for the
+    one-sided Fisher test on a 2x2 table). Tail terms k = hits..min(pathway_n, sig_n)
+    are laid out in flat arrays of at most _TAIL_TERMS_PER_CHUNK terms (one cell's tail
+    is never split), and each tail is a log-sum-exp over its segment.
+    """
+    total_n, pathway_n, sig_n, hits = (
+        np.asarray(arr, dtype=np.int64) for arr in np.broadcast_arrays(total_n, pathway_n, sig_n, hits)
+    )
+    p_values = np.ones(total_n.shape)
+    max_hits = np.minimum(pathway_n, sig_n)
+    min_hits = np.maximum(0, pathway_n - (total_n - sig_n))
+    valid = (
+        (total_n > 0) & (pathway_n >= 0) & (sig_n >= 0) & (hits >= 0)
+        & (pathway_n <= total_n) & (sig_n <= total_n)
+        & (hits <= max_hits) & (hits >= min_hits)
+    )
+    if not valid.any():
+        return p_values
+    big_n, path_n, sig, low = total_n[valid], pathway_n[valid], sig_n[valid], hits[valid]
+    terms = max_hits[valid] - low + 1
+    log_fact = log_factorials(int(big_n.max()))
+    tails = np.empty(len(terms))
+    ends = np.cumsum(terms)
+    first = 0
+    while first < len(terms):
+        done = ends[first - 1] if first else 0
+        last = max(int(np.searchsorted(ends, done + _TAIL_TERMS_PER_CHUNK, side="right")), first + 1)
+        cells = slice(first, last)
+        tails[cells] = _log_tails(big_n[cells], path_n[cells], sig[cells], low[cells], terms[cells], log_fact)
+        first = last
+    p_values[valid] = np.clip(np.exp(tails), 0.0, 1.0)
+    return p_values
+
+
+def _log_tails(
+    big_n: np.ndarray, path_n: np.ndarray, sig: np.ndarray, low: np.ndarray, terms: np.ndarray, log_fact: np.ndarray
+) -> np.ndarray:
+    """log P(X >= low) per cell, from one flat array holding every cell's tail terms."""
+    starts = np.concatenate(([0], np.cumsum(terms)[:-1]))
+    segment = np.repeat(np.arange(len(terms)), terms)
+    k = np.repeat(low - starts, terms) + np.arange(int(terms.sum()))
+
+    def log_choose(n: np.ndarray, r: np.ndarray) -> np.ndarray:
+        return log_fact[n] - log_fact[r] - log_fact[n - r]
+
+    big_n, path_n, sig = big_n[segment], path_n[segment], sig[segment]
+    log_terms = log_choose(sig, k) + log_choose(big_n - sig, path_n - k) - log_choose(big_n, path_n)
+    peak = np.maximum.reduceat(log_terms, starts)
+    return peak + np.log(np.add.reduceat(np.exp(log_terms - peak[segment]), starts))
+
+
+def benjamini_hochberg(p_values: Any) -> np.ndarray:
+    """Benjamini-Hochberg q-values over every finite entry of ``p_values`` (any shape); NaN stays NaN."""
+    p_values = np.asarray(p_values, dtype=float)
+    flat = p_values.ravel()
+    q_values = np.full(flat.shape, np.nan)
+    finite = np.flatnonzero(np.isfinite(flat))
+    if not len(finite):
+        return q_values.reshape(p_values.shape)
+    order = finite[np.argsort(flat[finite], kind="stable")]
+    scaled = flat[order] * len(order) / np.arange(1, len(order) + 1)
+    q_values[order] = np.clip(np.minimum.accumulate(np.minimum(scaled, 1.0)[::-1])[::-1], 0.0, 1.0)
+    return q_values.reshape(p_values.shape)
+
+
+def build_pathway_incidence(index: Dict[str, Any], gene_to_uniprot: Dict[str, List[str]]) -> PathwayIncidence:
+    """Incidence matrix for a loaded pathway index; each pathway gets the normalized UniProt IDs of its nodes."""
+    index_nodes = index.get("nodes", {})
+    node_cache: Dict[str, List[str]] = {}
+    pathway_ids: List[str] = []
+    names: List[str] = []
+    members: List[List[str]] = []
+    for pathway in list(index.get("pathways", [])):
+        pathway_id = str(pathway.get("pathway_id", "")).strip().lower()
+        if not pathway_id:
+            continue
+        uniprots: set[str] = set()
+        for node_id in list(pathway.get("nodes", [])):
+            key = str(node_id)
+            if key not in node_cache:
+                node_cache[key] = [
+                    normalized
+                    for normalized in (normalize_uniprot(uni) for uni in candidate_uniprots_for_node(index_nodes.get(key, {}), gene_to_uniprot))
+                    if normalized
+                ]
+            uniprots.update(node_cache[key])
+        pathway_ids.append(pathway_id)
+        names.append(str(pathway.get("name") or pathway_id).strip())
+        members.append(sorted(uniprots))
+    universe = np.asarray(sorted({uni for group in members for uni in group}), dtype=str)
+    rows = np.repeat(np.arange(len(members)), [len(group) for group in members])
+    flat = np.asarray([uni for group in members for uni in group], dtype=str)
+    cols = np.searchsorted(universe, flat) if len(flat) else np.zeros(0, dtype=np.int64)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(cols)), (rows, cols)),
+        shape=(len(members), len(universe)),
+    )
+    return PathwayIncidence(pathway_ids=pathway_ids, names=names, uniprots=universe, matrix=matrix)
+
+
+def _file_stamp(path: str) -> Tuple[str, int, int]:
+    if not path:
+        return ("", 0, 0)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return (path, 0, 0)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def load_pathway_incidence(index_file: str, gene_map_file: str = "") -> PathwayIncidence:
+    """
+    Incidence matrix for a pathway index file and gene -> UniProt mapping file, built once
+    per version of the two files (path, mtime and size) and shared by all sessions.
+    """
+    key = (_file_stamp(index_file), _file_stamp(gene_map_file))
+    with _INCIDENCE_CACHE_LOCK:
+        cached = _INCIDENCE_CACHE.get(key)
+        if cached is not None:
+            _INCIDENCE_CACHE.move_to_end(key)
+            return cached
+    start = time.perf_counter()
+    gene_map = build_gene_to_uniprot_map(Path(gene_map_file)) if gene_map_file else {}
+    incidence = build_pathway_incidence(load_kegg_index(Path(index_file)), gene_map)
+    print(
+        f"Pathway incidence: {len(incidence.pathway_ids)} pathways x {len(incidence.uniprots)} UniProt IDs "
+        f"({incidence.matrix.nnz} links) from {os.path.basename(index_file)} in {time.perf_counter() - start:.2f}s"
+    )
+    with _INCIDENCE_CACHE_LOCK:
+        _INCIDENCE_CACHE[key] = incidence
+        _INCIDENCE_CACHE.move_to_end(key)
+        while len(_INCIDENCE_CACHE) > _INCIDENCE_CACHE_MAX:
+            _INCIDENCE_CACHE.popitem(last=False)
+    return incidence
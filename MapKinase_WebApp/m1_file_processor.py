@@ -1,7 +1,27 @@
 import csv
+import hashlib
+import io
+import itertools
+import json
 import os
 import re
-from typing import Dict, List, Tuple
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pa_parquet
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pa_ipc = None
+    pa_parquet = None
 
 
 def _clean_header(header: str, idx: int) -> str:
@@ -34,6 +54,799 @@ class PTMValidationResult:
         self.comparisons = comparisons
 
 
+class LoadedDataset:
+    """An uploaded protein or PTM file, parsed once.
+
+    Holds the cleaned headers, the validation result and the data as typed column arrays
+    keyed by column index: comparison (C:) and outline (O:) columns as float64, the ID
+    columns as category, everything else as str. ``frame`` wraps those arrays without
+    copying; ``rows`` renders them back to string rows (what the annotators and the upload
+    payload consume) on first access. ``key`` is the parse format plus the SHA-1 of the file
+    bytes. Datasets reopened from the upload cache decode their text columns on first access.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        kind: str,
+        headers: List[str],
+        columns: Optional[Dict[int, Any]],
+        validation: Any,
+        key: str = "",
+        error: Optional[str] = None,
+    ):
+        self.path = path
+        self.kind = kind
+        self.headers = headers
+        self._columns = columns
+        self._columns_loader: Optional[Callable[[], Dict[int, Any]]] = None
+        self._raw_cells: Dict[int, Dict[int, str]] = {}
+        self.validation = validation
+        self.key = key
+        self.error = error
+        self._rows: Optional[List[List[str]]] = None
+        self._frame: Optional[pd.DataFrame] = None
+
+    @property
+    def valid(self) -> bool:
+        return bool(self.validation is not None and self.validation.valid)
+
+    @property
+    def columns(self) -> Dict[int, Any]:
+        if self._columns is None:
+            self._columns = self._columns_loader() if self._columns_loader is not None else {}
+        return self._columns
+
+    @property
+    def rows(self) -> List[List[str]]:
+        if self._rows is None:
+            self._rows = _render_rows(self.headers, self.columns, self._raw_cells)
+        return self._rows
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        if self._frame is None:
+            self._frame = _columns_frame(self.headers, self.columns)
+        return self._frame
+
+    def to_payload(self) -> Dict[str, Any]:
+        """The ``{"headers", "rows"}`` dict the upload pipeline passes around."""
+        if self.error:
+            return {"error": self.error}
+        return {"headers": list(self.headers), "rows": self.rows, "dataset_key": self.key}
+
+
+_ID_COLUMN_COUNT = {"protein": 2, "ptm": 1}
+_LOADED_DATASETS: "OrderedDict[str, LoadedDataset]" = OrderedDict()
+_LOADED_DATASETS_MAX = 8
+_LOADED_DATASETS_LOCK = threading.Lock()
+
+
+def _is_numeric_header(header: str) -> bool:
+    prefix = str(header or "").strip().lower()[:2]
+    return prefix in {"c:", "o:"}
+
+
+def _chunk_columns(rows: List[List[Any]], width: int) -> List[np.ndarray]:
+    """One object array per header column for a chunk of row lists; short rows are padded with ''."""
+    frame = pd.DataFrame(rows, dtype=object)
+    columns = []
+    for idx in range(width):
+        if idx >= frame.shape[1]:
+            columns.append(np.full(len(rows), "", dtype=object))
+            continue
+        values = frame[idx].to_numpy(dtype=object)
+        missing = pd.isna(values)
+        if missing.any():
+            values = values.copy()
+            values[missing] = ""
+        columns.append(values)
+    return columns
+
+
+class _ColumnBuilder:
+    """Typed column arrays for one dataset, appended a validated chunk at a time.
+
+    C:/O: columns after the ID columns become float64, the first ``id_columns`` become
+    category and the rest stay str. Numeric cells that do not parse are kept as text in
+    ``raw_cells`` (column -> row -> cell) so an invalid upload still previews as uploaded.
+    """
+
+    def __init__(self, headers: List[str], id_columns: int = 1):
+        self.width = len(headers)
+        self.id_columns = id_columns
+        self.numeric = {idx for idx, header in enumerate(headers) if idx >= id_columns and _is_numeric_header(header)}
+        self.parts: Dict[int, List[Any]] = {idx: [] for idx in range(self.width)}
+        self.raw_cells: Dict[int, Dict[int, str]] = {}
+        self.row_count = 0
+
+    def append(self, columns: List[np.ndarray]) -> None:
+        n_rows = len(columns[0]) if columns else 0
+        if not n_rows:
+            return
+        for idx in range(self.width):
+            values = columns[idx]
+            if idx in self.numeric:
+                self.parts[idx].append(self._numeric(idx, values))
+            elif idx < self.id_columns:
+                self.parts[idx].append(_stripped_categorical(values))
+            else:
+                self.parts[idx].append(values)
+        self.row_count += n_rows
+
+    def _numeric(self, idx: int, values: np.ndarray) -> np.ndarray:
+        try:
+            return values.astype(np.float64)
+        except (TypeError, ValueError):
+            pass
+        parsed = pd.to_numeric(values, errors="coerce").astype(np.float64)
+        for pos in np.flatnonzero(np.isnan(parsed)):
+            cell = str(values[pos]).strip()
+            if cell and cell.lower() != "na":
+                self.raw_cells.setdefault(idx, {})[self.row_count + int(pos)] = values[pos]
+        return parsed
+
+    def finish(self) -> Dict[int, Any]:
+        columns: Dict[int, Any] = {}
+        for idx, parts in self.parts.items():
+            if idx < self.id_columns and idx not in self.numeric:
+                columns[idx] = union_categoricals(parts) if parts else pd.Categorical([])
+            elif parts:
+                columns[idx] = np.concatenate(parts)
+            else:
+                columns[idx] = np.zeros(0, dtype=np.float64 if idx in self.numeric else object)
+        self.parts = {idx: [] for idx in range(self.width)}
+        return columns
+
+
+def _stripped_categorical(values: np.ndarray) -> pd.Categorical:
+    """Categorical of the stripped cells; only the distinct values are stripped."""
+    codes, uniques = pd.factorize(values)
+    stripped = [str(value).strip() for value in uniques]
+    if stripped != list(uniques):
+        merged, uniques = pd.factorize(np.array(stripped, dtype=object))
+        codes = merged[codes]
+    return pd.Categorical.from_codes(codes, categories=pd.Index(uniques, dtype=object))
+
+
+def _columns_frame(headers: List[str], columns: Dict[int, Any]) -> pd.DataFrame:
+    """DataFrame over typed column arrays, without copying them."""
+    headers = list(headers or [])
+    if not headers:
+        return pd.DataFrame()
+    if not columns or not len(columns.get(0, [])):
+        return pd.DataFrame(columns=headers)
+    typed = pd.DataFrame({idx: columns[idx] for idx in range(len(headers))}, copy=False)
+    typed.columns = headers
+    return typed
+
+
+def _render_rows(
+    headers: List[str], columns: Dict[int, Any], raw_cells: Optional[Dict[int, Dict[int, str]]] = None
+) -> List[List[str]]:
+    """String rows for typed columns: NaN as '', whole numbers without '.0', unparsed cells as uploaded."""
+    if not headers or not columns:
+        return []
+    texts = []
+    for idx in range(len(headers)):
+        values = columns[idx]
+        if isinstance(values, np.ndarray) and values.dtype.kind == "f":
+            cells = [_cell_text(value) for value in values.tolist()]
+            for pos, cell in (raw_cells or {}).get(idx, {}).items():
+                cells[pos] = cell
+        else:
+            cells = np.asarray(values, dtype=object).tolist()
+        texts.append(cells)
+    return [list(row) for row in zip(*texts)]
+
+
+def typed_frame(headers: List[str], rows: List[List[Any]], id_columns: int = 1) -> pd.DataFrame:
+    """DataFrame for ``headers``/``rows`` with C:/O: columns numeric and the first ``id_columns`` as category."""
+    headers = list(headers or [])
+    if not headers:
+        return pd.DataFrame()
+    if not rows:
+        return pd.DataFrame(columns=headers)
+    builder = _ColumnBuilder(headers, id_columns)
+    builder.append(_chunk_columns(rows, len(headers)))
+    return _columns_frame(headers, builder.finish())
+
+
+def _register_loaded_dataset(dataset: LoadedDataset) -> None:
+    if not dataset.key:
+        return
+    with _LOADED_DATASETS_LOCK:
+        _LOADED_DATASETS[f"{dataset.kind}:{dataset.key}"] = dataset
+        _LOADED_DATASETS.move_to_end(f"{dataset.kind}:{dataset.key}")
+        while len(_LOADED_DATASETS) > _LOADED_DATASETS_MAX:
+            _LOADED_DATASETS.popitem(last=False)
+
+
+def dataset_frame(payload: Optional[Dict[str, Any]], kind: str = "") -> pd.DataFrame:
+    """Typed DataFrame for an upload payload, reusing the parsed dataset when it is still loaded.
+
+    Payloads that gained columns during annotation still map back to their source file
+    through ``dataset_key``: the uploaded columns come from the parsed dataset and only the
+    appended annotation columns are read from the payload rows, as str.
+    """
+    if not payload:
+        return pd.DataFrame()
+    headers = list(payload.get("headers") or [])
+    rows = payload.get("rows") or []
+    dataset = loaded_dataset(payload.get("dataset_key") or "", kind)
+    if dataset is not None:
+        frame = dataset.frame
+        uploaded = list(frame.columns)
+        if headers[: len(uploaded)] == uploaded and len(rows) == len(frame):
+            return _with_annotation_columns(frame, headers, rows)
+    return typed_frame(headers, rows, _ID_COLUMN_COUNT.get(kind, 1))
+
+
+def loaded_dataset(key: str, kind: str = "") -> Optional[LoadedDataset]:
+    """The parsed upload with ``dataset_key`` ``key``, while it is still held in memory."""
+    if not key:
+        return None
+    with _LOADED_DATASETS_LOCK:
+        matches = [ds for ds in _LOADED_DATASETS.values() if ds.key == key and (not kind or ds.kind == kind)]
+    return matches[-1] if matches else None
+
+
+def _with_annotation_columns(frame: pd.DataFrame, headers: List[str], rows: List[List[Any]]) -> pd.DataFrame:
+    """``frame`` plus the payload columns past its own (added by annotation), without copying ``frame``."""
+    width = frame.shape[1]
+    if len(headers) <= width:
+        return frame
+    extra = {
+        idx: np.array([row[idx] if idx < len(row) else "" for row in rows], dtype=object)
+        for idx in range(width, len(headers))
+    }
+    annotated = pd.concat([frame, pd.DataFrame(extra, index=frame.index, copy=False)], axis=1, copy=False)
+    annotated.columns = headers
+    return annotated
+
+
+_CHUNK_ROWS = 20000
+_MAX_ERRORS = 200
+
+
+class _CountingReader(io.RawIOBase):
+    """Binary reader that tracks bytes consumed."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        count = self.raw.readinto(buffer)
+        if count:
+            self.bytes_read += count
+        return count
+
+
+def _float_failures(values: np.ndarray, skip_na: bool = False) -> np.ndarray:
+    """Per-cell codes for float() checks: 0 ok, 1 empty, 2 not numeric.
+
+    The whole column goes through one astype(float) (which calls float() per cell in C);
+    only columns with a failing cell are re-checked one cell at a time. With ``skip_na``
+    empty and 'NA' cells count as ok (outline columns).
+    """
+    try:
+        values.astype(float)
+        return np.zeros(len(values), dtype=np.int8)
+    except (TypeError, ValueError):
+        pass
+    codes = np.zeros(len(values), dtype=np.int8)
+    for pos, value in enumerate(values):
+        cell = (value or "").strip()
+        if not cell:
+            codes[pos] = 0 if skip_na else 1
+            continue
+        if skip_na and cell.lower() == "na":
+            continue
+        try:
+            float(cell)
+        except ValueError:
+            codes[pos] = 2
+    return codes
+
+
+class _StreamingValidator:
+    """Row checks for protein/PTM uploads, applied one chunk of rows at a time.
+
+    Produces the same errors, in the same order, as checking every row in turn, and
+    reports when the error cap is reached so the caller can stop reading.
+    """
+
+    def __init__(self, kind: str, headers: List[str], required_comparisons: Optional[List[str]] = None):
+        self.kind = kind
+        self.headers = headers
+        self.required_comparisons = required_comparisons or []
+        self.errors: List[str] = []
+        self.row_count = 0
+        self.comparison_col_indexes: List[int] = []
+        self.outline_col_indexes: List[int] = []
+        self.tooltip_col_indexes: List[int] = []
+
+    @property
+    def second_column(self) -> str:
+        return "Gene Symbol" if self.kind == "protein" else "Site Position"
+
+    def check_headers(self) -> bool:
+        """Header checks; False when the header is too short to check any rows."""
+        headers = self.headers
+        if len(headers) < 3:
+            self.errors.append(
+                f"Header must contain at least 3 columns (Uniprot, {self.second_column}, and one Comparison column)."
+            )
+            return False
+
+        for idx, header in enumerate(headers):
+            header_clean = _clean_header(header, idx)
+            if idx == 0 or idx == 1:
+                continue
+            if header_clean.lower().startswith("c:"):
+                self.comparison_col_indexes.append(idx)
+            elif header_clean.lower().startswith("o:"):
+                self.outline_col_indexes.append(idx)
+            elif header_clean.lower().startswith("t:"):
+                self.tooltip_col_indexes.append(idx)
+            else:
+                self.errors.append(
+                    f"Invalid header in column {idx + 1}: '{header_clean}'. "
+                    "Comparison headers must start with 'C:', outline headers with 'O:', and tooltip headers with 'T:'."
+                )
+
+        if not self.comparison_col_indexes:
+            self.errors.append("At least one Comparison column (header starting with 'C:') is required (third column or later).")
+
+        comparison_headers = self.comparisons
+        if self.kind == "ptm":
+            missing = [c for c in self.required_comparisons if c not in comparison_headers]
+            if missing:
+                self.errors.append(f"Missing Comparison columns present in protein file: {', '.join(missing)}.")
+        comparison_suffixes = {_normalize_fc_suffix(h) for h in comparison_headers if _normalize_fc_suffix(h)}
+        for idx in self.outline_col_indexes:
+            outline_header = _clean_header(headers[idx], idx)
+            outline_suffix = _normalize_fc_suffix(outline_header)
+            if outline_suffix and outline_suffix not in comparison_suffixes:
+                self.errors.append(
+                    f"Outline header '{outline_header}' must match a Comparison header (C:) with the same label."
+                )
+        return True
+
+    @property
+    def comparisons(self) -> List[str]:
+        return [_clean_header(self.headers[idx], idx) for idx in self.comparison_col_indexes]
+
+    def check_rows(self, columns: List[np.ndarray], first_row_idx: int) -> bool:
+        """Check one chunk, given as one array per header column.
+
+        ``first_row_idx`` is the 1-based file row of the chunk's first row. Returns False once the error cap is hit; row_count then stops at the offending row.
+        """
+        n_rows = len(columns[0]) if columns else 0
+        if not n_rows:
+            return True
+
+        def column(idx: int) -> np.ndarray:
+            if idx >= len(columns):
+                return np.full(n_rows, "", dtype=object)
+            return columns[idx]
+
+        messages: Dict[int, List[Tuple[int, str]]] = {}
+
+        def flag(mask: np.ndarray, order: int, build) -> None:
+            for pos in np.flatnonzero(mask):
+                messages.setdefault(int(pos), []).append((order, build(int(pos))))
+
+        def blank(values: np.ndarray) -> np.ndarray:
+            return np.fromiter((not value.strip() for value in values), dtype=bool, count=len(values))
+
+        uniprot = column(0)
+        second = column(1)
+        second_blank = blank(second)
+        flag(blank(uniprot), 0, lambda pos: f"Row {first_row_idx + pos}, Column 1 (Uniprot ID) is empty.")
+        flag(second_blank, 1, lambda pos: f"Row {first_row_idx + pos}, Column 2 ({self.second_column}) is empty.")
+        if self.kind == "ptm":
+            site_codes = np.zeros(n_rows, dtype=np.int8)  # 1 not positive, 2 not an integer
+            try:
+                site_values = second.astype(np.int64)
+                site_codes[(site_values <= 0) & ~second_blank] = 1
+            except (TypeError, ValueError, OverflowError):
+                for pos in np.flatnonzero(~second_blank):
+                    try:
+                        site_codes[pos] = 1 if int(second[pos].strip()) <= 0 else 0
+                    except ValueError:
+                        site_codes[pos] = 2
+            flag(site_codes == 1, 1, lambda pos: (
+                f"Row {first_row_idx + pos}, Column 2 (Site Position) must be a positive integer. Found '{second[pos].strip()}'."
+            ))
+            flag(site_codes == 2, 1, lambda pos: (
+                f"Row {first_row_idx + pos}, Column 2 (Site Position) must be an integer. Found '{second[pos].strip()}'."
+            ))
+
+        order = 2
+        for c_idx in self.comparison_col_indexes:
+            values = column(c_idx)
+            codes = _float_failures(values)
+            flag(codes == 1, order, lambda pos, c_idx=c_idx: f"Row {first_row_idx + pos}, Column {c_idx + 1} (Comparison) is empty.")
+            flag(codes == 2, order, lambda pos, c_idx=c_idx, values=values: (
+                f"Row {first_row_idx + pos}, Column {c_idx + 1} (Comparison) must be numeric. Found '{values[pos].strip()}'."
+            ))
+            order += 1
+        for o_idx in self.outline_col_indexes:
+            values = column(o_idx)
+            codes = _float_failures(values, skip_na=True)
+            flag(codes == 2, order, lambda pos, o_idx=o_idx, values=values: (
+                f"Row {first_row_idx + pos}, Column {o_idx + 1} (Outline) must be numeric or NA. Found '{values[pos].strip()}'."
+            ))
+            order += 1
+
+        positions = sorted(messages)
+        if len(self.errors) >= _MAX_ERRORS and 0 not in messages:
+            positions.insert(0, 0)
+        for pos in positions:
+            # Stable sort keeps column order; per-column checks were flagged in order.
+            self.errors.extend(text for _, text in sorted(messages.get(pos, []), key=lambda item: item[0]))
+            if len(self.errors) >= _MAX_ERRORS:
+                self.errors.append("Stopped after 200 errors; fix these issues and retry.")
+                self.row_count += pos + 1
+                return False
+        self.row_count += n_rows
+        return True
+
+    def result(self, result_cls):
+        summary = {
+            "rows": self.row_count,
+            "comparisons": len(self.comparison_col_indexes),
+            "tooltips": len(self.tooltip_col_indexes),
+        }
+        return result_cls(len(self.errors) == 0, self.errors, summary, self.comparisons)
+
+
+_TEXT_EXTENSIONS = {".txt", ".tsv", ".csv"}
+_BINARY_EXTENSIONS = {".parquet": "parquet", ".feather": "arrow", ".arrow": "arrow", ".ipc": "arrow"}
+
+
+def _check_file(file_path: str, result_cls) -> Optional[Any]:
+    if not os.path.isfile(file_path):
+        return result_cls(False, [f"File not found: {file_path}"], {}, [])
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in _BINARY_EXTENSIONS:
+        if pa is None:
+            return result_cls(False, [f"Reading '{ext}' files requires pyarrow, which is not installed."], {}, [])
+        return None
+    if ext not in _TEXT_EXTENSIONS:
+        return result_cls(
+            False,
+            [f"Unsupported file type '{ext}'. Use .txt (tab), .csv, .parquet, .feather or .arrow."],
+            {},
+            [],
+        )
+    return None
+
+
+def _parse_format(file_path: str) -> str:
+    """How ``file_path`` is parsed: 'parquet', 'arrow', 'csv' or 'tsv' (by extension)."""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in _BINARY_EXTENSIONS:
+        return _BINARY_EXTENSIONS[ext]
+    return "csv" if _detect_delimiter(file_path) == "," else "tsv"
+
+
+def _file_digest(file_path: str) -> str:
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_dataset(
+    file_path: str,
+    kind: str,
+    result_cls,
+    required_comparisons: Optional[List[str]] = None,
+    progress: Optional[Callable[[float, int], None]] = None,
+    chunk_rows: int = _CHUNK_ROWS,
+) -> LoadedDataset:
+    """Read and validate a file in ``chunk_rows``-row chunks, or reopen it from the upload cache.
+
+    Reading stops as soon as the error cap is reached. ``progress(fraction, rows)`` is
+    called after each chunk with the share of the file consumed. Valid datasets are
+    written to the upload cache under the parse format and the SHA-1 of the file bytes,
+    so the same file uploaded again skips parsing and row validation, while the same
+    bytes uploaded as .csv and then as .txt are parsed separately.
+    """
+    failed = _check_file(file_path, result_cls)
+    if failed is not None:
+        return LoadedDataset(file_path, kind, [], {}, failed, error=failed.errors[0])
+    fmt = _parse_format(file_path)
+    try:
+        key = f"{fmt}-{_file_digest(file_path)}"
+    except OSError as exc:
+        failed = result_cls(False, [f"Unexpected error while reading file: {exc}"], {}, [])
+        return LoadedDataset(file_path, kind, [], {}, failed, error=f"Debug load failed: {exc}")
+
+    cached = _load_cached_upload(file_path, kind, fmt, key, result_cls, required_comparisons)
+    if cached is not None:
+        if progress is not None:
+            progress(1.0, cached.validation.summary.get("rows", 0))
+        if cached.valid:
+            _register_loaded_dataset(cached)
+        return cached
+
+    if fmt in ("parquet", "arrow"):
+        source = _binary_chunks(file_path, fmt, chunk_rows)
+    else:
+        source = _text_chunks(file_path, chunk_rows)
+
+    headers: List[str] = []
+    validator: Optional[_StreamingValidator] = None
+    builder: Optional[_ColumnBuilder] = None
+    try:
+        try:
+            raw_headers = next(source)
+        except StopIteration:
+            return LoadedDataset(file_path, kind, [], {}, result_cls(False, ["The file is empty."], {}, []), "", "No rows parsed from file.")
+        headers = [_clean_header(h, idx) for idx, h in enumerate(raw_headers)]
+        validator = _StreamingValidator(kind, raw_headers, required_comparisons)
+        builder = _ColumnBuilder(headers, _ID_COLUMN_COUNT.get(kind, 1))
+        keep_going = validator.check_headers()
+        next_row_idx = 2  # 1-based with header at row 1
+        while keep_going:
+            item = next(source, None)
+            if item is None:
+                break
+            columns, fraction = item
+            keep_going = validator.check_rows(columns, next_row_idx)
+            builder.append(columns)
+            next_row_idx = builder.row_count + 2
+            if progress is not None:
+                progress(fraction, builder.row_count)
+    except UnicodeDecodeError:
+        validator = validator or _StreamingValidator(kind, [], required_comparisons)
+        validator.errors.append("File could not be decoded as UTF-8. Please provide UTF-8 encoded text.")
+        return _decode_fallback(file_path, kind, validator.result(result_cls))
+    except Exception as exc:
+        if validator is None:
+            failed = result_cls(False, [f"Unexpected error while reading file: {exc}"], {}, [])
+            return LoadedDataset(file_path, kind, [], {}, failed, error=f"Debug load failed: {exc}")
+        validator.errors.append(f"Unexpected error while reading file: {exc}")
+    finally:
+        source.close()
+
+    validation = validator.result(result_cls)
+    dataset = LoadedDataset(file_path, kind, headers, builder.finish(), validation, key)
+    dataset._raw_cells = builder.raw_cells
+    if validation.valid:
+        _register_loaded_dataset(dataset)
+        _write_upload_cache(dataset, fmt, raw_headers)
+    return dataset
+
+
+def _text_chunks(file_path: str, chunk_rows: int):
+    """Yield the raw header row, then ``(columns, fraction_of_bytes_read)`` per chunk.
+
+    ``columns`` holds one object array per header column.
+    """
+    total_bytes = max(os.path.getsize(file_path), 1)
+    with open(file_path, "rb", buffering=0) as raw:
+        counter = _CountingReader(raw)
+        text = io.TextIOWrapper(io.BufferedReader(counter), encoding="utf-8", newline="")
+        reader = csv.reader(text, delimiter=_detect_delimiter(file_path))
+        header = next(reader, None)
+        if header is None:
+            return
+        yield header
+        while True:
+            chunk = list(itertools.islice(reader, chunk_rows))
+            if not chunk:
+                return
+            yield _chunk_columns(chunk, len(header)), min(counter.bytes_read / total_bytes, 1.0)
+
+
+def _cell_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if value != value:
+            return ""
+        if value.is_integer():
+            # Integer columns that held a NaN come back as float64; keep "5", not "5.0".
+            return str(int(value))
+    return str(value)
+
+
+def _data_columns(schema) -> List[str]:
+    """Column names of ``schema`` minus the index columns pandas stored alongside the data."""
+    names = list(schema.names)
+    try:
+        metadata = schema.pandas_metadata or {}
+    except (ValueError, TypeError):
+        metadata = {}
+    index_columns = {name for name in metadata.get("index_columns") or [] if isinstance(name, str)}
+    return [name for name in names if name not in index_columns]
+
+
+def _binary_chunks(file_path: str, fmt: str, chunk_rows: int):
+    """Like _text_chunks for Parquet and Arrow IPC/Feather files, with every cell as text.
+
+    Nulls and NaN become empty cells, so they fail or pass validation exactly as a blank
+    cell in a CSV would. Index columns written by pandas are not part of the upload.
+    """
+    if fmt == "parquet":
+        parquet = pa_parquet.ParquetFile(file_path)
+        total_rows = parquet.metadata.num_rows
+        columns = _data_columns(parquet.schema_arrow)
+        yield columns
+        batches = parquet.iter_batches(batch_size=chunk_rows, columns=columns)
+    else:
+        source = pa.memory_map(file_path, "r")
+        try:
+            table = pa_ipc.open_file(source).read_all()
+        except pa.ArrowInvalid:
+            source.seek(0)
+            table = pa_ipc.open_stream(source).read_all()
+        total_rows = table.num_rows
+        columns = _data_columns(table.schema)
+        table = table.select(columns)
+        yield columns
+        batches = table.to_batches(max_chunksize=chunk_rows)
+    done = 0
+    for batch in batches:
+        if not batch.num_rows:
+            continue
+        chunk = [np.array([_cell_text(v) for v in column.to_pylist()], dtype=object) for column in batch.columns]
+        done += batch.num_rows
+        yield chunk, min(done / max(total_rows, 1), 1.0)
+
+
+UPLOAD_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "uploads")
+UPLOAD_CACHE_MAX_ENTRIES = 32
+_UPLOAD_CACHE_VERSION = 3
+_FIELD_SEP = "\x1f"
+_RECORD_SEP = "\x1e"
+
+
+def _upload_cache_path(kind: str, key: str) -> str:
+    return os.path.join(UPLOAD_CACHE_DIR, f"{kind}-{key}")
+
+
+def _write_upload_cache(dataset: LoadedDataset, fmt: str, raw_headers: List[str]) -> None:
+    """Persist a valid dataset's columns as ``numeric.npy`` plus ``text.bin``.
+
+    ``numeric.npy`` holds the C:/O: columns as float64, so they reopen as a memory-mapped
+    read; ``text.bin`` holds the remaining columns as separator-joined UTF-8, one record
+    per column. Files whose cells contain the separator characters are not cached.
+    """
+    columns = dataset.columns
+    n_rows = len(columns.get(0, [])) if columns else 0
+    if not dataset.key or not n_rows:
+        return
+    numeric_columns = [idx for idx in range(len(dataset.headers)) if np.asarray(columns[idx]).dtype.kind == "f"]
+    text_columns = [idx for idx in range(len(dataset.headers)) if idx not in numeric_columns]
+    texts = [np.asarray(columns[idx], dtype=object).tolist() for idx in text_columns]
+    blob = _RECORD_SEP.join(_FIELD_SEP.join(cells) for cells in texts)
+    if blob.count(_RECORD_SEP) != len(texts) - 1 or blob.count(_FIELD_SEP) != len(texts) * (n_rows - 1):
+        return
+    target = _upload_cache_path(dataset.kind, dataset.key)
+    if os.path.isdir(target):
+        return
+    tmp_dir = f"{target}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        os.makedirs(tmp_dir, exist_ok=True)
+        numeric = np.empty((n_rows, len(numeric_columns)), dtype=np.float64)
+        for pos, idx in enumerate(numeric_columns):
+            numeric[:, pos] = columns[idx]
+        np.save(os.path.join(tmp_dir, "numeric.npy"), numeric)
+        with open(os.path.join(tmp_dir, "text.bin"), "wb") as fh:
+            fh.write(blob.encode("utf-8"))
+        meta = {
+            "version": _UPLOAD_CACHE_VERSION,
+            "kind": dataset.kind,
+            "format": fmt,
+            "raw_headers": list(raw_headers),
+            "rows": n_rows,
+            "numeric_columns": numeric_columns,
+            "text_columns": text_columns,
+        }
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp_dir, target)
+    except OSError as exc:
+        print(f"Warning: could not cache upload {dataset.key[:12]}: {exc}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return
+    _prune_upload_cache()
+
+
+def _prune_upload_cache() -> None:
+    try:
+        names = [name for name in os.listdir(UPLOAD_CACHE_DIR) if ".tmp-" not in name]
+    except OSError:
+        return
+    if len(names) <= UPLOAD_CACHE_MAX_ENTRIES:
+        return
+    paths = [os.path.join(UPLOAD_CACHE_DIR, name) for name in names]
+    paths.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0.0)
+    for path in paths[: len(paths) - UPLOAD_CACHE_MAX_ENTRIES]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _load_cached_upload(
+    file_path: str,
+    kind: str,
+    fmt: str,
+    key: str,
+    result_cls,
+    required_comparisons: Optional[List[str]],
+) -> Optional[LoadedDataset]:
+    """Dataset for ``key`` from the upload cache, or None when it is not cached.
+
+    Only valid datasets are cached, so the row checks are known to pass; the header
+    checks are re-run because PTM validation depends on ``required_comparisons``.
+    Text columns are decoded on first use and the numeric columns stay memory-mapped.
+    """
+    path = _upload_cache_path(kind, key)
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.isfile(meta_path):
+        return None
+    try:
+        with open(meta_path, "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+        if meta.get("version") != _UPLOAD_CACHE_VERSION or meta.get("kind") != kind or meta.get("format") != fmt:
+            return None
+        numeric = np.load(os.path.join(path, "numeric.npy"), mmap_mode="r")
+        text_path = os.path.join(path, "text.bin")
+        if not os.path.isfile(text_path):
+            return None
+        os.utime(path)
+    except (OSError, ValueError) as exc:
+        print(f"Warning: ignoring unreadable upload cache entry {key[:12]}: {exc}")
+        return None
+
+    raw_headers = meta.get("raw_headers") or []
+    validator = _StreamingValidator(kind, raw_headers, required_comparisons)
+    validator.check_headers()
+    validator.row_count = int(meta.get("rows") or 0)
+    headers = [_clean_header(h, idx) for idx, h in enumerate(raw_headers)]
+    id_columns = _ID_COLUMN_COUNT.get(kind, 1)
+
+    def read_columns() -> Dict[int, Any]:
+        with open(text_path, "rb") as fh:
+            text = fh.read().decode("utf-8")
+        columns: Dict[int, Any] = {idx: numeric[:, pos] for pos, idx in enumerate(meta.get("numeric_columns") or [])}
+        for idx, record in zip(meta.get("text_columns") or [], text.split(_RECORD_SEP)):
+            cells = record.split(_FIELD_SEP)
+            columns[idx] = pd.Categorical(cells) if idx < id_columns else np.array(cells, dtype=object)
+        return columns
+
+    dataset = LoadedDataset(file_path, kind, headers, None, validator.result(result_cls), key)
+    dataset._columns_loader = read_columns
+    return dataset
+
+
+def _decode_fallback(file_path: str, kind: str, validation) -> LoadedDataset:
+    """Dataset for a file that is not valid UTF-8: errors plus a lossy parse for the preview."""
+    try:
+        with open(file_path, "r", encoding="utf-8", errors="replace", newline="") as fh:
+            parsed = list(itertools.islice(csv.reader(fh, delimiter=_detect_delimiter(file_path)), _CHUNK_ROWS))
+    except Exception as exc:
+        return LoadedDataset(file_path, kind, [], {}, validation, error=f"Debug load failed: {exc}")
+    if not parsed:
+        return LoadedDataset(file_path, kind, [], {}, validation, error="No rows parsed from file.")
+    headers = [_clean_header(h, idx) for idx, h in enumerate(parsed[0])]
+    builder = _ColumnBuilder(headers, _ID_COLUMN_COUNT.get(kind, 1))
+    if len(parsed) > 1:
+        builder.append(_chunk_columns(parsed[1:], len(headers)))
+    dataset = LoadedDataset(file_path, kind, headers, builder.finish(), validation)
+    dataset._raw_cells = builder.raw_cells
+    return dataset
+
+
 def _detect_delimiter(file_path: str) -> str:
     ext = os.path.splitext(file_path)[1].lower()
     if ext == ".csv":
@@ -41,9 +854,12 @@ def _detect_delimiter(file_path: str) -> str:
     return "\t"
 
 
-def validate_protein_file(file_path: str) -> ProteinValidationResult:
+def load_protein_dataset(
+    file_path: str,
+    progress: Optional[Callable[[float, int], None]] = None,
+) -> LoadedDataset:
     """
-    Validate a protein data file according to the expected schema.
+    Parse and validate a protein data file in one pass.
     Rules:
       - Col0: Uniprot ID (required values)
       - Col1: Gene Symbol (required values)
@@ -53,114 +869,24 @@ def validate_protein_file(file_path: str) -> ProteinValidationResult:
       - Comparison cells must be numeric (float/int) and non-empty
       - Outline comparison cells must be numeric (float/int) or "NA"
       - Uniprot/GeneSymbol/Comparison cells required on every row
-      - Only .txt (tab-delimited) or .csv files are allowed
-    Returns a ProteinValidationResult with validity, errors, and summary counts.
+      - Only .txt (tab-delimited) or .csv files are allowed, plus .parquet/.feather/.arrow when pyarrow is installed
+    The validation result is available as ``.validation``; see _load_dataset for ``progress``.
     """
-    if not os.path.isfile(file_path):
-        return ProteinValidationResult(False, [f"File not found: {file_path}"], {}, [])
-    ext = os.path.splitext(file_path)[1].lower()
-    if ext not in {".txt", ".tsv", ".csv"}:
-        return ProteinValidationResult(False, [f"Unsupported file type '{ext}'. Use .txt (tab) or .csv."], {}, [])
-
-    delimiter = _detect_delimiter(file_path)
-    errors: List[str] = []
-    comparison_col_indexes: List[int] = []
-    outline_col_indexes: List[int] = []
-    tooltip_col_indexes: List[int] = []
-    row_count = 0
-
-    try:
-        with open(file_path, newline="", encoding="utf-8") as fh:
-            reader = csv.reader(fh, delimiter=delimiter)
-            try:
-                headers = next(reader)
-            except StopIteration:
-                return ProteinValidationResult(False, ["The file is empty."], {}, [])
-            row_count = 0
-            if len(headers) < 3:
-                errors.append("Header must contain at least 3 columns (Uniprot, Gene Symbol, and one Comparison column).")
-                return ProteinValidationResult(False, errors, {"rows": row_count, "comparisons": 0, "tooltips": 0}, [])
-
-            for idx, header in enumerate(headers):
-                header_clean = _clean_header(header, idx)
-                if idx == 0 or idx == 1:
-                    continue
-                if header_clean.lower().startswith("c:"):
-                    comparison_col_indexes.append(idx)
-                elif header_clean.lower().startswith("o:"):
-                    outline_col_indexes.append(idx)
-                elif header_clean.lower().startswith("t:"):
-                    tooltip_col_indexes.append(idx)
-                else:
-                    errors.append(
-                        f"Invalid header in column {idx + 1}: '{header_clean}'. "
-                        "Comparison headers must start with 'C:', outline headers with 'O:', and tooltip headers with 'T:'."
-                    )
-
-            if not comparison_col_indexes:
-                errors.append("At least one Comparison column (header starting with 'C:') is required (third column or later).")
-            comparison_headers = [_clean_header(headers[idx], idx) for idx in comparison_col_indexes]
-            comparison_suffixes = {_normalize_fc_suffix(h) for h in comparison_headers if _normalize_fc_suffix(h)}
-            for idx in outline_col_indexes:
-                outline_header = _clean_header(headers[idx], idx)
-                outline_suffix = _normalize_fc_suffix(outline_header)
-                if outline_suffix and outline_suffix not in comparison_suffixes:
-                    errors.append(
-                        f"Outline header '{outline_header}' must match a Comparison header (C:) with the same label."
-                    )
-
-            for row_idx, row in enumerate(reader, start=2):  # 1-based with header at row 1
-                row_count += 1
-                # Normalize row length
-                if len(row) < len(headers):
-                    row.extend([""] * (len(headers) - len(row)))
-                uniprot = (row[0] or "").strip()
-                gene_symbol = (row[1] or "").strip()
-                if not uniprot:
-                    errors.append(f"Row {row_idx}, Column 1 (Uniprot ID) is empty.")
-                if not gene_symbol:
-                    errors.append(f"Row {row_idx}, Column 2 (Gene Symbol) is empty.")
-                for c_idx in comparison_col_indexes:
-                    cell = (row[c_idx] or "").strip()
-                    if not cell:
-                        errors.append(f"Row {row_idx}, Column {c_idx + 1} (Comparison) is empty.")
-                        continue
-                    try:
-                        float(cell)
-                    except ValueError:
-                        errors.append(f"Row {row_idx}, Column {c_idx + 1} (Comparison) must be numeric. Found '{cell}'.")
-                for o_idx in outline_col_indexes:
-                    cell = (row[o_idx] or "").strip()
-                    if not cell or cell.strip().lower() == "na":
-                        continue
-                    try:
-                        float(cell)
-                    except ValueError:
-                        errors.append(f"Row {row_idx}, Column {o_idx + 1} (Outline) must be numeric or NA. Found '{cell}'.")
-                # Tooltip columns: values optional, no validation needed
-
-                if len(errors) >= 200:
-                    errors.append("Stopped after 200 errors; fix these issues and retry.")
-                    break
+    return _load_dataset(file_path, "protein", ProteinValidationResult, progress=progress)
 
-    except UnicodeDecodeError:
-        errors.append("File could not be decoded as UTF-8. Please provide UTF-8 encoded text.")
-    except Exception as exc:
-        errors.append(f"Unexpected error while reading file: {exc}")
 
-    valid = len(errors) == 0
-    summary = {
-        "rows": row_count,
-        "comparisons": len(comparison_col_indexes),
-        "tooltips": len(tooltip_col_indexes),
-    }
-    comparison_headers = [_clean_header(headers[idx], idx) for idx in comparison_col_indexes]
-    return ProteinValidationResult(valid, errors, summary, comparison_headers)
+def validate_protein_file(file_path: str) -> ProteinValidationResult:
+    """Validate a protein data file (see load_protein_dataset for the rules)."""
+    return load_protein_dataset(file_path).validation
 
 
-def validate_ptm_file(file_path: str, required_comparisons: List[str]) -> PTMValidationResult:
+def load_ptm_dataset(
+    file_path: str,
+    required_comparisons: List[str],
+    progress: Optional[Callable[[float, int], None]] = None,
+) -> LoadedDataset:
     """
-    Validate a PTM data file.
+    Parse and validate a PTM data file in one pass.
     Rules:
       - Col0: Uniprot ID (required values)
       - Col1: Site Position (required, positive int)
@@ -171,114 +897,12 @@ def validate_ptm_file(file_path: str, required_comparisons: List[str]) -> PTMVal
       - Outline comparison cells must be numeric (float/int) or "NA"
       - Site position must be an integer > 0
       - Uniprot/Site/Comparison cells required on every row
-      - File must be .txt (tab) or .csv
+      - File must be .txt (tab) or .csv, or .parquet/.feather/.arrow when pyarrow is installed
       - All required_comparisons (from protein file) must exist in PTM headers (case-sensitive exact match)
     """
-    if not os.path.isfile(file_path):
-        return PTMValidationResult(False, [f"File not found: {file_path}"], {}, [])
-    ext = os.path.splitext(file_path)[1].lower()
-    if ext not in {".txt", ".tsv", ".csv"}:
-        return PTMValidationResult(False, [f"Unsupported file type '{ext}'. Use .txt (tab) or .csv."], {}, [])
-
-    delimiter = _detect_delimiter(file_path)
-    errors: List[str] = []
-    comparison_col_indexes: List[int] = []
-    outline_col_indexes: List[int] = []
-    tooltip_col_indexes: List[int] = []
-    row_count = 0
-
-    try:
-        with open(file_path, newline="", encoding="utf-8") as fh:
-            reader = csv.reader(fh, delimiter=delimiter)
-            try:
-                headers = next(reader)
-            except StopIteration:
-                return PTMValidationResult(False, ["The file is empty."], {}, [])
-            row_count = 0
-            if len(headers) < 3:
-                errors.append("Header must contain at least 3 columns (Uniprot, Site Position, and one Comparison column).")
-                return PTMValidationResult(False, errors, {"rows": row_count, "comparisons": 0, "tooltips": 0}, [])
-
-            for idx, header in enumerate(headers):
-                header_clean = _clean_header(header, idx)
-                if idx == 0 or idx == 1:
-                    continue
-                if header_clean.lower().startswith("c:"):
-                    comparison_col_indexes.append(idx)
-                elif header_clean.lower().startswith("o:"):
-                    outline_col_indexes.append(idx)
-                elif header_clean.lower().startswith("t:"):
-                    tooltip_col_indexes.append(idx)
-                else:
-                    errors.append(
-                        f"Invalid header in column {idx + 1}: '{header_clean}'. "
-                        "Comparison headers must start with 'C:', outline headers with 'O:', and tooltip headers with 'T:'."
-                    )
-
-            if not comparison_col_indexes:
-                errors.append("At least one Comparison column (header starting with 'C:') is required (third column or later).")
-
-            missing = [c for c in required_comparisons if c not in [_clean_header(headers[idx], idx) for idx in comparison_col_indexes]]
-            if missing:
-                errors.append(f"Missing Comparison columns present in protein file: {', '.join(missing)}.")
-            comparison_headers = [_clean_header(headers[idx], idx) for idx in comparison_col_indexes]
-            comparison_suffixes = {_normalize_fc_suffix(h) for h in comparison_headers if _normalize_fc_suffix(h)}
-            for idx in outline_col_indexes:
-                outline_header = _clean_header(headers[idx], idx)
-                outline_suffix = _normalize_fc_suffix(outline_header)
-                if outline_suffix and outline_suffix not in comparison_suffixes:
-                    errors.append(
-                        f"Outline header '{outline_header}' must match a Comparison header (C:) with the same label."
-                    )
-
-            for row_idx, row in enumerate(reader, start=2):
-                row_count += 1
-                if len(row) < len(headers):
-                    row.extend([""] * (len(headers) - len(row)))
-                uniprot = (row[0] or "").strip()
-                site = (row[1] or "").strip()
-                if not uniprot:
-                    errors.append(f"Row {row_idx}, Column 1 (Uniprot ID) is empty.")
-                if not site:
-                    errors.append(f"Row {row_idx}, Column 2 (Site Position) is empty.")
-                else:
-                    try:
-                        site_val = int(site)
-                        if site_val <= 0:
-                            errors.append(f"Row {row_idx}, Column 2 (Site Position) must be a positive integer. Found '{site}'.")
-                    except ValueError:
-                        errors.append(f"Row {row_idx}, Column 2 (Site Position) must be an integer. Found '{site}'.")
-                for c_idx in comparison_col_indexes:
-                    cell = (row[c_idx] or "").strip()
-                    if not cell:
-                        errors.append(f"Row {row_idx}, Column {c_idx + 1} (Comparison) is empty.")
-                        continue
-                    try:
-                        float(cell)
-                    except ValueError:
-                        errors.append(f"Row {row_idx}, Column {c_idx + 1} (Comparison) must be numeric. Found '{cell}'.")
-                for o_idx in outline_col_indexes:
-                    cell = (row[o_idx] or "").strip()
-                    if not cell or cell.strip().lower() == "na":
-                        continue
-                    try:
-                        float(cell)
-                    except ValueError:
-                        errors.append(f"Row {row_idx}, Column {o_idx + 1} (Outline) must be numeric or NA. Found '{cell}'.")
-                if len(errors) >= 200:
-                    errors.append("Stopped after 200 errors; fix these issues and retry.")
-                    break
+    return _load_dataset(file_path, "ptm", PTMValidationResult, required_comparisons, progress=progress)
 
-    except UnicodeDecodeError:
-        errors.append("File could not be decoded as UTF-8. Please provide UTF-8 encoded text.")
-    except Exception as exc:
-        errors.append(f"Unexpected error while reading file: {exc}")
 
-    valid = len(errors) == 0
-    summary = {
-        "rows": row_count,
-        "comparisons": len(comparison_col_indexes),
-        "tooltips": len(tooltip_col_indexes),
-    }
-    comparison_headers = [_clean_header(headers[idx], idx) for idx in comparison_col_indexes] if comparison_col_indexes else []
-    return PTMValidationResult(valid, errors, summary, comparison_headers)
+def validate_ptm_file(file_path: str, required_comparisons: List[str]) -> PTMValidationResult:
+    """Validate a PTM data file (see load_ptm_dataset for the rules)."""
+    return load_ptm_dataset(file_path, required_comparisons).validation
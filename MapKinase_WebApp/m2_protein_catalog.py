@@ -1,42 +1,43 @@
 import copy
+import hashlib
 import json
 import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
-from MapKinase_WebApp.m4_json import DEFAULT_DATA, DEFAULT_SETTINGS, PathwayProcessor
+from MapKinase_WebApp.c1_versioned_dirs import current_version_dir, new_version_dir, publish_version
+from MapKinase_WebApp.m4_json import (
+    DEFAULT_DATA,
+    DEFAULT_SETTINGS,
+    PathwayProcessor,
+    _entry_frame,
+    _hash_dataset_entry,
+    restyle_catalog_records,
+)
 
 CATALOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
 GLOBAL_PROTEIN_CATALOG_PATH = os.path.join(CATALOG_DIR, "global_protein_catalog.json")
-
-
-def _detect_sep(path: str) -> str:
-    ext = os.path.splitext(path)[1].lower()
-    return "," if ext == ".csv" else "\t"
+GLOBAL_PROTEIN_CATALOG_STORE = os.path.join(CATALOG_DIR, "global_protein_catalog")
+CATALOG_STORE_VERSION = 1
+SESSION_CATALOG_DIR = os.path.join(CATALOG_DIR, "session_catalogs")
+SESSION_CATALOG_MAX_ENTRIES = 8
+COLOR_SETTING_KEYS = ("negative_color", "positive_color", "max_negative", "max_positive")
+_RESTYLED_SUMMARY_MAX = 4
 
 
 def _load_dataframe(entry: Any) -> Optional[pd.DataFrame]:
-    if entry is None:
+    try:
+        return _entry_frame(entry)
+    except Exception as exc:
+        print(f"Warning: could not load catalog data: {exc}")
         return None
-    if isinstance(entry, pd.DataFrame):
-        return entry.copy()
-    if isinstance(entry, dict):
-        headers = entry.get("data_headers")
-        rows = entry.get("data_rows")
-        if headers is not None and rows is not None:
-            try:
-                return pd.DataFrame(rows, columns=headers)
-            except Exception:
-                pass
-        path = entry.get("file_path")
-        if path:
-            try:
-                return pd.read_csv(path, sep=_detect_sep(path))
-            except Exception:
-                return None
-    return None
 
 
 def _deep_merge(base: Dict[str, Any], override: Optional[Dict[str, Any]]) -> Dict[str, Any]:
@@ -69,7 +70,7 @@ def build_global_protein_catalog(
     ptm_datasets = []
     for dataset in data_cfg["ptm"]:
         df = _load_dataframe(dataset)
-        ds_copy = copy.deepcopy(dataset)
+        ds_copy = dict(dataset)
         if df is not None:
             ds_copy["dataframe"] = df
         ptm_datasets.append(ds_copy)
@@ -85,6 +86,324 @@ def build_global_protein_catalog(
     return {"metadata": metadata, "protein_catalog": catalog}
 
 
+def _fold_change_keys(catalog: Dict[str, Any]) -> List[str]:
+    keys = set()
+    for record in catalog.values():
+        if isinstance(record, dict):
+            keys.update(k for k in record if k.startswith("fold_change_"))
+    return sorted(keys, key=lambda k: int(k.rsplit("_", 1)[1]) if k.rsplit("_", 1)[1].isdigit() else 0)
+
+
+_SUMMARY_FIELDS = ("label", "gene_symbol", "backup_label")
+_SUMMARY_PREFIXES = ("fold_change_", "fc_color_")
+
+
+def catalog_color_settings(settings: Any) -> Dict[str, Any]:
+    """The colour settings (see COLOR_SETTING_KEYS) of a pathway's settings dict, for recolouring catalog entries."""
+    if not isinstance(settings, dict):
+        return {}
+    return {key: settings[key] for key in COLOR_SETTING_KEYS if settings.get(key) is not None}
+
+
+def _color_settings_key(colors: Dict[str, Any]) -> str:
+    return json.dumps({key: colors.get(key) for key in COLOR_SETTING_KEYS}, sort_keys=True, default=str)
+
+
+def summarize_catalog_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields the viewer needs to list and colour a protein before its full record is fetched."""
+    return {
+        key: value
+        for key, value in record.items()
+        if key in _SUMMARY_FIELDS or key.startswith(_SUMMARY_PREFIXES)
+    }
+
+
+def _unicode_array(values: List[str]) -> np.ndarray:
+    width = max([len(v) for v in values] + [1])
+    return np.asarray(values, dtype=f"<U{width}")
+
+
+def write_protein_catalog_store(
+    catalog: Dict[str, Any],
+    directory: str = GLOBAL_PROTEIN_CATALOG_STORE,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Write ``catalog`` as a columnar store that ProteinCatalogStore can memory-map.
+
+    Records are sorted by UniProt ID and kept as compact JSON blobs addressed through an
+    offsets array; IDs, labels, a symbol index and the fold-change matrix are NumPy arrays.
+    Each call writes a new version directory inside ``directory`` and then switches the
+    CURRENT pointer to it, so stores other threads still have mapped are left in place.
+    Raises OSError when the store cannot be written.
+    """
+    uniprot_ids = sorted(str(key) for key in catalog)
+    labels = []
+    blobs = []
+    symbol_pairs = []
+    fc_keys = _fold_change_keys(catalog)
+    fold_changes = np.full((len(uniprot_ids), len(fc_keys)), np.nan, dtype=float)
+    for row, uniprot_id in enumerate(uniprot_ids):
+        record = catalog.get(uniprot_id) or {}
+        label = str(record.get("label") or record.get("gene_symbol") or uniprot_id)
+        labels.append(label)
+        for symbol in {label, str(record.get("gene_symbol") or "")}:
+            if symbol.strip():
+                symbol_pairs.append((symbol.strip().upper(), row))
+        for col, key in enumerate(fc_keys):
+            value = record.get(key)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                fold_changes[row, col] = value
+        blobs.append(json.dumps(record, separators=(",", ":"), default=str).encode("utf-8"))
+    symbol_pairs.sort()
+    offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    np.cumsum([len(blob) for blob in blobs], out=offsets[1:])
+
+    os.makedirs(directory, exist_ok=True)
+    tmp_dir = new_version_dir(directory)
+    try:
+        np.save(os.path.join(tmp_dir, "uniprot.npy"), _unicode_array(uniprot_ids))
+        np.save(os.path.join(tmp_dir, "labels.npy"), _unicode_array(labels))
+        np.save(os.path.join(tmp_dir, "symbols.npy"), _unicode_array([pair[0] for pair in symbol_pairs]))
+        np.save(os.path.join(tmp_dir, "symbol_rows.npy"), np.asarray([pair[1] for pair in symbol_pairs], dtype=np.int64))
+        np.save(os.path.join(tmp_dir, "offsets.npy"), offsets)
+        np.save(os.path.join(tmp_dir, "fold_changes.npy"), fold_changes)
+        with open(os.path.join(tmp_dir, "records.bin"), "wb") as fh:
+            for blob in blobs:
+                fh.write(blob)
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as fh:
+            json.dump(
+                {
+                    "version": CATALOG_STORE_VERSION,
+                    "protein_count": len(uniprot_ids),
+                    "fold_change_keys": fc_keys,
+                    "metadata": metadata or {},
+                },
+                fh,
+            )
+        publish_version(directory, tmp_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    _STORE_CACHE.pop(directory, None)
+    return directory
+
+
+class ProteinCatalogStore:
+    """Read-only view over a columnar catalog written by write_protein_catalog_store.
+
+    Arrays are memory-mapped, so opening the store is cheap and fetching one protein only
+    decodes that protein's record. ``directory`` is the published version directory
+    (see current_version_dir).
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+        if meta.get("version") != CATALOG_STORE_VERSION:
+            raise ValueError(f"Unsupported protein catalog store version {meta.get('version')!r}")
+        self.metadata = meta.get("metadata", {})
+        self.fold_change_keys = list(meta.get("fold_change_keys", []))
+        self.uniprot_ids = np.load(os.path.join(directory, "uniprot.npy"), mmap_mode="r")
+        self.labels = np.load(os.path.join(directory, "labels.npy"), mmap_mode="r")
+        self.symbols = np.load(os.path.join(directory, "symbols.npy"), mmap_mode="r")
+        self.symbol_rows = np.load(os.path.join(directory, "symbol_rows.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r")
+        self.fold_changes = np.load(os.path.join(directory, "fold_changes.npy"), mmap_mode="r")
+        records_path = os.path.join(directory, "records.bin")
+        if os.path.getsize(records_path):
+            self._records = np.memmap(records_path, dtype=np.uint8, mode="r")
+        else:
+            self._records = np.zeros(0, dtype=np.uint8)
+        self._full: Optional[Dict[str, Dict[str, Any]]] = None
+        self._summary: Optional[Dict[str, Dict[str, Any]]] = None
+        self._restyled_summaries: "OrderedDict[str, Dict[str, Dict[str, Any]]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.uniprot_ids)
+
+    def __contains__(self, uniprot_id: Any) -> bool:
+        return self.row_for(uniprot_id) is not None
+
+    def row_for(self, uniprot_id: Any) -> Optional[int]:
+        key = str(uniprot_id or "")
+        if not key or not len(self.uniprot_ids):
+            return None
+        row = int(np.searchsorted(self.uniprot_ids, key))
+        if row < len(self.uniprot_ids) and self.uniprot_ids[row] == key:
+            return row
+        return None
+
+    def record_at(self, row: int) -> Dict[str, Any]:
+        start, stop = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(self._records[start:stop].tobytes().decode("utf-8"))
+
+    def get(self, uniprot_id: Any) -> Optional[Dict[str, Any]]:
+        row = self.row_for(uniprot_id)
+        return None if row is None else self.record_at(row)
+
+    def get_many(self, uniprot_ids: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+        records = {}
+        for uniprot_id in uniprot_ids:
+            record = self.get(uniprot_id)
+            if record is not None:
+                records[str(uniprot_id)] = record
+        return records
+
+    def rows_for_symbol(self, symbol: Any) -> List[int]:
+        key = str(symbol or "").strip().upper()
+        if not key or not len(self.symbols):
+            return []
+        start = int(np.searchsorted(self.symbols, key, side="left"))
+        stop = int(np.searchsorted(self.symbols, key, side="right"))
+        return sorted({int(row) for row in self.symbol_rows[start:stop]})
+
+    def find(self, key: Any) -> List[str]:
+        """UniProt IDs matching ``key`` as a UniProt ID or (case-insensitive) gene symbol."""
+        row = self.row_for(key)
+        if row is not None:
+            return [str(self.uniprot_ids[row])]
+        return [str(self.uniprot_ids[row]) for row in self.rows_for_symbol(key)]
+
+    def search(self, pattern: str, limit: int = 50) -> List[Tuple[str, str]]:
+        """(uniprot, label) pairs whose ID or label matches the regex ``pattern``."""
+        try:
+            regex = re.compile(pattern, re.IGNORECASE)
+        except re.error:
+            return []
+        matches = []
+        for uniprot_id, label in zip(self.uniprot_ids, self.labels):
+            if regex.search(str(uniprot_id)) or regex.search(str(label)):
+                matches.append((str(uniprot_id), str(label)))
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def summary(self, colors: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+        """Per-protein summaries (see summarize_catalog_record), built once per store.
+
+        With ``colors`` (see catalog_color_settings) the fc_color_* fields are recomputed for
+        those settings; the last few recoloured summaries are kept.
+        """
+        if self._summary is None:
+            self._summary = {uniprot_id: summarize_catalog_record(record) for uniprot_id, record in self.iter_records()}
+        if not colors:
+            return self._summary
+        key = _color_settings_key(colors)
+        restyled = self._restyled_summaries.get(key)
+        if restyled is None:
+            restyled = restyle_catalog_records(self._summary, colors)
+            self._restyled_summaries[key] = restyled
+            while len(self._restyled_summaries) > _RESTYLED_SUMMARY_MAX:
+                self._restyled_summaries.popitem(last=False)
+        self._restyled_summaries.move_to_end(key)
+        return restyled
+
+    def iter_records(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for row in range(len(self.uniprot_ids)):
+            yield str(self.uniprot_ids[row]), self.record_at(row)
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Every record, decoded once per store and shared between callers (treat as read-only)."""
+        if self._full is None:
+            self._full = dict(self.iter_records())
+        return self._full
+
+
+_STORE_CACHE: Dict[str, Tuple[str, int, ProteinCatalogStore]] = {}
+
+
+def _store_dir_for(path: Optional[str]) -> str:
+    if not path:
+        return GLOBAL_PROTEIN_CATALOG_STORE
+    path = str(path)
+    return path[:-len(".json")] if path.endswith(".json") else path
+
+
+def open_protein_catalog_store(path: Optional[str] = None) -> Optional[ProteinCatalogStore]:
+    """Open (or reuse) the columnar store for a catalog JSON path or store directory.
+
+    Builds the store from the JSON catalog the first time it is missing or older than
+    the JSON; returns None when neither exists.
+    """
+    directory = _store_dir_for(path)
+    json_path = f"{directory}.json"
+    try:
+        json_mtime = os.stat(json_path).st_mtime_ns if os.path.exists(json_path) else None
+        version_dir = current_version_dir(directory)
+        store_mtime = os.stat(os.path.join(version_dir, "meta.json")).st_mtime_ns if version_dir else None
+        if json_mtime is not None and (store_mtime is None or store_mtime < json_mtime):
+            with open(json_path, "r", encoding="utf-8") as fh:
+                payload = json.load(fh)
+            write_protein_catalog_store(
+                payload.get("protein_catalog", {}) or {}, directory, payload.get("metadata", {})
+            )
+            version_dir = current_version_dir(directory)
+            store_mtime = os.stat(os.path.join(version_dir, "meta.json")).st_mtime_ns if version_dir else None
+        if version_dir is None:
+            return None
+        cached = _STORE_CACHE.get(directory)
+        if cached is not None and cached[0] == version_dir and cached[1] == store_mtime:
+            return cached[2]
+        store = ProteinCatalogStore(version_dir)
+        _STORE_CACHE[directory] = (version_dir, store_mtime, store)
+        return store
+    except (OSError, ValueError, json.JSONDecodeError) as exc:
+        print(f"Warning: could not open protein catalog store for {path}: {exc}")
+        return None
+
+
+def get_catalog_records(
+    catalog_info: Any,
+    uniprot_ids: Iterable[Any],
+    colors: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Fetch only the requested proteins, from an inline catalog or the on-disk store.
+
+    With ``colors`` (see catalog_color_settings) the records' colours are recomputed for
+    the viewed pathway's settings instead of those the catalog was built with.
+    """
+    records: Dict[str, Dict[str, Any]] = {}
+    inline = catalog_info.get("protein_catalog") if isinstance(catalog_info, dict) else None
+    if isinstance(inline, dict):
+        records = {str(uid): inline[uid] for uid in uniprot_ids if uid in inline}
+    else:
+        path = (catalog_info.get("store_path") or catalog_info.get("path")) if isinstance(catalog_info, dict) else None
+        store = open_protein_catalog_store(path or os.environ.get("GLOBAL_PROTEIN_CATALOG_PATH"))
+        if store is not None:
+            records = store.get_many(uniprot_ids)
+    return restyle_catalog_records(records, colors) if colors and records else records
+
+
+def get_catalog_summary(catalog_info: Any, colors: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+    """Compact per-protein summary for the viewer's search list; full records come from get_catalog_records.
+
+    ``colors`` recolours the summaries as in get_catalog_records.
+    """
+    if isinstance(catalog_info, dict):
+        inline = catalog_info.get("protein_catalog")
+        if isinstance(inline, dict):
+            summary = {str(uid): summarize_catalog_record(record or {}) for uid, record in inline.items()}
+            return restyle_catalog_records(summary, colors) if colors else summary
+        path = catalog_info.get("store_path") or catalog_info.get("path")
+    else:
+        path = None
+    store = open_protein_catalog_store(path or os.environ.get("GLOBAL_PROTEIN_CATALOG_PATH"))
+    return store.summary(colors) if store is not None else {}
+
+
+def load_full_catalog(catalog_info: Any) -> Dict[str, Dict[str, Any]]:
+    if isinstance(catalog_info, dict):
+        inline = catalog_info.get("protein_catalog")
+        if isinstance(inline, dict):
+            return inline
+        path = catalog_info.get("store_path") or catalog_info.get("path")
+    else:
+        path = None
+    store = open_protein_catalog_store(path or os.environ.get("GLOBAL_PROTEIN_CATALOG_PATH"))
+    return store.to_dict() if store is not None else {}
+
+
 def ensure_global_protein_catalog(
     force: bool = False,
     data_override: Optional[Dict[str, Any]] = None,
@@ -92,24 +411,172 @@ def ensure_global_protein_catalog(
 ) -> Dict[str, Any]:
     os.makedirs(CATALOG_DIR, exist_ok=True)
     if not force and os.path.exists(GLOBAL_PROTEIN_CATALOG_PATH):
-        try:
-            with open(GLOBAL_PROTEIN_CATALOG_PATH, "r", encoding="utf-8") as fh:
-                payload = json.load(fh)
-            metadata = payload.get("metadata", {})
-        except (OSError, json.JSONDecodeError):
-            metadata = {}
-        info = {"path": GLOBAL_PROTEIN_CATALOG_PATH, "metadata": metadata}
+        store = open_protein_catalog_store(GLOBAL_PROTEIN_CATALOG_PATH)
+        metadata = dict(store.metadata) if store is not None else {}
+        info = {"path": GLOBAL_PROTEIN_CATALOG_PATH, "store_path": GLOBAL_PROTEIN_CATALOG_STORE, "metadata": metadata}
         os.environ.setdefault("GLOBAL_PROTEIN_CATALOG_PATH", GLOBAL_PROTEIN_CATALOG_PATH)
         return info
 
     payload = build_global_protein_catalog(data_override=data_override, settings_override=settings_override)
-    with open(GLOBAL_PROTEIN_CATALOG_PATH, "w", encoding="utf-8") as fh:
-        json.dump(payload, fh, indent=2)
-    info = {"path": GLOBAL_PROTEIN_CATALOG_PATH, "metadata": payload.get("metadata", {})}
+    try:
+        with open(GLOBAL_PROTEIN_CATALOG_PATH, "w", encoding="utf-8") as fh:
+            json.dump(payload, fh, separators=(",", ":"))
+        write_protein_catalog_store(payload["protein_catalog"], GLOBAL_PROTEIN_CATALOG_STORE, payload.get("metadata", {}))
+    except OSError as exc:
+        # The store is rebuilt from the JSON on next open; until then the previous version is served.
+        print(f"Warning: could not write the global protein catalog store: {exc}")
+    info = {
+        "path": GLOBAL_PROTEIN_CATALOG_PATH,
+        "store_path": GLOBAL_PROTEIN_CATALOG_STORE,
+        "metadata": payload.get("metadata", {}),
+    }
     os.environ["GLOBAL_PROTEIN_CATALOG_PATH"] = GLOBAL_PROTEIN_CATALOG_PATH
     return info
 
 
+def protein_catalog_key(
+    data_override: Optional[Dict[str, Any]] = None,
+    settings_override: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Content hash of the datasets and settings a catalog would be built from."""
+    data_cfg = copy.deepcopy(DEFAULT_DATA)
+    _deep_merge(data_cfg, data_override)
+    settings = dict(DEFAULT_SETTINGS)
+    if settings_override:
+        settings.update(settings_override)
+    digest = hashlib.sha256()
+    digest.update(f"v{CATALOG_STORE_VERSION}".encode("utf-8"))
+    _hash_dataset_entry(digest, data_cfg.get("protein"))
+    for dataset in data_cfg.get("ptm") or []:
+        _hash_dataset_entry(digest, dataset)
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+class SessionCatalogRegistry:
+    """Process-wide catalogs for uploaded data, shared between sessions by content hash.
+
+    Each session holds a reference to at most one catalog. Identical uploads reuse the
+    same store instead of rebuilding it, and sessions never overwrite each other's
+    catalog. Catalogs no session references are kept in LRU order and evicted (memory
+    and disk) once more than ``max_entries`` are held.
+    """
+
+    def __init__(self, directory: str = SESSION_CATALOG_DIR, max_entries: int = SESSION_CATALOG_MAX_ENTRIES) -> None:
+        self.directory = directory
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._refs: Dict[str, set] = {}
+        self._session_keys: Dict[Any, str] = {}
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.builds = 0
+
+    def _store_dir(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _build(self, key: str, data_override, settings_override) -> Dict[str, Any]:
+        store_dir = self._store_dir(key)
+        store = open_protein_catalog_store(store_dir)
+        if store is None:
+            payload = build_global_protein_catalog(data_override=data_override, settings_override=settings_override)
+            metadata = dict(payload.get("metadata", {}), catalog_key=key)
+            os.makedirs(self.directory, exist_ok=True)
+            write_protein_catalog_store(payload["protein_catalog"], store_dir, metadata)
+            self.builds += 1
+            self._prune_disk(keep=key)
+            metadata_out = metadata
+        else:
+            self.hits += 1
+            metadata_out = dict(store.metadata)
+        return {"path": store_dir, "store_path": store_dir, "metadata": metadata_out, "catalog_key": key}
+
+    def acquire(
+        self,
+        session_id: Any,
+        data_override: Optional[Dict[str, Any]] = None,
+        settings_override: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Catalog info for this session's data, building it only if the hash is new."""
+        key = protein_catalog_key(data_override, settings_override)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self._bind(session_id, key)
+                return dict(entry)
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is None:
+                entry = self._build(key, data_override, settings_override)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._build_locks.pop(key, None)
+            self._bind(session_id, key)
+            self._evict()
+            return dict(entry)
+
+    def release(self, session_id: Any) -> None:
+        with self._lock:
+            key = self._session_keys.pop(session_id, None)
+            if key is not None:
+                self._refs.get(key, set()).discard(session_id)
+            self._evict()
+
+    def _bind(self, session_id: Any, key: str) -> None:
+        previous = self._session_keys.get(session_id)
+        if previous is not None and previous != key:
+            self._refs.get(previous, set()).discard(session_id)
+        self._session_keys[session_id] = key
+        self._refs.setdefault(key, set()).add(session_id)
+
+    def _evict(self) -> None:
+        for key in list(self._entries):
+            if len(self._entries) <= self.max_entries:
+                break
+            if self._refs.get(key):
+                continue
+            self._entries.pop(key, None)
+            self._refs.pop(key, None)
+            store_dir = self._store_dir(key)
+            _STORE_CACHE.pop(store_dir, None)
+            shutil.rmtree(store_dir, ignore_errors=True)
+
+    def _prune_disk(self, keep: str) -> None:
+        """Drop stores left on disk by earlier runs once more than ``max_entries`` exist."""
+        try:
+            names = [name for name in os.listdir(self.directory) if ".tmp-" not in name]
+        except OSError:
+            return
+        with self._lock:
+            known = set(self._entries) | {keep}
+        stale = [name for name in names if name not in known]
+        excess = len(names) - self.max_entries
+        if excess <= 0:
+            return
+        stale.sort(key=lambda name: os.path.getmtime(os.path.join(self.directory, name)))
+        for name in stale[:excess]:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "referenced": sum(1 for key in self._entries if self._refs.get(key)),
+                "sessions": len(self._session_keys),
+                "hits": self.hits,
+                "builds": self.builds,
+            }
+
+
+SESSION_CATALOGS = SessionCatalogRegistry()
+
+
 if __name__ == "__main__":
     info = ensure_global_protein_catalog(force=True)
     print(f"Global protein catalog written to {info['path']} ({info['metadata'].get('protein_count', 0)} proteins).")
@@ -5,6 +5,7 @@ import os
 from pathlib import Path
 from typing import Optional
 from shiny import App, ui, render, reactive
+from MapKinase_WebApp.m2_protein_catalog import catalog_color_settings, get_catalog_records, get_catalog_summary
 
 try:
     import numpy as _np
@@ -136,19 +137,18 @@ def create_pathway_svg(json_data, show_kegg_bg=False):
     text_data = json_data.get('text_data', [])
     show_arrows = bool(settings.get('show_arrows', True))
     show_text_boxes = bool(settings.get('show_text_boxes', True))
-    catalog_data = {}
     catalog_info = json_data.get('_global_protein_catalog') or {}
-    catalog_path = catalog_info.get('path') or os.environ.get('GLOBAL_PROTEIN_CATALOG_PATH')
-    if isinstance(catalog_info, dict) and catalog_info.get('protein_catalog'):
-        catalog_data = catalog_info.get('protein_catalog') or {}
-    elif catalog_path and os.path.exists(catalog_path):
-        try:
-            with open(catalog_path, 'r', encoding='utf-8') as catalog_fh:
-                catalog_payload = json.load(catalog_fh)
-            if isinstance(catalog_payload, dict):
-                catalog_data = catalog_payload.get('protein_catalog', {}) or {}
-        except Exception as catalog_err:
-            print(f"Warning: failed to load global protein catalog from {catalog_path}: {catalog_err}")
+    # Only a per-protein summary is embedded; full records are fetched through
+    # the 'catalog_record_request' input when a protein is added to the canvas.
+    # Catalog colours follow this pathway's colour settings, which are also part of the
+    # key so the viewer drops records fetched under other settings.
+    catalog_colors = catalog_color_settings(settings)
+    catalog_key = str(catalog_info.get('catalog_key') or catalog_info.get('store_path') or catalog_info.get('path') or '') if isinstance(catalog_info, dict) else ''
+    catalog_data = {
+        'key': f"{catalog_key}|{_safe_json_dumps(catalog_colors)}",
+        'colors': catalog_colors,
+        'proteins': get_catalog_summary(catalog_info, catalog_colors),
+    }
     if not protbox_data:
         max_x, max_y = 800, 600
     else:
@@ -233,13 +233,18 @@ def create_pathway_svg(json_data, show_kegg_bg=False):
     function getCanvasEl() {{
         return getScopedNodeById('svgCanvas');
     }}
+    var proteinCatalogKey = '';
+    var proteinCatalogColors = {{}};
     var proteinCatalog = (function() {{
         try {{
             var catalogNode = getScopedNodeById('global-protein-catalog');
             if (catalogNode) {{
                 var parsedPayload = JSON.parse(catalogNode.textContent || '{{}}') || {{}};
                 if (typeof parsedPayload === 'object' && !Array.isArray(parsedPayload)) {{
-                    return parsedPayload;
+                    proteinCatalogKey = String(parsedPayload.key || '');
+                    proteinCatalogColors = parsedPayload.colors || {{}};
+                    var proteins = parsedPayload.proteins;
+                    return (proteins && typeof proteins === 'object' && !Array.isArray(proteins)) ? proteins : {{}};
                 }}
             }}
         }} catch (err) {{
@@ -247,6 +252,42 @@ def create_pathway_svg(json_data, show_kegg_bg=False):
         }}
         return {{}};
     }})();
+    // Full catalog records are fetched from the server on demand and cached per catalog.
+    if (window.__mkCatalogRecordKey !== proteinCatalogKey) {{
+        window.__mkCatalogRecordKey = proteinCatalogKey;
+        window.__mkCatalogRecordCache = {{}};
+    }}
+    window.__mkCatalogRecordWaiters = window.__mkCatalogRecordWaiters || {{}};
+    if (window.Shiny && Shiny.addCustomMessageHandler && !window.__mkCatalogRecordHandlerInstalled) {{
+        window.__mkCatalogRecordHandlerInstalled = true;
+        Shiny.addCustomMessageHandler('catalog_records', function(msg) {{
+            var records = (msg && msg.records) || {{}};
+            var uniprots = (msg && Array.isArray(msg.uniprots)) ? msg.uniprots : Object.keys(records);
+            uniprots.forEach(function(uniprot) {{
+                if (records[uniprot]) {{
+                    window.__mkCatalogRecordCache[uniprot] = records[uniprot];
+                }}
+                var waiters = window.__mkCatalogRecordWaiters[uniprot] || [];
+                delete window.__mkCatalogRecordWaiters[uniprot];
+                waiters.forEach(function(resolve) {{ resolve(window.__mkCatalogRecordCache[uniprot] || null); }});
+            }});
+        }});
+    }}
+    function requestCatalogRecord(uniprot) {{
+        if (!uniprot) return Promise.resolve(null);
+        var cached = window.__mkCatalogRecordCache[uniprot];
+        if (cached) return Promise.resolve(cached);
+        if (!(window.Shiny && Shiny.setInputValue)) return Promise.resolve(null);
+        return new Promise(function(resolve) {{
+            var waiters = window.__mkCatalogRecordWaiters[uniprot];
+            if (!waiters) {{
+                waiters = window.__mkCatalogRecordWaiters[uniprot] = [];
+                Shiny.setInputValue('catalog_record_request', {{ uniprots: [uniprot], colors: proteinCatalogColors, ts: Date.now() }}, {{ priority: 'event' }});
+            }}
+            waiters.push(resolve);
+            setTimeout(function() {{ resolve(window.__mkCatalogRecordCache[uniprot] || null); }}, 10000);
+        }});
+    }}
     // Pick the first unoccupied PTM snap point for a protbox
     var ptmSnapRadius = 12;
     var currentSelected = currentSelected || {{}};
@@ -7203,18 +7244,25 @@ function rebuildGroupIndexes() {{
                 }}
                 return snapshot;
             }}
-            const ensureProteinRecord = (uniprot) => {{
+            const ensureProteinRecord = (uniprot, fallback = null) => {{
                 if (!uniprot) return null;
-                if (!proteinData[uniprot] && proteinCatalog[uniprot]) {{
+                const source = window.__mkCatalogRecordCache[uniprot] || fallback;
+                if (!proteinData[uniprot] && source) {{
                     try {{
-                        proteinData[uniprot] = JSON.parse(JSON.stringify(proteinCatalog[uniprot]));
+                        proteinData[uniprot] = JSON.parse(JSON.stringify(source));
                     }} catch (err) {{
                         console.warn('Failed to clone catalog entry for', uniprot, err);
-                        proteinData[uniprot] = proteinCatalog[uniprot];
+                        proteinData[uniprot] = source;
                     }}
                 }}
                 return proteinData[uniprot];
             }};
+            const ensureProteinRecordAsync = (uniprot) => {{
+                const existing = ensureProteinRecord(uniprot);
+                if (existing || !proteinCatalog[uniprot]) return Promise.resolve(existing || null);
+                // Fall back to the summary entry if the full record cannot be fetched.
+                return requestCatalogRecord(uniprot).then(() => ensureProteinRecord(uniprot, proteinCatalog[uniprot]));
+            }};
 
             const spawnPtmForProtbox = (protboxId, uniprot, ptmKey, options = {{}}) => {{
                 const protein = ensureProteinRecord(uniprot);
@@ -8320,6 +8368,14 @@ function rebuildGroupIndexes() {{
             }};
             const createProtboxAtPosition = (uniprot, svgX, svgY, options = {{}}) => {{
                 const protein = ensureProteinRecord(uniprot);
+                if (!protein && proteinCatalog[uniprot] && !options.catalogFetched) {{
+                    ensureProteinRecordAsync(uniprot).then((record) => {{
+                        if (record) {{
+                            createProtboxAtPosition(uniprot, svgX, svgY, Object.assign({{}}, options, {{ catalogFetched: true }}));
+                        }}
+                    }});
+                    return;
+                }}
                 if (!protein) {{
                     console.warn('No protein data for', uniprot);
                     return;
@@ -9896,6 +9952,19 @@ def server(input, output, session):
             json_data.setdefault('protein_data', {})[uniprot] = protein_payload
         _set_active_json(json_data)
 
+    @reactive.Effect
+    @reactive.event(input.catalog_record_request)
+    async def send_catalog_records():
+        request = input.catalog_record_request() or {}
+        uniprots = [str(uid) for uid in (request.get('uniprots') or []) if uid]
+        if not uniprots:
+            return
+        json_data = json_data_reactive.get() or {}
+        catalog_info = _extract_catalog_info(json_data) or {}
+        colors = request.get('colors') or catalog_color_settings(json_data.get('general_data', {}).get('settings', {}))
+        records = get_catalog_records(catalog_info, uniprots, colors)
+        await session.send_custom_message('catalog_records', {'uniprots': uniprots, 'records': records})
+
     @reactive.Effect
     @reactive.event(input.add_text_box)
     def add_text_box():
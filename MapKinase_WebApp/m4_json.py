@@ -1,5 +1,6 @@
 import sys
 import base64
+import copy
 import pandas as pd
 import numpy as np
 import os
@@ -8,9 +9,19 @@ from datetime import datetime
 from collections import defaultdict
 import json
 import html
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from multiprocessing import util as multiprocessing_util
 from MapKinase_WebApp.a1_factory import get_pathway_api
+from MapKinase_WebApp.a1_pathway_topology import PathwayTopology
+from MapKinase_WebApp.m13_color_gradient import get_gradient
+from MapKinase_WebApp.m1_file_processor import loaded_dataset, typed_frame
 
 
 def _safe_debug_print(*parts):
@@ -153,11 +164,7 @@ def _resolve_outline_columns(fold_change_columns, headers):
         resolved.append(outline_map.get(key))
     return resolved
 
-def parse_exceptions_file(file_path='exceptions_file.txt'):
-    exceptions = {
-        'global': {'proximity': [], 'specific': {}},
-        'hsa_specific': {}
-    }
+def _resolve_exceptions_path(file_path='exceptions_file.txt'):
     if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
         candidate_dirs = [
             os.path.join(sys._MEIPASS, 'MapKinase_WebApp'),
@@ -172,6 +179,15 @@ def parse_exceptions_file(file_path='exceptions_file.txt'):
         if os.path.exists(candidate):
             full_path = candidate
             break
+    return full_path, candidate_dirs
+
+
+def parse_exceptions_file(file_path='exceptions_file.txt'):
+    exceptions = {
+        'global': {'proximity': [], 'specific': {}},
+        'hsa_specific': {}
+    }
+    full_path, candidate_dirs = _resolve_exceptions_path(file_path)
     try:
         if not full_path:
             print(f"Exceptions file not found (searched: {candidate_dirs})")
@@ -231,9 +247,288 @@ def parse_exceptions_file(file_path='exceptions_file.txt'):
         print(f"Error reading exceptions file {full_path}: {str(e)}")
         return exceptions
 
-def calculate_proximities(genes, proteomic_data):
+# Perpendicular tolerances used by the adjacency conditions; any neighbour index radius must cover them.
+_PROXIMITY_ALIGN_X = 23
+_PROXIMITY_ALIGN_Y = 8
+
+
+class ProximityIndex:
+    """Sparse neighbour lists (CSR layout) for protbox entries.
+
+    Only pairs whose x and y offsets both fall within ``radius`` are stored, so memory and
+    build time scale with the number of nearby boxes rather than N x N. ``radius=None``
+    keeps every pair.
+    """
+
+    def __init__(self, entry_ids, xs, ys, radius=None):
+        self.entry_ids = list(entry_ids)
+        self.positions = {entry_id: pos for pos, entry_id in enumerate(self.entry_ids)}
+        self.radius = radius
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        count = len(self.entry_ids)
+        if count == 0:
+            pairs_i = pairs_j = np.zeros(0, dtype=np.int64)
+        elif radius is None or not np.isfinite(radius):
+            grid_i, grid_j = np.meshgrid(np.arange(count), np.arange(count), indexing='ij')
+            keep = grid_i != grid_j
+            pairs_i, pairs_j = grid_i[keep], grid_j[keep]
+        else:
+            pairs_i, pairs_j = self._grid_pairs(xs, ys, max(float(radius), 1e-9))
+        order = np.lexsort((pairs_j, pairs_i))
+        pairs_i, pairs_j = pairs_i[order], pairs_j[order]
+        self.offsets = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pairs_i, minlength=count), out=self.offsets[1:])
+        self.neighbors = pairs_j.astype(np.int32)
+        self.dx = xs[pairs_j] - xs[pairs_i]
+        self.dy = ys[pairs_j] - ys[pairs_i]
+
+    @staticmethod
+    def _grid_pairs(xs, ys, radius):
+        # Bucket boxes into radius-sized cells; candidates only come from the 3x3 surrounding cells.
+        cell_x = np.floor(xs / radius).astype(np.int64)
+        cell_y = np.floor(ys / radius).astype(np.int64)
+        buckets = defaultdict(list)
+        for pos, key in enumerate(zip(cell_x.tolist(), cell_y.tolist())):
+            buckets[key].append(pos)
+        buckets = {key: np.asarray(members, dtype=np.int64) for key, members in buckets.items()}
+        found_i = []
+        found_j = []
+        for (cx, cy), members in buckets.items():
+            candidates = [
+                buckets[(cx + ox, cy + oy)]
+                for ox in (-1, 0, 1)
+                for oy in (-1, 0, 1)
+                if (cx + ox, cy + oy) in buckets
+            ]
+            candidates = np.concatenate(candidates)
+            left = np.repeat(members, len(candidates))
+            right = np.tile(candidates, len(members))
+            keep = (
+                (left != right)
+                & (np.abs(xs[right] - xs[left]) <= radius)
+                & (np.abs(ys[right] - ys[left]) <= radius)
+            )
+            found_i.append(left[keep])
+            found_j.append(right[keep])
+        return np.concatenate(found_i), np.concatenate(found_j)
+
+    def __contains__(self, entry_id):
+        return entry_id in self.positions
+
+    def __len__(self):
+        return len(self.entry_ids)
+
+    @property
+    def pair_count(self):
+        return len(self.neighbors)
+
+    def offsets_for(self, entry_id):
+        """Return (dx, dy) arrays from ``entry_id`` to each stored neighbour."""
+        pos = self.positions.get(entry_id)
+        if pos is None:
+            empty = np.zeros(0, dtype=float)
+            return empty, empty
+        start, stop = self.offsets[pos], self.offsets[pos + 1]
+        return self.dx[start:stop], self.dy[start:stop]
+
+    def neighbor_ids(self, entry_id):
+        pos = self.positions.get(entry_id)
+        if pos is None:
+            return []
+        return [self.entry_ids[idx] for idx in self.neighbors[self.offsets[pos]:self.offsets[pos + 1]]]
+
+
+_PROXIMITY_CONDITIONS = ('adjacent_y_south', 'adjacent_y_north', 'adjacent_x_west', 'adjacent_x_east')
+_PROXIMITY_CONDITION_CODES = {name: code for code, name in enumerate(_PROXIMITY_CONDITIONS)}
+_PROXIMITY_ACTIONS = ('block', 'priority', 'move_circle', 'move_label')
+
+
+def _proximity_nearest(dx, dy):
+    """Nearest qualifying neighbour distance per condition code (inf when none; last slot = unknown condition).
+
+    A condition with threshold t holds when some neighbour is closer than t, i.e. when this minimum is < t.
+    """
+    nearest = np.full(len(_PROXIMITY_CONDITIONS) + 1, np.inf)
+    if len(dx) == 0:
+        return nearest
+    abs_dx = np.abs(dx)
+    abs_dy = np.abs(dy)
+    in_column = abs_dx <= _PROXIMITY_ALIGN_X
+    in_row = abs_dy <= _PROXIMITY_ALIGN_Y
+    candidates = (
+        (in_column & (dy > 0), abs_dy),
+        (in_column & (dy < 0), abs_dy),
+        (in_row & (dx < 0), abs_dx),
+        (in_row & (dx > 0), abs_dx),
+    )
+    for code, (mask, distance) in enumerate(candidates):
+        if mask.any():
+            nearest[code] = distance[mask].min()
+    return nearest
+
+
+def _compile_move(action, values):
+    try:
+        if action == 'move_circle' and len(values) == 3:
+            return values[0], (float(values[1]), float(values[2]))
+        if action == 'move_label' and len(values) == 4:
+            return values[0], (float(values[1]), float(values[2]), values[3])
+    except ValueError:
+        print(f"Skipping {action} exception with non-numeric offsets: {values}")
+    return None
+
+
+class PathwayExceptionRules:
+    """Global plus pathway-specific exceptions compiled for fast per-protbox lookups.
+
+    Proximity rules are sorted by priority once and their conditions flattened into
+    arrays, so checking a protbox is one nearest-distance pass over its neighbours
+    followed by an array comparison. Specific rules are pre-resolved per protein.
+    """
+
+    def __init__(self, global_rules, pathway_rules):
+        proximity = list(global_rules.get('proximity', [])) + list(pathway_rules.get('proximity', []))
+        proximity = [rule for rule in proximity if rule.get('action') in _PROXIMITY_ACTIONS]
+        # Stable sort: equal priorities keep file order (global first), later rules win ties below.
+        self.proximity_rules = sorted(proximity, key=lambda rule: rule['priority'])
+        self.radius = max(
+            [_PROXIMITY_ALIGN_X, _PROXIMITY_ALIGN_Y]
+            + [threshold for rule in self.proximity_rules for _, threshold in rule['conditions']]
+        )
+        condition_rule, condition_code, condition_threshold = [], [], []
+        self.rule_counts = np.zeros(len(self.proximity_rules), dtype=float)
+        self.rule_moves = []
+        for rule_idx, rule in enumerate(self.proximity_rules):
+            # A condition listed twice only needs one of its thresholds to hold, so keep the loosest.
+            loosest = {}
+            for condition, threshold in rule['conditions']:
+                loosest[condition] = max(loosest.get(condition, -np.inf), threshold)
+            for condition, threshold in loosest.items():
+                condition_rule.append(rule_idx)
+                condition_code.append(_PROXIMITY_CONDITION_CODES.get(condition, len(_PROXIMITY_CONDITIONS)))
+                condition_threshold.append(threshold)
+            self.rule_counts[rule_idx] = len(loosest)
+            self.rule_moves.append(_compile_move(rule['action'], rule['values']))
+        self.condition_rule = np.asarray(condition_rule, dtype=np.int64)
+        self.condition_code = np.asarray(condition_code, dtype=np.int64)
+        self.condition_threshold = np.asarray(condition_threshold, dtype=float)
+
+        self.specific = {}
+        specific = defaultdict(list)
+        for source in (pathway_rules.get('specific', {}), global_rules.get('specific', {})):
+            for protein, rules in source.items():
+                specific[protein].extend(rules)
+        for protein, rules in specific.items():
+            self.specific[protein] = self._compile_specific(rules)
+
+    @staticmethod
+    def _compile_specific(rules):
+        blocked_positions = set()
+        custom_priority = None
+        move_circle = {}
+        move_label = {}
+        for rule in rules:
+            action = rule[0].lower()
+            if action == 'block' and len(rule) > 1:
+                blocked_positions.add(rule[1])
+            elif action == 'priority':
+                custom_priority = rule[1:]
+            elif action in ('move_circle', 'move_label'):
+                move = _compile_move(action, rule[1:])
+                if move is not None:
+                    (move_circle if action == 'move_circle' else move_label)[move[0]] = move[1]
+        return blocked_positions, custom_priority, move_circle, move_label
+
+    def matching_rules(self, dx, dy):
+        """Indices into ``proximity_rules`` whose conditions all hold, in priority order."""
+        if not self.proximity_rules:
+            return []
+        nearest = _proximity_nearest(dx, dy)
+        satisfied = nearest[self.condition_code] < self.condition_threshold
+        hits = np.bincount(self.condition_rule, weights=satisfied, minlength=len(self.proximity_rules))
+        return np.flatnonzero(hits == self.rule_counts).tolist()
+
+    def placement(self, protein, dx, dy):
+        """Return (blocked_positions, custom_priority, move_circle, move_label) for one protbox."""
+        blocked, custom_priority, move_circle, move_label = self.specific.get(protein, (set(), None, {}, {}))
+        blocked_positions = set(blocked)
+        move_circle = dict(move_circle)
+        move_label = dict(move_label)
+        top_rule = {}
+        for rule_idx in self.matching_rules(dx, dy):
+            rule = self.proximity_rules[rule_idx]
+            action = rule['action']
+            if action in ('block', 'priority'):
+                # Only the first rule with the highest priority applies.
+                current = top_rule.get(action)
+                if current is None or rule['priority'] > current['priority']:
+                    top_rule[action] = rule
+                continue
+            move = self.rule_moves[rule_idx]
+            if move is not None:
+                (move_circle if action == 'move_circle' else move_label)[move[0]] = move[1]
+        if 'block' in top_rule:
+            blocked_positions.update(top_rule['block']['values'])
+        if 'priority' in top_rule:
+            custom_priority = top_rule['priority']['values']
+        return blocked_positions, custom_priority, move_circle, move_label
+
+
+class CompiledExceptions:
+    """Parsed exceptions file with per-pathway compiled rules built on first use."""
+
+    def __init__(self, raw, path=None):
+        self.raw = raw
+        self.path = path
+        self.digest = hashlib.sha1(json.dumps(raw, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        self._by_pathway = {}
+
+    def for_pathway(self, pathway_id):
+        rules = self._by_pathway.get(pathway_id)
+        if rules is None:
+            rules = PathwayExceptionRules(
+                self.raw.get('global', {}),
+                self.raw.get('hsa_specific', {}).get(pathway_id, {}),
+            )
+            self._by_pathway[pathway_id] = rules
+        return rules
+
+
+_COMPILED_EXCEPTIONS_CACHE = {}
+
+
+def load_exceptions(file_path='exceptions_file.txt'):
+    """Compiled exceptions for ``file_path``; only re-parsed when the file's mtime or size changes."""
+    full_path, _ = _resolve_exceptions_path(file_path)
+    if not full_path:
+        return CompiledExceptions(parse_exceptions_file(file_path))
+    try:
+        stat = os.stat(full_path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        stamp = None
+    cached = _COMPILED_EXCEPTIONS_CACHE.get(full_path)
+    if cached is not None and stamp is not None and cached[0] == stamp:
+        return cached[1]
+    compiled = CompiledExceptions(parse_exceptions_file(file_path), path=full_path)
+    if stamp is not None:
+        _COMPILED_EXCEPTIONS_CACHE[full_path] = (stamp, compiled)
+    return compiled
+
+
+def proximity_radius(exceptions, pathway_id):
+    """Largest distance any proximity rule for ``pathway_id`` can look at."""
+    if isinstance(exceptions, CompiledExceptions):
+        return exceptions.for_pathway(pathway_id).radius
+    rules = list(exceptions.get('global', {}).get('proximity', []))
+    rules += exceptions.get('hsa_specific', {}).get(pathway_id, {}).get('proximity', [])
+    thresholds = [threshold for rule in rules for _, threshold in rule['conditions']]
+    return max([_PROXIMITY_ALIGN_X, _PROXIMITY_ALIGN_Y] + thresholds)
+
+
+def calculate_proximities(genes, proteomic_data, max_distance=None):
     protein_coords = {}
-    proximities = {}
     protein_to_entry_ids = defaultdict(list)
     for gene in genes:
         entry_id = gene["id"]
@@ -247,23 +542,509 @@ def calculate_proximities(genes, proteomic_data):
         }
         for protein in proteins:
             protein_to_entry_ids[protein].append(entry_id)
-    for entry_id1, coords1 in protein_coords.items():
-        proximities[entry_id1] = {}
-        for entry_id2, coords2 in protein_coords.items():
-            if entry_id1 == entry_id2:
-                continue
-            left1, right1 = coords1['x'], coords1['x'] + coords1['width']
-            top1, bottom1 = coords1['y'], coords1['y'] + coords1['height']
-            left2, right2 = coords2['x'], coords2['x'] + coords2['width']
-            top2, bottom2 = coords2['y'], coords2['y'] + coords2['height']
-            dx = min(abs(left1 - right2), abs(right1 - left2)) if left1 < right2 < right1 or left2 < right1 < left2 else max(0, min(abs(left1 - left2), abs(right1 - right2)))
-            dy = min(abs(top1 - bottom2), abs(bottom1 - top2)) if top1 < bottom2 < bottom1 or top2 < bottom1 < top2 else max(0, min(abs(top1 - top2), abs(bottom1 - bottom2)))
-            dx_signed = coords2['x'] - coords1['x']
-            dy_signed = coords2['y'] - coords1['y']
-            dist = np.sqrt(dx ** 2 + dy ** 2)
-            proximities[entry_id1][entry_id2] = {'dx': dx_signed, 'dy': dy_signed, 'dist': dist, 'edge_dx': dx, 'edge_dy': dy}
+    entry_ids = list(protein_coords.keys())
+    proximities = ProximityIndex(
+        entry_ids,
+        [protein_coords[entry_id]['x'] for entry_id in entry_ids],
+        [protein_coords[entry_id]['y'] for entry_id in entry_ids],
+        radius=max_distance,
+    )
     return proximities, protein_coords, protein_to_entry_ids
 
+_PATHWAY_LAYOUT_VERSION = 1
+_PATHWAY_LAYOUT_CACHE = OrderedDict()
+_PATHWAY_LAYOUT_CACHE_SIZE = 32
+_PATHWAY_LAYOUT_LOCK = threading.Lock()
+
+
+class PathwayLayout:
+    """Dataset-independent half of a pathway JSON: groups, arrows, compounds, text and proximity.
+
+    Built once per pathway/source/parser/exceptions combination and shared between
+    generations; PathwayProcessor.process_pathway binds a dataset onto a copy of it.
+    """
+
+    def __init__(self, topology, pathway_id, pathway_source, exceptions, proximities, protein_coords,
+                 protein_to_entry_ids, sections):
+        self.topology = topology
+        self.pathway_id = pathway_id
+        self.pathway_source = pathway_source
+        self.exceptions = exceptions
+        self.proximities = proximities
+        self.protein_coords = protein_coords
+        self.protein_to_entry_ids = protein_to_entry_ids
+        self.sections = sections
+
+    def copy_sections(self):
+        """Independent copies of the groups/arrows/compound_data/text_data lists for one payload."""
+        return copy.deepcopy(self.sections)
+
+
+def build_pathway_layout(topology, pathway_id, pathway_source='kegg', exceptions=None):
+    if exceptions is None:
+        exceptions = load_exceptions()
+    source = str(pathway_source or 'kegg').lower()
+    entries, groups, arrows = topology
+    proximities, protein_coords, protein_to_entry_ids = calculate_proximities(
+        entries, None, max_distance=proximity_radius(exceptions, pathway_id)
+    )
+    json_data = {'groups': [], 'arrows': [], 'compound_data': [], 'text_data': []}
+    _find_entry_by_id = topology.find_entry
+
+    for group in groups:
+        members = []
+        protbox_ids = set()
+        component_ids = group.get('components') or group.get('protbox_ids') or []
+        for comp_id in component_ids:
+            entry = _find_entry_by_id(comp_id)
+            if not entry:
+                continue
+            entry_type = entry.get('type')
+            if entry_type == 'prot_box':
+                members.append({'type': 'prot-box', 'id': comp_id})
+                protbox_ids.add(str(comp_id))
+            elif entry_type == 'compound':
+                members.append({'type': 'compound', 'id': comp_id})
+            elif entry_type in {'map', 'label', 'text'} or entry.get('graphics_type') in {'roundrectangle', 'label'} or entry.get('shape_type'):
+                members.append({'type': 'text-box', 'id': comp_id})
+        group_entry = {
+            'group_id': group['id'],
+            'members': members,
+            'protbox_ids': list(protbox_ids)
+        }
+        if members and source == 'kegg':
+            group_entry['show_box'] = True
+            group_entry['box_padding'] = 10
+            group_entry['box_radius'] = 8
+        json_data['groups'].append(group_entry)
+
+    binding_edges = []
+    if source == 'kegg':
+        binding_edges = topology.binding_edges
+        arrows = topology.non_binding_arrows
+    if binding_edges:
+        existing_ids = {str(g.get('group_id')) for g in json_data.get('groups', []) if isinstance(g, dict)}
+        for hub_id, linked in topology.binding_hubs():
+            hub_entry = _find_entry_by_id(hub_id)
+            if not hub_entry or hub_entry.get('type') != 'prot_box':
+                continue
+            members = []
+            protbox_ids = set()
+            for pid in [hub_id] + sorted(linked):
+                entry = _find_entry_by_id(pid)
+                if not entry or entry.get('type') != 'prot_box':
+                    continue
+                members.append({'type': 'prot-box', 'id': pid})
+                protbox_ids.add(str(pid))
+            if len(members) < 2:
+                continue
+            group_id = f"bind_assoc_{hub_id}"
+            if group_id in existing_ids:
+                continue
+            json_data['groups'].append(
+                {
+                    'group_id': group_id,
+                    'members': members,
+                    'protbox_ids': list(protbox_ids),
+                    'show_box': True,
+                    'box_padding': 10,
+                    'box_radius': 8,
+                    'anchor_member': hub_id,
+                }
+            )
+            existing_ids.add(group_id)
+    prot_entries = [e for e in entries if e.get('type') == 'prot_box']
+    prot_ids = {e.get("id") for e in prot_entries}
+    opposite_side = {'East': 'West', 'West': 'East', 'North': 'South', 'South': 'North'}
+    is_kegg = source == 'kegg'
+    def _entry_center(entry):
+        if not entry:
+            return None, None
+        x_val = entry.get("x", 0)
+        y_val = entry.get("y", 0)
+        if is_kegg:
+            return x_val, y_val
+        return x_val + entry.get("width", 0) / 2, y_val + entry.get("height", 0) / 2
+
+    def _shorten_end(start_x, start_y, end_x, end_y, amount):
+        dx = end_x - start_x
+        dy = end_y - start_y
+        dist = (dx ** 2 + dy ** 2) ** 0.5
+        if dist <= 0:
+            return end_x, end_y
+        return end_x - dx / dist * amount, end_y - dy / dist * amount
+
+    def _shorten_start(start_x, start_y, end_x, end_y, amount):
+        dx = end_x - start_x
+        dy = end_y - start_y
+        dist = (dx ** 2 + dy ** 2) ** 0.5
+        if dist <= 0:
+            return start_x, start_y
+        return start_x + dx / dist * amount, start_y + dy / dist * amount
+    for arrow in arrows:
+        entry1_id = arrow.get("entry1")
+        entry2_id = arrow.get("entry2")
+        entry1 = topology.find_entry_or_group(entry1_id) if entry1_id else None
+        entry2 = topology.find_entry_or_group(entry2_id) if entry2_id else None
+        entry1_is_protbox = bool(entry1 and entry1.get("id") in prot_ids)
+        entry2_is_protbox = bool(entry2 and entry2.get("id") in prot_ids)
+        entry1_is_compound = bool(entry1 and entry1.get("type") == "compound")
+        entry2_is_compound = bool(entry2 and entry2.get("type") == "compound")
+        center1_x, center1_y = _entry_center(entry1)
+        center2_x, center2_y = _entry_center(entry2)
+        # If exactly one endpoint is a protbox, attach to the protbox handle and use coords for the other end.
+        if entry1 and entry2 and entry1_is_protbox != entry2_is_protbox:
+            dx = (center2_x or 0) - (center1_x or 0)
+            dy = (center2_y or 0) - (center1_y or 0)
+            angle = calculate_angle(center1_x or 0, center1_y or 0, center2_x or 0, center2_y or 0)
+            primary_out_old = determine_arrow_side(angle)
+            primary_out = map_side(primary_out_old)
+            side_out = primary_out
+            angle_rev = np.arctan2(-dy, -dx)
+            primary_in_old = determine_arrow_side(angle_rev)
+            primary_in = map_side(primary_in_old)
+            side_in = primary_in
+            arrow_entry = {
+                'line': arrow.get('line', 'arrow'),
+                'type': arrow.get('type', ''),
+                'control_points': arrow.get('control_points', []),
+                'connector_type': arrow.get('connector_type', ''),
+            }
+            if entry1_is_protbox:
+                arrow_entry['protbox_id_1'] = entry1_id
+                arrow_entry['protbox_id_1_side'] = side_out
+                if center2_x is not None and center2_y is not None:
+                    end_x, end_y = center2_x, center2_y
+                    if entry2_is_compound:
+                        end_x, end_y = _shorten_end(center1_x or 0, center1_y or 0, end_x, end_y, 10)
+                    arrow_entry['x2'] = end_x
+                    arrow_entry['y2'] = end_y
+            else:
+                arrow_entry['protbox_id_2'] = entry2_id
+                arrow_entry['protbox_id_2_side'] = side_in
+                if center1_x is not None and center1_y is not None:
+                    start_x, start_y = center1_x, center1_y
+                    if entry1_is_compound:
+                        start_x, start_y = _shorten_start(start_x, start_y, center2_x or 0, center2_y or 0, 10)
+                    arrow_entry['x1'] = start_x
+                    arrow_entry['y1'] = start_y
+            json_data['arrows'].append(arrow_entry)
+            continue
+        # Fallback: if either endpoint is not a protbox, use provided coords or derive from entry centers
+        if not (entry1 and entry2 and entry1_is_protbox and entry2_is_protbox):
+            x1 = arrow.get("x1")
+            y1 = arrow.get("y1")
+            x2 = arrow.get("x2")
+            y2 = arrow.get("y2")
+            if (x1 is None or y1 is None) and center1_x is not None and center1_y is not None:
+                x1 = center1_x
+                y1 = center1_y
+            if (x2 is None or y2 is None) and center2_x is not None and center2_y is not None:
+                x2 = center2_x
+                y2 = center2_y
+            if x1 is not None and y1 is not None and x2 is not None and y2 is not None:
+                if entry1_is_compound:
+                    x1, y1 = _shorten_start(x1, y1, x2, y2, 10)
+                if entry2_is_compound:
+                    x2, y2 = _shorten_end(x1, y1, x2, y2, 10)
+                json_data['arrows'].append(
+                    {
+                        'x1': x1,
+                        'y1': y1,
+                        'x2': x2,
+                        'y2': y2,
+                        'line': arrow.get('line', 'arrow'),
+                        'type': arrow.get('type', ''),
+                        'control_points': arrow.get('control_points', []),
+                        'connector_type': arrow.get('connector_type', ''),
+                    }
+                )
+            continue
+        if center1_x is None:
+            center1_x = entry1['x'] + entry1['width'] / 2
+        if center1_y is None:
+            center1_y = entry1['y'] + entry1['height'] / 2
+        if center2_x is None:
+            center2_x = entry2['x'] + entry2['width'] / 2
+        if center2_y is None:
+            center2_y = entry2['y'] + entry2['height'] / 2
+        dx = center2_x - center1_x
+        dy = center2_y - center1_y
+        angle = calculate_angle(center1_x, center1_y, center2_x, center2_y)
+        possible_out = get_possible_outgoing_sides(dx, dy)
+        primary_out_old = determine_arrow_side(angle)
+        primary_out = map_side(primary_out_old)
+        side_out = primary_out  # Use primary without choose_side
+
+        angle_rev = np.arctan2(-dy, -dx)
+        possible_in = [opposite_side[s] for s in possible_out if s in opposite_side]
+        primary_in_old = determine_arrow_side(angle_rev)
+        primary_in = map_side(primary_in_old)
+        side_in = primary_in  # Use primary without choose_side
+
+        arrow_entry = {
+            'protbox_id_1': arrow['entry1'],
+            'protbox_id_2': arrow['entry2'],
+            'protbox_id_1_side': side_out,
+            'protbox_id_2_side': side_in,
+            'line': arrow['line'],
+            'type': arrow['type'],
+            'control_points': arrow.get('control_points', []),
+            'connector_type': arrow.get('connector_type', ''),
+        }
+        json_data['arrows'].append(arrow_entry)
+    if json_data.get('groups') and json_data.get('arrows'):
+        entry_map = {str(entry.get('id')): entry for entry in entries if entry.get('type') == 'prot_box'}
+        group_members = {}
+        group_anchor = {}
+        for group in json_data.get('groups', []):
+            if not isinstance(group, dict):
+                continue
+            if not group.get('show_box'):
+                continue
+            gid = str(group.get('group_id'))
+            prot_ids = []
+            if isinstance(group.get('protbox_ids'), list):
+                prot_ids.extend([str(pid) for pid in group.get('protbox_ids') if pid is not None])
+            if (not prot_ids) and isinstance(group.get('members'), list):
+                for member in group.get('members'):
+                    if isinstance(member, dict) and member.get('type') == 'prot-box' and member.get('id') is not None:
+                        prot_ids.append(str(member.get('id')))
+            prot_ids = [pid for pid in prot_ids if pid in entry_map]
+            if len(prot_ids) < 2:
+                continue
+            group_members[gid] = sorted(set(prot_ids))
+            if group.get('anchor_member') is not None:
+                group_anchor[gid] = str(group.get('anchor_member'))
+        if group_members:
+            membership = defaultdict(set)
+            for gid, ids in group_members.items():
+                for pid in ids:
+                    membership[pid].add(gid)
+
+            def _entry_center(entry):
+                if not entry:
+                    return None, None
+                return (
+                    entry.get('x', 0) + entry.get('width', 0) / 2,
+                    entry.get('y', 0) + entry.get('height', 0) / 2,
+                )
+
+            def _pick_representative(gid, target_id):
+                anchor = group_anchor.get(gid)
+                if anchor and anchor in group_members.get(gid, []):
+                    return anchor
+                target_entry = entry_map.get(str(target_id))
+                tx, ty = _entry_center(target_entry)
+                best_id = None
+                best_dist = None
+                for pid in group_members.get(gid, []):
+                    entry = entry_map.get(pid)
+                    cx, cy = _entry_center(entry)
+                    if cx is None or cy is None or tx is None or ty is None:
+                        continue
+                    dist = (cx - tx) ** 2 + (cy - ty) ** 2
+                    if best_dist is None or dist < best_dist:
+                        best_dist = dist
+                        best_id = pid
+                return best_id or (group_members.get(gid, []) or [None])[0]
+
+            def _make_arrow_entry(pid1, pid2, template):
+                entry1 = entry_map.get(str(pid1))
+                entry2 = entry_map.get(str(pid2))
+                if not entry1 or not entry2:
+                    return None
+                center1_x = entry1['x'] + entry1['width'] / 2
+                center1_y = entry1['y'] + entry1['height'] / 2
+                center2_x = entry2['x'] + entry2['width'] / 2
+                center2_y = entry2['y'] + entry2['height'] / 2
+                dx = center2_x - center1_x
+                dy = center2_y - center1_y
+                angle = calculate_angle(center1_x, center1_y, center2_x, center2_y)
+                primary_out = map_side(determine_arrow_side(angle))
+                angle_rev = np.arctan2(-dy, -dx)
+                primary_in = map_side(determine_arrow_side(angle_rev))
+                return {
+                    'protbox_id_1': pid1,
+                    'protbox_id_2': pid2,
+                    'protbox_id_1_side': primary_out,
+                    'protbox_id_2_side': primary_in,
+                    'line': template.get('line', 'arrow'),
+                    'type': template.get('type', ''),
+                    'control_points': [],
+                    'connector_type': template.get('connector_type', ''),
+                }
+
+            group_links = {}
+            for idx, arrow in enumerate(list(json_data.get('arrows', []))):
+                pid1 = arrow.get('protbox_id_1')
+                pid2 = arrow.get('protbox_id_2')
+                if pid1 is None or pid2 is None:
+                    continue
+                pid1 = str(pid1)
+                pid2 = str(pid2)
+                line = arrow.get('line', 'arrow')
+                rel_type = arrow.get('type', '')
+                if pid1 in membership:
+                    for gid in membership[pid1]:
+                        if pid2 in group_members.get(gid, []):
+                            continue
+                        key = (gid, pid2, 'out', line, rel_type)
+                        entry = group_links.setdefault(key, {'members': set(), 'indices': [], 'template': arrow})
+                        entry['members'].add(pid1)
+                        entry['indices'].append(idx)
+                if pid2 in membership:
+                    for gid in membership[pid2]:
+                        if pid1 in group_members.get(gid, []):
+                            continue
+                        key = (gid, pid1, 'in', line, rel_type)
+                        entry = group_links.setdefault(key, {'members': set(), 'indices': [], 'template': arrow})
+                        entry['members'].add(pid2)
+                        entry['indices'].append(idx)
+
+            remove_indices = set()
+            collapsed_arrows = []
+            for key, info in group_links.items():
+                gid, external_id, direction, line, rel_type = key
+                group_ids = set(group_members.get(gid, []))
+                if not group_ids or info['members'] != group_ids:
+                    continue
+                indices = info['indices']
+                if not indices:
+                    continue
+                if any(idx in remove_indices for idx in indices):
+                    continue
+                representative = _pick_representative(gid, external_id)
+                if not representative:
+                    continue
+                if direction == 'out':
+                    new_arrow = _make_arrow_entry(representative, external_id, info['template'])
+                else:
+                    new_arrow = _make_arrow_entry(external_id, representative, info['template'])
+                if new_arrow:
+                    collapsed_arrows.append(new_arrow)
+                remove_indices.update(indices)
+            if remove_indices:
+                kept = [a for idx, a in enumerate(json_data['arrows']) if idx not in remove_indices]
+                kept.extend(collapsed_arrows)
+                json_data['arrows'] = kept
+    for entry in entries:
+        if entry.get('type') == 'compound':
+            # Normalize compound size to a small fixed circle-like footprint, but keep the original center.
+            # KEGG graphics x/y are already centers; WikiPathways entries store top-left, so adjust accordingly.
+            if source == 'kegg':
+                center_x = entry['x']
+                center_y = entry['y']
+            else:
+                center_x = entry['x'] + entry['width'] / 2
+                center_y = entry['y'] + entry['height'] / 2
+            # Match KEGG default compound size (8x8 circle); viewer treats x/y as center
+            default_size = 8
+            compound = {
+                'compound_id': entry['id'],  # KGML numeric id
+                'kegg_compound': entry['name'],  # e.g., 'cpd:C00165'
+                'label': entry.get('first_name', ''),  # usually the C-number in MAPK
+                'x': center_x,
+                'y': center_y,
+                'width': default_size,
+                'height': default_size,
+                'fgcolor': entry.get('fgcolor', '#000000'),
+                'bgcolor': entry.get('bgcolor', '#FFFFFF'),
+                'graphics_type': entry.get('graphics_type', ''),  # likely 'circle'
+                'link': entry.get('link', '')
+            }
+            json_data['compound_data'].append(compound)
+    for entry in entries:
+        entry_type = entry.get('type')
+        gfx_type = entry.get('graphics_type')
+        has_shape = bool(entry.get('shape_type'))
+        if entry_type in {'map', 'label', 'text'} or gfx_type in {'roundrectangle', 'label'} or has_shape:
+            label = entry.get('first_name', '')
+            # Optionally strip 'TITLE:' prefix if present
+            if label.upper().startswith('TITLE:'):
+                label = label.split(':', 1)[1].strip()
+
+            bgcolor = entry.get('bgcolor', '#FFFFFF')
+            # Make default white backgrounds transparent so labels appear see-through
+            if isinstance(bgcolor, str) and bgcolor.lower().lstrip('#') in {'ffffff', 'fff'}:
+                bgcolor = 'transparent'
+            border_color = entry.get('border_color', 'transparent') or 'transparent'
+            border_width = entry.get('border_width', 0) or 0
+            width = entry.get('width', 0)
+            height = entry.get('height', 0)
+            x_val = entry.get('x', 0)
+            y_val = entry.get('y', 0)
+            if is_kegg:
+                x_val = x_val - (width / 2)
+                y_val = y_val - (height / 2)
+            text_item = {
+                'text_id': entry['id'],
+                'label': label,
+                'x': x_val,
+                'y': y_val,
+                'width': width,
+                'height': height,
+                'fgcolor': entry.get('fgcolor', '#000000'),
+                'bgcolor': bgcolor,
+                'graphics_type': entry.get('graphics_type', ''),  # often 'roundrectangle'
+                'text_style': entry.get('text_style', {}),
+                'border_color': border_color,
+                'border_width': border_width,
+                'is_background': entry.get('is_background', False),
+                'shape_type': entry.get('shape_type', ''),
+                'link': entry.get('link', '')
+            }
+            json_data['text_data'].append(text_item)
+    return PathwayLayout(topology, pathway_id, source, exceptions, proximities, protein_coords,
+                         protein_to_entry_ids, json_data)
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+        return f"{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}"
+    except (OSError, TypeError):
+        return str(path)
+
+
+def get_pathway_layout(pathway_api, pathway_id, pathway_source, pathway_file, exceptions=None):
+    """Cached layout for a downloaded pathway file.
+
+    Keyed by source, pathway id, parser and layout versions, the exceptions content hash
+    and the pathway file stamp, so every dataset rendered on the same pathway reuses it.
+    Layouts of failed or empty parses are not cached, so the next generation parses again.
+    """
+    if exceptions is None:
+        exceptions = load_exceptions()
+    key = (
+        str(pathway_source or 'kegg').lower(),
+        str(pathway_id),
+        type(pathway_api).__name__,
+        getattr(pathway_api, 'parser_version', 0),
+        _PATHWAY_LAYOUT_VERSION,
+        exceptions.digest,
+        _file_stamp(pathway_file),
+    )
+    with _PATHWAY_LAYOUT_LOCK:
+        layout = _PATHWAY_LAYOUT_CACHE.get(key)
+        if layout is not None:
+            _PATHWAY_LAYOUT_CACHE.move_to_end(key)
+            print(f"Reusing cached layout for {pathway_id} ({pathway_source})")
+            return layout
+    topology = pathway_api.parse_pathway(pathway_file)
+    if not isinstance(topology, PathwayTopology):
+        topology = PathwayTopology(*topology, source=str(pathway_source or 'kegg'))
+    layout = build_pathway_layout(topology, pathway_id, pathway_source, exceptions)
+    if not topology.cacheable:
+        print(f"Not caching layout for {pathway_id} ({pathway_source}): parse failed or found no entries")
+        return layout
+    with _PATHWAY_LAYOUT_LOCK:
+        _PATHWAY_LAYOUT_CACHE[key] = layout
+        while len(_PATHWAY_LAYOUT_CACHE) > _PATHWAY_LAYOUT_CACHE_SIZE:
+            _PATHWAY_LAYOUT_CACHE.popitem(last=False)
+    return layout
+
+
 def savefile(input_file, directory, suffix, extension=".json", include_timestamp=True):
     try:
         base_name = os.path.splitext(os.path.basename(input_file))[0]
@@ -282,6 +1063,121 @@ def savefile(input_file, directory, suffix, extension=".json", include_timestamp
         print(f"Error creating output file path for {input_file}: {e}")
         return None
 
+_NO_FOLD_CHANGE_COLOR = [128, 128, 128]
+_NO_OUTLINE_COLOR = [0, 0, 0]
+
+
+def restyle_pathway_json(payload, negative_color=None, positive_color=None, max_negative=None, max_positive=None,
+                         copy=False):
+    """Recompute every fc_color_*/outline_color_* from the stored fold changes.
+
+    Colour parameters left as None keep the payload's current settings. Only the JSON
+    is touched (no pathway file or dataset access), so this is cheap enough to run on
+    every colour tweak. With ``copy=True`` the protein entries are copied first and
+    the input payload is left unchanged; otherwise it is updated in place.
+    """
+    if not isinstance(payload, dict):
+        return payload
+    if copy:
+        payload = dict(payload)
+        general_data = dict(payload.get('general_data') or {})
+        general_data['settings'] = dict(general_data.get('settings') or {})
+        payload['general_data'] = general_data
+        protein_data = {}
+        for key, protein in (payload.get('protein_data') or {}).items():
+            if isinstance(protein, dict):
+                protein = dict(protein)
+                if isinstance(protein.get('PTMs'), dict):
+                    protein['PTMs'] = {
+                        ptm_key: dict(ptm) if isinstance(ptm, dict) else ptm
+                        for ptm_key, ptm in protein['PTMs'].items()
+                    }
+            protein_data[key] = protein
+        payload['protein_data'] = protein_data
+    settings = payload.setdefault('general_data', {}).setdefault('settings', {})
+    for key, value in (('negative_color', negative_color), ('positive_color', positive_color),
+                       ('max_negative', max_negative), ('max_positive', max_positive)):
+        if value is not None:
+            settings[key] = value
+
+    entities = []
+    for protein in (payload.get('protein_data') or {}).values():
+        if not isinstance(protein, dict):
+            continue
+        entities.append(protein)
+        entities.extend(ptm for ptm in (protein.get('PTMs') or {}).values() if isinstance(ptm, dict))
+    _recolor_entities(entities, settings)
+    return payload
+
+
+def restyle_catalog_records(records, settings=None):
+    """Copies of catalog records/summaries (uniprot -> record) recoloured with ``settings``.
+
+    Catalog colours are baked in when the catalog is built; this recomputes their
+    fc_color_*/outline_color_* (and those of embedded PTMs) from the stored fold changes
+    with the colour settings of the pathway being viewed. Missing settings use the defaults.
+    """
+    restyled = {}
+    entities = []
+    for uniprot_id, record in (records or {}).items():
+        if not isinstance(record, dict):
+            restyled[uniprot_id] = record
+            continue
+        record = dict(record)
+        entities.append(record)
+        if isinstance(record.get('PTMs'), dict):
+            record['PTMs'] = {key: dict(ptm) if isinstance(ptm, dict) else ptm for key, ptm in record['PTMs'].items()}
+            entities.extend(ptm for ptm in record['PTMs'].values() if isinstance(ptm, dict))
+        restyled[uniprot_id] = record
+    _recolor_entities(entities, settings or {})
+    return restyled
+
+
+def _recolor_entities(entities, settings):
+    # Every fold_change_N / outline_fold_change_N of every entity goes through the gradient in one call.
+    def _setting(key):
+        value = settings.get(key)
+        return DEFAULT_SETTINGS[key] if value is None else value
+
+    def _limit(key):
+        try:
+            return float(settings.get(key)) or float(DEFAULT_SETTINGS[key])
+        except (TypeError, ValueError):
+            return float(DEFAULT_SETTINGS[key])
+
+    targets = []
+    values = []
+    for entity in entities:
+        for key, raw in entity.items():
+            if key.startswith('fold_change_'):
+                color_key = 'fc_color_' + key[len('fold_change_'):]
+            elif key.startswith('outline_fold_change_'):
+                color_key = 'outline_color_' + key[len('outline_fold_change_'):]
+            else:
+                continue
+            try:
+                value = float(raw) if raw not in (None, '') else np.nan
+            except (TypeError, ValueError):
+                value = np.nan
+            targets.append((entity, color_key, key.startswith('outline_')))
+            values.append(value)
+    if not targets:
+        return
+    values = np.asarray(values, dtype=float)
+    values[~np.isfinite(values)] = np.nan
+    rgb = get_gradient(
+        _setting('negative_color'),
+        _setting('positive_color'),
+        _limit('max_negative'),
+        _limit('max_positive'),
+    ).map_lists(values)
+    missing = np.isnan(values).tolist()
+    for (entity, color_key, is_outline), color, is_missing in zip(targets, rgb, missing):
+        if is_missing:
+            color = list(_NO_OUTLINE_COLOR if is_outline else _NO_FOLD_CHANGE_COLOR)
+        entity[color_key] = color
+
+
 def find_entry_or_group(entry_id, entries, groups):
     for entry in entries:
         if entry["id"] == entry_id:
@@ -292,6 +1188,81 @@ def find_entry_or_group(entry_id, entries, groups):
             return group
     return None
 
+
+_PTM_CLASSIFICATION_CACHE = OrderedDict()
+_PTM_CLASSIFICATION_CACHE_SIZE = 16
+_PTM_CLASSIFICATION_LOCK = threading.Lock()
+
+
+def _hash_frame_columns(frame, columns):
+    digest = hashlib.sha1()
+    digest.update(str(len(frame)).encode("utf-8"))
+    for col in columns:
+        digest.update(str(col).encode("utf-8"))
+        hashed = pd.util.hash_pandas_object(frame[col].astype(str), index=False).to_numpy()
+        digest.update(hashed.tobytes())
+    return digest.hexdigest()
+
+
+def _rule_mask(text, statement_type, search_texts):
+    # Mirrors the per-row `in` checks of the original loop, one vectorized pass per search text.
+    s1, s2, s3, s4 = search_texts
+
+    def has(value):
+        return text.str.contains(value.lower(), regex=False).to_numpy(dtype=bool)
+
+    if statement_type == 'if_statment' and s1:
+        return has(s1)
+    if statement_type == 'if_not_statement' and s1:
+        return ~has(s1)
+    if statement_type == 'if_and_statement' and s1 and s2:
+        return has(s1) & has(s2)
+    if statement_type == 'if_or_statement' and s1 and s2:
+        return has(s1) | has(s2)
+    if statement_type == 'if_and_not_statement' and s1 and s2:
+        return has(s1) & ~has(s2)
+    if statement_type == 'if_and_and_not_statement' and s1 and s2 and s3:
+        return has(s1) & has(s2) & ~has(s3)
+    if statement_type == 'if_or_and_not_statement' and s1 and s2 and s3:
+        return (has(s1) | has(s2)) & ~has(s3)
+    if statement_type == 'if_or_and_or_statement' and s1 and s2 and s3 and s4:
+        return (has(s1) | has(s2)) & (has(s3) | has(s4))
+    return None
+
+
+def _classify_ptm_labels(phospho_data, valid_symbol_list):
+    labels = np.full(len(phospho_data), 'none', dtype=object)
+    lowered = {}
+
+    def column_text(header):
+        if header not in lowered:
+            lowered[header] = phospho_data[header].astype(str).str.lower()
+        return lowered[header]
+
+    # Regular rules apply in list order, so the last matching rule wins.
+    for symbol_dict in valid_symbol_list:
+        label_key = list(symbol_dict.keys())[0]
+        inner_dict = symbol_dict[label_key]
+        statement_type = inner_dict.get('statement_type', 'NA')
+        if statement_type in ('NA', 'if_and_notlabeled_statement'):
+            continue
+        search_texts = tuple(inner_dict.get(f'search_text_{i}', '') for i in range(1, 5))
+        mask = _rule_mask(column_text(inner_dict['header_to_search']), statement_type, search_texts)
+        if mask is not None:
+            labels[mask] = label_key.replace('_dict', '')
+    # "Not labeled" rules only fill sites that no regular rule claimed; the first match wins.
+    for symbol_dict in valid_symbol_list:
+        label_key = list(symbol_dict.keys())[0]
+        inner_dict = symbol_dict[label_key]
+        search_text_1 = inner_dict.get('search_text_1', '')
+        if inner_dict.get('statement_type') != 'if_and_notlabeled_statement' or not search_text_1:
+            continue
+        text = column_text(inner_dict['header_to_search'])
+        mask = (labels == 'none') & text.str.contains(search_text_1.lower(), regex=False).to_numpy(dtype=bool)
+        labels[mask] = label_key.replace('_dict', '')
+    return labels
+
+
 def classify_phosphosite_function(phospho_data, ptm_symbol_list, reg_site_col='C: Regulatory site',
                                   reg_function_col='C: Regulatory site function',
                                   output_col='Phosphosite_Classification'):
@@ -319,67 +1290,94 @@ def classify_phosphosite_function(phospho_data, ptm_symbol_list, reg_site_col='C
         _safe_debug_print("Error: No valid rules in ptm_symbol_list. All PTMs will be classified as 'none'.")
         return phospho_data
 
-    for idx in phospho_data.index:
-        ptm_label_type = 'none'
-        for symbol_dict in [d for d in valid_symbol_list if
-                            d[list(d.keys())[0]].get('statement_type') != 'if_and_notlabeled_statement']:
-            inner_dict = symbol_dict[list(symbol_dict.keys())[0]]
-            statement_type = inner_dict.get('statement_type', 'NA')
-            header = inner_dict.get('header_to_search', '')
-            search_text_1 = inner_dict.get('search_text_1', '')
-            search_text_2 = inner_dict.get('search_text_2', '')
-            search_text_3 = inner_dict.get('search_text_3', '')
-            search_text_4 = inner_dict.get('search_text_4', '')
-            label_key = list(symbol_dict.keys())[0]
-            symbol_label = label_key.replace('_dict', '')
-            function_text = str(phospho_data.loc[idx, header]).lower()
-            assign_label = False
-            if statement_type == 'NA':
-                continue
-            elif statement_type == 'if_statment' and search_text_1:
-                assign_label = search_text_1.lower() in function_text
-            elif statement_type == 'if_not_statement' and search_text_1:
-                assign_label = search_text_1.lower() not in function_text
-            elif statement_type == 'if_and_statement' and search_text_1 and search_text_2:
-                assign_label = (search_text_1.lower() in function_text and
-                                search_text_2.lower() in function_text)
-            elif statement_type == 'if_or_statement' and search_text_1 and search_text_2:
-                assign_label = (search_text_1.lower() in function_text or
-                                search_text_2.lower() in function_text)
-            elif statement_type == 'if_and_not_statement' and search_text_1 and search_text_2:
-                assign_label = (search_text_1.lower() in function_text and
-                                search_text_2.lower() not in function_text)
-            elif statement_type == 'if_and_and_not_statement' and search_text_1 and search_text_2 and search_text_3:
-                assign_label = (search_text_1.lower() in function_text and
-                                search_text_2.lower() in function_text and
-                                search_text_3.lower() not in function_text)
-            elif statement_type == 'if_or_and_not_statement' and search_text_1 and search_text_2 and search_text_3:
-                assign_label = ((search_text_1.lower() in function_text or
-                                 search_text_2.lower() in function_text) and
-                                search_text_3.lower() not in function_text)
-            elif statement_type == 'if_or_and_or_statement' and search_text_1 and search_text_2 and search_text_3 and search_text_4:
-                assign_label = ((search_text_1.lower() in function_text or
-                                 search_text_2.lower() in function_text) and
-                                (search_text_3.lower() in function_text or
-                                 search_text_4.lower() in function_text))
-            if assign_label:
-                ptm_label_type = symbol_label
-        for symbol_dict in [d for d in valid_symbol_list if
-                            d[list(d.keys())[0]].get('statement_type') == 'if_and_notlabeled_statement']:
-            inner_dict = symbol_dict[list(symbol_dict.keys())[0]]
-            statement_type = inner_dict.get('statement_type', 'NA')
-            header = inner_dict.get('header_to_search', '')
-            search_text_1 = inner_dict.get('search_text_1', '')
-            label_key = list(symbol_dict.keys())[0]
-            symbol_label = label_key.replace('_dict', '')
-            function_text = str(phospho_data.loc[idx, header]).lower()
-            if statement_type == 'if_and_notlabeled_statement' and search_text_1:
-                if ptm_label_type == 'none' and search_text_1.lower() in function_text:
-                    ptm_label_type = symbol_label
-        phospho_data.loc[idx, output_col] = ptm_label_type
+    rules_key = json.dumps(valid_symbol_list, sort_keys=True, default=str)
+    rules_hash = hashlib.sha1(rules_key.encode("utf-8")).hexdigest()
+    headers = sorted({d[list(d.keys())[0]].get('header_to_search', '') for d in valid_symbol_list})
+    data_hash = _hash_frame_columns(phospho_data, headers)
+    cache_key = (data_hash, rules_hash)
+    with _PTM_CLASSIFICATION_LOCK:
+        labels = _PTM_CLASSIFICATION_CACHE.get(cache_key)
+        if labels is not None:
+            _PTM_CLASSIFICATION_CACHE.move_to_end(cache_key)
+    if labels is None:
+        labels = _classify_ptm_labels(phospho_data, valid_symbol_list)
+        with _PTM_CLASSIFICATION_LOCK:
+            _PTM_CLASSIFICATION_CACHE[cache_key] = labels
+            while len(_PTM_CLASSIFICATION_CACHE) > _PTM_CLASSIFICATION_CACHE_SIZE:
+                _PTM_CLASSIFICATION_CACHE.popitem(last=False)
+    else:
+        _safe_debug_print(f"Using cached PTM classification for {len(labels)} sites")
+    phospho_data[output_col] = labels.copy()
     _safe_debug_print(f"Classification complete. Value counts:\n{phospho_data[output_col].value_counts()}")
     return phospho_data
 
+_PTM_EXECUTION_MODES = ('thread', 'process', 'serial')
+_PTM_WORKER_STATE = {}
+
+
+def _share_ptm_frame(frame):
+    # Numeric/bool columns go into shared-memory blocks; the remaining (string) columns are pickled.
+    blocks = []
+    numeric = {}
+    objects = {}
+    for col in frame.columns:
+        values = frame[col].to_numpy()
+        if values.dtype.kind in 'fiub':
+            shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[:] = values
+            blocks.append(shm)
+            numeric[col] = (shm.name, values.dtype.str, len(values))
+        else:
+            objects[col] = values
+    return {'columns': list(frame.columns), 'numeric': numeric, 'objects': objects}, blocks
+
+
+def _close_ptm_worker_blocks():
+    # The processor's frames view the blocks, so drop it before closing the handles.
+    _PTM_WORKER_STATE.pop('processor', None)
+    for shm in _PTM_WORKER_STATE.pop('blocks', []):
+        try:
+            shm.close()
+        except BufferError:
+            pass
+
+
+def _init_ptm_worker(payload):
+    site_index = {}
+    blocks = []
+    for dataset_id, shared in payload['frames'].items():
+        columns = dict(shared['objects'])
+        for col, (name, dtype, length) in shared['numeric'].items():
+            # Pool workers share the parent's resource tracker; the parent unlinks the block.
+            # The handle stays open for the worker's lifetime so the column can view it without a copy.
+            shm = shared_memory.SharedMemory(name=name)
+            blocks.append(shm)
+            values = np.ndarray((length,), dtype=np.dtype(dtype), buffer=shm.buf)
+            values.flags.writeable = False
+            columns[col] = values
+        frame = pd.DataFrame({col: columns[col] for col in shared['columns']}, copy=False)
+        site_index[dataset_id] = {'frame': frame, 'groups': payload['groups'][dataset_id]}
+    _PTM_WORKER_STATE['blocks'] = blocks
+    # Runs when the pool shuts the worker down (multiprocessing finalizers, not atexit).
+    multiprocessing_util.Finalize(None, _close_ptm_worker_blocks, exitpriority=10)
+    processor = PathwayProcessor.__new__(PathwayProcessor)
+    processor.__dict__.update(payload['attributes'])
+    # The gradient is rebuilt from the shipped colour settings rather than pickled.
+    processor._gradient = get_gradient(
+        processor.negative_color, processor.positive_color, processor.max_negative, processor.max_positive
+    )
+    processor._ptm_site_index = site_index
+    processor._ptm_summary_cache = {}
+    _PTM_WORKER_STATE['processor'] = processor
+
+
+def _run_ptm_worker_chunk(uniprot_ids):
+    processor = _PTM_WORKER_STATE['processor']
+    start = time.perf_counter()
+    summaries = {uid: processor._build_ptm_summary(uid) for uid in uniprot_ids}
+    return summaries, time.perf_counter() - start, os.getpid()
+
+
 class PathwayProcessor:
     def __init__(self, entries, proteomic_data, ptm_datasets, settings):
         self.proteomic_data = proteomic_data
@@ -388,7 +1386,8 @@ class PathwayProcessor:
         self.current_proteins = {}  # Initialize current_proteins
         for dataset_id, dataset in self.ptm_datasets.items():
             if 'dataframe' in dataset and isinstance(dataset['dataframe'], pd.DataFrame):
-                dataset['data'] = dataset['dataframe'].copy()
+                # Shallow: the typed upload frame is shared, and only new columns are added here.
+                dataset['data'] = dataset['dataframe'].copy(deep=False)
             else:
                 dataset['data'] = pd.read_csv(dataset['file_path'], sep="\t")
             _safe_debug_print(f"PTM dataset {dataset_id}: {len(dataset['data'])} rows, columns: {dataset['data'].columns.tolist()}")
@@ -432,32 +1431,79 @@ class PathwayProcessor:
         self.positive_color = settings.get('positive_color', (0, 0, 255))
         self.max_negative = settings.get('max_negative', -2)
         self.max_positive = settings.get('max_positive', 2)
+        self._gradient = get_gradient(self.negative_color, self.positive_color, self.max_negative, self.max_positive)
         self.ptm_label_color = settings.get('ptm_label_color', (0, 0, 0))
         self.ptm_circle_radius = settings.get('ptm_circle_radius', 5)
         self.ptm_circle_spacing = settings.get('ptm_circle_spacing', 4)
         self.display_types = settings.get('display_types', ['prot_box'])
         default_workers = os.cpu_count() or 4
         self._ptm_worker_count = max(1, min(settings.get('ptm_worker_count', default_workers), 16))
+        # Processes are not GIL-bound, so they are not held to the 16-thread cap.
+        self._ptm_process_count = max(1, int(settings.get('ptm_worker_count', default_workers)))
+        self._ptm_execution_mode = str(settings.get('ptm_execution_mode', 'thread')).lower()
+        if self._ptm_execution_mode not in _PTM_EXECUTION_MODES:
+            print(f"Warning: unknown ptm_execution_mode {self._ptm_execution_mode!r}; using 'thread'.")
+            self._ptm_execution_mode = 'thread'
+        self._ptm_chunk_timings = []
         self._ptm_summary_cache = {}
+        self._build_protein_index()
+        self._build_ptm_site_index()
+
+    def _build_protein_index(self):
+        # One pass over the ID column: key -> first row position (matches the old `.values[0]` lookups).
+        self._protein_row_index = {}
+        self._protein_raw_columns = {}
+        self._protein_numeric_columns = {}
+        self._protein_color_columns = {}
+        if self.hsa_id_column in self.proteomic_data.columns:
+            for pos, key in enumerate(self.proteomic_data[self.hsa_id_column].to_numpy()):
+                if key is None or (isinstance(key, float) and np.isnan(key)):
+                    continue
+                self._protein_row_index.setdefault(key, pos)
+        numeric_cols = list(self.fold_change_columns) + [col for col in (self.outline_columns or []) if col]
+        for col in numeric_cols:
+            if col in self.proteomic_data.columns and col not in self._protein_numeric_columns:
+                self._protein_numeric_columns[col] = pd.to_numeric(
+                    self.proteomic_data[col], errors='coerce'
+                ).to_numpy(dtype=float)
+                self._protein_color_columns[col] = self._gradient.map_lists(self._protein_numeric_columns[col])
+        raw_cols = [self.prot_uniprot_column, self.gene_name_column] + list(self.protein_tooltip_columns)
+        for col in raw_cols:
+            if col in self.proteomic_data.columns and col not in self._protein_raw_columns:
+                self._protein_raw_columns[col] = self.proteomic_data[col].to_numpy()
+
+    def _protein_row(self, protein):
+        return self._protein_row_index.get(protein)
+
+    def _protein_raw_value(self, row_pos, col):
+        values = self._protein_raw_columns.get(col)
+        if values is None:
+            # Raises KeyError for unknown columns, like the old `.loc[mask, col]` lookups.
+            values = self.proteomic_data[col].to_numpy()
+            self._protein_raw_columns[col] = values
+        return values[row_pos]
+
+    def _protein_numeric_value(self, row_pos, col):
+        values = self._protein_numeric_columns.get(col)
+        if values is None:
+            values = pd.to_numeric(self.proteomic_data[col], errors='coerce').to_numpy(dtype=float)
+            self._protein_numeric_columns[col] = values
+        value = values[row_pos]
+        return None if np.isnan(value) else float(value)
+
+    def _protein_color(self, row_pos, col):
+        colors = self._protein_color_columns.get(col)
+        if colors is None:
+            self._protein_numeric_value(row_pos, col)
+            colors = self._gradient.map_lists(self._protein_numeric_columns[col])
+            self._protein_color_columns[col] = colors
+        return list(colors[row_pos])
 
     def get_color(self, fold_change):
-        if pd.isna(fold_change):
-            return [128, 128, 128]
-        white = (255, 255, 255)
-        r0, g0, b0 = white
-        if fold_change < 0:
-            r1, g1, b1 = self.negative_color
-            t = min(abs(fold_change) / abs(self.max_negative), 1)
-        else:
-            r1, g1, b1 = self.positive_color
-            t = min(fold_change / self.max_positive, 1)
-        r = int((1 - t) * r0 + t * r1)
-        g = int((1 - t) * g0 + t * g1)
-        b = int((1 - t) * b0 + t * b1)
-        return [r, g, b]
+        return self._gradient.color(fold_change)
 
     def choose_protein(self, proteins):
-        valid_proteins = [p for p in proteins if p in self.proteomic_data[self.hsa_id_column].values]
+        valid_proteins = [p for p in proteins if self._protein_row(p) is not None]
         if not valid_proteins:
             return None
         try:
@@ -467,118 +1513,115 @@ class PathwayProcessor:
                 max_fold_change = -float('inf')
                 selected_protein = None
                 for protein in valid_proteins:
+                    row_pos = self._protein_row(protein)
                     for fc_col in self.fold_change_columns:
-                        fold_change = self.proteomic_data.loc[
-                            self.proteomic_data[self.hsa_id_column] == protein, fc_col].values
-                        if len(fold_change) > 0:
-                            try:
-                                fc_val = float(fold_change[0])
-                            except (TypeError, ValueError):
-                                fc_val = None
-                            if fc_val is not None and abs(fc_val) > max_fold_change:
-                                max_fold_change = abs(fc_val)
-                                selected_protein = protein
+                        fc_val = self._protein_numeric_value(row_pos, fc_col)
+                        if fc_val is not None and abs(fc_val) > max_fold_change:
+                            max_fold_change = abs(fc_val)
+                            selected_protein = protein
                 if not selected_protein:
                     selected_protein = valid_proteins[0]
             else:
                 selected_protein = valid_proteins[0]
-            uniprot_id = self.proteomic_data.loc[
-                self.proteomic_data[self.hsa_id_column] == selected_protein, self.prot_uniprot_column].values
-            uniprot_id = uniprot_id[0] if len(uniprot_id) > 0 else None
-            annotations = []
-            for col in self.protein_tooltip_columns:
-                value = self.proteomic_data.loc[
-                    self.proteomic_data[self.hsa_id_column] == selected_protein, col].values
-                annotations.append(str(value[0]) if len(value) > 0 else '')
+            row_pos = self._protein_row(selected_protein)
+            uniprot_id = self._protein_raw_value(row_pos, self.prot_uniprot_column)
+            annotations = [str(self._protein_raw_value(row_pos, col)) for col in self.protein_tooltip_columns]
             return {'protein': selected_protein, 'uniprot_id': uniprot_id, 'annotations': annotations}
         except (KeyError, IndexError) as e:
             return None
 
-    def prioritize_ptm_sites(self, uniprot_id):
-        all_ptms = []
+    def _build_ptm_site_index(self):
+        # Coerce fold-change columns and group rows by UniProt once per dataset, so per-protein
+        # selection is a positional slice rather than a full-table boolean scan.
+        self._ptm_fc_columns = [col[1] for dataset in self.ptm_datasets.values() for col in dataset['main_columns']]
+        self._ptm_site_index = {}
         for dataset_id, dataset in self.ptm_datasets.items():
+            prepared = dataset['data'].copy()
+            for fc in set(self._ptm_fc_columns):
+                if fc in prepared.columns:
+                    prepared[fc] = pd.to_numeric(prepared[fc], errors='coerce')
+            is_phospho = dataset['type'] == 'Phosphorylation'
+            prepared['dataset_id'] = dataset_id
+            prepared['is_phospho'] = is_phospho
+            if is_phospho:
+                prepared['is_modulating'] = dataset['data'].get(dataset.get('modulation_column', ''), '') == '+'
+            else:
+                prepared['is_modulating'] = True
             uniprot_col = dataset['uniprot_column']
-            fold_change_cols = [col[1] for col in dataset['main_columns']]
-            ptm_data = dataset['data']
-            ptm_subset = ptm_data[ptm_data[uniprot_col] == uniprot_id].copy()
-            if ptm_subset.empty:
+            groups = prepared.groupby(uniprot_col, sort=False, observed=True).indices if uniprot_col in prepared.columns else {}
+            self._ptm_site_index[dataset_id] = {'frame': prepared, 'groups': groups}
+
+    def _ptm_rank_order(self, combined_ptms):
+        def abs_desc(values):
+            # Descending |fc| with NaN last, matching sort_values(key=abs, ascending=False).
+            magnitude = np.abs(np.asarray(values, dtype=float))
+            return np.where(np.isnan(magnitude), np.inf, -magnitude)
+
+        if self.ptm_selection_option in (1, 3):
+            keys = [abs_desc(combined_ptms[fc].to_numpy()) for fc in self._ptm_fc_columns]
+            return np.lexsort(keys[::-1]) if keys else np.arange(len(combined_ptms))
+        first_fc = np.zeros(len(combined_ptms), dtype=float)
+        for dataset_id, dataset in self.ptm_datasets.items():
+            fc_col = dataset['main_columns'][0][1]
+            if fc_col not in combined_ptms.columns:
+                continue
+            rows = (combined_ptms['dataset_id'] == dataset_id).to_numpy()
+            first_fc[rows] = combined_ptms[fc_col].to_numpy(dtype=float)[rows]
+        first_fc = np.nan_to_num(first_fc, nan=0.0)
+        is_phospho = combined_ptms['is_phospho'].to_numpy(dtype=bool)
+        is_modulating = combined_ptms['is_modulating'].to_numpy(dtype=bool)
+        return np.lexsort((-np.abs(first_fc), ~is_modulating, ~is_phospho))
+
+    def prioritize_ptm_sites(self, uniprot_id, limit=None):
+        all_ptms = []
+        for dataset_id, site_index in self._ptm_site_index.items():
+            positions = site_index['groups'].get(uniprot_id)
+            if positions is None or len(positions) == 0:
                 continue
-            ptm_subset['dataset_id'] = dataset_id
-            ptm_subset['is_phospho'] = dataset['type'] == 'Phosphorylation'
-            ptm_subset['is_modulating'] = ptm_subset.get(dataset.get('modulation_column', ''), '') == '+' if dataset['type'] == 'Phosphorylation' else True
-            all_ptms.append(ptm_subset)
+            all_ptms.append(site_index['frame'].iloc[positions])
         if not all_ptms:
             return pd.DataFrame()
         combined_ptms = pd.concat(all_ptms, ignore_index=True)
         if combined_ptms.empty:
             return combined_ptms
-        if 'dataset_id' not in combined_ptms.columns:
-            return pd.DataFrame()
-        if combined_ptms['dataset_id'].isna().any():
-            combined_ptms = combined_ptms.dropna(subset=['dataset_id'])
-        if combined_ptms.empty:
-            return combined_ptms
-        # Normalize fold-change columns to numeric
-        fc_cols = [col[1] for dataset in self.ptm_datasets.values() for col in dataset['main_columns']]
-        for fc in fc_cols:
-            if fc in combined_ptms.columns:
-                combined_ptms[fc] = pd.to_numeric(combined_ptms[fc], errors='coerce')
         try:
             if self.ptm_selection_option == 1:
                 print("Applying PTM selection option 1: Highest absolute fold change")
-                combined_ptms = combined_ptms.sort_values(
-                    by=fc_cols,
-                    key=lambda x: pd.to_numeric(x, errors="coerce").abs(),
-                    ascending=False
-                )
             elif self.ptm_selection_option == 2:
                 print("Applying PTM selection option 2: Prefer modulating phospho PTMs")
-                def sort_key(row):
-                    try:
-                        dataset_id = row['dataset_id']
-                        dataset = self.ptm_datasets[dataset_id]
-                        fold_change = row.get(dataset['main_columns'][0][1], 0)
-                        if pd.isna(fold_change):
-                            fold_change = 0.0
-                        try:
-                            fold_change = float(fold_change)
-                        except (TypeError, ValueError):
-                            fold_change = 0.0
-                        is_modulating_val = row.get('is_modulating')
-                        is_modulating = bool(is_modulating_val is True or is_modulating_val == '+' or str(is_modulating_val).lower() == 'true')
-                        is_phospho = bool(row.get('is_phospho'))
-                        return (-is_phospho, -is_modulating, -abs(fold_change))
-                    except (KeyError, TypeError) as e:
-                        print(f"Error in sort_key for row {row}: {e}")
-                        return (0, 0, 0)
-                combined_ptms['sort_key'] = combined_ptms.apply(sort_key, axis=1)
-                combined_ptms = combined_ptms.sort_values(by='sort_key')
-                combined_ptms = combined_ptms.drop(columns=['sort_key'])
             elif self.ptm_selection_option == 3:
                 print("Applying PTM selection option 3: Modulating phospho and all non-phospho PTMs")
                 combined_ptms = combined_ptms[
                     (combined_ptms['is_phospho'] & combined_ptms['is_modulating']) |
                     (~combined_ptms['is_phospho'])
                 ]
-                combined_ptms = combined_ptms.sort_values(
-                    by=fc_cols,
-                    key=lambda x: pd.to_numeric(x, errors="coerce").abs(),
-                    ascending=False
-                )
+            if self.ptm_selection_option in (1, 2, 3):
+                order = self._ptm_rank_order(combined_ptms)
+                if limit is not None:
+                    order = order[:max(0, int(limit))]
+                combined_ptms = combined_ptms.iloc[order]
+            elif limit is not None:
+                combined_ptms = combined_ptms.iloc[:max(0, int(limit))]
             print(f"Found {len(combined_ptms)} PTM sites")
             return combined_ptms
         except Exception as e:
             print(f"Error prioritizing PTM sites for UniProt ID {uniprot_id}: {str(e)}")
             return pd.DataFrame()
 
-    def process_pathway(self, entries, groups, arrows, proteomic_data, ptm_datasets, skip_disk_write=False):
+    def process_pathway(self, entries, groups, arrows, proteomic_data, ptm_datasets, skip_disk_write=False, topology=None,
+                        layout=None):
+        """Bind this processor's datasets onto a pathway layout (built here when not supplied)."""
         try:
-            exceptions = parse_exceptions_file()
-            proximities, protein_coords, protein_to_entry_ids = calculate_proximities(entries, self.proteomic_data)
-            hsa_id = self.settings.get('pathway_id', 'hsa04010')
-            hsa_exceptions = exceptions['hsa_specific'].get(hsa_id,
-                                                            {'proximity': [], 'specific': {}})
-            global_exceptions = exceptions['global']
+            if layout is None:
+                if topology is None:
+                    topology = PathwayTopology(entries, groups, arrows, source=str(self.settings.get('pathway_source', 'kegg')))
+                layout = build_pathway_layout(
+                    topology, self.settings.get('pathway_id', 'hsa04010'), self.settings.get('pathway_source', 'kegg')
+                )
+            entries = layout.topology.entries
+            exceptions = layout.exceptions
+            proximities = layout.proximities
+            protein_to_entry_ids = layout.protein_to_entry_ids
             chosen_proteins = set()
             defaults = {
                 'N1': (-5, -5, 'right'), 'N2': (0, -11, 'center'), 'N3': (5, -5, 'left'),
@@ -648,363 +1691,7 @@ class PathwayProcessor:
                 'compound_data' : [],
                 'text_data' : []
             }
-            def _find_entry_by_id(entry_id):
-                for entry in entries:
-                    if str(entry.get('id')) == str(entry_id):
-                        return entry
-                return None
-
-            for group in groups:
-                members = []
-                protbox_ids = set()
-                component_ids = group.get('components') or group.get('protbox_ids') or []
-                for comp_id in component_ids:
-                    entry = _find_entry_by_id(comp_id)
-                    if not entry:
-                        continue
-                    entry_type = entry.get('type')
-                    if entry_type == 'prot_box':
-                        members.append({'type': 'prot-box', 'id': comp_id})
-                        protbox_ids.add(str(comp_id))
-                    elif entry_type == 'compound':
-                        members.append({'type': 'compound', 'id': comp_id})
-                    elif entry_type in {'map', 'label', 'text'} or entry.get('graphics_type') in {'roundrectangle', 'label'} or entry.get('shape_type'):
-                        members.append({'type': 'text-box', 'id': comp_id})
-                group_entry = {
-                    'group_id': group['id'],
-                    'members': members,
-                    'protbox_ids': list(protbox_ids)
-                }
-                if members and str(self.settings.get('pathway_source', 'kegg')).lower() == 'kegg':
-                    group_entry['show_box'] = True
-                    group_entry['box_padding'] = 10
-                    group_entry['box_radius'] = 8
-                json_data['groups'].append(group_entry)
-
-            binding_edges = []
-            if str(self.settings.get('pathway_source', 'kegg')).lower() == 'kegg':
-                filtered_arrows = []
-                for arrow in arrows:
-                    if arrow.get('binding') or str(arrow.get('type', '')).lower() == 'binding/association':
-                        entry1_id = arrow.get('entry1')
-                        entry2_id = arrow.get('entry2')
-                        if entry1_id and entry2_id:
-                            binding_edges.append((str(entry1_id), str(entry2_id)))
-                        continue
-                    filtered_arrows.append(arrow)
-                arrows = filtered_arrows
-            if binding_edges:
-                neighbors = defaultdict(set)
-                for a_id, b_id in binding_edges:
-                    neighbors[a_id].add(b_id)
-                    neighbors[b_id].add(a_id)
-                existing_ids = {str(g.get('group_id')) for g in json_data.get('groups', []) if isinstance(g, dict)}
-                for hub_id, linked in neighbors.items():
-                    if len(linked) < 2:
-                        continue
-                    hub_entry = _find_entry_by_id(hub_id)
-                    if not hub_entry or hub_entry.get('type') != 'prot_box':
-                        continue
-                    members = []
-                    protbox_ids = set()
-                    for pid in [hub_id] + sorted(linked):
-                        entry = _find_entry_by_id(pid)
-                        if not entry or entry.get('type') != 'prot_box':
-                            continue
-                        members.append({'type': 'prot-box', 'id': pid})
-                        protbox_ids.add(str(pid))
-                    if len(members) < 2:
-                        continue
-                    group_id = f"bind_assoc_{hub_id}"
-                    if group_id in existing_ids:
-                        continue
-                    json_data['groups'].append(
-                        {
-                            'group_id': group_id,
-                            'members': members,
-                            'protbox_ids': list(protbox_ids),
-                            'show_box': True,
-                            'box_padding': 10,
-                            'box_radius': 8,
-                            'anchor_member': hub_id,
-                        }
-                    )
-                    existing_ids.add(group_id)
-            prot_entries = [e for e in entries if e.get('type') == 'prot_box']
-            prot_ids = {e.get("id") for e in prot_entries}
-            opposite_side = {'East': 'West', 'West': 'East', 'North': 'South', 'South': 'North'}
-            is_kegg = str(self.settings.get('pathway_source', 'kegg')).lower() == 'kegg'
-            def _entry_center(entry):
-                if not entry:
-                    return None, None
-                x_val = entry.get("x", 0)
-                y_val = entry.get("y", 0)
-                if is_kegg:
-                    return x_val, y_val
-                return x_val + entry.get("width", 0) / 2, y_val + entry.get("height", 0) / 2
-
-            def _shorten_end(start_x, start_y, end_x, end_y, amount):
-                dx = end_x - start_x
-                dy = end_y - start_y
-                dist = (dx ** 2 + dy ** 2) ** 0.5
-                if dist <= 0:
-                    return end_x, end_y
-                return end_x - dx / dist * amount, end_y - dy / dist * amount
-
-            def _shorten_start(start_x, start_y, end_x, end_y, amount):
-                dx = end_x - start_x
-                dy = end_y - start_y
-                dist = (dx ** 2 + dy ** 2) ** 0.5
-                if dist <= 0:
-                    return start_x, start_y
-                return start_x + dx / dist * amount, start_y + dy / dist * amount
-            for arrow in arrows:
-                entry1_id = arrow.get("entry1")
-                entry2_id = arrow.get("entry2")
-                entry1 = find_entry_or_group(entry1_id, entries, groups) if entry1_id else None
-                entry2 = find_entry_or_group(entry2_id, entries, groups) if entry2_id else None
-                entry1_is_protbox = bool(entry1 and entry1.get("id") in prot_ids)
-                entry2_is_protbox = bool(entry2 and entry2.get("id") in prot_ids)
-                entry1_is_compound = bool(entry1 and entry1.get("type") == "compound")
-                entry2_is_compound = bool(entry2 and entry2.get("type") == "compound")
-                center1_x, center1_y = _entry_center(entry1)
-                center2_x, center2_y = _entry_center(entry2)
-                # If exactly one endpoint is a protbox, attach to the protbox handle and use coords for the other end.
-                if entry1 and entry2 and entry1_is_protbox != entry2_is_protbox:
-                    dx = (center2_x or 0) - (center1_x or 0)
-                    dy = (center2_y or 0) - (center1_y or 0)
-                    angle = calculate_angle(center1_x or 0, center1_y or 0, center2_x or 0, center2_y or 0)
-                    primary_out_old = determine_arrow_side(angle)
-                    primary_out = map_side(primary_out_old)
-                    side_out = primary_out
-                    angle_rev = np.arctan2(-dy, -dx)
-                    primary_in_old = determine_arrow_side(angle_rev)
-                    primary_in = map_side(primary_in_old)
-                    side_in = primary_in
-                    arrow_entry = {
-                        'line': arrow.get('line', 'arrow'),
-                        'type': arrow.get('type', ''),
-                        'control_points': arrow.get('control_points', []),
-                        'connector_type': arrow.get('connector_type', ''),
-                    }
-                    if entry1_is_protbox:
-                        arrow_entry['protbox_id_1'] = entry1_id
-                        arrow_entry['protbox_id_1_side'] = side_out
-                        if center2_x is not None and center2_y is not None:
-                            end_x, end_y = center2_x, center2_y
-                            if entry2_is_compound:
-                                end_x, end_y = _shorten_end(center1_x or 0, center1_y or 0, end_x, end_y, 10)
-                            arrow_entry['x2'] = end_x
-                            arrow_entry['y2'] = end_y
-                    else:
-                        arrow_entry['protbox_id_2'] = entry2_id
-                        arrow_entry['protbox_id_2_side'] = side_in
-                        if center1_x is not None and center1_y is not None:
-                            start_x, start_y = center1_x, center1_y
-                            if entry1_is_compound:
-                                start_x, start_y = _shorten_start(start_x, start_y, center2_x or 0, center2_y or 0, 10)
-                            arrow_entry['x1'] = start_x
-                            arrow_entry['y1'] = start_y
-                    json_data['arrows'].append(arrow_entry)
-                    continue
-                # Fallback: if either endpoint is not a protbox, use provided coords or derive from entry centers
-                if not (entry1 and entry2 and entry1_is_protbox and entry2_is_protbox):
-                    x1 = arrow.get("x1")
-                    y1 = arrow.get("y1")
-                    x2 = arrow.get("x2")
-                    y2 = arrow.get("y2")
-                    if (x1 is None or y1 is None) and center1_x is not None and center1_y is not None:
-                        x1 = center1_x
-                        y1 = center1_y
-                    if (x2 is None or y2 is None) and center2_x is not None and center2_y is not None:
-                        x2 = center2_x
-                        y2 = center2_y
-                    if x1 is not None and y1 is not None and x2 is not None and y2 is not None:
-                        if entry1_is_compound:
-                            x1, y1 = _shorten_start(x1, y1, x2, y2, 10)
-                        if entry2_is_compound:
-                            x2, y2 = _shorten_end(x1, y1, x2, y2, 10)
-                        json_data['arrows'].append(
-                            {
-                                'x1': x1,
-                                'y1': y1,
-                                'x2': x2,
-                                'y2': y2,
-                                'line': arrow.get('line', 'arrow'),
-                                'type': arrow.get('type', ''),
-                                'control_points': arrow.get('control_points', []),
-                                'connector_type': arrow.get('connector_type', ''),
-                            }
-                        )
-                    continue
-                if center1_x is None:
-                    center1_x = entry1['x'] + entry1['width'] / 2
-                if center1_y is None:
-                    center1_y = entry1['y'] + entry1['height'] / 2
-                if center2_x is None:
-                    center2_x = entry2['x'] + entry2['width'] / 2
-                if center2_y is None:
-                    center2_y = entry2['y'] + entry2['height'] / 2
-                dx = center2_x - center1_x
-                dy = center2_y - center1_y
-                angle = calculate_angle(center1_x, center1_y, center2_x, center2_y)
-                possible_out = get_possible_outgoing_sides(dx, dy)
-                primary_out_old = determine_arrow_side(angle)
-                primary_out = map_side(primary_out_old)
-                side_out = primary_out  # Use primary without choose_side
-
-                angle_rev = np.arctan2(-dy, -dx)
-                possible_in = [opposite_side[s] for s in possible_out if s in opposite_side]
-                primary_in_old = determine_arrow_side(angle_rev)
-                primary_in = map_side(primary_in_old)
-                side_in = primary_in  # Use primary without choose_side
-
-                arrow_entry = {
-                    'protbox_id_1': arrow['entry1'],
-                    'protbox_id_2': arrow['entry2'],
-                    'protbox_id_1_side': side_out,
-                    'protbox_id_2_side': side_in,
-                    'line': arrow['line'],
-                    'type': arrow['type'],
-                    'control_points': arrow.get('control_points', []),
-                    'connector_type': arrow.get('connector_type', ''),
-                }
-                json_data['arrows'].append(arrow_entry)
-            if json_data.get('groups') and json_data.get('arrows'):
-                entry_map = {str(entry.get('id')): entry for entry in entries if entry.get('type') == 'prot_box'}
-                group_members = {}
-                group_anchor = {}
-                for group in json_data.get('groups', []):
-                    if not isinstance(group, dict):
-                        continue
-                    if not group.get('show_box'):
-                        continue
-                    gid = str(group.get('group_id'))
-                    prot_ids = []
-                    if isinstance(group.get('protbox_ids'), list):
-                        prot_ids.extend([str(pid) for pid in group.get('protbox_ids') if pid is not None])
-                    if (not prot_ids) and isinstance(group.get('members'), list):
-                        for member in group.get('members'):
-                            if isinstance(member, dict) and member.get('type') == 'prot-box' and member.get('id') is not None:
-                                prot_ids.append(str(member.get('id')))
-                    prot_ids = [pid for pid in prot_ids if pid in entry_map]
-                    if len(prot_ids) < 2:
-                        continue
-                    group_members[gid] = sorted(set(prot_ids))
-                    if group.get('anchor_member') is not None:
-                        group_anchor[gid] = str(group.get('anchor_member'))
-                if group_members:
-                    membership = defaultdict(set)
-                    for gid, ids in group_members.items():
-                        for pid in ids:
-                            membership[pid].add(gid)
-
-                    def _entry_center(entry):
-                        if not entry:
-                            return None, None
-                        return (
-                            entry.get('x', 0) + entry.get('width', 0) / 2,
-                            entry.get('y', 0) + entry.get('height', 0) / 2,
-                        )
-
-                    def _pick_representative(gid, target_id):
-                        anchor = group_anchor.get(gid)
-                        if anchor and anchor in group_members.get(gid, []):
-                            return anchor
-                        target_entry = entry_map.get(str(target_id))
-                        tx, ty = _entry_center(target_entry)
-                        best_id = None
-                        best_dist = None
-                        for pid in group_members.get(gid, []):
-                            entry = entry_map.get(pid)
-                            cx, cy = _entry_center(entry)
-                            if cx is None or cy is None or tx is None or ty is None:
-                                continue
-                            dist = (cx - tx) ** 2 + (cy - ty) ** 2
-                            if best_dist is None or dist < best_dist:
-                                best_dist = dist
-                                best_id = pid
-                        return best_id or (group_members.get(gid, []) or [None])[0]
-
-                    def _make_arrow_entry(pid1, pid2, template):
-                        entry1 = entry_map.get(str(pid1))
-                        entry2 = entry_map.get(str(pid2))
-                        if not entry1 or not entry2:
-                            return None
-                        center1_x = entry1['x'] + entry1['width'] / 2
-                        center1_y = entry1['y'] + entry1['height'] / 2
-                        center2_x = entry2['x'] + entry2['width'] / 2
-                        center2_y = entry2['y'] + entry2['height'] / 2
-                        dx = center2_x - center1_x
-                        dy = center2_y - center1_y
-                        angle = calculate_angle(center1_x, center1_y, center2_x, center2_y)
-                        primary_out = map_side(determine_arrow_side(angle))
-                        angle_rev = np.arctan2(-dy, -dx)
-                        primary_in = map_side(determine_arrow_side(angle_rev))
-                        return {
-                            'protbox_id_1': pid1,
-                            'protbox_id_2': pid2,
-                            'protbox_id_1_side': primary_out,
-                            'protbox_id_2_side': primary_in,
-                            'line': template.get('line', 'arrow'),
-                            'type': template.get('type', ''),
-                            'control_points': [],
-                            'connector_type': template.get('connector_type', ''),
-                        }
-
-                    group_links = {}
-                    for idx, arrow in enumerate(list(json_data.get('arrows', []))):
-                        pid1 = arrow.get('protbox_id_1')
-                        pid2 = arrow.get('protbox_id_2')
-                        if pid1 is None or pid2 is None:
-                            continue
-                        pid1 = str(pid1)
-                        pid2 = str(pid2)
-                        line = arrow.get('line', 'arrow')
-                        rel_type = arrow.get('type', '')
-                        if pid1 in membership:
-                            for gid in membership[pid1]:
-                                if pid2 in group_members.get(gid, []):
-                                    continue
-                                key = (gid, pid2, 'out', line, rel_type)
-                                entry = group_links.setdefault(key, {'members': set(), 'indices': [], 'template': arrow})
-                                entry['members'].add(pid1)
-                                entry['indices'].append(idx)
-                        if pid2 in membership:
-                            for gid in membership[pid2]:
-                                if pid1 in group_members.get(gid, []):
-                                    continue
-                                key = (gid, pid1, 'in', line, rel_type)
-                                entry = group_links.setdefault(key, {'members': set(), 'indices': [], 'template': arrow})
-                                entry['members'].add(pid2)
-                                entry['indices'].append(idx)
-
-                    remove_indices = set()
-                    collapsed_arrows = []
-                    for key, info in group_links.items():
-                        gid, external_id, direction, line, rel_type = key
-                        group_ids = set(group_members.get(gid, []))
-                        if not group_ids or info['members'] != group_ids:
-                            continue
-                        indices = info['indices']
-                        if not indices:
-                            continue
-                        if any(idx in remove_indices for idx in indices):
-                            continue
-                        representative = _pick_representative(gid, external_id)
-                        if not representative:
-                            continue
-                        if direction == 'out':
-                            new_arrow = _make_arrow_entry(representative, external_id, info['template'])
-                        else:
-                            new_arrow = _make_arrow_entry(external_id, representative, info['template'])
-                        if new_arrow:
-                            collapsed_arrows.append(new_arrow)
-                        remove_indices.update(indices)
-                    if remove_indices:
-                        kept = [a for idx, a in enumerate(json_data['arrows']) if idx not in remove_indices]
-                        kept.extend(collapsed_arrows)
-                        json_data['arrows'] = kept
+            json_data.update(layout.copy_sections())
             # Populate protein_data_map for all entries first
             for entry in entries:
                 entry_type = entry.get("type", "")
@@ -1029,17 +1716,13 @@ class PathwayProcessor:
                 valid_protein_dicts = []
                 uniprot_ids = []
                 for protein in proteins:
-                    if protein not in self.proteomic_data[self.hsa_id_column].values:
+                    row_pos = self._protein_row(protein)
+                    if row_pos is None:
                         continue
-                    mask = self.proteomic_data[self.hsa_id_column] == protein
-                    uniprot_vals = self.proteomic_data.loc[mask, self.prot_uniprot_column].values
-                    uniprot_id = uniprot_vals[0] if len(uniprot_vals) > 0 else None
+                    uniprot_id = self._protein_raw_value(row_pos, self.prot_uniprot_column)
                     if not uniprot_id:
                         continue
-                    annotations = []
-                    for col in self.protein_tooltip_columns:
-                        value = self.proteomic_data.loc[mask, col].values
-                        annotations.append(str(value[0]) if len(value) > 0 else '')
+                    annotations = [str(self._protein_raw_value(row_pos, col)) for col in self.protein_tooltip_columns]
                     valid_protein_dicts.append({'protein': protein, 'uniprot_id': uniprot_id, 'annotations': annotations})
                     uniprot_ids.append(uniprot_id)
                     all_uniprot_ids.add(uniprot_id)
@@ -1122,76 +1805,6 @@ class PathwayProcessor:
                 if protbox_ptm_overrides:
                     protbox_entry['ptm_overrides'] = protbox_ptm_overrides
                 json_data['protbox_data'].append(protbox_entry)
-            for entry in entries:
-                if entry.get('type') == 'compound':
-                    # Normalize compound size to a small fixed circle-like footprint, but keep the original center.
-                    pathway_source = str(self.settings.get('pathway_source', 'kegg')).lower()
-                    # KEGG graphics x/y are already centers; WikiPathways entries store top-left, so adjust accordingly.
-                    if pathway_source == 'kegg':
-                        center_x = entry['x']
-                        center_y = entry['y']
-                    else:
-                        center_x = entry['x'] + entry['width'] / 2
-                        center_y = entry['y'] + entry['height'] / 2
-                    # Match KEGG default compound size (8x8 circle); viewer treats x/y as center
-                    default_size = 8
-                    compound = {
-                        'compound_id': entry['id'],  # KGML numeric id
-                        'kegg_compound': entry['name'],  # e.g., 'cpd:C00165'
-                        'label': entry.get('first_name', ''),  # usually the C-number in MAPK
-                        'x': center_x,
-                        'y': center_y,
-                        'width': default_size,
-                        'height': default_size,
-                        'fgcolor': entry.get('fgcolor', '#000000'),
-                        'bgcolor': entry.get('bgcolor', '#FFFFFF'),
-                        'graphics_type': entry.get('graphics_type', ''),  # likely 'circle'
-                        'link': entry.get('link', '')
-                    }
-                    json_data['compound_data'].append(compound)
-            for entry in entries:
-                entry_type = entry.get('type')
-                gfx_type = entry.get('graphics_type')
-                has_shape = bool(entry.get('shape_type'))
-                if entry_type in {'map', 'label', 'text'} or gfx_type in {'roundrectangle', 'label'} or has_shape:
-                    label = entry.get('first_name', '')
-                    # Optionally strip 'TITLE:' prefix if present
-                    if label.upper().startswith('TITLE:'):
-                        label = label.split(':', 1)[1].strip()
-
-                    bgcolor = entry.get('bgcolor', '#FFFFFF')
-                    # Make default white backgrounds transparent so labels appear see-through
-                    if isinstance(bgcolor, str) and bgcolor.lower().lstrip('#') in {'ffffff', 'fff'}:
-                        bgcolor = 'transparent'
-                    border_color = entry.get('border_color', 'transparent') or 'transparent'
-                    border_width = entry.get('border_width', 0) or 0
-                    is_kegg = str(self.settings.get('pathway_source', 'kegg')).lower() == 'kegg'
-                    width = entry.get('width', 0)
-                    height = entry.get('height', 0)
-                    x_val = entry.get('x', 0)
-                    y_val = entry.get('y', 0)
-                    if is_kegg:
-                        x_val = x_val - (width / 2)
-                        y_val = y_val - (height / 2)
-                    text_item = {
-                        'text_id': entry['id'],
-                        'label': label,
-                        'x': x_val,
-                        'y': y_val,
-                        'width': width,
-                        'height': height,
-                        'fgcolor': entry.get('fgcolor', '#000000'),
-                        'bgcolor': bgcolor,
-                        'graphics_type': entry.get('graphics_type', ''),  # often 'roundrectangle'
-                        'text_style': entry.get('text_style', {}),
-                        'border_color': border_color,
-                        'border_width': border_width,
-                        'is_background': entry.get('is_background', False),
-                        'shape_type': entry.get('shape_type', ''),
-                        'link': entry.get('link', '')
-                    }
-                    json_data['text_data'].append(text_item)
-
             if not skip_disk_write:
                 temp_file = savefile(self.settings.get('pathway_id', 'hsa04010'),
                                      self.settings.get('output_subdir', 'output/testing_file_001'),
@@ -1234,8 +1847,9 @@ class PathwayProcessor:
             protein = protein_dict['protein']
             uniprot_id = protein_dict['uniprot_id']
             annotations = protein_dict.get('annotations', [])
-            protein_in_data = protein in self.proteomic_data[self.hsa_id_column].values
-            valid_proteins = [p for p in proteins if p in self.proteomic_data[self.hsa_id_column].values]
+            row_pos = self._protein_row(protein)
+            protein_in_data = row_pos is not None
+            valid_proteins = [p for p in proteins if self._protein_row(p) is not None]
             protein_entry = {
                 'label': '',
                 'label_color': [0, 0, 0],
@@ -1251,37 +1865,23 @@ class PathwayProcessor:
                 protein_entry[f'outline_color_{idx}'] = [0, 0, 0]
                 protein_entry[f'outline_fold_change_{idx}'] = None
             if protein_in_data:
-                gene_name = self.proteomic_data.loc[
-                    self.proteomic_data[self.hsa_id_column] == protein, self.gene_name_column].values[0]
+                gene_name = self._protein_raw_value(row_pos, self.gene_name_column)
                 protein_entry['label'] = gene_name
                 outline_cols = self.outline_columns or []
                 for idx, fc_col in enumerate(self.fold_change_columns, 1):
-                    fold_change = self.proteomic_data.loc[
-                        self.proteomic_data[self.hsa_id_column] == protein, fc_col].values
-                    if len(fold_change) > 0:
-                        raw_value = fold_change[0]
-                        fc_value = None
-                        if raw_value is not None and not pd.isna(raw_value):
-                            try:
-                                fc_value = float(raw_value)
-                            except (TypeError, ValueError):
-                                fc_value = None
-                        protein_entry[f'fold_change_{idx}'] = fc_value
-                        if fc_value is not None:
-                            protein_entry[f'fc_color_{idx}'] = self.get_color(fc_value)
-                        else:
-                            protein_entry[f'fc_color_{idx}'] = [128, 128, 128]
+                    fc_value = self._protein_numeric_value(row_pos, fc_col)
+                    protein_entry[f'fold_change_{idx}'] = fc_value
+                    if fc_value is not None:
+                        protein_entry[f'fc_color_{idx}'] = self._protein_color(row_pos, fc_col)
+                    else:
+                        protein_entry[f'fc_color_{idx}'] = [128, 128, 128]
                     outline_col = outline_cols[idx - 1] if idx - 1 < len(outline_cols) else None
                     outline_value = None
-                    if outline_col and outline_col in self.proteomic_data.columns:
-                        outline_vals = self.proteomic_data.loc[
-                            self.proteomic_data[self.hsa_id_column] == protein, outline_col
-                        ].values
-                        if len(outline_vals) > 0:
-                            outline_value = self._safe_float(outline_vals[0])
+                    if outline_col and outline_col in self._protein_numeric_columns:
+                        outline_value = self._protein_numeric_value(row_pos, outline_col)
                     protein_entry[f'outline_fold_change_{idx}'] = outline_value
                     if outline_value is not None:
-                        protein_entry[f'outline_color_{idx}'] = self.get_color(outline_value)
+                        protein_entry[f'outline_color_{idx}'] = self._protein_color(row_pos, outline_col)
                     else:
                         protein_entry[f'outline_color_{idx}'] = [0, 0, 0]
             else:
@@ -1291,13 +1891,11 @@ class PathwayProcessor:
             tooltip_plain_lines = []
             tooltip_html_lines = []
             if protein_in_data:
-                mask = self.proteomic_data[self.hsa_id_column] == protein
                 for col in self.protein_tooltip_columns:
                     label = str(col)
-                    val_series = self.proteomic_data.loc[mask, col] if col in self.proteomic_data.columns else []
                     value = ''
-                    if len(val_series) > 0:
-                        cell = val_series.values[0]
+                    if col in self._protein_raw_columns:
+                        cell = self._protein_raw_value(row_pos, col)
                         if cell is not None and not pd.isna(cell):
                             value = str(cell)
                     if str(value).strip() == '':
@@ -1331,72 +1929,14 @@ class PathwayProcessor:
                     }
                     position_priority = ['N1', 'N2', 'N3', 'S1', 'S2', 'S3', 'W1', 'W2', 'E1', 'E2']
                     pathway_id = self.settings.get('pathway_id', 'hsa04010')
-                    hsa_exceptions = exceptions.get('hsa_specific', {}).get(pathway_id,
-                                                                            {'proximity': [], 'specific': {}})
-                    global_exceptions = exceptions.get('global', {'proximity': [], 'specific': {}})
-                    entry_proximities = proximities.get(entry_id, {})
-                    if not entry_proximities:
+                    if not isinstance(exceptions, CompiledExceptions):
+                        exceptions = CompiledExceptions(exceptions)
+                    if entry_id not in proximities:
                         print(f"Warning: No proximity data for entry {entry_id} (protein: {protein}).")
-                    specific_rules = hsa_exceptions['specific'].get(protein, []) + global_exceptions['specific'].get(
-                        protein, [])
-                    blocked_positions = set()
-                    custom_priority = None
-                    move_circle = {}
-                    move_label = {}
-                    for rule in specific_rules:
-                        action = rule[0].lower()
-                        if action == 'block' and len(rule) > 1:
-                            blocked_positions.add(rule[1])
-                        elif action == 'priority':
-                            custom_priority = rule[1:]
-                        elif action == 'move_circle' and len(rule) == 4:
-                            pos, dx, dy = rule[1], float(rule[2]), float(rule[3])
-                            move_circle[pos] = (dx, dy)
-                        elif action == 'move_label' and len(rule) == 5:
-                            pos, dx, dy, align = rule[1], float(rule[2]), float(rule[3]), rule[4]
-                            move_label[pos] = (dx, dy, align)
-                    all_proximity_rules = global_exceptions['proximity'] + hsa_exceptions['proximity']
-                    proximity_rules = sorted(all_proximity_rules,
-                                             key=lambda r: (r['priority'], all_proximity_rules.index(r)))
-                    passed_rules_by_action = {'block': [], 'priority': [], 'move_circle': [], 'move_label': []}
-                    for rule in proximity_rules:
-                        conditions_satisfied = {cond: False for cond, _ in rule['conditions']}
-                        for other_entry_id, distances in entry_proximities.items():
-                            dx = distances['dx']
-                            dy = distances['dy']
-                            for condition, threshold in rule['conditions']:
-                                if condition == 'adjacent_y_south' and dy > 0 and abs(dy) < threshold:
-                                    if abs(dx) <= 23:
-                                        conditions_satisfied[condition] = True
-                                elif condition == 'adjacent_y_north' and dy < 0 and abs(dy) < threshold:
-                                    if abs(dx) <= 23:
-                                        conditions_satisfied[condition] = True
-                                elif condition == 'adjacent_x_west' and dx < 0 and abs(dx) < threshold:
-                                    if abs(dy) <= 8:
-                                        conditions_satisfied[condition] = True
-                                elif condition == 'adjacent_x_east' and dx > 0 and abs(dx) < threshold:
-                                    if abs(dy) <= 8:
-                                        conditions_satisfied[condition] = True
-                        if all(conditions_satisfied.values()):
-                            passed_rules_by_action[rule['action']].append(rule)
-                    for action in ['block', 'priority']:
-                        if passed_rules_by_action[action]:
-                            highest_rule = max(passed_rules_by_action[action], key=lambda r: r['priority'])
-                            if action == 'block':
-                                for pos in highest_rule['values']:
-                                    blocked_positions.add(pos)
-                            elif action == 'priority':
-                                custom_priority = highest_rule['values']
-                    for action in ['move_circle', 'move_label']:
-                        for rule in sorted(passed_rules_by_action[action],
-                                           key=lambda r: (r['priority'], proximity_rules.index(r))):
-                            if action == 'move_circle' and len(rule['values']) == 3:
-                                pos, dx, dy = rule['values'][0], float(rule['values'][1]), float(rule['values'][2])
-                                move_circle[pos] = (dx, dy)
-                            elif action == 'move_label' and len(rule['values']) == 4:
-                                pos, dx, dy, align = rule['values'][0], float(rule['values'][1]), float(
-                                    rule['values'][2]), rule['values'][3]
-                                move_label[pos] = (dx, dy, align)
+                    neighbor_dx, neighbor_dy = proximities.offsets_for(entry_id)
+                    blocked_positions, custom_priority, move_circle, move_label = (
+                        exceptions.for_pathway(pathway_id).placement(protein, neighbor_dx, neighbor_dy)
+                    )
                     available_positions = [p for p in (custom_priority or position_priority) if
                                            p not in blocked_positions]
                     defaults = {
@@ -1608,8 +2148,13 @@ class PathwayProcessor:
         missing = [uid for uid in valid_ids if uid not in cache]
         if not missing:
             return
+        if self._ptm_execution_mode == 'process':
+            worker_count = min(self._ptm_process_count, len(missing))
+            if worker_count > 1 and self._prefetch_ptm_summaries_in_processes(missing, worker_count, cache):
+                return
+            missing = [uid for uid in missing if uid not in cache]
         worker_count = min(max(1, self._ptm_worker_count), len(missing))
-        if worker_count <= 1:
+        if self._ptm_execution_mode == 'serial' or worker_count <= 1:
             for uid in missing:
                 cache[uid] = self._build_ptm_summary(uid)
             return
@@ -1623,6 +2168,83 @@ class PathwayProcessor:
                     print(f"Warning: PTM worker failed for {uid}: {exc}")
                     cache[uid] = {}
 
+    def _ptm_worker_payload(self):
+        frames = {}
+        groups = {}
+        blocks = []
+        try:
+            for dataset_id, site_index in self._ptm_site_index.items():
+                frames[dataset_id], dataset_blocks = _share_ptm_frame(site_index['frame'])
+                blocks.extend(dataset_blocks)
+                groups[dataset_id] = site_index['groups']
+        except Exception:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+            raise
+        ptm_datasets = {
+            dataset_id: {key: value for key, value in dataset.items() if key not in {'data', 'dataframe', 'data_rows'}}
+            for dataset_id, dataset in self.ptm_datasets.items()
+        }
+        attributes = {
+            'settings': self.settings,
+            'ptm_datasets': ptm_datasets,
+            'ptm_selection_option': self.ptm_selection_option,
+            'ptm_label_color': self.ptm_label_color,
+            'negative_color': self.negative_color,
+            'positive_color': self.positive_color,
+            'max_negative': self.max_negative,
+            'max_positive': self.max_positive,
+            '_ptm_fc_columns': self._ptm_fc_columns,
+        }
+        return {'frames': frames, 'groups': groups, 'attributes': attributes}, blocks
+
+    def _prefetch_ptm_summaries_in_processes(self, missing, worker_count, cache):
+        # Chunk the UniProt IDs so each task amortises IPC; several chunks per worker keeps the pool balanced.
+        chunk_count = min(len(missing), worker_count * 4)
+        chunks = [
+            list(chunk)
+            for chunk in np.array_split(np.array(missing, dtype=object), chunk_count)
+            if len(chunk)
+        ]
+        try:
+            payload, blocks = self._ptm_worker_payload()
+        except Exception as exc:
+            print(f"Warning: could not share PTM columns with worker processes ({exc}); falling back to threads.")
+            return False
+        start = time.perf_counter()
+        failed = 0
+        try:
+            with ProcessPoolExecutor(max_workers=worker_count, initializer=_init_ptm_worker, initargs=(payload,)) as executor:
+                future_to_chunk = {
+                    executor.submit(_run_ptm_worker_chunk, chunk): (idx, chunk)
+                    for idx, chunk in enumerate(chunks, 1)
+                }
+                for future in as_completed(future_to_chunk):
+                    idx, chunk = future_to_chunk[future]
+                    try:
+                        summaries, elapsed, pid = future.result()
+                    except Exception as exc:
+                        # Left out of the cache so the thread path builds these proteins instead.
+                        print(f"Warning: PTM process chunk {idx}/{len(chunks)} failed ({exc}); retrying with threads.")
+                        failed += len(chunk)
+                        continue
+                    cache.update(summaries)
+                    self._ptm_chunk_timings.append(
+                        {'chunk': idx, 'proteins': len(chunk), 'seconds': elapsed, 'pid': pid}
+                    )
+                    print(f"PTM chunk {idx}/{len(chunks)}: {len(chunk)} proteins in {elapsed:.3f}s (pid {pid})")
+        except Exception as exc:
+            print(f"Warning: PTM process pool failed ({exc}); falling back to threads.")
+            return False
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+        print(f"PTM summaries for {len(missing) - failed} proteins built in {time.perf_counter() - start:.3f}s "
+              f"across {worker_count} processes")
+        return not failed
+
     def _build_ptm_summary(self, uniprot_id):
         if not uniprot_id:
             return {}
@@ -1630,8 +2252,9 @@ class PathwayProcessor:
         if cache is not None and uniprot_id in cache:
             return cache[uniprot_id]
         ptm_entries = {}
+        max_display = self.settings.get('ptm_max_display', 4)
         try:
-            ptm_sites = self.prioritize_ptm_sites(uniprot_id)
+            ptm_sites = self.prioritize_ptm_sites(uniprot_id, limit=max_display)
         except Exception as exc:
             print(f"Warning: unable to build PTM summary for {uniprot_id}: {exc}")
             return ptm_entries
@@ -1639,7 +2262,6 @@ class PathwayProcessor:
             if cache is not None:
                 cache[uniprot_id] = ptm_entries
             return ptm_entries
-        max_display = self.settings.get('ptm_max_display', 4)
         for i, (_, row) in enumerate(ptm_sites.iterrows()):
             if i >= max_display:
                 break
@@ -1719,6 +2341,7 @@ class PathwayProcessor:
     def build_full_protein_catalog(self):
         catalog = {}
         seen = set()
+        pending_colors = []
         for _, row in self.proteomic_data.iterrows():
             if self.prot_uniprot_column not in row.index or pd.isna(row[self.prot_uniprot_column]):
                 continue
@@ -1752,16 +2375,59 @@ class PathwayProcessor:
                 fc_value = self._safe_float(row.get(fc_col))
                 protein_entry[f'fold_change_{idx}'] = fc_value
                 if fc_value is not None:
-                    protein_entry[f'fc_color_{idx}'] = self.get_color(fc_value)
+                    pending_colors.append((protein_entry, f'fc_color_{idx}', fc_value))
                 outline_col = outline_cols[idx - 1] if idx - 1 < len(outline_cols) else None
                 outline_value = self._safe_float(row.get(outline_col)) if outline_col else None
                 protein_entry[f'outline_fold_change_{idx}'] = outline_value
                 if outline_value is not None:
-                    protein_entry[f'outline_color_{idx}'] = self.get_color(outline_value)
+                    pending_colors.append((protein_entry, f'outline_color_{idx}', outline_value))
             catalog[uniprot_id] = protein_entry
+        # Colour every catalog fold change in one pass rather than per value.
+        if pending_colors:
+            colors = self._gradient.map_lists([value for _, _, value in pending_colors])
+            for (protein_entry, key, _), color in zip(pending_colors, colors):
+                protein_entry[key] = color
         return catalog
 
 def generate_pathway_json(pathway_id, data, settings, skip_disk_write=False, debug_write=False):
+    json_data, _ = _generate_pathway_json(pathway_id, data, settings, skip_disk_write, debug_write)
+    return json_data
+
+
+def _entry_frame(entry):
+    """Typed DataFrame for a protein/PTM data entry: its ``dataframe``, else its rows, else its file."""
+    if entry is None:
+        return None
+    if isinstance(entry, pd.DataFrame):
+        return entry
+    frame = entry.get('dataframe')
+    if isinstance(frame, pd.DataFrame):
+        return frame
+    headers = entry.get('data_headers')
+    rows = entry.get('data_rows')
+    if headers is not None and rows is not None:
+        return typed_frame(headers, rows)
+    file_path = entry.get('file_path')
+    if file_path:
+        sep = "," if os.path.splitext(file_path)[1].lower() == ".csv" else "\t"
+        return pd.read_csv(file_path, sep=sep)
+    return None
+
+
+def _resolve_pathway_file(pathway_id, settings):
+    """The pathway API for ``settings`` and the local pathway file, downloading it if missing."""
+    pathway_api = get_pathway_api(settings.get('pathway_source', 'kegg'))
+    species_code = settings.get("species_code") or ""
+    if species_code:
+        setattr(pathway_api, "species_code", species_code)
+    species_hint = settings.get("_species_full_name") or settings.get("species")
+    pathway_file = pathway_api.download_pathway_data(pathway_id, species_hint=species_hint)
+    print(f"Pathway file downloaded: {pathway_file}")
+    return pathway_api, pathway_file
+
+
+def _generate_pathway_json(pathway_id, data, settings, skip_disk_write=False, debug_write=False, resolved=None):
+    """generate_pathway_json plus the layout it used; ``resolved`` is a _resolve_pathway_file result."""
     try:
         # Debug logging: capture what enters m4
         if debug_write:
@@ -1782,24 +2448,7 @@ def generate_pathway_json(pathway_id, data, settings, skip_disk_write=False, deb
             except Exception as log_exc:  # pragma: no cover - debug helper
                 print(f"Debug log (m4 input) failed: {log_exc}")
 
-        def _load_df(entry):
-            if entry is None:
-                return None
-            if isinstance(entry, pd.DataFrame):
-                return entry.copy()
-            headers = entry.get('data_headers')
-            rows = entry.get('data_rows')
-            if headers is not None and rows is not None:
-                try:
-                    return pd.DataFrame(rows, columns=headers)
-                except Exception:
-                    pass
-            file_path = entry.get('file_path')
-            if file_path:
-                return pd.read_csv(file_path, sep="\t")
-            return None
-
-        proteomic_data = _load_df(data['protein'])
+        proteomic_data = _entry_frame(data['protein'])
         if proteomic_data is None:
             raise RuntimeError("No protein data provided.")
 
@@ -1807,14 +2456,10 @@ def generate_pathway_json(pathway_id, data, settings, skip_disk_write=False, deb
         settings['protein_file_path'] = data['protein'].get('file_path', '')
         settings['main_columns'] = data['protein']['main_columns']
         settings['protein_tooltip_columns'] = data['protein'].get('tooltip_columns', ['Gene Symbol', 'Uniprot_ID'])
-        pathway_api = get_pathway_api(settings.get('pathway_source', 'kegg'))
-        species_code = settings.get("species_code") or ""
-        if species_code:
-            setattr(pathway_api, "species_code", species_code)
-        species_hint = settings.get("_species_full_name") or settings.get("species")
-        pathway_file = pathway_api.download_pathway_data(pathway_id, species_hint=species_hint)
-        print(f"Pathway file downloaded: {pathway_file}")
-        entries, groups, arrows = pathway_api.parse_pathway(pathway_file)
+        pathway_api, pathway_file = resolved or _resolve_pathway_file(pathway_id, settings)
+        layout = get_pathway_layout(pathway_api, pathway_id, settings.get('pathway_source', 'kegg'), pathway_file)
+        topology = layout.topology
+        entries, groups, arrows = topology
         print(f"Parsed {len(entries)} entries, {len(groups)} groups, and {len(arrows)} arrows")
         # Debug: capture what we got from the pathway API (a1_factory output)
         if debug_write:
@@ -1842,7 +2487,7 @@ def generate_pathway_json(pathway_id, data, settings, skip_disk_write=False, deb
 
         loaded_ptm = []
         for dataset in ptm_datasets:
-            df = _load_df(dataset)
+            df = _entry_frame(dataset)
             if df is None:
                 raise RuntimeError(f"No PTM data provided for dataset {dataset.get('type', 'PTM')}")
             ds = dict(dataset)
@@ -1853,7 +2498,10 @@ def generate_pathway_json(pathway_id, data, settings, skip_disk_write=False, deb
 
         processor = PathwayProcessor(entries, proteomic_data, loaded_ptm, settings)
         print("PathwayProcessor created")
-        json_data = processor.process_pathway(entries, groups, arrows, proteomic_data, loaded_ptm, skip_disk_write=skip_disk_write)
+        json_data = processor.process_pathway(
+            entries, groups, arrows, proteomic_data, loaded_ptm, skip_disk_write=skip_disk_write, topology=topology,
+            layout=layout,
+        )
         print("Pathway JSON generated")
 
         # Debug logging: capture what m4 returns (consumed by m5/m3)
@@ -1866,10 +2514,10 @@ def generate_pathway_json(pathway_id, data, settings, skip_disk_write=False, deb
             except Exception as log_exc:  # pragma: no cover - debug helper
                 print(f"Debug log (m4 output) failed: {log_exc}")
 
-        return json_data
+        return json_data, layout
     except Exception as e:
         print(f"Error: {e}")
-        return None
+        return None, None
 # Expose default settings and data so other scripts can import them and call generate_pathway_json
 DEFAULT_SETTINGS = {
     'pathway_id': 'hsa04010',
@@ -1884,6 +2532,7 @@ DEFAULT_SETTINGS = {
     'show_arrows': True,
     'show_text_boxes': True,
     'debug_mode': False,
+    'ks_activity_execution_mode': 'process',
     'negative_color': (179, 21, 41),
     'positive_color': (16, 101, 171),
     'max_negative': -2,
@@ -1997,7 +2646,204 @@ DEFAULT_DATA = {
 }
 
 
-def get_default_json(data_override=None, settings_override=None, skip_disk_write=False, debug_write=False):
+_PATHWAY_JSON_CACHE_DIR = Path(__file__).resolve().parent / "cache" / "pathway_json"
+_PATHWAY_JSON_CACHE_VERSION = 2
+
+
+def _hash_dataset_entry(digest, entry):
+    """Feed a protein/PTM data entry into ``digest`` by content rather than identity.
+
+    An upload's ``dataset_key`` (format plus SHA-1 of the file, from the upload cache) stands
+    in for its uploaded columns, so only the columns added by annotation are hashed. Entries
+    without a key, or whose upload is no longer loaded, are hashed cell by cell.
+    """
+    if entry is None:
+        digest.update(b"none")
+        return
+    if isinstance(entry, pd.DataFrame):
+        digest.update(json.dumps([str(c) for c in entry.columns]).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(entry.astype(str), index=False).to_numpy().tobytes())
+        return
+    frame = entry.get('dataframe')
+    rows = entry.get('data_rows')
+    meta = {
+        k: v for k, v in entry.items()
+        if k not in ('dataframe', 'data_rows')
+    }
+    digest.update(json.dumps(meta, sort_keys=True, default=str).encode("utf-8"))
+    uploaded = loaded_dataset(entry.get('dataset_key') or "")
+    width = uploaded.frame.shape[1] if uploaded is not None else 0
+    if (uploaded is not None and isinstance(frame, pd.DataFrame) and len(frame) == len(uploaded.frame)
+            and list(frame.columns[:width]) == list(uploaded.frame.columns)):
+        annotation = frame.iloc[:, width:]
+        if annotation.shape[1]:
+            digest.update(pd.util.hash_pandas_object(annotation.astype(str), index=False).to_numpy().tobytes())
+        return
+    if isinstance(frame, pd.DataFrame):
+        _hash_dataset_entry(digest, frame)
+    if rows is not None:
+        digest.update(json.dumps(rows, default=str).encode("utf-8"))
+    elif frame is None and entry.get('file_path'):
+        # File-backed data: the path plus its mtime and size stand in for the content.
+        try:
+            stat = os.stat(entry['file_path'])
+            digest.update(f"{stat.st_mtime_ns}:{stat.st_size}".encode("utf-8"))
+        except OSError:
+            digest.update(b"missing")
+
+
+def pathway_json_cache_key(pathway_id, data, settings, pathway_file=None):
+    """Content-addressed key for one generation: pathway (and its KGML/GPML file), input data and settings."""
+    digest = hashlib.sha256()
+    digest.update(f"v{_PATHWAY_JSON_CACHE_VERSION}".encode("utf-8"))
+    digest.update(str(pathway_id).encode("utf-8"))
+    if pathway_file is not None:
+        digest.update(_file_stamp(pathway_file).encode("utf-8"))
+    digest.update(str(settings.get('pathway_source', 'kegg')).lower().encode("utf-8"))
+    _hash_dataset_entry(digest, data.get('protein'))
+    for dataset in data.get('ptm') or []:
+        _hash_dataset_entry(digest, dataset)
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode("utf-8"))
+    exceptions_path, _ = _resolve_exceptions_path()
+    if exceptions_path:
+        try:
+            stat = os.stat(exceptions_path)
+            digest.update(f"{stat.st_mtime_ns}:{stat.st_size}".encode("utf-8"))
+        except OSError:
+            pass
+    return digest.hexdigest()
+
+
+class PathwayJsonCache:
+    """Two-tier cache of generated pathway JSON: an in-memory LRU in front of an on-disk store.
+
+    Payloads are stored pickled so every hit hands back an independent copy that callers
+    may mutate. The disk tier evicts least-recently-used files once it grows past
+    ``max_disk_bytes``.
+    """
+
+    def __init__(self, cache_dir=_PATHWAY_JSON_CACHE_DIR, max_memory_entries=16, max_disk_bytes=256 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'disk_evictions': 0}
+
+    def _path_for(self, key):
+        return self.cache_dir / f"{key}.pkl"
+
+    def _remember(self, key, blob):
+        self._memory[key] = blob
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            blob = self._memory.get(key)
+            if blob is not None:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return pickle.loads(blob)
+        path = self._path_for(key)
+        try:
+            blob = path.read_bytes()
+            payload = pickle.loads(blob)
+            os.utime(path)
+        except FileNotFoundError:
+            blob = None
+        except Exception as e:
+            print(f"Discarding unreadable pathway JSON cache file {path}: {e}")
+            blob = None
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        with self._lock:
+            if blob is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['disk_hits'] += 1
+            self._remember(key, blob)
+        return payload
+
+    def put(self, key, payload):
+        try:
+            blob = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            print(f"Pathway JSON not cached (not picklable): {e}")
+            return
+        with self._lock:
+            self._remember(key, blob)
+            self.stats['stores'] += 1
+        if self.max_disk_bytes <= 0:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            path = self._path_for(key)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(blob)
+            os.replace(tmp_path, path)
+            self._evict_disk()
+        except OSError as e:
+            print(f"Could not write pathway JSON cache file: {e}")
+
+    def _evict_disk(self):
+        files = []
+        total = 0
+        for path in self.cache_dir.glob("*.pkl"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+                with self._lock:
+                    self.stats['disk_evictions'] += 1
+            except OSError:
+                continue
+
+    def clear(self, disk=True):
+        with self._lock:
+            self._memory.clear()
+        if disk and self.cache_dir.exists():
+            for path in self.cache_dir.glob("*.pkl"):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+
+_PATHWAY_JSON_CACHE = PathwayJsonCache()
+
+
+def get_pathway_json_cache_stats():
+    """Hit/miss counters for the get_default_json cache."""
+    return _PATHWAY_JSON_CACHE.snapshot()
+
+
+def clear_pathway_json_cache(disk=True):
+    _PATHWAY_JSON_CACHE.clear(disk=disk)
+
+
+def get_default_json(data_override=None, settings_override=None, skip_disk_write=False, debug_write=False,
+                     use_cache=True):
     """Return the JSON pathway data using the DEFAULT_DATA and DEFAULT_SETTINGS.
 
     Optional overrides may be supplied to change the DEFAULT_DATA or DEFAULT_SETTINGS
@@ -2008,6 +2854,10 @@ def get_default_json(data_override=None, settings_override=None, skip_disk_write
         settings_override (dict|None): partial dict to merge on top of DEFAULT_SETTINGS
         skip_disk_write (bool): if True, avoid writing intermediate/output files to disk
         debug_write (bool): if True, write debug snapshot files for m4/m3 handoff
+        use_cache (bool): reuse a previously generated result for identical inputs. Only
+            applies with skip_disk_write and without debug_write, since a hit skips those side effects.
+            The key includes the pathway file's stamp, and results built on a failed or empty
+            pathway parse are not cached.
 
     Returns:
         dict: generated pathway JSON (or a minimal fallback structure on error)
@@ -2025,15 +2875,29 @@ def get_default_json(data_override=None, settings_override=None, skip_disk_write
             data[k] = v
 
     try:
-        json_data = generate_pathway_json(
+        cache_key = None
+        resolved = None
+        if use_cache and skip_disk_write and not debug_write:
+            started = time.perf_counter()
+            resolved = _resolve_pathway_file(settings.get('pathway_id', 'hsa04010'), settings)
+            cache_key = pathway_json_cache_key(settings.get('pathway_id', 'hsa04010'), data, settings, resolved[1])
+            cached = _PATHWAY_JSON_CACHE.get(cache_key)
+            if cached is not None:
+                print(f"Pathway JSON cache hit for {settings.get('pathway_id')} "
+                      f"({(time.perf_counter() - started) * 1000:.1f} ms)")
+                return cached
+        json_data, layout = _generate_pathway_json(
             settings.get('pathway_id', 'hsa04010'),
             data,
             settings,
             skip_disk_write=skip_disk_write,
             debug_write=debug_write,
+            resolved=resolved,
         )
         if json_data is None:
             raise RuntimeError('generate_pathway_json returned None')
+        if cache_key is not None and layout is not None and layout.topology.cacheable:
+            _PATHWAY_JSON_CACHE.put(cache_key, json_data)
         return json_data
     except FileNotFoundError as e:
         print(f"Warning: data file not found while generating default JSON: {e}")
@@ -3,6 +3,7 @@ import base64
 import copy
 import io
 import json
+import multiprocessing
 import os
 import re
 import threading
@@ -16,6 +17,7 @@ from argparse import Namespace
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+import numpy as np
 import pandas as pd
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -25,25 +27,42 @@ if PARENT_DIR not in sys.path:
 
 from shiny import App, reactive, render, ui
 
-from MapKinase_WebApp.m4_json import DEFAULT_DATA, DEFAULT_SETTINGS, get_default_json
+from MapKinase_WebApp.m4_json import DEFAULT_DATA, DEFAULT_SETTINGS, get_default_json, restyle_pathway_json
+from MapKinase_WebApp.m13_color_gradient import get_gradient
 from MapKinase_WebApp.a1_factory import get_pathway_api
-from MapKinase_WebApp.m2_protein_catalog import ensure_global_protein_catalog
-from MapKinase_WebApp.m1_file_processor import validate_protein_file, validate_ptm_file
-from MapKinase_WebApp.d2_psp_regulatorysites import load_regulatory_sites, annotate_ptm_dataset
-from MapKinase_WebApp.d2_psp_kinasesubstrates import load_kinase_substrate_map, annotate_ptm_dataset_with_kinases
-from MapKinase_WebApp.d1_transfer_kegg_annotations import load_kegg_map, annotate_protein_with_kegg
+from MapKinase_WebApp.m2_protein_catalog import (
+    SESSION_CATALOGS,
+    catalog_color_settings,
+    ensure_global_protein_catalog,
+    get_catalog_records,
+    open_protein_catalog_store,
+)
+from MapKinase_WebApp.m1_file_processor import dataset_frame, load_protein_dataset, load_ptm_dataset, typed_frame
+from MapKinase_WebApp.d5_annotation_pipeline import annotate_protein_kegg, annotate_ptm_sites
+from MapKinase_WebApp.d6_annotation_registry import ANNOTATIONS
+from MapKinase_WebApp.d7_kinase_site_matrix import (
+    IN_VITRO,
+    IN_VIVO,
+    KinaseSiteOverlap,
+    evidence_mask,
+    evidence_types,
+)
+from MapKinase_WebApp.d8_kinase_activity import score_kinase_activity
 from MapKinase_WebApp.m6_rank_pathways import (
-    build_gene_to_uniprot_map,
-    candidate_uniprots_for_node,
     build_protein_lookup,
     compute_single_protein_scores,
-    load_kegg_index,
     normalize_uniprot,
     parse_weights,
     rank_all_pathways,
     resolve_node_scores,
 )
 
+from MapKinase_WebApp.m14_pathway_enrichment import (
+    PathwayIncidence,
+    benjamini_hochberg,
+    hypergeometric_right_tail,
+    load_pathway_incidence,
+)
 from MapKinase_WebApp.m3_svg_viewer import create_pathway_svg, _build_blank_canvas
 from MapKinase_WebApp.m7_cst_viewer import (
     create_cst_pathway_viewer,
@@ -184,10 +203,16 @@ UPLOAD_ACCEPT_TYPES = [
     ".txt",
     ".tsv",
     ".csv",
+    ".parquet",
+    ".feather",
+    ".arrow",
+    ".ipc",
     "text/plain",
     "text/csv",
     "application/csv",
     "application/vnd.ms-excel",
+    "application/vnd.apache.parquet",
+    "application/vnd.apache.arrow.file",
 ]
 # Flip to True to mirror terminal stdout/stderr into TERMINAL_LOG_FILE by default.
 TERMINAL_LOG_DEFAULT = False
@@ -310,14 +335,8 @@ def _init_global_catalog() -> Dict[str, Any]:
     )
     if BUILD_GLOBAL_CATALOG_ON_STARTUP:
         return ensure_global_protein_catalog()
-    metadata: Dict[str, Any] = {}
-    if os.path.exists(default_path):
-        try:
-            with open(default_path, "r", encoding="utf-8") as fh:
-                payload = json.load(fh)
-            metadata = payload.get("metadata", {}) if isinstance(payload, dict) else {}
-        except (OSError, json.JSONDecodeError):
-            metadata = {}
+    store = open_protein_catalog_store(default_path)
+    metadata: Dict[str, Any] = dict(store.metadata) if store is not None else {}
     os.environ.setdefault("GLOBAL_PROTEIN_CATALOG_PATH", default_path)
     return {"path": default_path, "metadata": metadata}
 
@@ -806,58 +825,15 @@ def _coerce_float(value: Any) -> Optional[float]:
         return None
 
 
-def _compute_gradient_color(value: Optional[float], neg: Sequence[int], pos: Sequence[int], max_neg: float, max_pos: float) -> Optional[List[int]]:
-    if value is None:
-        return None
-    white = (255, 255, 255)
-    neg = _rgb_tuple_to_list(neg)
-    pos = _rgb_tuple_to_list(pos)
-    if value < 0:
-        denom = abs(max_neg) if max_neg else 1.0
-        t = min(abs(value) / denom, 1.0)
-        r = int((1 - t) * white[0] + t * neg[0])
-        g = int((1 - t) * white[1] + t * neg[1])
-        b = int((1 - t) * white[2] + t * neg[2])
-    else:
-        denom = max_pos if max_pos else 1.0
-        if denom <= 0:
-            denom = 1.0
-        t = min(value / denom, 1.0)
-        r = int((1 - t) * white[0] + t * pos[0])
-        g = int((1 - t) * white[1] + t * pos[1])
-        b = int((1 - t) * white[2] + t * pos[2])
-    return [r, g, b]
-
-
-def _apply_color_overrides(payload: Dict[str, Any], color_override: Dict[str, Any]) -> None:
-    protein_data = payload.get("protein_data") or {}
-    if not protein_data:
-        return
-    neg = color_override.get("negative_color")
-    pos = color_override.get("positive_color")
-    max_neg = _coerce_float(color_override.get("max_negative")) or DEFAULT_SETTINGS["max_negative"]
-    max_pos = _coerce_float(color_override.get("max_positive")) or DEFAULT_SETTINGS["max_positive"]
-    for protein in protein_data.values():
-        _recolor_entry(protein, neg, pos, max_neg, max_pos)
-        ptms = protein.get("PTMs") or {}
-        for ptm in ptms.values():
-            _recolor_entry(ptm, neg, pos, max_neg, max_pos)
-
-
-def _recolor_entry(entry: Dict[str, Any], neg: Sequence[int], pos: Sequence[int], max_neg: float, max_pos: float) -> None:
-    if not isinstance(entry, dict):
-        return
-    for key, value in list(entry.items()):
-        if not key.startswith("fold_change_"):
-            continue
-        try:
-            idx = key.rsplit("_", 1)[1]
-        except IndexError:
-            continue
-        fc_value = _coerce_float(value)
-        new_color = _compute_gradient_color(fc_value, neg, pos, max_neg, max_pos)
-        if new_color is not None:
-            entry[f"fc_color_{idx}"] = new_color
+def _apply_color_overrides(payload: Dict[str, Any], color_override: Dict[str, Any], as_copy: bool = False) -> Dict[str, Any]:
+    return restyle_pathway_json(
+        payload,
+        negative_color=color_override.get("negative_color"),
+        positive_color=color_override.get("positive_color"),
+        max_negative=color_override.get("max_negative"),
+        max_positive=color_override.get("max_positive"),
+        copy=as_copy,
+    )
 
 
 def _hex_to_rgb(value: str, fallback: Tuple[int, int, int]) -> Tuple[int, int, int]:
@@ -948,6 +924,14 @@ def _to_float(value: Any, fallback: float) -> float:
         return fallback
 
 
+def _finite_or_none(value: Any) -> Optional[float]:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
 def _to_bool(value: Any, fallback: bool) -> bool:
     if value in (None, ""):
         return fallback
@@ -1117,6 +1101,10 @@ def _empty_ks_index() -> Dict[str, Any]:
         "ptms_by_uniprot": {},
         "ptm_headers": [],
         "prot_gene_map": {},
+        "overlap": None,
+        "site_values": {},
+        "ptm_data": None,
+        "ptm_frame": None,
     }
 
 
@@ -1156,33 +1144,6 @@ def _compute_ptm_position(
     return positions.get(pos_key, (x, y))
 
 
-def _gradient_color_from_fold(
-    fold_value: Any,
-    negative_color: Sequence[float],
-    positive_color: Sequence[float],
-    max_negative: float,
-    max_positive: float,
-) -> List[int]:
-    try:
-        if fold_value in (None, "", False):
-            return [128, 128, 128]
-        fold = float(fold_value)
-    except (TypeError, ValueError):
-        return [128, 128, 128]
-    if not math.isfinite(fold):
-        return [128, 128, 128]
-    neg = [int(v) for v in negative_color][:3]
-    pos = [int(v) for v in positive_color][:3]
-    neg_limit = abs(max_negative) if max_negative else 1.0
-    pos_limit = max_positive if max_positive else 1.0
-    pos_limit = pos_limit if pos_limit != 0 else 1.0
-    white = (255, 255, 255)
-    if fold < 0:
-        t = min(abs(fold) / neg_limit, 1.0)
-        return [int((1 - t) * white[i] + t * neg[i]) for i in range(3)]
-    t = min(fold / pos_limit, 1.0)
-    return [int((1 - t) * white[i] + t * pos[i]) for i in range(3)]
-
 def _normalize_fc_suffix(header: str) -> str:
     value = str(header or "").strip()
     if ":" in value:
@@ -3465,7 +3426,7 @@ def _home_tab() -> ui.nav_panel:
                         "Protein file core columns: UniProt, GeneSymbol, and one or more comparison columns beginning with C:.",
                         "PTM file core columns: UniProt, PTM Site, and comparison columns that match the protein comparison headers exactly.",
                         "Optional text columns begin with T:, and optional outline columns begin with O: and should match the related comparison names.",
-                        "Accepted upload types: .txt, .tsv, and .csv.",
+                        "Accepted upload types: .txt, .tsv, .csv, .parquet, .feather, and .arrow.",
                     ],
                 ),
             ),
@@ -3934,10 +3895,10 @@ def server(input, output, session):  # type: ignore[override]
     protein_preview_dataset = reactive.Value(None)
     ptm_preview_dataset = reactive.Value(None)
     global_catalog_info = reactive.Value(dict(GLOBAL_CATALOG_INFO))
+    catalog_session_id = getattr(session, "id", None) or id(session)
+    session.on_ended(lambda: SESSION_CATALOGS.release(catalog_session_id))
     protein_dataset_path = reactive.Value(None)
     ptm_dataset_path = reactive.Value(None)
-    psp_cache: Dict[str, Any] = {}
-    kegg_cache: Dict[str, Dict[str, str]] = {}
     protein_kegg_warning = reactive.Value("")
     ks_index = reactive.Value(_empty_ks_index())
     pathway_score_cache = reactive.Value(
@@ -3978,67 +3939,9 @@ def server(input, output, session):  # type: ignore[override]
     def _mark_pathway_scores_pending(status: str = "Run Fisher's Exact Test to score pathways.") -> None:
         _clear_pathway_scores(status)
 
-    def _dataset_to_df(dataset: Optional[Dict[str, Any]]) -> pd.DataFrame:
-        if not dataset:
-            return pd.DataFrame()
-        headers = list(dataset.get("headers") or [])
-        rows = list(dataset.get("rows") or [])
-        if not headers:
-            return pd.DataFrame()
-        if not rows:
-            return pd.DataFrame(columns=headers)
-        normalized_rows: List[List[str]] = []
-        width = len(headers)
-        for row in rows:
-            vals = list(row)
-            if len(vals) < width:
-                vals.extend([""] * (width - len(vals)))
-            elif len(vals) > width:
-                vals = vals[:width]
-            normalized_rows.append(vals)
-        return pd.DataFrame(normalized_rows, columns=headers, dtype=str)
-
-    def _fisher_right_tail(total_n: int, pathway_n: int, sig_n: int, sig_in_pathway: int) -> float:
-        if total_n <= 0 or pathway_n < 0 or sig_n < 0 or sig_in_pathway < 0:
-            return 1.0
-        if pathway_n > total_n or sig_n > total_n:
-            return 1.0
-        max_hits = min(pathway_n, sig_n)
-        if sig_in_pathway > max_hits:
-            return 1.0
-        min_hits = max(0, pathway_n - (total_n - sig_n))
-        if sig_in_pathway < min_hits:
-            return 1.0
-
-        def _log_choose(n: int, k: int) -> float:
-            if k < 0 or k > n:
-                return float("-inf")
-            return math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1)
-
-        denom = _log_choose(total_n, pathway_n)
-        if not math.isfinite(denom):
-            return 1.0
-        p_val = 0.0
-        for hit_count in range(sig_in_pathway, max_hits + 1):
-            log_prob = _log_choose(sig_n, hit_count) + _log_choose(total_n - sig_n, pathway_n - hit_count) - denom
-            if math.isfinite(log_prob):
-                p_val += math.exp(log_prob)
-        return min(max(p_val, 0.0), 1.0)
-
-    def _benjamini_hochberg(values: List[Optional[float]]) -> List[Optional[float]]:
-        indexed = [(idx, float(val)) for idx, val in enumerate(values) if val is not None and math.isfinite(float(val))]
-        if not indexed:
-            return [None] * len(values)
-        indexed.sort(key=lambda item: item[1])
-        adjusted: List[Optional[float]] = [None] * len(values)
-        total = len(indexed)
-        running = 1.0
-        for rev_rank, (original_idx, p_val) in enumerate(reversed(indexed), start=1):
-            rank = total - rev_rank + 1
-            bh_val = min(running, (p_val * total) / rank)
-            running = bh_val
-            adjusted[original_idx] = min(max(bh_val, 0.0), 1.0)
-        return adjusted
+    def _dataset_to_df(dataset: Optional[Dict[str, Any]], kind: str = "") -> pd.DataFrame:
+        # Typed frame (float64 C:/O: columns, categorical IDs), shared with the parsed upload.
+        return dataset_frame(dataset, kind)
 
     def _coerce_numeric_series(series: pd.Series) -> pd.Series:
         return pd.to_numeric(series.astype(str).str.strip(), errors="coerce")
@@ -4056,117 +3959,121 @@ def server(input, output, session):  # type: ignore[override]
             return series <= negative_cutoff
         return (series >= positive_cutoff) | (series <= negative_cutoff)
 
-    def _pathway_uniprots(pathway: Dict[str, Any], index_nodes: Dict[str, Dict[str, Any]], gene_to_uniprot: Dict[str, List[str]]) -> set[str]:
-        pathway_uniprots: set[str] = set()
-        for node_id in list(pathway.get("nodes", [])):
-            node_obj = index_nodes.get(str(node_id), {})
-            for uni in candidate_uniprots_for_node(node_obj, gene_to_uniprot):
-                normalized = normalize_uniprot(uni)
-                if normalized:
-                    pathway_uniprots.add(normalized)
-        return pathway_uniprots
-
     def _compute_fisher_pathway_rows(
         prot_df: pd.DataFrame,
         site_df: Optional[pd.DataFrame],
-        fc_col: str,
+        fc_cols: List[str],
         positive_cutoff: float,
         negative_cutoff: float,
         significance_mode: str,
-        index_sources: List[Tuple[str, Dict[str, Any], str]],
-        gene_map: Dict[str, List[str]],
-        site_fc_col: Optional[str] = None,
-    ) -> Tuple[Dict[str, Dict[str, Dict[str, Any]]], List[Dict[str, Any]]]:
-        protein_rows = prot_df.copy()
-        protein_id_col = protein_rows.columns[0]
-        protein_rows["_uniprot"] = protein_rows[protein_id_col].map(normalize_uniprot)
-        protein_rows = protein_rows[protein_rows["_uniprot"] != ""].copy()
-        protein_rows["_fc"] = _coerce_numeric_series(protein_rows[fc_col])
-        protein_rows["_significant"] = _fisher_significance_mask(
-            protein_rows["_fc"],
-            positive_cutoff,
-            negative_cutoff,
-            significance_mode,
-        )
-        protein_rows = protein_rows.drop_duplicates(subset=["_uniprot"], keep="first")
-
+        incidences: List[Tuple[str, PathwayIncidence]],
+    ) -> Tuple[Dict[str, Dict[str, Dict[str, Dict[str, Any]]]], Dict[str, List[Dict[str, Any]]]]:
+        """Fisher rows for every comparison column and pathway source.
+
+        Returns ``{fc_col: {source: {pathway_id: row}}}`` and ``{fc_col: [rows]}``. Proteins are
+        the first row per UniProt; sites count against their parent UniProt (and are never
+        significant for a column the PTM upload lacks). All overlap counts come from one
+        sparse product per source; p-values are computed for every pathway and column at
+        once, and their Benjamini-Hochberg q-values across all sources, pathways and columns.
+        """
+        prot_uniprots = prot_df[prot_df.columns[0]].map(normalize_uniprot)
+        first_rows = ((prot_uniprots != "") & ~prot_uniprots.duplicated(keep="first")).to_numpy()
+        protein_rows = prot_df.loc[first_rows]
+        protein_uniprots = prot_uniprots[first_rows].tolist()
         total_proteins = int(len(protein_rows))
-        significant_proteins = int(protein_rows["_significant"].sum()) if total_proteins else 0
-        protein_uniprots = set(protein_rows["_uniprot"].tolist())
-        significant_protein_uniprots = set(protein_rows.loc[protein_rows["_significant"], "_uniprot"].tolist())
-
-        site_rows = pd.DataFrame()
-        total_sites = 0
-        significant_sites = 0
+        prot_sig = np.zeros((total_proteins, len(fc_cols)), dtype=bool)
+        for pos, fc_col in enumerate(fc_cols):
+            prot_sig[:, pos] = _fisher_significance_mask(
+                _coerce_numeric_series(protein_rows[fc_col]),
+                positive_cutoff,
+                negative_cutoff,
+                significance_mode,
+            ).to_numpy(dtype=bool)
+        significant_proteins = prot_sig.sum(axis=0).astype(int)
+
+        site_uniprots: List[str] = []
+        site_sig = np.zeros((0, len(fc_cols)), dtype=bool)
         if site_df is not None and not site_df.empty:
-            site_rows = site_df.copy()
-            site_uniprot_col = site_rows.columns[0]
-            site_rows["_parent_uniprot"] = site_rows[site_uniprot_col].map(normalize_uniprot)
-            site_rows = site_rows[site_rows["_parent_uniprot"] != ""].copy()
-            active_site_fc_col = site_fc_col if site_fc_col and site_fc_col in site_rows.columns else None
-            if active_site_fc_col:
-                site_rows["_fc"] = _coerce_numeric_series(site_rows[active_site_fc_col])
-                site_rows["_significant"] = _fisher_significance_mask(
-                    site_rows["_fc"],
-                    positive_cutoff,
-                    negative_cutoff,
-                    significance_mode,
-                )
-            else:
-                site_rows["_significant"] = False
-            total_sites = int(len(site_rows))
-            significant_sites = int(site_rows["_significant"].sum()) if total_sites else 0
-
-        combined_rows: List[Dict[str, Any]] = []
-        nested_rows: Dict[str, Dict[str, Dict[str, Any]]] = {}
-        for source_key, source_index, _source_file in index_sources:
-            source_rows: Dict[str, Dict[str, Any]] = {}
-            for pathway in list(source_index.get("pathways", [])):
-                pathway_id = str(pathway.get("pathway_id", "")).strip().lower()
-                if not pathway_id:
-                    continue
-                pathway_name = str(pathway.get("name") or pathway_id).strip()
-                pathway_uniprots = _pathway_uniprots(pathway, source_index.get("nodes", {}), gene_map)
-                proteins_in_dataset = protein_uniprots & pathway_uniprots
-                sig_proteins_in_path = significant_protein_uniprots & pathway_uniprots
-                pathway_protein_total = len(proteins_in_dataset)
-                sig_protein_in_pathway = len(sig_proteins_in_path)
-                protein_p = _fisher_right_tail(total_proteins, pathway_protein_total, significant_proteins, sig_protein_in_pathway) if total_proteins else None
-
-                pathway_site_total = 0
-                sig_site_in_pathway = 0
-                site_p: Optional[float] = None
-                if total_sites and not site_rows.empty:
-                    in_path_mask = site_rows["_parent_uniprot"].isin(pathway_uniprots)
-                    pathway_site_total = int(in_path_mask.sum())
-                    if pathway_site_total:
-                        sig_site_in_pathway = int((site_rows["_significant"] & in_path_mask).sum())
-                    site_p = _fisher_right_tail(total_sites, pathway_site_total, significant_sites, sig_site_in_pathway)
-
-                row = {
-                    "pathway_source": source_key,
-                    "pathway_id": pathway_id,
-                    "name": pathway_name,
-                    "prot_dataset_total": total_proteins,
-                    "prot_pathway_total": pathway_protein_total,
-                    "prot_significant_total": significant_proteins,
-                    "prot_significant_in_pathway": sig_protein_in_pathway,
-                    "prot_fisher_p": protein_p,
-                    "phos_dataset_total": total_sites,
-                    "phos_pathway_total": pathway_site_total,
-                    "phos_significant_total": significant_sites,
-                    "phos_significant_in_pathway": sig_site_in_pathway,
-                    "phos_fisher_p": site_p,
-                    "positive_cutoff": positive_cutoff,
-                    "negative_cutoff": negative_cutoff,
-                    "significance_mode": significance_mode,
-                    "comparison_column": fc_col,
-                }
-                combined_rows.append(row)
-                source_rows[pathway_id] = row
-            nested_rows[source_key] = source_rows
+            parent_uniprots = site_df[site_df.columns[0]].map(normalize_uniprot)
+            site_keep = (parent_uniprots != "").to_numpy()
+            site_rows = site_df.loc[site_keep]
+            site_uniprots = parent_uniprots[site_keep].tolist()
+            site_sig = np.zeros((len(site_uniprots), len(fc_cols)), dtype=bool)
+            for pos, fc_col in enumerate(fc_cols):
+                if fc_col in site_rows.columns:
+                    site_sig[:, pos] = _fisher_significance_mask(
+                        _coerce_numeric_series(site_rows[fc_col]),
+                        positive_cutoff,
+                        negative_cutoff,
+                        significance_mode,
+                    ).to_numpy(dtype=bool)
+        total_sites = len(site_uniprots)
+        significant_sites = site_sig.sum(axis=0).astype(int)
+
+        # Proteins then sites as rows; columns: protein present, protein significant per
+        # comparison, site present, site significant per comparison.
+        n_cols = len(fc_cols)
+        indicators = np.zeros((total_proteins + total_sites, 2 * n_cols + 2))
+        indicators[:total_proteins, 0] = 1.0
+        indicators[:total_proteins, 1:n_cols + 1] = prot_sig
+        indicators[total_proteins:, n_cols + 1] = 1.0
+        indicators[total_proteins:, n_cols + 2:] = site_sig
+
+        source_counts: List[np.ndarray] = []
+        for _source_key, incidence in incidences:
+            codes = incidence.uniprot_codes(protein_uniprots + site_uniprots)
+            source_counts.append(
+                incidence.overlap_counts(codes, indicators).round().astype(np.int64).reshape(len(incidence.pathway_ids), -1)
+            )
+        counts_all = np.vstack(source_counts) if source_counts else np.zeros((0, 2 * n_cols + 2), dtype=np.int64)
+        prot_pathway = counts_all[:, [0]]
+        prot_hits = counts_all[:, 1:n_cols + 1]
+        site_pathway = counts_all[:, [n_cols + 1]]
+        site_hits = counts_all[:, n_cols + 2:]
+        prot_p = np.full(prot_hits.shape, np.nan)
+        site_p = np.full(site_hits.shape, np.nan)
+        if total_proteins:
+            prot_p = hypergeometric_right_tail(total_proteins, prot_pathway, significant_proteins[None, :], prot_hits)
+        if total_sites:
+            site_p = hypergeometric_right_tail(total_sites, site_pathway, significant_sites[None, :], site_hits)
+        prot_q = benjamini_hochberg(prot_p)
+        site_q = benjamini_hochberg(site_p)
+
+        results_by_fc: Dict[str, Dict[str, Dict[str, Dict[str, Any]]]] = {fc_col: {} for fc_col in fc_cols}
+        rows_by_fc: Dict[str, List[Dict[str, Any]]] = {fc_col: [] for fc_col in fc_cols}
+        offset = 0
+        for source_key, incidence in incidences:
+            for pos, fc_col in enumerate(fc_cols):
+                source_rows: Dict[str, Dict[str, Any]] = {}
+                for path_idx, (pathway_id, pathway_name) in enumerate(zip(incidence.pathway_ids, incidence.names)):
+                    at = offset + path_idx
+                    row = {
+                        "pathway_source": source_key,
+                        "pathway_id": pathway_id,
+                        "name": pathway_name,
+                        "prot_dataset_total": total_proteins,
+                        "prot_pathway_total": int(prot_pathway[at, 0]),
+                        "prot_significant_total": int(significant_proteins[pos]),
+                        "prot_significant_in_pathway": int(prot_hits[at, pos]),
+                        "prot_fisher_p": _finite_or_none(prot_p[at, pos]),
+                        "prot_fisher_q": _finite_or_none(prot_q[at, pos]),
+                        "phos_dataset_total": total_sites,
+                        "phos_pathway_total": int(site_pathway[at, 0]),
+                        "phos_significant_total": int(significant_sites[pos]),
+                        "phos_significant_in_pathway": int(site_hits[at, pos]),
+                        "phos_fisher_p": _finite_or_none(site_p[at, pos]),
+                        "phos_fisher_q": _finite_or_none(site_q[at, pos]),
+                        "positive_cutoff": positive_cutoff,
+                        "negative_cutoff": negative_cutoff,
+                        "significance_mode": significance_mode,
+                        "comparison_column": fc_col,
+                    }
+                    rows_by_fc[fc_col].append(row)
+                    source_rows[pathway_id] = row
+                results_by_fc[fc_col][source_key] = source_rows
+            offset += len(incidence.pathway_ids)
 
-        return nested_rows, combined_rows
+        return results_by_fc, rows_by_fc
 
     def _resolve_kegg_index_file_for_species(species_code: str) -> str:
         code = (species_code or "").strip().lower()
@@ -4256,8 +4163,8 @@ def server(input, output, session):  # type: ignore[override]
             _clear_pathway_scores(f"No pathway index files found for species '{species_code}' in index_files.")
             return
 
-        prot_df = _dataset_to_df(protein_data)
-        site_df = _dataset_to_df(ptm_data) if ptm_data else None
+        prot_df = _dataset_to_df(protein_data, "protein")
+        site_df = _dataset_to_df(ptm_data, "ptm") if ptm_data else None
         if prot_df.empty:
             _clear_pathway_scores("Protein dataset is empty after parsing; pathway scoring skipped.")
             return
@@ -4274,32 +4181,21 @@ def server(input, output, session):  # type: ignore[override]
 
         try:
             gene_map_file = _resolve_gene_to_uniprot_file_for_species(species_code)
-            gene_map = build_gene_to_uniprot_map(Path(gene_map_file)) if gene_map_file else {}
-            index_sources: List[Tuple[str, Dict[str, Any], str]] = []
+            incidences: List[Tuple[str, PathwayIncidence]] = []
             if kegg_index_file:
-                index_sources.append(("kegg", load_kegg_index(Path(kegg_index_file)), kegg_index_file))
+                incidences.append(("kegg", load_pathway_incidence(kegg_index_file, gene_map_file)))
             if wikipathways_index_file:
-                index_sources.append(("wikipathways", load_kegg_index(Path(wikipathways_index_file)), wikipathways_index_file))
-
-            results_by_fc: Dict[str, Dict[str, Dict[str, Dict[str, Any]]]] = {}
-            download_rows_by_fc: Dict[str, List[Dict[str, Any]]] = {}
-            site_headers = list(site_df.columns) if site_df is not None and not site_df.empty else []
-
-            for fc_col in ordered_fc_cols:
-                site_fc_col = fc_col if site_df is not None and fc_col in site_headers else None
-                source_maps, flat_rows = _compute_fisher_pathway_rows(
-                    prot_df=prot_df,
-                    site_df=site_df,
-                    fc_col=fc_col,
-                    positive_cutoff=positive_cutoff,
-                    negative_cutoff=negative_cutoff,
-                    significance_mode=significance_mode,
-                    index_sources=index_sources,
-                    gene_map=gene_map,
-                    site_fc_col=site_fc_col,
-                )
-                results_by_fc[fc_col] = source_maps
-                download_rows_by_fc[fc_col] = flat_rows
+                incidences.append(("wikipathways", load_pathway_incidence(wikipathways_index_file, gene_map_file)))
+
+            results_by_fc, download_rows_by_fc = _compute_fisher_pathway_rows(
+                prot_df=prot_df,
+                site_df=site_df,
+                fc_cols=ordered_fc_cols,
+                positive_cutoff=positive_cutoff,
+                negative_cutoff=negative_cutoff,
+                significance_mode=significance_mode,
+                incidences=incidences,
+            )
 
             index_files_obj: Dict[str, str] = {}
             if kegg_index_file:
@@ -4373,30 +4269,6 @@ def server(input, output, session):  # type: ignore[override]
         finally:
             state["export_pending"].set(False)
 
-    def _detect_delimiter(path: str) -> str:
-        ext = os.path.splitext(path)[1].lower()
-        return "," if ext == ".csv" else "\t"
-
-    def _load_dataset(path: str) -> Dict[str, Any]:
-        delimiter = _detect_delimiter(path)
-        try:
-            with open(path, "r", encoding="utf-8", errors="replace") as fh:
-                raw_lines = fh.read().splitlines()
-            reader = csv.reader(raw_lines, delimiter=delimiter)
-            parsed = list(reader)
-            if not parsed:
-                return {"error": "No rows parsed from file."}
-            headers = []
-            for idx, h in enumerate(parsed[0]):
-                cleaned = h or ""
-                if idx == 0:
-                    cleaned = cleaned.lstrip("\ufeff")
-                headers.append(cleaned.strip())
-            rows = parsed[1:]
-            return {"headers": headers, "rows": rows}
-        except Exception as exc:
-            return {"error": f"Debug load failed: {exc}"}
-
     def _get_input_preview_content(
         dataset: Optional[Dict[str, Any]],
         fallback_headers: List[str],
@@ -4601,12 +4473,14 @@ def server(input, output, session):  # type: ignore[override]
 
     def _refresh_global_catalog_from_current(reset: bool = False) -> None:
         if reset:
+            SESSION_CATALOGS.release(catalog_session_id)
             info = dict(GLOBAL_CATALOG_INFO)
             global_catalog_info.set(info)
             _sync_catalog_into_open_payloads(info)
             return
         data_override = collect_data_override()
         if not data_override:
+            SESSION_CATALOGS.release(catalog_session_id)
             info = dict(GLOBAL_CATALOG_INFO)
             global_catalog_info.set(info)
             _sync_catalog_into_open_payloads(info)
@@ -4624,25 +4498,18 @@ def server(input, output, session):  # type: ignore[override]
             "hsa_id_column": protein_cfg.get("kegg_column", protein_cfg.get("uniprot_column", "Uniprot_ID")),
         }
         try:
-            info = ensure_global_protein_catalog(
-                force=True,
+            info = SESSION_CATALOGS.acquire(
+                catalog_session_id,
                 data_override=data_override,
                 settings_override=settings_override,
             )
         except Exception as exc:
             print(f"Warning: failed to refresh global protein catalog: {exc}")
             return
-        path = info.get("path")
-        if path and os.path.exists(path):
-            try:
-                with open(path, "r", encoding="utf-8") as fh:
-                    payload = json.load(fh)
-                protein_catalog = payload.get("protein_catalog")
-                if isinstance(protein_catalog, dict):
-                    info = dict(info)
-                    info["protein_catalog"] = protein_catalog
-            except Exception as exc:
-                print(f"Warning: failed to hydrate refreshed global protein catalog: {exc}")
+        with reactive.isolate():
+            previous = global_catalog_info.get() or {}
+        if previous.get("catalog_key") == info.get("catalog_key"):
+            return
         global_catalog_info.set(dict(info))
         _sync_catalog_into_open_payloads(dict(info))
 
@@ -4652,20 +4519,18 @@ def server(input, output, session):  # type: ignore[override]
                 info = global_catalog_info.get()
         except RuntimeError:
             info = None
-        info_dict = dict(info or GLOBAL_CATALOG_INFO)
-        if info_dict.get("protein_catalog"):
-            return info_dict
-        path = info_dict.get("path")
-        if path and os.path.exists(path):
-            try:
-                with open(path, "r", encoding="utf-8") as fh:
-                    payload = json.load(fh)
-                protein_catalog = payload.get("protein_catalog")
-                if isinstance(protein_catalog, dict):
-                    info_dict["protein_catalog"] = protein_catalog
-            except Exception as exc:
-                print(f"Warning: failed to load global protein catalog from {path}: {exc}")
-        return info_dict
+        return dict(info or GLOBAL_CATALOG_INFO)
+
+    @reactive.Effect
+    @reactive.event(input.catalog_record_request)
+    def _handle_catalog_record_request():
+        request = _get_input_value(input, "catalog_record_request") or {}
+        uniprots = [str(uid) for uid in (request.get("uniprots") or []) if uid]
+        if not uniprots:
+            return
+        # The viewer sends its pathway's colour settings so records match the canvas colours.
+        records = get_catalog_records(_current_global_catalog_info(), uniprots, request.get("colors") or None)
+        _send_custom_message(session, "catalog_records", {"uniprots": uniprots, "records": records})
 
     @reactive.Effect
     @reactive.event(input.export_snapshot)
@@ -4741,73 +4606,101 @@ def server(input, output, session):  # type: ignore[override]
         vitro_col = "PSP: uniprot_in_vitro_kinases"
         if vivo_col not in idx_map and vitro_col not in idx_map:
             return _empty_ks_index()
+        # IDs come from the typed upload frames. The annotation columns (kinase lists,
+        # PSP: regulatory_site) and the raw cells the KS canvas shows in tooltips only
+        # exist in the annotated rows, so the fallback parse and the row maps read those.
         prot_gene_map: Dict[str, str] = {}
-        if prot_data:
-            prot_headers = prot_data.get("headers") or []
-            if len(prot_headers) >= 2:
-                for row in prot_data.get("rows") or []:
-                    uid = (row[0] if len(row) > 0 else "").strip()
-                    gene = (row[1] if len(row) > 1 else "").strip()
-                    if uid:
-                        prot_gene_map[uid] = gene or uid
-        kinases: Dict[str, Dict[str, Any]] = {}
-        substrates: Dict[str, Dict[str, Any]] = {}
-        ptms_by_uniprot: Dict[str, List[Dict[str, Any]]] = {}
+        prot_frame = _dataset_to_df(prot_data, "protein") if prot_data else pd.DataFrame()
+        if prot_frame.shape[1] >= 2:
+            for uid, gene in zip(
+                prot_frame.iloc[:, 0].astype(str).str.strip().tolist(),
+                prot_frame.iloc[:, 1].astype(str).str.strip().tolist(),
+            ):
+                if uid:
+                    prot_gene_map[uid] = gene or uid
         ptm_rows = ptm_data.get("rows") or []
-        for row in ptm_rows:
+        ptm_frame = _dataset_to_df(ptm_data, "ptm")
+        if len(ptm_frame) != len(ptm_rows):
+            ptm_frame = typed_frame(headers, ptm_rows)
+
+        def _cell(row: Sequence[Any], idx: int) -> Any:
+            return row[idx] if idx < len(row) else ""
+
+        def _row_map(row: Sequence[Any]) -> Dict[str, Any]:
             row_vals = list(row)
-            row_map = {h: (row_vals[idx] if idx < len(row_vals) else "") for h, idx in idx_map.items()}
-            uniprot = str(row_map.get(headers[0], "") or "").strip()
-            site = str(row_map.get(headers[1], "") or "").strip()
-            site_label = _clean_site_label(site)
-            if not uniprot:
-                continue
-            sub_key = f"{uniprot}:{site}" if site else uniprot
-            ptms_by_uniprot.setdefault(uniprot, []).append(row_map)
-            vivo_ids = _split_multi_ids(row_map.get(vivo_col, ""))
-            vitro_ids = _split_multi_ids(row_map.get(vitro_col, ""))
-            if not (vivo_ids or vitro_ids):
-                continue
-            sub_entry = substrates.setdefault(
-                sub_key,
-                {
-                    "uniprot": uniprot,
-                    "site": site,
-                    "site_label": site_label,
-                    "types": set(),
-                    "gene": prot_gene_map.get(uniprot, uniprot),
-                    "kinases": {},
-                    "row": row_map,
-                },
-            )
-            if vivo_ids:
-                sub_entry["types"].add("in_vivo")
-            if vitro_ids:
-                sub_entry["types"].add("in_vitro")
-            for kin_id in vivo_ids:
-                kin_entry = kinases.setdefault(
-                    kin_id,
-                    {"types": set(), "gene": prot_gene_map.get(kin_id, kin_id), "substrates": set()},
-                )
-                kin_entry["types"].add("in_vivo")
-                kin_entry["substrates"].add(sub_key)
-                rel = sub_entry["kinases"].setdefault(kin_id, {"types": set()})
-                rel["types"].add("in_vivo")
-            for kin_id in vitro_ids:
-                kin_entry = kinases.setdefault(
-                    kin_id,
-                    {"types": set(), "gene": prot_gene_map.get(kin_id, kin_id), "substrates": set()},
-                )
-                kin_entry["types"].add("in_vitro")
-                kin_entry["substrates"].add(sub_key)
-                rel = sub_entry["kinases"].setdefault(kin_id, {"types": set()})
-                rel["types"].add("in_vitro")
+            return {h: (row_vals[idx] if idx < len(row_vals) else "") for h, idx in idx_map.items()}
+
+        uniprots = ptm_frame.iloc[:, 0].astype(str).str.strip().tolist()
+        sites = ptm_frame.iloc[:, 1].astype(str).str.strip().tolist()
+        species = ptm_data.get("psp_species")
+        matrix = ANNOTATIONS.kinase_site_matrix(species) if species else None
+        if matrix is not None:
+            # The kinases the annotation columns list, gathered from the shared kinase x site matrix.
+            edge_rows, kin_codes, edge_evidence = matrix.overlap(uniprots, sites)
+            edge_kinases = matrix.kinases[kin_codes].tolist()
+        else:
+            edge_row_list: List[int] = []
+            edge_kinases = []
+            edge_bits: List[int] = []
+            kinase_cols = [(idx_map.get(vivo_col), IN_VIVO), (idx_map.get(vitro_col), IN_VITRO)]
+            for pos, row in enumerate(ptm_rows):
+                for col_idx, bit in kinase_cols:
+                    if col_idx is None:
+                        continue
+                    for kin_id in _split_multi_ids(_cell(row, col_idx)):
+                        edge_row_list.append(pos)
+                        edge_kinases.append(kin_id)
+                        edge_bits.append(bit)
+            edge_rows = np.asarray(edge_row_list, dtype=np.int64)
+            edge_evidence = np.asarray(edge_bits, dtype=np.uint8)
+        keep = np.asarray([bool(uniprots[pos]) for pos in edge_rows.tolist()], dtype=bool)
+        edge_rows, edge_evidence = edge_rows[keep], edge_evidence[keep]
+        edge_kinases = [kin_id for kin_id, kept in zip(edge_kinases, keep.tolist()) if kept]
+        edge_subs = [
+            f"{uniprots[pos]}:{sites[pos]}" if sites[pos] else uniprots[pos] for pos in edge_rows.tolist()
+        ]
+        overlap = KinaseSiteOverlap.from_edges(edge_rows, edge_subs, edge_kinases, edge_evidence)
+
+        kinases: Dict[str, Dict[str, Any]] = {
+            kin_id: {"types": set(), "gene": prot_gene_map.get(kin_id, kin_id), "substrates": set()}
+            for kin_id in overlap.kinase_ids
+        }
+        substrates: Dict[str, Dict[str, Any]] = {}
+        for sub_key, pos in zip(overlap.substrate_keys, overlap.substrate_rows.tolist()):
+            substrates[sub_key] = {
+                "uniprot": uniprots[pos],
+                "site": sites[pos],
+                "site_label": _clean_site_label(sites[pos]),
+                "types": set(),
+                "gene": prot_gene_map.get(uniprots[pos], uniprots[pos]),
+                "kinases": {},
+                "row": _row_map(ptm_rows[pos]),
+            }
+        for sub_code, kin_code, bits in zip(
+            overlap.pair_substrates.tolist(), overlap.pair_kinases.tolist(), overlap.pair_evidence.tolist()
+        ):
+            sub_key = overlap.substrate_keys[sub_code]
+            kin_id = overlap.kinase_ids[kin_code]
+            types = evidence_types(bits)
+            kinases[kin_id]["types"].update(types)
+            kinases[kin_id]["substrates"].add(sub_key)
+            substrates[sub_key]["types"].update(types)
+            substrates[sub_key]["kinases"][kin_id] = {"types": set(types)}
+        # PTM rows are only looked up for kinases (to draw their own sites).
+        ptms_by_uniprot: Dict[str, List[Dict[str, Any]]] = {}
+        for uniprot, row in zip(uniprots, ptm_rows):
+            if uniprot in kinases:
+                ptms_by_uniprot.setdefault(uniprot, []).append(_row_map(row))
         return {
             "kinases": kinases,
             "substrates": substrates,
             "ptms_by_uniprot": ptms_by_uniprot,
             "ptm_headers": headers,
             "prot_gene_map": prot_gene_map,
+            "overlap": overlap,
+            "site_values": {},
+            "ptm_data": ptm_data,
+            "ptm_frame": ptm_frame,
         }
 
     def _update_ks_index(reset: bool = False):
@@ -4817,25 +4710,41 @@ def server(input, output, session):  # type: ignore[override]
         with reactive.isolate():
             ptm_data = ptm_dataset.get()
             prot_data = protein_dataset.get()
-        ks_index.set(_build_ks_index(ptm_data, prot_data))
+        index = _build_ks_index(ptm_data, prot_data)
+        ks_index.set(index)
+        # Score the default (in vivo) evidence filter on a worker thread so the flush is not held up;
+        # the KS bookmark then opens on cached results, or waits for this run if it is still going.
+        threading.Thread(target=_ks_activity, args=(index, IN_VIVO), name="ks-activity", daemon=True).start()
+
+    def _ks_activity(ks_data: Dict[str, Any], mask: int):
+        """Kinase activity scores for the indexed upload and evidence mask (cached per dataset), or None."""
+        overlap = ks_data.get("overlap")
+        ptm_data = ks_data.get("ptm_data")
+        if overlap is None or not ptm_data or not len(overlap.pair_kinases):
+            return None
+        try:
+            return score_kinase_activity(
+                overlap,
+                ptm_data,
+                mask,
+                execution_mode=DEFAULT_SETTINGS.get("ks_activity_execution_mode", "serial"),
+            )
+        except Exception as exc:
+            print(f"Warning: kinase activity scoring failed: {exc}")
+            return None
+
+    # Annotation tables are shared by all sessions through the process-wide registry.
+    def _get_psp_map(species: str):
+        return ANNOTATIONS.regulatory_sites(species) or {}
 
-    def _get_psp_map():
-        cached = psp_cache.get("data")
-        if not cached:
-            psp_cache["data"] = load_regulatory_sites(BASE_DIR)
-        return psp_cache.get("data") or {}
+    def _get_psp_ks_map(species: str):
+        return ANNOTATIONS.kinase_substrates(species) or {}
 
-    def _get_psp_ks_map():
-        cached = psp_cache.get("ks")
-        if not cached:
-            psp_cache["ks"] = load_kinase_substrate_map(BASE_DIR)
-        return psp_cache.get("ks") or {}
+    def _get_psp_modification_maps(species: str):
+        return ANNOTATIONS.modification_sites(species)
 
     def _get_kegg_map(species_code: str):
-        key = (species_code or "").strip().lower()
-        if key not in kegg_cache:
-            kegg_cache[key] = load_kegg_map(BASE_DIR, key)
-        return kegg_cache.get(key) or {}
+        return ANNOTATIONS.kegg_map(species_code) or {}
 
     def _send_custom_message_safe(msg_type: str, payload: Dict[str, Any]) -> None:
         try:
@@ -4865,7 +4774,8 @@ def server(input, output, session):  # type: ignore[override]
             return
 
         try:
-            prot_result = validate_protein_file(SAMPLE_PROTEIN_FILE)
+            prot_loaded = load_protein_dataset(SAMPLE_PROTEIN_FILE)
+            prot_result = prot_loaded.validation
             if not prot_result.valid:
                 protein_validation.set({"status": "Demo protein file failed validation.", "errors": prot_result.errors, "valid": False, "comparisons": []})
                 ptm_validation.set({"status": "PTM upload disabled until demo protein is valid.", "errors": [], "valid": False})
@@ -4885,10 +4795,10 @@ def server(input, output, session):  # type: ignore[override]
             species_code = species_info.get("code", "") or SPECIES_CHOICES.get(DEFAULT_SPECIES, {}).get("code", "hsa")
             print(f"Demo mode: loading sample datasets for species '{species_choice}' code '{species_code}'")
 
-            demo_prot_payload = _load_dataset(SAMPLE_PROTEIN_FILE)
+            demo_prot_payload = prot_loaded.to_payload()
             protein_preview_dataset.set(demo_prot_payload)
             try:
-                demo_prot_payload = annotate_protein_with_kegg(demo_prot_payload, species_code, _get_kegg_map(species_code))
+                demo_prot_payload = annotate_protein_kegg(demo_prot_payload, _get_kegg_map(species_code))
             except Exception as exc:
                 print(f"Warning: demo protein KEGG annotation failed: {exc}")
             protein_dataset.set(demo_prot_payload)
@@ -4905,7 +4815,8 @@ def server(input, output, session):  # type: ignore[override]
             })
             _write_debug_dump("user_protein_dataset_debug.txt", demo_prot_payload)
 
-            ptm_result = validate_ptm_file(SAMPLE_PTM_FILE, prot_result.comparisons)
+            ptm_loaded = load_ptm_dataset(SAMPLE_PTM_FILE, prot_result.comparisons)
+            ptm_result = ptm_loaded.validation
             if not ptm_result.valid:
                 ptm_validation.set({"status": "Demo PTM file failed validation.", "errors": ptm_result.errors, "valid": False})
                 ptm_dataset.set(None)
@@ -4914,11 +4825,16 @@ def server(input, output, session):  # type: ignore[override]
                 _mark_pathway_scores_pending("Demo datasets changed. Run Fisher's Exact Test to score pathways.")
                 return
 
-            demo_ptm_payload = _load_dataset(SAMPLE_PTM_FILE)
+            demo_ptm_payload = ptm_loaded.to_payload()
             ptm_preview_dataset.set(demo_ptm_payload)
             try:
-                demo_ptm_payload = annotate_ptm_dataset(demo_ptm_payload, species_choice, _get_psp_map())
-                demo_ptm_payload = annotate_ptm_dataset_with_kinases(demo_ptm_payload, species_choice, _get_psp_ks_map())
+                demo_ptm_payload = annotate_ptm_sites(
+                    demo_ptm_payload,
+                    species_choice,
+                    _get_psp_map(species_choice),
+                    _get_psp_ks_map(species_choice),
+                    _get_psp_modification_maps(species_choice),
+                )
             except Exception as exc:
                 print(f"Warning: demo PTM annotation failed: {exc}")
             ptm_dataset.set(demo_ptm_payload)
@@ -5029,6 +4945,8 @@ def server(input, output, session):  # type: ignore[override]
                     "type": "Phosphorylation",
                     "data_headers": ptm_headers,
                     "data_rows": ptm_data.get("rows") or [],
+                    "dataframe": _dataset_to_df(ptm_data, "ptm"),
+                    "dataset_key": ptm_data.get("dataset_key") or "",
                     "uniprot_column": ptm_uniprot,
                     "site_column": ptm_site,
                     "shape": shape_choice,
@@ -5054,15 +4972,21 @@ def server(input, output, session):  # type: ignore[override]
                 "PSP: NOTES",
                 "PSP: in_vivo_kinases",
                 "PSP: in_vitro_kinases",
+                "PSP: acetylation_site",
+                "PSP: ubiquitination_site",
             ]
             for col in psp_cols:
                 if col in ptm_headers and col not in ptm_tooltips and col != modulation_col:
                     ptm_tooltips.append(col)
 
+        # m4 and the session catalog (built by m2 through m4's PathwayProcessor) read the typed
+        # frame of the upload; the KEGG/PSP columns added by annotation are appended to it as str.
         data_override = {
             "protein": {
                 "data_headers": prot_headers,
                 "data_rows": protein_data.get("rows") or [],
+                "dataframe": _dataset_to_df(protein_data, "protein"),
+                "dataset_key": protein_data.get("dataset_key") or "",
                 "file_path": protein_dataset_path.get() or "",
                 "uniprot_column": prot_uniprot,
                 "kegg_column": prot_kegg,
@@ -5078,9 +5002,25 @@ def server(input, output, session):  # type: ignore[override]
             entry["file_path"] = ptm_dataset_path.get() or ""
         return data_override
 
+    async def _load_upload_with_progress(loader, label: str, *args):
+        # Stream the file on a worker thread and mirror its progress in a notification bar.
+        state = {"fraction": 0.0, "rows": 0}
+
+        def report(fraction: float, rows: int) -> None:
+            state["fraction"] = fraction
+            state["rows"] = rows
+
+        with ui.Progress(min=0, max=1) as bar:
+            bar.set(0, message=f"Reading {label} file...")
+            task = asyncio.ensure_future(asyncio.to_thread(loader, *args, progress=report))
+            while not task.done():
+                await asyncio.wait({task}, timeout=0.25)
+                bar.set(state["fraction"], message=f"Validating {label} file...", detail=f"{state['rows']:,} rows read")
+            return task.result()
+
     @reactive.Effect
     @reactive.event(input.input_protein_upload)
-    def _process_protein_upload():
+    async def _process_protein_upload():
         if str((_get_input_value(input, "input_mode") or "user")).lower() == "demo":
             protein_validation.set({"status": "Demo mode uses bundled sample files; switch to User mode to upload.", "errors": [], "valid": False, "comparisons": []})
             protein_kegg_warning.set("")
@@ -5114,9 +5054,10 @@ def server(input, output, session):  # type: ignore[override]
             _update_ks_index(reset=True)
             _clear_pathway_scores("Pathway scoring waiting for valid protein upload.")
             return
-        result = validate_protein_file(datapath)
+        loaded = await _load_upload_with_progress(load_protein_dataset, "protein", datapath)
+        result = loaded.validation
         if not result.valid:
-            protein_preview_dataset.set(_load_dataset(datapath))
+            protein_preview_dataset.set(loaded.to_payload())
             protein_validation.set({"status": "Protein file failed validation. See errors below.", "errors": result.errors, "valid": False, "comparisons": []})
             ptm_validation.set({"status": "PTM upload optional. Provide after protein if available.", "errors": [], "valid": False})
             protein_dataset.set(None)
@@ -5134,13 +5075,13 @@ def server(input, output, session):  # type: ignore[override]
             f"Tooltip columns: {result.summary.get('tooltips', 0)}."
         )
         protein_validation.set({"status": status, "errors": [], "valid": True, "comparisons": result.comparisons})
-        dataset_payload = _load_dataset(datapath)
+        dataset_payload = loaded.to_payload()
         protein_preview_dataset.set(dataset_payload)
         species_key, species_info = _resolve_species(_get_input_value(input, "input_species"))
         species_code = species_info.get("code", "")
         try:
             kegg_map = _get_kegg_map(species_code)
-            dataset_payload = annotate_protein_with_kegg(dataset_payload, species_code, kegg_map)
+            dataset_payload = annotate_protein_kegg(dataset_payload, kegg_map)
             headers = dataset_payload.get("headers") or []
             kegg_idx = headers.index("KEGG_Gene_ID") if "KEGG_Gene_ID" in headers else -1
             kegg_matches = 0
@@ -5255,7 +5196,7 @@ def server(input, output, session):  # type: ignore[override]
 
     @reactive.Effect
     @reactive.event(input.input_ptm_upload)
-    def _process_ptm_upload():
+    async def _process_ptm_upload():
         if not protein_validation.get().get("valid"):
             ptm_validation.set({"status": "Upload a valid protein file first.", "errors": ["Protein file not validated yet."], "valid": False})
             _update_ks_index(reset=True)
@@ -5287,7 +5228,8 @@ def server(input, output, session):  # type: ignore[override]
             _mark_pathway_scores_pending("PTM dataset changed. Run Fisher's Exact Test to refresh pathway scores.")
             return
         protein_comparisons = protein_validation.get().get("comparisons") or []
-        result = validate_ptm_file(datapath, protein_comparisons)
+        loaded = await _load_upload_with_progress(load_ptm_dataset, "PTM", datapath, protein_comparisons)
+        result = loaded.validation
         if result.valid:
             status = (
                 f"PTM file valid. Rows: {result.summary.get('rows', 0)}, "
@@ -5295,12 +5237,17 @@ def server(input, output, session):  # type: ignore[override]
                 f"Tooltip columns: {result.summary.get('tooltips', 0)}."
             )
             ptm_validation.set({"status": status, "errors": [], "valid": True})
-            dataset_payload = _load_dataset(datapath)
+            dataset_payload = loaded.to_payload()
             ptm_preview_dataset.set(dataset_payload)
             try:
                 species_choice, _ = _resolve_species(_get_input_value(input, "input_species"))
-                dataset_payload = annotate_ptm_dataset(dataset_payload, species_choice, _get_psp_map())
-                dataset_payload = annotate_ptm_dataset_with_kinases(dataset_payload, species_choice, _get_psp_ks_map())
+                dataset_payload = annotate_ptm_sites(
+                    dataset_payload,
+                    species_choice,
+                    _get_psp_map(species_choice),
+                    _get_psp_ks_map(species_choice),
+                    _get_psp_modification_maps(species_choice),
+                )
             except Exception as exc:
                 print(f"Warning: PSP annotation failed: {exc}")
             ptm_dataset.set(dataset_payload)
@@ -5310,7 +5257,7 @@ def server(input, output, session):  # type: ignore[override]
             _update_ks_index()
             _mark_pathway_scores_pending("PTM dataset loaded. Run Fisher's Exact Test to refresh pathway scores.")
         else:
-            ptm_preview_dataset.set(_load_dataset(datapath))
+            ptm_preview_dataset.set(loaded.to_payload())
             ptm_validation.set({"status": "PTM file failed validation. See errors below.", "errors": result.errors, "valid": False})
             ptm_dataset.set(None)
             ptm_dataset_path.set(None)
@@ -5684,13 +5631,9 @@ def server(input, output, session):  # type: ignore[override]
         }
 
     def _apply_color_metadata(payload: Dict[str, Any], color_override: Dict[str, Any]) -> None:
-        general_settings = payload.setdefault("general_data", {}).setdefault("settings", {})
-        general_settings["negative_color"] = color_override["negative_color"]
-        general_settings["positive_color"] = color_override["positive_color"]
-        general_settings["max_negative"] = color_override["max_negative"]
-        general_settings["max_positive"] = color_override["max_positive"]
-        payload["_color_preview_override"] = color_override
+        # Writes the colour settings into general_data and recolours every fold change in place.
         _apply_color_overrides(payload, color_override)
+        payload["_color_preview_override"] = color_override
 
     def _register_bookmark(cfg: Dict[str, Any]) -> None:
         prefix = cfg["key"]
@@ -5882,6 +5825,46 @@ def server(input, output, session):  # type: ignore[override]
             payload["_global_protein_catalog"] = dict(catalog_info)
             return payload
 
+        def _float_or_none(raw: Any) -> Optional[float]:
+            try:
+                return float(raw)
+            except (TypeError, ValueError):
+                return None
+
+        def _fc_colors(
+            row_map: Dict[str, Any],
+            main_cols: List[str],
+            outline_cols: List[str],
+            settings_override: Dict[str, Any],
+        ) -> List[Tuple[Optional[float], List[int], Optional[float], List[int]]]:
+            """(fold change, fill colour, outline fold change, outline colour) per main column.
+
+            Fill and outline values are coloured together in one gradient pass; a missing
+            outline value gets a black outline.
+            """
+            gradient = get_gradient(
+                settings_override.get("negative_color", DEFAULT_SETTINGS["negative_color"]),
+                settings_override.get("positive_color", DEFAULT_SETTINGS["positive_color"]),
+                settings_override.get("max_negative", DEFAULT_SETTINGS["max_negative"]),
+                settings_override.get("max_positive", DEFAULT_SETTINGS["max_positive"]),
+            )
+            count = len(main_cols)
+            fc_vals = [_float_or_none(row_map.get(col, "")) for col in main_cols]
+            outline_vals = [
+                _float_or_none(row_map.get(outline_cols[pos], "")) if pos < len(outline_cols) and outline_cols[pos] else None
+                for pos in range(count)
+            ]
+            colors = gradient.map([np.nan if val is None else val for val in fc_vals + outline_vals]).tolist()
+            return [
+                (
+                    fc_vals[pos],
+                    colors[pos],
+                    outline_vals[pos],
+                    colors[count + pos] if outline_vals[pos] is not None else [0, 0, 0],
+                )
+                for pos in range(count)
+            ]
+
         def _make_protein_entry(
             uniprot_id: str,
             protein_row: Dict[str, Any],
@@ -5922,27 +5905,17 @@ def server(input, output, session):  # type: ignore[override]
                 if val:
                     ann_values.append(f'"{val}"')
             entry["annotations"] = ",".join(ann_values)
-            neg = settings_override.get("negative_color", DEFAULT_SETTINGS["negative_color"])
-            pos = settings_override.get("positive_color", DEFAULT_SETTINGS["positive_color"])
-            max_neg = settings_override.get("max_negative", DEFAULT_SETTINGS["max_negative"])
-            max_pos = settings_override.get("max_positive", DEFAULT_SETTINGS["max_positive"])
-            outline_cols = ctx.get("protein_outline_columns", [])
-            for idx, col in enumerate(ctx.get("protein_main_columns", []), 1):
-                raw = protein_row.get(col, "")
-                try:
-                    fc_val = float(raw)
-                except (TypeError, ValueError):
-                    fc_val = None
+            fc_colors = _fc_colors(
+                protein_row,
+                ctx.get("protein_main_columns", []),
+                ctx.get("protein_outline_columns", []),
+                settings_override,
+            )
+            for idx, (fc_val, fc_color, outline_val, outline_color) in enumerate(fc_colors, 1):
                 entry[f"fold_change_{idx}"] = fc_val
-                entry[f"fc_color_{idx}"] = _gradient_color_from_fold(fc_val, neg, pos, max_neg, max_pos)
-                outline_col = outline_cols[idx - 1] if idx - 1 < len(outline_cols) else None
-                outline_raw = protein_row.get(outline_col, "") if outline_col else ""
-                try:
-                    outline_val = float(outline_raw)
-                except (TypeError, ValueError):
-                    outline_val = None
+                entry[f"fc_color_{idx}"] = fc_color
                 entry[f"outline_fold_change_{idx}"] = outline_val
-                entry[f"outline_color_{idx}"] = _gradient_color_from_fold(outline_val, neg, pos, max_neg, max_pos) if outline_val is not None else [0, 0, 0]
+                entry[f"outline_color_{idx}"] = outline_color
             if not ctx.get("protein_main_columns"):
                 entry["fold_change_1"] = None
                 entry["fc_color_1"] = [128, 128, 128]
@@ -5983,10 +5956,6 @@ def server(input, output, session):  # type: ignore[override]
             elif symbol_class and symbol_class.lower() != "none":
                 symbol_text = symbol_class[:3]
                 annotated_flag = "+"
-            neg = settings_override.get("negative_color", DEFAULT_SETTINGS["negative_color"])
-            pos = settings_override.get("positive_color", DEFAULT_SETTINGS["positive_color"])
-            max_neg = settings_override.get("max_negative", DEFAULT_SETTINGS["max_negative"])
-            max_pos = settings_override.get("max_positive", DEFAULT_SETTINGS["max_positive"])
             payload: Dict[str, Any] = {
                 "ptm_type": ctx.get("ptm_type", "ptm_0"),
                 "uniprot_id": row_map.get(ctx.get("ptm_headers", [None, None])[0] if ctx.get("ptm_headers") else "", ""),
@@ -6013,23 +5982,14 @@ def server(input, output, session):  # type: ignore[override]
                 "symbol_x": float(shape_x),
                 "symbol_y": float(shape_y),
             }
-            outline_cols = ctx.get("ptm_outline_columns", [])
-            for idx, col in enumerate(ctx.get("ptm_main_columns", []), 1):
-                raw = row_map.get(col, "")
-                try:
-                    fc_val = float(raw)
-                except (TypeError, ValueError):
-                    fc_val = None
+            fc_colors = _fc_colors(
+                row_map, ctx.get("ptm_main_columns", []), ctx.get("ptm_outline_columns", []), settings_override
+            )
+            for idx, (fc_val, fc_color, outline_val, outline_color) in enumerate(fc_colors, 1):
                 payload[f"fold_change_{idx}"] = fc_val
-                payload[f"fc_color_{idx}"] = _gradient_color_from_fold(fc_val, neg, pos, max_neg, max_pos)
-                outline_col = outline_cols[idx - 1] if idx - 1 < len(outline_cols) else None
-                outline_raw = row_map.get(outline_col, "") if outline_col else ""
-                try:
-                    outline_val = float(outline_raw)
-                except (TypeError, ValueError):
-                    outline_val = None
+                payload[f"fc_color_{idx}"] = fc_color
                 payload[f"outline_fold_change_{idx}"] = outline_val
-                payload[f"outline_color_{idx}"] = _gradient_color_from_fold(outline_val, neg, pos, max_neg, max_pos) if outline_val is not None else [0, 0, 0]
+                payload[f"outline_color_{idx}"] = outline_color
             return payload
 
         def _first_fc_value(row_map: Dict[str, Any], columns: List[str]) -> Optional[float]:
@@ -6041,6 +6001,30 @@ def server(input, output, session):  # type: ignore[override]
                     continue
             return None
 
+        def _ks_site_values(ks_data: Dict[str, Any], columns: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+            """First non-missing value in ``columns`` for every overlap substrate, as (values, found) arrays.
+
+            Gathered from the typed PTM frame once per column list and kept on the KS index,
+            so table refreshes only index into them.
+            """
+            cache = ks_data.setdefault("site_values", {})
+            key = tuple(columns)
+            if key not in cache:
+                overlap = ks_data["overlap"]
+                frame = ks_data["ptm_frame"]
+                rows = overlap.substrate_rows
+                values = np.full(len(rows), np.nan)
+                found = np.zeros(len(rows), dtype=bool)
+                for col in columns:
+                    if col not in frame.columns or found.all():
+                        continue
+                    column = pd.to_numeric(frame[col], errors="coerce").to_numpy(dtype=float)[rows]
+                    fill = ~found & ~np.isnan(column)
+                    values[fill] = column[fill]
+                    found |= fill
+                cache[key] = (values, found)
+            return cache[key]
+
         def _resolve_gene_label(uniprot_id: str, info: Dict[str, Any], ctx: Dict[str, Any]) -> str:
             gene = info.get("gene")
             if not gene:
@@ -6609,9 +6593,6 @@ def server(input, output, session):  # type: ignore[override]
                 except (TypeError, ValueError):
                     fc_val = None
                 reg_only = bool(_get_input_value(input, _prefixed_id(prefix, "ks_filter_reg_only")))
-                def _is_sig(fc: Optional[float]) -> bool:
-                    return fc is not None and (fc >= max_pos or fc <= max_neg)
-
                 def _fc_matches(value: Optional[float]) -> bool:
                     if fc_val is None or not fc_op:
                         return True
@@ -6631,29 +6612,33 @@ def server(input, output, session):  # type: ignore[override]
                         return value != fc_val
                     return True
                 rows: List[Dict[str, Any]] = []
+                overlap = ks_data.get("overlap")
+                if overlap is None:
+                    return rows
+                mask = evidence_mask(allowed_types)
                 if entity_mode == "kinase":
+                    sub_fc, _ = _ks_site_values(ks_data, ctx.get("ptm_main_columns", []))
+                    with np.errstate(invalid="ignore"):
+                        sub_sig = (sub_fc >= max_pos) | (sub_fc <= max_neg)
+                    sub_counts = overlap.substrate_counts(mask)
+                    sig_counts = overlap.kinase_totals(sub_sig, mask)
+                    kin_evidence = overlap.kinase_evidence(mask)
+                    activity = _ks_activity(ks_data, mask)
+                    activity_scores: Dict[str, Dict[str, Any]] = {}
+                    if activity is not None and activity.columns:
+                        activity_col = selected_fc if selected_fc in activity.columns else activity.columns[0]
+                        activity_scores = activity.frame(activity_col).to_dict("index")
                     for kin_id, info in (ks_data.get("kinases") or {}).items():
                         gene = _resolve_gene_label(kin_id, info, ctx)
                         prot_row = ctx.get("prot_rows_by_uniprot", {}).get(kin_id, {})
                         prot_fc_cols = [selected_fc] if selected_fc else ctx.get("protein_main_columns", [])
                         fc_val = _first_fc_value(prot_row, prot_fc_cols)
-                        sig_count = 0
-                        sub_count = 0
-                        visible_types: set = set()
-                        for sub_key in info.get("substrates", []):
-                            sub_entry = (ks_data.get("substrates") or {}).get(sub_key, {})
-                            rel_types = (sub_entry.get("kinases", {}).get(kin_id, {}) or {}).get("types", set())
-                            matched_types = set(rel_types or set()).intersection(allowed_types)
-                            if not matched_types:
-                                continue
-                            visible_types.update(matched_types)
-                            sub_count += 1
-                            sub_fc = _first_fc_value(sub_entry.get("row", {}), ctx.get("ptm_main_columns", []))
-                            if _is_sig(sub_fc):
-                                sig_count += 1
+                        code = overlap.kinase_codes[kin_id]
+                        sub_count = int(sub_counts[code])
+                        sig_count = int(sig_counts[code])
                         if not sub_count:
                             continue
-                        evid_label = _ks_evidence_label(visible_types)
+                        evid_label = _ks_evidence_label(evidence_types(kin_evidence[code]))
                         if not _fc_matches(fc_val):
                             continue
                         has_reg = ""
@@ -6676,31 +6661,30 @@ def server(input, output, session):  # type: ignore[override]
                                 "sig_pct": (sig_count / sub_count * 100.0) if sub_count else None,
                                 "evidence": evid_label,
                                 "count": sub_count,
+                                "z": _finite_or_none(activity_scores.get(kin_id, {}).get("z_score")),
+                                "perm_p": _finite_or_none(activity_scores.get(kin_id, {}).get("perm_p_value")),
                             }
                         )
                 else:
+                    ptm_fc_cols = []
+                    if selected_fc and selected_fc in (ctx.get("ptm_main_columns") or []):
+                        ptm_fc_cols = [selected_fc]
+                    else:
+                        ptm_fc_cols = ctx.get("ptm_main_columns", [])
+                    sub_fc, sub_has_fc = _ks_site_values(ks_data, ptm_fc_cols)
+                    kin_counts = overlap.kinase_counts(mask)
+                    sub_evidence = overlap.substrate_evidence(mask)
                     for sub_key, info in (ks_data.get("substrates") or {}).items():
+                        code = overlap.substrate_codes[sub_key]
+                        kin_count = int(kin_counts[code])
+                        if not kin_count:
+                            continue
                         sub_uid = info.get("uniprot", "")
                         gene = _resolve_gene_label(sub_uid, info, ctx)
                         site = info.get("site_label") or info.get("site") or ""
-                        ptm_fc_cols = []
-                        if selected_fc and selected_fc in (ctx.get("ptm_main_columns") or []):
-                            ptm_fc_cols = [selected_fc]
-                        else:
-                            ptm_fc_cols = ctx.get("ptm_main_columns", [])
-                        ptm_fc_val = _first_fc_value(info.get("row", {}), ptm_fc_cols)
-                        kin_count = 0
-                        visible_types: set = set()
-                        for _, rel in (info.get("kinases") or {}).items():
-                            matched_types = set((rel or {}).get("types", set()) or set()).intersection(allowed_types)
-                            if not matched_types:
-                                continue
-                            kin_count += 1
-                            visible_types.update(matched_types)
-                        if not kin_count:
-                            continue
+                        ptm_fc_val = float(sub_fc[code]) if sub_has_fc[code] else None
                         reg_val = str(info.get("row", {}).get("PSP: regulatory_site", "")).strip()
-                        evid_label = _ks_evidence_label(visible_types)
+                        evid_label = _ks_evidence_label(evidence_types(sub_evidence[code]))
                         if not _fc_matches(ptm_fc_val):
                             continue
                         if reg_only:
@@ -6759,6 +6743,8 @@ def server(input, output, session):  # type: ignore[override]
                         header("FC", "fc"),
                         header("Significant PTMs (%)", "sig_pct"),
                         header("Substrates", "count"),
+                        header("Activity z", "z"),
+                        header("p (perm.)", "perm_p"),
                     ]
                 else:
                     headers = [
@@ -6790,6 +6776,8 @@ def server(input, output, session):  # type: ignore[override]
                             ui.tags.td("N/A" if entry.get("fc") is None else f"{entry['fc']:.3g}"),
                             ui.tags.td("N/A" if entry.get("sig_pct") is None else f"{entry['sig_pct']:.1f}%"),
                             ui.tags.td(str(entry.get("count", 0))),
+                            ui.tags.td("N/A" if entry.get("z") is None else f"{entry['z']:.2f}"),
+                            ui.tags.td("N/A" if entry.get("perm_p") is None else f"{entry['perm_p']:.3g}"),
                         ]
                     else:
                         cells = [
@@ -7701,11 +7689,13 @@ def server(input, output, session):  # type: ignore[override]
                         "prot_significant_total",
                         "prot_significant_in_pathway",
                         "prot_fisher_p",
+                        "prot_fisher_q",
                         "phos_dataset_total",
                         "phos_pathway_total",
                         "phos_significant_total",
                         "phos_significant_in_pathway",
                         "phos_fisher_p",
+                        "phos_fisher_q",
                     ]
                     buffer = io.StringIO()
                     writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
@@ -7806,8 +7796,9 @@ def server(input, output, session):  # type: ignore[override]
             try:
                 settings_override = collect_settings(input, cfg)
                 color_override = _color_override_from_settings(settings_override)
-                payload = copy.deepcopy(current)
-                _apply_color_metadata(payload, color_override)
+                # Restyle works on copied protein entries only; the layout is never regenerated.
+                payload = _apply_color_overrides(current, color_override, as_copy=True)
+                payload["_color_preview_override"] = color_override
                 payload["_persist_token"] = time.time()
                 state["json"].set(payload)
             except Exception as exc:
@@ -7852,25 +7843,12 @@ def server(input, output, session):  # type: ignore[override]
             protboxes = payload.setdefault("protbox_data", [])
             existing_ids = {str(pb.get("protbox_id")) for pb in protboxes}
             catalog_info = payload.get("_global_protein_catalog") or _current_global_catalog_info()
+            catalog_colors = catalog_color_settings(payload.get("general_data", {}).get("settings", {}))
 
             def _catalog_lookup(uniprot: str) -> Dict[str, Any]:
                 if not isinstance(catalog_info, dict):
                     return {}
-                cat_map = catalog_info.get("protein_catalog")
-                if not isinstance(cat_map, dict):
-                    path = catalog_info.get("path")
-                    if path and os.path.exists(path):
-                        try:
-                            with open(path, "r", encoding="utf-8") as fh:
-                                cat_payload = json.load(fh)
-                            cat_map = cat_payload.get("protein_catalog", {})
-                            if isinstance(cat_map, dict):
-                                catalog_info["protein_catalog"] = cat_map
-                        except Exception:
-                            cat_map = {}
-                if isinstance(cat_map, dict) and uniprot in cat_map:
-                    return cat_map.get(uniprot) or {}
-                return {}
+                return get_catalog_records(catalog_info, [uniprot], catalog_colors).get(uniprot) or {}
 
             def _resolve_protein_entry(uniprot: str) -> Dict[str, Any]:
                 existing_entry = payload.get("protein_data", {}).get(uniprot) if isinstance(payload, dict) else None
@@ -8188,6 +8166,8 @@ def _launch_desktop_window(url: str):
 
 
 if __name__ == "__main__":
+    # Process pools (opt-in PTM and kinase activity modes) re-enter the frozen exe under spawn.
+    multiprocessing.freeze_support()
     if GUI_POPUP:
         server_thread = threading.Thread(target=_run_uvicorn_app, daemon=True)
         server_thread.start()
@@ -3,16 +3,19 @@ from __future__ import annotations
 import base64
 import html
 import json
-import math
 import re
 import zlib
 from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Sequence
 
+import numpy as np
+import pandas as pd
 from shiny import ui
 
+from MapKinase_WebApp.m1_file_processor import dataset_frame
 from MapKinase_WebApp.m8_pathway_label_mapper import PathwayLabelMapper
+from MapKinase_WebApp.m13_color_gradient import get_gradient
 from MapKinase_WebApp.m11_cst_pathway_index import get_cst_pathway_mapping
 
 
@@ -82,34 +85,6 @@ def _coerce_rgb(value: Sequence[float] | None, fallback: Sequence[float]) -> Lis
     return output
 
 
-def _gradient_color_from_fold(
-    fold_value: Any,
-    negative_color: Sequence[float],
-    positive_color: Sequence[float],
-    max_negative: float,
-    max_positive: float,
-) -> List[int]:
-    try:
-        if fold_value in (None, "", False):
-            return [128, 128, 128]
-        fold = float(fold_value)
-    except (TypeError, ValueError):
-        return [128, 128, 128]
-    if not math.isfinite(fold):
-        return [128, 128, 128]
-    neg = _coerce_rgb(negative_color, _DEFAULT_NEGATIVE_COLOR)
-    pos = _coerce_rgb(positive_color, _DEFAULT_POSITIVE_COLOR)
-    neg_limit = abs(float(max_negative) if max_negative else 1.0) or 1.0
-    pos_limit = float(max_positive) if max_positive else 1.0
-    pos_limit = pos_limit if pos_limit != 0 else 1.0
-    white = (255, 255, 255)
-    if fold < 0:
-        t = min(abs(fold) / neg_limit, 1.0)
-        return [int((1 - t) * white[i] + t * neg[i]) for i in range(3)]
-    t = min(fold / pos_limit, 1.0)
-    return [int((1 - t) * white[i] + t * pos[i]) for i in range(3)]
-
-
 def _normalize_fc_headers(raw_columns: Sequence[Any]) -> List[str]:
     headers: List[str] = []
     for item in raw_columns or []:
@@ -501,56 +476,56 @@ def _map_cst_text_nodes(file_path_str: str) -> List[Dict[str, Any]]:
 
 
 def _build_dataset_index(dataset: Optional[Dict[str, Any]]) -> Dict[str, Any]:
-    if not dataset:
-        return {"fc_headers": [], "rows_by_uniprot": {}, "rows_by_gene": {}}
-    headers = list(dataset.get("headers") or [])
-    rows = list(dataset.get("rows") or [])
+    # Reads the upload's typed frame (shared with the other consumers): fold changes as one
+    # float matrix, and row positions keyed by UniProt (first row per ID) and gene symbol.
+    frame = dataset_frame(dataset, "protein") if dataset else pd.DataFrame()
+    headers = [str(h) for h in frame.columns]
     if not headers:
-        return {"fc_headers": [], "rows_by_uniprot": {}, "rows_by_gene": {}}
-    fc_headers = _normalize_fc_headers(dataset.get("main_columns") or [h for h in headers if str(h).startswith("C:")])
-    rows_by_uniprot: Dict[str, Dict[str, Any]] = {}
-    rows_by_gene: Dict[str, List[Dict[str, Any]]] = {}
-    uniprot_key = headers[0]
-    gene_key = headers[1] if len(headers) > 1 else ""
-    for row in rows:
-        values = list(row)
-        if len(values) < len(headers):
-            values.extend([""] * (len(headers) - len(values)))
-        row_map = {header: values[idx] if idx < len(values) else "" for idx, header in enumerate(headers)}
-        raw_uniprot = str(row_map.get(uniprot_key, "") or "").strip().upper()
-        raw_gene = str(row_map.get(gene_key, "") or "").strip().upper() if gene_key else ""
-        normalized_uniprot = raw_uniprot.split("-", 1)[0] if raw_uniprot else ""
+        return {"fc_headers": [], "fold_changes": np.zeros((0, 0)), "rows_by_uniprot": {}, "rows_by_gene": {}}
+    fc_headers = _normalize_fc_headers(dataset.get("main_columns") or [h for h in headers if h.startswith("C:")])
+    fold_changes = np.full((len(frame), len(fc_headers)), np.nan)
+    for idx, header in enumerate(fc_headers):
+        if header in frame.columns:
+            fold_changes[:, idx] = pd.to_numeric(frame[header], errors="coerce").to_numpy(dtype=float)
+    uniprots = frame.iloc[:, 0].astype(str).str.strip().to_numpy()
+    genes = frame.iloc[:, 1].astype(str).str.strip().to_numpy() if len(headers) > 1 else np.full(len(frame), "")
+    rows_by_uniprot: Dict[str, int] = {}
+    rows_by_gene: Dict[str, List[int]] = {}
+    for pos, (raw_uniprot, raw_gene) in enumerate(zip(uniprots.tolist(), genes.tolist())):
+        normalized_uniprot = raw_uniprot.upper().split("-", 1)[0]
         if normalized_uniprot and normalized_uniprot not in rows_by_uniprot:
-            rows_by_uniprot[normalized_uniprot] = row_map
+            rows_by_uniprot[normalized_uniprot] = pos
         if raw_gene:
-            rows_by_gene.setdefault(raw_gene, []).append(row_map)
+            rows_by_gene.setdefault(raw_gene.upper(), []).append(pos)
     return {
         "fc_headers": fc_headers,
+        "fold_changes": fold_changes,
+        "uniprots": uniprots,
+        "genes": genes if len(headers) > 1 else None,
         "rows_by_uniprot": rows_by_uniprot,
         "rows_by_gene": rows_by_gene,
-        "headers": headers,
     }
 
 
-def _match_dataset_rows(mapping: Dict[str, Any], dataset_index: Dict[str, Any]) -> List[Dict[str, Any]]:
+def _match_dataset_rows(mapping: Dict[str, Any], dataset_index: Dict[str, Any]) -> List[int]:
     rows_by_uniprot = dataset_index.get("rows_by_uniprot", {})
     rows_by_gene = dataset_index.get("rows_by_gene", {})
-    matches: List[Dict[str, Any]] = []
-    seen_ids: set[int] = set()
+    matches: List[int] = []
+    seen: set[int] = set()
     for uniprot_id in mapping.get("suggested_uniprot_ids", []) or []:
         key = str(uniprot_id or "").strip().upper().split("-", 1)[0]
-        row = rows_by_uniprot.get(key)
-        if row is None or id(row) in seen_ids:
+        pos = rows_by_uniprot.get(key)
+        if pos is None or pos in seen:
             continue
-        matches.append(row)
-        seen_ids.add(id(row))
+        matches.append(pos)
+        seen.add(pos)
     for gene_symbol in mapping.get("suggested_gene_symbols", []) or []:
         key = str(gene_symbol or "").strip().upper()
-        for row in rows_by_gene.get(key, []):
-            if id(row) in seen_ids:
+        for pos in rows_by_gene.get(key, []):
+            if pos in seen:
                 continue
-            matches.append(row)
-            seen_ids.add(id(row))
+            matches.append(pos)
+            seen.add(pos)
     return matches
 
 
@@ -568,6 +543,13 @@ def _build_cst_overlay_nodes(
     dataset_index = _build_dataset_index(protein_dataset)
     fc_headers = list(dataset_index.get("fc_headers") or [])
     overlay_nodes: List[Dict[str, Any]] = []
+    gradient = get_gradient(
+        _coerce_rgb(negative_color, _DEFAULT_NEGATIVE_COLOR),
+        _coerce_rgb(positive_color, _DEFAULT_POSITIVE_COLOR),
+        max_negative,
+        max_positive,
+    )
+    pending_colors: List[tuple] = []
 
     for node in mapped_nodes:
         mapping = dict(node.get("mapping") or {})
@@ -601,35 +583,25 @@ def _build_cst_overlay_nodes(
             "default_color": [166, 166, 166],
         }
 
-        for idx, header in enumerate(fc_headers, 1):
-            chosen_row: Optional[Dict[str, Any]] = None
-            chosen_value: Optional[float] = None
-            for row in matches:
-                raw_value = row.get(header, "")
-                try:
-                    value = float(raw_value)
-                except (TypeError, ValueError):
-                    continue
-                if chosen_value is None or abs(value) > abs(chosen_value):
-                    chosen_value = value
-                    chosen_row = row
-            if chosen_value is None or chosen_row is None:
+        # Per comparison, the matched row with the largest |fold change| (the first one on ties).
+        match_values = dataset_index["fold_changes"][matches] if matches else np.zeros((0, len(fc_headers)))
+        for idx in range(1, len(fc_headers) + 1):
+            column = np.abs(match_values[:, idx - 1])
+            if not len(column) or np.isnan(column).all():
                 continue
+            pos = matches[int(np.nanargmax(column))]
+            chosen_value = float(dataset_index["fold_changes"][pos, idx - 1])
             overlay_node[f"fold_change_{idx}"] = chosen_value
-            overlay_node[f"fc_color_{idx}"] = _gradient_color_from_fold(
-                chosen_value,
-                negative_color,
-                positive_color,
-                max_negative,
-                max_positive,
-            )
-            if dataset_index.get("headers"):
-                uniprot_key = dataset_index["headers"][0]
-                gene_key = dataset_index["headers"][1] if len(dataset_index["headers"]) > 1 else ""
-                overlay_node[f"matched_uniprot_{idx}"] = str(chosen_row.get(uniprot_key, "") or "")
-                overlay_node[f"matched_gene_symbol_{idx}"] = str(chosen_row.get(gene_key, "") or "") if gene_key else ""
+            pending_colors.append((overlay_node, f"fc_color_{idx}", chosen_value))
+            genes = dataset_index.get("genes")
+            overlay_node[f"matched_uniprot_{idx}"] = str(dataset_index["uniprots"][pos])
+            overlay_node[f"matched_gene_symbol_{idx}"] = str(genes[pos]) if genes is not None else ""
 
         overlay_nodes.append(overlay_node)
+    if pending_colors:
+        colors = gradient.map_lists([value for _, _, value in pending_colors])
+        for (overlay_node, key, _), color in zip(pending_colors, colors):
+            overlay_node[key] = color
     return overlay_nodes
 
 
@@ -4,6 +4,7 @@ import io
 import os
 import pybiopax
 from MapKinase_WebApp.a1_base_api import BasePathwayAPI
+from MapKinase_WebApp.a1_pathway_topology import PathwayTopology
 from svglib.svglib import svg2rlg
 from reportlab.graphics import renderPM
 
@@ -69,7 +70,7 @@ class PathBankAPI(BasePathwayAPI):
         """Parse BioPAX file to extract entries, groups, and arrows."""
         if not file_path or not os.path.exists(file_path):
             print(f"No valid file to parse for {file_path}")
-            return [], [], []
+            return PathwayTopology(source="pathbank")
 
         try:
             # Parse BioPAX file using pybiopax
@@ -132,7 +133,7 @@ class PathBankAPI(BasePathwayAPI):
                         print(f"Parsed arrow: {source} -> {target}")
 
             print(f"Parsed {len(entries)} entries, {len(groups)} groups, and {len(arrows)} arrows")
-            return entries, groups, arrows
+            return PathwayTopology(entries, groups, arrows, source="pathbank")
         except Exception as e:
             print(f"Error parsing BioPAX file {file_path}: {e}")
-            return [], [], []
+            return PathwayTopology(source="pathbank", complete=False)
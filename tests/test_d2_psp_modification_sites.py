@@ -0,0 +1,103 @@
+import gzip
+
+import pytest
+
+from MapKinase_WebApp import d2_psp_site_index, d5_annotation_pipeline as d5
+from MapKinase_WebApp.d2_psp_modification_sites import (
+    load_acetylation_site_index,
+    load_modification_site_index,
+    load_ubiquitination_site_index,
+    modification_columns,
+)
+
+HEADER = ["GENE", "PROTEIN", "ACC_ID", "HU_CHR_LOC", "MOD_RSD", "SITE_GRP_ID", "ORGANISM", "MW_kD", "DOMAIN",
+          "SITE_+/-7_AA", "LT_LIT", "MS_LIT", "MS_CST", "CST_CAT#"]
+ACETYLATION_ROWS = [
+    ["TP53", "p53", "P04637", "17p13.1", "K120-ac", "1", "human", "43.6", "P53", "x", "12", "3", "", ""],
+    ["TP53", "p53", "P04637", "17p13.1", "K382-ac", "2", "human", "43.6", "P53_tetramer", "x", "", "7", "", ""],
+    ["TP53", "p53", "P04637", "17p13.1", "K382-ac", "2", "human", "43.6", "later", "x", "40", "9", "", ""],
+    ["Trp53", "p53", "P02340", "", "K379-ac", "3", "mouse", "43.5", "", "x", "1", "", "", ""],
+    ["H3", "H3", "P68431", "", "no-site", "4", "human", "15.4", "", "x", "", "", "", ""],
+]
+UBIQUITINATION_ROWS = [
+    ["TP53", "p53", "P04637", "17p13.1", "K120-ub", "5", "human", "43.6", "P53", "x", "", "21", "", ""],
+    ["UBB", "UBB", "P0CG47", "", "K48-ub", "6", "human", "25.8", "ubiquitin", "x", "30", "110", "", ""],
+]
+
+
+def write_psp(path, rows):
+    with gzip.open(path, "wt", encoding="utf-8") as fh:
+        fh.write("PhosphoSitePlus licence preamble\n\n")
+        for row in [HEADER] + rows:
+            fh.write("\t".join(row) + "\n")
+
+
+@pytest.fixture
+def base_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(d2_psp_site_index, "PSP_SITE_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(d2_psp_site_index, "_OPEN_INDEXES", {})
+    monkeypatch.setattr(d5, "_TABLE_CACHE", d5.OrderedDict())
+    (tmp_path / "annotation_files").mkdir()
+    write_psp(tmp_path / "annotation_files" / "Acetylation_site_dataset.gz", ACETYLATION_ROWS)
+    write_psp(tmp_path / "annotation_files" / "Ubiquitination_site_dataset.gz", UBIQUITINATION_ROWS)
+    return str(tmp_path)
+
+
+def test_acetylation_index_keeps_domain_and_literature_counts(base_dir):
+    human = load_acetylation_site_index(base_dir, "human")
+    # Every human row with a parsable residue is indexed; "no-site" is skipped.
+    assert len(human) == 3
+    assert human.get(("P04637", "120", "human")) == {"DOMAIN": "P53", "LT_LIT": "12", "MS_LIT": "3"}
+    # A site listed twice keeps its last row.
+    assert human.get(("P04637", "382", "human")) == {"DOMAIN": "later", "LT_LIT": "40", "MS_LIT": "9"}
+    assert human.get(("P02340", "379", "human")) is None
+    mouse = load_acetylation_site_index(base_dir, "mouse")
+    assert mouse.get(("P02340", "379", "mouse")) == {"DOMAIN": "", "LT_LIT": "1", "MS_LIT": ""}
+
+
+def test_ubiquitination_index_is_separate_from_acetylation(base_dir):
+    human = load_ubiquitination_site_index(base_dir, "human")
+    assert len(human) == 2
+    assert human.get(("P0CG47", "48", "human")) == {"DOMAIN": "ubiquitin", "LT_LIT": "30", "MS_LIT": "110"}
+    assert human.get(("P04637", "382", "human")) is None
+    assert load_modification_site_index(base_dir, " Ubiquitination ", "human").get(("P04637", "120", "human"))
+
+
+def test_unknown_modification_or_missing_file_gives_none(base_dir, tmp_path):
+    assert load_modification_site_index(base_dir, "sumoylation", "human") is None
+    empty_dir = tmp_path / "empty"
+    (empty_dir / "annotation_files").mkdir(parents=True)
+    assert load_acetylation_site_index(str(empty_dir), "human") is None
+
+
+def test_modification_columns():
+    assert modification_columns("acetylation") == [
+        "PSP: acetylation_site",
+        "PSP: acetylation_domain",
+        "PSP: acetylation_lt_lit",
+        "PSP: acetylation_ms_lit",
+    ]
+
+
+def test_pipeline_adds_modification_columns(base_dir):
+    maps = {
+        "acetylation": load_acetylation_site_index(base_dir, "human"),
+        "ubiquitination": load_ubiquitination_site_index(base_dir, "human"),
+    }
+    dataset = {
+        "headers": ["Uniprot", "Site", "C:a"],
+        "rows": [["P04637", "382", "1.0"], ["P04637", "120.0", "0.5"], ["P0CG47", "48", ""], ["P04637", "", "2"]],
+    }
+    timings = {}
+    annotated = d5.annotate_ptm_sites(dataset, "human", modification_maps=maps, timings=timings)
+    assert annotated["headers"] == (
+        dataset["headers"] + modification_columns("acetylation") + modification_columns("ubiquitination")
+    )
+    assert [row[3:] for row in annotated["rows"]] == [
+        ["+", "later", "40", "9", "", "", "", ""],
+        ["+", "P53", "12", "3", "+", "P53", "", "21"],
+        ["", "", "", "", "+", "ubiquitin", "30", "110"],
+        ["", "", "", "", "", "", "", ""],
+    ]
+    assert {"acetylation lookup", "ubiquitination lookup"} <= set(timings)
+    assert "psp_species" not in annotated
@@ -0,0 +1,88 @@
+import gzip
+
+import pytest
+
+from MapKinase_WebApp import d2_psp_site_index
+from MapKinase_WebApp.d2_psp_kinasesubstrates import (
+    KINASE_SUBSTRATE_INDEX,
+    load_kinase_substrate_index,
+    load_kinase_substrate_map,
+)
+from MapKinase_WebApp.d2_psp_regulatorysites import PSP_FIELDS, load_regulatory_site_index, load_regulatory_sites
+
+REGULATORY_ROWS = [
+    ["GENE", "PROTEIN", "ACC_ID", "ORGANISM", "MOD_RSD", "DOMAIN", "ON_FUNCTION", "ON_PROCESS",
+     "ON_PROT_INTERACT", "ON_OTHER_INTERACT", "NOTES"],
+    ["AKT1", "Akt1", "P31749", "human", "T308-p", "", "activity, induced", "apoptosis", "", "", ""],
+    ["AKT1", "Akt1", "P31749", "human", "S473-p", "", "activity, induced", "", "", "", "first"],
+    ["AKT1", "Akt1", "P31749", "human", "S473-p", "", "", "", "", "", "last row wins"],
+    ["Akt1", "Akt1", "P31750", "mouse", "T308-p", "", "activity, induced", "", "", "", ""],
+    ["BAD", "BAD", "Q92934", "human", "bad-site", "", "", "", "", "", ""],
+]
+
+KINASE_ROWS = [
+    ["GENE", "KINASE", "KIN_ACC_ID", "KIN_ORGANISM", "SUBSTRATE", "SUB_ACC_ID", "SUB_ORGANISM",
+     "SUB_MOD_RSD", "IN_VIVO_RXN", "IN_VITRO_RXN"],
+    ["PDPK1", "PDK1", "O15530", "human", "Akt1", "P31749", "human", "T308", "X", ""],
+    ["MTOR", "mTOR", "P42345", "human", "Akt1", "P31749", "human", "S473", "X", "X"],
+    ["PRKDC", "DNAPK", "P78527", "human", "Akt1", "P31749", "human", "S473", "", "X"],
+    ["Pdpk1", "PDK1", "Q9Z2A0", "mouse", "Akt1", "P31750", "mouse", "T308", "X", ""],
+]
+
+
+def write_psp(path, rows):
+    with gzip.open(path, "wt", encoding="utf-8") as fh:
+        fh.write("PhosphoSitePlus licence preamble\n\n")
+        for row in rows:
+            fh.write("\t".join(row) + "\n")
+
+
+@pytest.fixture
+def base_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(d2_psp_site_index, "PSP_SITE_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(d2_psp_site_index, "_OPEN_INDEXES", {})
+    (tmp_path / "annotation_files").mkdir()
+    write_psp(tmp_path / "annotation_files" / "Regulatory_sites.gz", REGULATORY_ROWS)
+    write_psp(tmp_path / "annotation_files" / "Kinase_Substrate_Dataset.gz", KINASE_ROWS)
+    return str(tmp_path)
+
+
+def test_regulatory_index_matches_dict_loader(base_dir):
+    legacy = load_regulatory_sites(base_dir)
+    for organism in ("human", "mouse"):
+        index = load_regulatory_site_index(base_dir, organism)
+        keys = [key for key in legacy if key[2] == organism]
+        assert len(index) == sum(1 for row in REGULATORY_ROWS[1:] if row[3] == organism and row[4] != "bad-site")
+        for key in keys:
+            assert index.get(key) == {field: legacy[key][field] for field in PSP_FIELDS}
+        assert index.get_many(keys) == [index.get(key) for key in keys]
+    human = load_regulatory_site_index(base_dir, "human")
+    assert human.get(("P31749", "473", "human"))["NOTES"] == "last row wins"
+    assert human.get(("P31750", "308", "mouse")) is None
+    assert human.get(("P31749", "999", "human")) is None
+
+
+def test_kinase_substrate_index_matches_dict_loader(base_dir):
+    legacy = load_kinase_substrate_map(base_dir)
+    index = load_kinase_substrate_index(base_dir, "human")
+    columns = KINASE_SUBSTRATE_INDEX.columns
+    for key, entries in legacy.items():
+        expected = [{col: entry[col] for col in columns} for entry in entries] if key[2] == "human" else None
+        assert index.get(key) == expected
+    assert [row["KINASE"] for row in index.get(("P31749", "473", "human"))] == ["mTOR", "DNAPK"]
+
+
+def test_rebuilt_index_leaves_open_index_readable(base_dir, tmp_path):
+    old = load_regulatory_site_index(base_dir, "human")
+    rows = REGULATORY_ROWS + [["PTEN", "PTEN", "P60484", "human", "S380-p", "", "", "", "", "", "new"]]
+    write_psp(tmp_path / "annotation_files" / "Regulatory_sites.gz", rows)
+    new = load_regulatory_site_index(base_dir, "human")
+    assert new is not old
+    assert new.get(("P60484", "380", "human"))["NOTES"] == "new"
+    assert old.get(("P31749", "308", "human"))["ON_PROCESS"] == "apoptosis"
+    assert load_regulatory_site_index(base_dir, "human") is new
+
+
+def test_missing_file_or_species(base_dir):
+    assert load_regulatory_site_index(base_dir, "yeast") is None
+    assert load_regulatory_site_index(base_dir, "human", "Missing.gz") is None
@@ -0,0 +1,137 @@
+import gzip
+
+import numpy as np
+import pytest
+
+from MapKinase_WebApp import d2_psp_site_index, d5_annotation_pipeline as d5
+from MapKinase_WebApp.d1_transfer_kegg_annotations import KEGG_COL, annotate_protein_with_kegg
+from MapKinase_WebApp.d2_psp_kinasesubstrates import (
+    annotate_ptm_dataset_with_kinases,
+    load_kinase_substrate_index,
+    load_kinase_substrate_map,
+)
+from MapKinase_WebApp.d2_psp_regulatorysites import (
+    annotate_ptm_dataset,
+    load_regulatory_site_index,
+    load_regulatory_sites,
+)
+
+REGULATORY_HEADER = ["GENE", "PROTEIN", "ACC_ID", "ORGANISM", "MOD_RSD", "DOMAIN", "ON_FUNCTION", "ON_PROCESS",
+                     "ON_PROT_INTERACT", "ON_OTHER_INTERACT", "NOTES"]
+KINASE_HEADER = ["GENE", "KINASE", "KIN_ACC_ID", "KIN_ORGANISM", "SUBSTRATE", "SUB_ACC_ID", "SUB_ORGANISM",
+                 "SUB_MOD_RSD", "IN_VIVO_RXN", "IN_VITRO_RXN"]
+ACCESSIONS = [f"P{i:05d}" for i in range(25)]
+SITES = ["5", "5.0", " 7 ", "12.9", "", "abc", "nan", "-3", "1e1", "0"]
+
+
+def write_psp(path, header, rows):
+    with gzip.open(path, "wt", encoding="utf-8") as fh:
+        fh.write("PhosphoSitePlus licence preamble\n\n")
+        for row in [header] + rows:
+            fh.write("\t".join(row) + "\n")
+
+
+def random_psp(rng):
+    organisms = ["human", "human", "mouse"]
+    regulatory = [
+        ["G", "P", str(rng.choice(ACCESSIONS)), str(rng.choice(organisms)), f"S{int(rng.integers(1, 14))}-p",
+         "", f"fn{i}", "", "", "", f"note {i}"]
+        for i in range(150)
+    ]
+    kinase = [
+        ["G", f"KIN{int(k)}", f"Q{int(k):05d}" if k % 5 else "", "human", "S",
+         str(rng.choice(ACCESSIONS)), str(rng.choice(organisms)), f"S{int(rng.integers(1, 14))}",
+         str(rng.choice(["X", " x", ""])), str(rng.choice(["X", ""]))]
+        for k in rng.integers(0, 12, size=250)
+    ]
+    return regulatory, kinase
+
+
+def random_upload(rng, n_rows=400):
+    rows = []
+    for i in range(n_rows):
+        accession = str(rng.choice(ACCESSIONS + ["P99999", "", " P00003 "]))
+        row = [accession, str(rng.choice(SITES)), f"{rng.normal():.3f}", f"r{i}"]
+        rows.append(row[: int(rng.choice([2, 4, 4, 4]))])
+    return {"headers": ["Uniprot", "Site", "C:a", "Label"], "rows": rows, "name": "upload"}
+
+
+@pytest.fixture
+def psp(tmp_path, monkeypatch):
+    monkeypatch.setattr(d2_psp_site_index, "PSP_SITE_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(d2_psp_site_index, "_OPEN_INDEXES", {})
+    monkeypatch.setattr(d5, "_TABLE_CACHE", d5.OrderedDict())
+    (tmp_path / "annotation_files").mkdir()
+    regulatory, kinase = random_psp(np.random.default_rng(11))
+    write_psp(tmp_path / "annotation_files" / "Regulatory_sites.gz", REGULATORY_HEADER, regulatory)
+    write_psp(tmp_path / "annotation_files" / "Kinase_Substrate_Dataset.gz", KINASE_HEADER, kinase)
+    return str(tmp_path)
+
+
+def legacy_annotation(dataset, species, regulatory_map, ks_map):
+    return annotate_ptm_dataset_with_kinases(annotate_ptm_dataset(dataset, species, regulatory_map), species, ks_map)
+
+
+@pytest.mark.parametrize("species", ["human", "Mouse "])
+def test_ptm_pipeline_matches_per_row_annotators_with_indexes(psp, species):
+    organism = species.strip().lower()
+    regulatory = load_regulatory_site_index(psp, organism)
+    kinases = load_kinase_substrate_index(psp, organism)
+    dataset = random_upload(np.random.default_rng(3))
+    expected = legacy_annotation(dataset, species, regulatory, kinases)
+    timings = {}
+    annotated = d5.annotate_ptm_sites(dataset, species, regulatory, kinases, timings=timings)
+    assert annotated["headers"] == expected["headers"]
+    assert annotated["rows"] == expected["rows"]
+    assert annotated["name"] == "upload" and annotated["psp_species"] == organism
+    assert {"keys", "regulatory join", "kinase join", "assemble"} <= set(timings)
+    # The random tables do overlap the upload, so the comparison covers real hits.
+    marker = annotated["headers"].index("PSP: regulatory_site")
+    assert any(row[marker] == "+" for row in annotated["rows"]) and any(row[-1] for row in annotated["rows"])
+
+
+def test_ptm_pipeline_matches_per_row_annotators_with_dicts(psp):
+    regulatory = load_regulatory_sites(psp)
+    kinases = load_kinase_substrate_map(psp)
+    dataset = random_upload(np.random.default_rng(4))
+    expected = legacy_annotation(dataset, "human", regulatory, kinases)
+    annotated = d5.annotate_ptm_sites(dataset, "human", regulatory, kinases)
+    assert annotated["headers"] == expected["headers"]
+    assert annotated["rows"] == expected["rows"]
+    # The dict and index sources give the same columns.
+    indexed = d5.annotate_ptm_sites(
+        dataset, "human", load_regulatory_site_index(psp, "human"), load_kinase_substrate_index(psp, "human")
+    )
+    assert indexed["rows"] == annotated["rows"]
+
+
+def test_ptm_pipeline_single_source(psp):
+    regulatory = load_regulatory_site_index(psp, "human")
+    kinases = load_kinase_substrate_index(psp, "human")
+    dataset = random_upload(np.random.default_rng(5), n_rows=50)
+    only_regulatory = d5.annotate_ptm_sites(dataset, "human", regulatory_map=regulatory)
+    assert only_regulatory["rows"] == annotate_ptm_dataset(dataset, "human", regulatory)["rows"]
+    assert "psp_species" not in only_regulatory
+    only_kinases = d5.annotate_ptm_sites(dataset, "human", ks_map=kinases)
+    assert only_kinases["rows"] == annotate_ptm_dataset_with_kinases(dataset, "human", kinases)["rows"]
+
+
+def test_ptm_pipeline_leaves_unsupported_input_alone(psp):
+    dataset = random_upload(np.random.default_rng(6), n_rows=10)
+    regulatory = load_regulatory_site_index(psp, "human")
+    assert d5.annotate_ptm_sites(dataset, "yeast", regulatory) is dataset
+    assert d5.annotate_ptm_sites(dataset, "human") is dataset
+    empty = d5.annotate_ptm_sites({"headers": ["Uniprot", "Site"], "rows": []}, "human", regulatory)
+    assert empty["rows"] == [] and empty["headers"][-1] == "PSP: NOTES"
+
+
+def test_kegg_pipeline_matches_per_row_annotator():
+    rng = np.random.default_rng(8)
+    kegg_map = {acc: f"hsa:{i}" for i, acc in enumerate(ACCESSIONS[::2])}
+    rows = [[str(rng.choice(ACCESSIONS + [""])), f"{rng.normal():.2f}"] for _ in range(200)] + [["P00000"]]
+    for headers in (["Uniprot", "C:a"], ["Uniprot", KEGG_COL, "C:a"]):
+        dataset = {"headers": headers, "rows": rows}
+        expected = annotate_protein_with_kegg(dataset, "hsa", kegg_map)
+        annotated = d5.annotate_protein_kegg(dataset, kegg_map)
+        assert annotated["headers"] == expected["headers"]
+        assert annotated["rows"] == expected["rows"]
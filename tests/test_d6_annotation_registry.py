@@ -0,0 +1,131 @@
+import gzip
+import threading
+from types import MappingProxyType
+
+import pytest
+
+from MapKinase_WebApp import d2_psp_site_index, d5_annotation_pipeline as d5
+from MapKinase_WebApp.d6_annotation_registry import AnnotationRegistry
+from MapKinase_WebApp.d7_kinase_site_matrix import KinaseSiteMatrix
+
+REGULATORY_ROWS = [
+    ["GENE", "PROTEIN", "ACC_ID", "ORGANISM", "MOD_RSD", "DOMAIN", "ON_FUNCTION", "ON_PROCESS",
+     "ON_PROT_INTERACT", "ON_OTHER_INTERACT", "NOTES"],
+    ["AKT1", "Akt1", "P31749", "human", "T308-p", "", "activity, induced", "", "", "", ""],
+    ["Akt1", "Akt1", "P31750", "mouse", "T308-p", "", "activity, induced", "", "", "", ""],
+]
+KINASE_ROWS = [
+    ["GENE", "KINASE", "KIN_ACC_ID", "KIN_ORGANISM", "SUBSTRATE", "SUB_ACC_ID", "SUB_ORGANISM",
+     "SUB_MOD_RSD", "IN_VIVO_RXN", "IN_VITRO_RXN"],
+    ["PDPK1", "PDK1", "O15530", "human", "Akt1", "P31749", "human", "T308", "X", ""],
+    ["MTOR", "mTOR", "P42345", "human", "Akt1", "P31749", "human", "S473", "X", "X"],
+]
+ACETYLATION_ROWS = [
+    ["GENE", "PROTEIN", "ACC_ID", "MOD_RSD", "ORGANISM", "DOMAIN", "LT_LIT", "MS_LIT"],
+    ["TP53", "p53", "P04637", "K120-ac", "human", "P53", "12", "3"],
+]
+
+
+def write_psp(path, rows):
+    with gzip.open(path, "wt", encoding="utf-8") as fh:
+        fh.write("PhosphoSitePlus licence preamble\n\n")
+        for row in rows:
+            fh.write("\t".join(row) + "\n")
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(d2_psp_site_index, "PSP_SITE_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(d2_psp_site_index, "_OPEN_INDEXES", {})
+    monkeypatch.setattr(d5, "_TABLE_CACHE", d5.OrderedDict())
+    files = tmp_path / "annotation_files"
+    files.mkdir()
+    write_psp(files / "Regulatory_sites.gz", REGULATORY_ROWS)
+    write_psp(files / "Kinase_Substrate_Dataset.gz", KINASE_ROWS)
+    write_psp(files / "Acetylation_site_dataset.gz", ACETYLATION_ROWS)
+    (files / "hsa_KEGG_Conversion.txt").write_text("Uniprot_ID\tKEGG_Gene_ID\nP31749\thsa:207\n", encoding="utf-8")
+    return AnnotationRegistry(str(tmp_path))
+
+
+def test_tables_are_loaded_once_and_shared(registry):
+    human = registry.regulatory_sites("human")
+    assert human.get(("P31749", "308", "human"))["ON_FUNCTION"] == "activity, induced"
+    assert registry.regulatory_sites(" Human ") is human
+    assert registry.regulatory_sites("mouse") is not human
+    assert (registry.loads, registry.hits) == (2, 1)
+
+
+def test_concurrent_sessions_wait_for_one_load(registry):
+    barrier = threading.Barrier(8)
+    results = []
+
+    def fetch():
+        barrier.wait()
+        results.append(registry.kinase_substrates("human"))
+
+    threads = [threading.Thread(target=fetch) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert registry.loads == 1 and registry.hits == 7
+    assert all(result is results[0] for result in results)
+
+
+def test_changed_source_file_is_reloaded(registry):
+    first = registry.regulatory_sites("human")
+    write_psp(
+        f"{registry.base_dir}/annotation_files/Regulatory_sites.gz",
+        REGULATORY_ROWS + [["BAD", "BAD", "Q92934", "human", "S99-p", "", "", "", "", "", "new"]],
+    )
+    second = registry.regulatory_sites("human")
+    assert second is not first
+    assert second.get(("Q92934", "99", "human"))["NOTES"] == "new"
+    assert registry.regulatory_sites("human") is second
+    assert registry.loads == 2
+
+
+def test_kinase_site_matrix_reuses_the_shared_index(registry):
+    matrix = registry.kinase_site_matrix("human")
+    assert isinstance(matrix, KinaseSiteMatrix)
+    assert sorted(str(kinase) for kinase in matrix.kinases) == ["O15530", "P42345"]
+    assert registry.kinase_substrates("human") is registry.kinase_substrates("human")
+    assert registry.kinase_site_matrix("human") is matrix
+    assert registry.loads == 2
+
+
+def test_modification_sites_and_missing_files(registry):
+    maps = registry.modification_sites("human")
+    assert set(maps) == {"acetylation", "ubiquitination"}
+    assert maps["acetylation"].get(("P04637", "120", "human")) == {"DOMAIN": "P53", "LT_LIT": "12", "MS_LIT": "3"}
+    assert maps["ubiquitination"] is None
+    assert registry.modification_sites("human")["acetylation"] is maps["acetylation"]
+    available = {entry["dataset"]: entry["available"] for entry in registry.stats()["entries"]}
+    assert available == {"acetylation": True, "ubiquitination": False}
+
+
+def test_kegg_map_is_read_only(registry):
+    kegg = registry.kegg_map("hsa")
+    assert isinstance(kegg, MappingProxyType)
+    assert dict(kegg) == {"P31749": "hsa:207"}
+    with pytest.raises(TypeError):
+        kegg["P31749"] = "changed"
+    assert registry.kegg_map("hsa") is kegg
+
+
+def test_unknown_dataset_raises(registry):
+    with pytest.raises(KeyError):
+        registry.get("phosphorylation", "human")
+
+
+def test_stats_report_entries_and_memory(registry):
+    registry.regulatory_sites("human")
+    registry.regulatory_sites("human")
+    registry.kegg_map("hsa")
+    stats = registry.stats()
+    assert (stats["loads"], stats["hits"]) == (2, 1)
+    entries = {(entry["dataset"], entry["organism"]): entry for entry in stats["entries"]}
+    assert entries[("regulatory_sites", "human")]["hits"] == 1
+    assert entries[("regulatory_sites", "human")]["mapped_bytes"] > 0
+    assert entries[("kegg", "hsa")]["heap_bytes"] > 0
+    assert stats["mapped_bytes"] == sum(entry["mapped_bytes"] for entry in stats["entries"])
@@ -0,0 +1,105 @@
+import gzip
+
+import numpy as np
+import pytest
+
+from MapKinase_WebApp import d2_psp_site_index
+from MapKinase_WebApp.d2_psp_kinasesubstrates import load_kinase_substrate_index, load_kinase_substrate_map
+from MapKinase_WebApp.d7_kinase_site_matrix import (
+    IN_VITRO,
+    IN_VIVO,
+    KinaseSiteOverlap,
+    build_kinase_site_matrix,
+)
+
+HEADER = ["KINASE", "KIN_ACC_ID", "SUB_ACC_ID", "SUB_ORGANISM", "SUB_MOD_RSD", "IN_VIVO_RXN", "IN_VITRO_RXN"]
+
+
+def random_rows(rng, n_rows=400):
+    kinases = [f"K{i:02d}" for i in range(15)]
+    substrates = [f"S{i:03d}" for i in range(60)]
+    rows = []
+    for _ in range(n_rows):
+        vivo, vitro = rng.integers(0, 2, size=2)
+        rows.append([
+            "kin",
+            str(rng.choice(kinases)),
+            str(rng.choice(substrates)),
+            "human",
+            f"S{int(rng.integers(1, 12))}",
+            "X" if vivo or not vitro else "",
+            "X" if vitro else "",
+        ])
+    return rows
+
+
+@pytest.fixture
+def ks_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(d2_psp_site_index, "PSP_SITE_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(d2_psp_site_index, "_OPEN_INDEXES", {})
+    (tmp_path / "annotation_files").mkdir()
+    rows = random_rows(np.random.default_rng(7))
+    with gzip.open(tmp_path / "annotation_files" / "Kinase_Substrate_Dataset.gz", "wt", encoding="utf-8") as fh:
+        fh.write("\t".join(HEADER) + "\n")
+        for row in rows:
+            fh.write("\t".join(row) + "\n")
+    return str(tmp_path), load_kinase_substrate_index(str(tmp_path), "human")
+
+
+def naive_pairs(legacy, accessions, sites):
+    """(row, kinase, evidence) per upload row from the dict loader, merging duplicate kinases."""
+    edges = []
+    for row, (acc, site) in enumerate(zip(accessions, sites)):
+        merged = {}
+        for entry in legacy.get((acc, site, "human"), []):
+            bits = (IN_VIVO if entry["IN_VIVO_RXN"].strip().upper() == "X" else 0) | (
+                IN_VITRO if entry["IN_VITRO_RXN"].strip().upper() == "X" else 0
+            )
+            if bits:
+                merged[entry["KIN_ACC_ID"]] = merged.get(entry["KIN_ACC_ID"], 0) | bits
+        edges.extend((row, kinase, bits) for kinase, bits in merged.items())
+    return edges
+
+
+def test_matrix_overlap_matches_dict_loader(ks_index):
+    base_dir, index = ks_index
+    matrix = build_kinase_site_matrix(index)
+    legacy = load_kinase_substrate_map(base_dir)
+    rng = np.random.default_rng(3)
+    accessions = [f"S{int(i):03d}" for i in rng.integers(0, 70, size=300)]
+    sites = [str(int(i)) for i in rng.integers(1, 14, size=300)]
+    rows, kinase_codes, evidence = matrix.overlap(accessions, sites)
+    got = sorted((int(r), str(matrix.kinases[k]), int(e)) for r, k, e in zip(rows, kinase_codes, evidence))
+    assert got and got == sorted(naive_pairs(legacy, accessions, sites))
+
+
+def test_overlap_counts_match_naive(ks_index):
+    _, index = ks_index
+    matrix = build_kinase_site_matrix(index)
+    rng = np.random.default_rng(5)
+    accessions = [f"S{int(i):03d}" for i in rng.integers(0, 60, size=250)]
+    sites = [str(int(i)) for i in rng.integers(1, 12, size=250)]
+    rows, kinase_codes, evidence = matrix.overlap(accessions, sites)
+    keys = [f"{accessions[r]}|{sites[r]}" for r in rows]
+    kinases = [str(matrix.kinases[k]) for k in kinase_codes]
+    overlap = KinaseSiteOverlap.from_edges(rows, keys, kinases, evidence)
+    values = rng.normal(size=len(overlap.substrate_keys))
+    values[::4] = np.nan
+
+    for mask in (IN_VIVO, IN_VITRO, IN_VIVO | IN_VITRO):
+        pairs = {}
+        for key, kinase, bits in zip(keys, kinases, evidence):
+            pairs[(key, kinase)] = pairs.get((key, kinase), 0) | int(bits)
+        selected = [(key, kinase) for (key, kinase), bits in pairs.items() if bits & mask]
+        for code, kinase in enumerate(overlap.kinase_ids):
+            subs = [overlap.substrate_codes[key] for key, kin in selected if kin == kinase]
+            assert overlap.substrate_counts(mask)[code] == len(subs)
+            assert overlap.kinase_totals(values, mask)[code] == pytest.approx(np.nansum(values[subs]) if subs else 0.0)
+            present = [values[s] for s in subs if not np.isnan(values[s])]
+            mean = overlap.kinase_means(values, mask)[code]
+            if present:
+                assert mean == pytest.approx(np.mean(present))
+            else:
+                assert np.isnan(mean)
+        for key, code in overlap.substrate_codes.items():
+            assert overlap.kinase_counts(mask)[code] == sum(1 for k, _ in selected if k == key)
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+from scipy import stats
+
+from MapKinase_WebApp import d8_kinase_activity as d8
+from MapKinase_WebApp.d7_kinase_site_matrix import IN_VITRO, IN_VIVO, KinaseSiteOverlap
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(d8, "_ACTIVITY_CACHE", d8.OrderedDict())
+
+
+def make_case(seed=0, n_rows=300, n_cols=3):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(size=(n_rows, n_cols))
+    values[rng.random(values.shape) < 0.1] = np.nan
+    columns = [f"C:cmp{i}" for i in range(n_cols)]
+    rows = [
+        [f"P{i}", "5"] + ["" if np.isnan(v) else repr(float(v)) for v in row]
+        for i, row in enumerate(values)
+    ]
+    payload = {"headers": ["Uniprot", "Site"] + columns, "rows": rows}
+    edge_rows = rng.choice(n_rows, size=120, replace=False)
+    edge_rows = np.concatenate([edge_rows, edge_rows[:40]])
+    kinases = [f"K{int(k)}" for k in rng.integers(0, 8, size=len(edge_rows))]
+    evidence = rng.choice([IN_VIVO, IN_VITRO, IN_VIVO | IN_VITRO], size=len(edge_rows))
+    overlap = KinaseSiteOverlap.from_edges(edge_rows, [f"P{r}|5" for r in edge_rows], kinases, evidence)
+    return payload, values, overlap
+
+
+def naive_scores(values, overlap, mask):
+    """KSEA z, two-sided normal p, mean and median per kinase and column, one cell at a time."""
+    n_kin, n_cols = len(overlap.kinase_ids), values.shape[1]
+    z = np.full((n_kin, n_cols), np.nan)
+    p = np.full((n_kin, n_cols), np.nan)
+    means = np.full((n_kin, n_cols), np.nan)
+    medians = np.full((n_kin, n_cols), np.nan)
+    for code in range(n_kin):
+        keep = (overlap.pair_kinases == code) & ((overlap.pair_evidence & mask) != 0)
+        rows = overlap.substrate_rows[overlap.pair_substrates[keep]]
+        for col in range(n_cols):
+            column = values[:, col]
+            sub = column[rows]
+            sub = sub[~np.isnan(sub)]
+            if not len(sub):
+                continue
+            background = column[~np.isnan(column)]
+            means[code, col] = sub.mean()
+            medians[code, col] = np.median(sub)
+            z[code, col] = (sub.mean() - background.mean()) * np.sqrt(len(sub)) / background.std(ddof=1)
+            p[code, col] = 2 * stats.norm.sf(abs(z[code, col]))
+    return z, p, means, medians
+
+
+@pytest.mark.parametrize("mask", [IN_VIVO, IN_VITRO, IN_VIVO | IN_VITRO])
+def test_scores_match_naive(mask):
+    payload, values, overlap = make_case()
+    activity = d8.score_kinase_activity(overlap, payload, mask, permutations=0)
+    z, p, means, medians = naive_scores(values, overlap, mask)
+    np.testing.assert_allclose(activity.z_score, z, rtol=1e-9, equal_nan=True)
+    np.testing.assert_allclose(activity.p_value, p, rtol=1e-9, atol=1e-15, equal_nan=True)
+    np.testing.assert_allclose(activity.mean_fc, means, rtol=1e-9, equal_nan=True)
+    np.testing.assert_allclose(activity.median_fc, medians, rtol=1e-9, equal_nan=True)
+    assert np.isnan(activity.perm_p_value).all()
+
+
+def test_permutation_p_values():
+    payload, values, overlap = make_case(seed=1)
+    activity = d8.score_kinase_activity(overlap, payload, IN_VIVO | IN_VITRO, permutations=300, seed=4)
+    scored = ~np.isnan(activity.z_score)
+    perm = activity.perm_p_value
+    assert np.isnan(perm[~scored]).all()
+    assert ((perm[scored] >= 1.0 / 301) & (perm[scored] <= 1.0)).all()
+    # Same seed, same permutations, whatever the batch size.
+    d8._ACTIVITY_CACHE.clear()
+    d8_batch = d8._PERMUTATION_BATCH_CELLS
+    try:
+        d8._PERMUTATION_BATCH_CELLS = 1
+        again = d8.score_kinase_activity(overlap, payload, IN_VIVO | IN_VITRO, permutations=300, seed=4)
+    finally:
+        d8._PERMUTATION_BATCH_CELLS = d8_batch
+    assert again is not activity
+    np.testing.assert_array_equal(again.perm_p_value, perm)
+
+
+def test_results_are_cached():
+    payload, _, overlap = make_case(seed=2)
+    first = d8.score_kinase_activity(overlap, payload, IN_VIVO, permutations=10)
+    assert d8.score_kinase_activity(overlap, payload, IN_VIVO, permutations=10) is first
+    assert d8.score_kinase_activity(overlap, payload, IN_VITRO, permutations=10) is not first
+
+
+def test_process_pool_matches_serial():
+    payload, _, overlap = make_case(seed=3)
+    serial = d8.score_kinase_activity(overlap, payload, IN_VIVO | IN_VITRO, permutations=600, seed=9)
+    d8._ACTIVITY_CACHE.clear()
+    pooled = d8.score_kinase_activity(
+        overlap, payload, IN_VIVO | IN_VITRO, permutations=600, seed=9, execution_mode="process", workers=2
+    )
+    assert pooled is not serial
+    np.testing.assert_array_equal(pooled.perm_p_value, serial.perm_p_value)
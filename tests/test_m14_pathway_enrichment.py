@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from scipy import stats
+
+from MapKinase_WebApp import m14_pathway_enrichment as m14
+
+
+def random_tables(seed=0, n_pathways=200, n_columns=6, total=5000):
+    rng = np.random.default_rng(seed)
+    pathway_n = rng.integers(1, 300, size=(n_pathways, 1))
+    sig_n = rng.integers(1, 1500, size=(1, n_columns))
+    hits = rng.binomial(np.broadcast_to(pathway_n, (n_pathways, n_columns)), sig_n / total)
+    return total, pathway_n, sig_n, hits
+
+
+def test_hypergeometric_tail_matches_scipy():
+    total, pathway_n, sig_n, hits = random_tables()
+    p_values = m14.hypergeometric_right_tail(total, pathway_n, sig_n, hits)
+    expected = stats.hypergeom.sf(hits - 1, total, sig_n, pathway_n)
+    assert p_values.shape == hits.shape
+    np.testing.assert_allclose(p_values, expected, rtol=1e-8, atol=1e-12)
+
+
+def test_hypergeometric_tail_matches_fisher_exact():
+    for total, pathway_n, sig_n, hits in [(40, 10, 12, 6), (100, 1, 1, 1), (20, 20, 5, 5), (30, 7, 9, 0)]:
+        table = [[hits, pathway_n - hits], [sig_n - hits, total - pathway_n - sig_n + hits]]
+        expected = stats.fisher_exact(table, alternative="greater")[1]
+        assert m14.hypergeometric_right_tail(total, pathway_n, sig_n, hits) == pytest.approx(expected, rel=1e-9)
+
+
+def test_hypergeometric_tail_chunking_does_not_change_results(monkeypatch):
+    total, pathway_n, sig_n, hits = random_tables(seed=1, n_pathways=50)
+    whole = m14.hypergeometric_right_tail(total, pathway_n, sig_n, hits)
+    monkeypatch.setattr(m14, "_TAIL_TERMS_PER_CHUNK", 7)
+    np.testing.assert_array_equal(m14.hypergeometric_right_tail(total, pathway_n, sig_n, hits), whole)
+
+
+def test_hypergeometric_tail_inconsistent_counts_are_one():
+    # hits above min(pathway, sig), negative counts, pathway larger than the universe, empty universe
+    p_values = m14.hypergeometric_right_tail([10, 10, 10, 0], [3, -1, 11, 0], [4, 2, 2, 0], [4, 0, 1, 0])
+    np.testing.assert_array_equal(p_values, np.ones(4))
+
+
+def test_benjamini_hochberg_matches_statsmodels():
+    multitest = pytest.importorskip("statsmodels.stats.multitest")
+    rng = np.random.default_rng(2)
+    p_values = np.concatenate([rng.uniform(size=300), rng.uniform(0, 1e-3, size=40), [0.5, 0.5, 1.0]])
+    expected = multitest.multipletests(p_values, method="fdr_bh")[1]
+    np.testing.assert_allclose(m14.benjamini_hochberg(p_values), expected, rtol=1e-12)
+
+
+def test_benjamini_hochberg_shape_and_nan():
+    p_values = np.array([[0.01, np.nan], [0.04, 0.03]])
+    q_values = m14.benjamini_hochberg(p_values)
+    assert q_values.shape == p_values.shape
+    assert np.isnan(q_values[0, 1])
+    np.testing.assert_allclose(q_values[~np.isnan(p_values)], [0.03, 0.04, 0.04])
+
+
+def test_incidence_overlap_counts_match_naive():
+    index = {
+        "nodes": {
+            "n1": {"candidates": {"uniprot": ["P11111", "p22222"]}},
+            "n2": {"candidates": {"uniprot": ["P22222"]}},
+            "n3": {"candidates": {"uniprot": ["Q33333"]}},
+        },
+        "pathways": [
+            {"pathway_id": "HSA00001", "name": "first", "nodes": ["n1", "n2"]},
+            {"pathway_id": "", "nodes": ["n3"]},
+            {"pathway_id": "hsa00002", "nodes": ["n2", "n3", "missing"]},
+        ],
+    }
+    incidence = m14.build_pathway_incidence(index, {})
+    assert incidence.pathway_ids == ["hsa00001", "hsa00002"]
+    assert incidence.uniprots.tolist() == ["P11111", "P22222", "Q33333"]
+    assert incidence.sizes.tolist() == [2, 2]
+    uploads = ["P22222", "Q33333", "P99999", "P11111", "P22222"]
+    codes = incidence.uniprot_codes(uploads)
+    assert codes.tolist() == [1, 2, -1, 0, 1]
+    values = np.array([[1, 0], [1, 1], [1, 1], [0, 1], [1, 0]])
+    members = {"hsa00001": {"P11111", "P22222"}, "hsa00002": {"P22222", "Q33333"}}
+    expected = [
+        [sum(values[i, col] for i, uni in enumerate(uploads) if uni in members[pid]) for col in range(2)]
+        for pid in incidence.pathway_ids
+    ]
+    np.testing.assert_array_equal(incidence.overlap_counts(codes, values), expected)
@@ -0,0 +1,141 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from MapKinase_WebApp import m1_file_processor as m1
+
+
+@pytest.fixture(autouse=True)
+def upload_cache(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "upload_cache"
+    monkeypatch.setattr(m1, "UPLOAD_CACHE_DIR", str(cache_dir))
+    monkeypatch.setattr(m1, "_LOADED_DATASETS", m1.OrderedDict())
+    return cache_dir
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_empty_file_reports_empty(tmp_path):
+    result = m1.validate_ptm_file(write(tmp_path, "empty.csv", ""), [])
+    assert not result.valid
+    assert result.errors == ["The file is empty."]
+
+
+def test_valid_protein_file(tmp_path):
+    path = write(tmp_path, "prot.csv", "Uniprot,Gene,C:a vs b,O:a vs b,T:note\nP1,AKT1,1.5,NA,x\nP2,MAPK1,-2,,y\n")
+    dataset = m1.load_protein_dataset(path)
+    assert dataset.valid, dataset.validation.errors
+    assert dataset.validation.summary == {"rows": 2, "comparisons": 1, "tooltips": 1}
+    assert dataset.validation.comparisons == ["C:a vs b"]
+    assert dataset.frame["C:a vs b"].tolist() == [1.5, -2.0]
+
+
+def test_validator_row_errors_in_file_order(tmp_path):
+    path = write(tmp_path, "ptm.csv", "Uniprot,Site,C:x,O:x\nP1,5,1,NA\n,0,abc,1\nP3,2.5,,zz\n")
+    result = m1.validate_ptm_file(path, [])
+    assert result.errors == [
+        "Row 3, Column 1 (Uniprot ID) is empty.",
+        "Row 3, Column 2 (Site Position) must be a positive integer. Found '0'.",
+        "Row 3, Column 3 (Comparison) must be numeric. Found 'abc'.",
+        "Row 4, Column 2 (Site Position) must be an integer. Found '2.5'.",
+        "Row 4, Column 3 (Comparison) is empty.",
+        "Row 4, Column 4 (Outline) must be numeric or NA. Found 'zz'.",
+    ]
+
+
+def test_validator_header_errors(tmp_path):
+    path = write(tmp_path, "ptm.csv", "Uniprot,Site,bad,O:y\nP1,5,1,1\n")
+    result = m1.validate_ptm_file(path, ["C:x"])
+    assert "Invalid header in column 3: 'bad'." in result.errors[0]
+    assert any("At least one Comparison column" in err for err in result.errors)
+    assert "Missing Comparison columns present in protein file: C:x." in result.errors
+    assert any(err.startswith("Outline header 'O:y'") for err in result.errors)
+
+
+def test_validator_stops_at_error_cap(tmp_path):
+    body = "".join(f"P{i},-1,1\n" for i in range(500))
+    result = m1.validate_ptm_file(write(tmp_path, "ptm.csv", "Uniprot,Site,C:x\n" + body), [])
+    assert len(result.errors) == m1._MAX_ERRORS + 1
+    assert result.errors[-1].startswith("Stopped after 200 errors")
+
+
+def test_chunked_validation_matches_single_chunk(tmp_path):
+    body = "".join(f"P{i},{i % 7},{'x' if i % 11 == 0 else i}\n" for i in range(60))
+    path = write(tmp_path, "ptm.csv", "Uniprot,Site,C:x\n" + body)
+    whole = m1._load_dataset(path, "ptm", m1.PTMValidationResult, [], chunk_rows=1000)
+    chunked = m1._load_dataset(path, "ptm", m1.PTMValidationResult, [], chunk_rows=4)
+    assert chunked.validation.errors == whole.validation.errors
+
+
+def test_chunks_become_typed_columns(tmp_path):
+    body = "".join(f" P{i} ,G{i % 3},{i / 4},{'NA' if i % 2 else i},note {i}\n" for i in range(7))
+    path = write(tmp_path, "prot.csv", "Uniprot,Gene,C:x,O:x,T:t\n" + body)
+    dataset = m1._load_dataset(path, "protein", m1.ProteinValidationResult, chunk_rows=3)
+    assert dataset.valid, dataset.validation.errors
+    assert [str(dtype) for dtype in dataset.frame.dtypes] == ["category", "category", "float64", "float64", "object"]
+    assert dataset.frame["Uniprot"].tolist() == [f"P{i}" for i in range(7)]
+    assert dataset.frame["C:x"].tolist() == [i / 4 for i in range(7)]
+    assert dataset.rows[:2] == [["P0", "G0", "0", "0", "note 0"], ["P1", "G1", "0.25", "", "note 1"]]
+
+
+def test_invalid_upload_rows_keep_unparsed_cells(tmp_path):
+    path = write(tmp_path, "ptm.csv", "Uniprot,Site,C:x\nP1,5,1.5\nP2,6,abc\n")
+    dataset = m1.load_ptm_dataset(path, [])
+    assert not dataset.valid
+    assert dataset.rows == [["P1", "5", "1.5"], ["P2", "6", "abc"]]
+    assert np.isnan(dataset.frame["C:x"].iloc[1])
+
+
+def test_upload_cache_key_includes_parse_format(tmp_path, upload_cache):
+    text = "Uniprot,Site,C:x\nP1,5,1.0\n"
+    first = m1.load_ptm_dataset(write(tmp_path, "a.csv", text), [])
+    assert first.valid
+    assert first.key.startswith("csv-")
+    # Same bytes as tab-delimited text: one column, so the header check must fail.
+    second = m1.load_ptm_dataset(write(tmp_path, "a.txt", text), [])
+    assert not second.valid
+    assert second.key.startswith("tsv-") and second.key[4:] == first.key[4:]
+    assert os.listdir(upload_cache) == [f"ptm-{first.key}"]
+
+
+def test_upload_cache_round_trip(tmp_path):
+    path = write(tmp_path, "a.csv", "Uniprot,Site,C:x,T:t\nP1,5,1.25,note\nP2,7,-3,\n")
+    fresh = m1.load_ptm_dataset(path, [])
+    m1._LOADED_DATASETS.clear()
+    cached = m1.load_ptm_dataset(path, [])
+    assert cached._columns is None  # reopened from the cache, text columns not yet decoded
+    assert cached.rows == fresh.rows
+    assert cached.validation.summary == fresh.validation.summary
+    pd.testing.assert_frame_equal(cached.frame, fresh.frame)
+
+
+def test_parquet_drops_pandas_index_and_float_sites(tmp_path):
+    pytest.importorskip("pyarrow")
+    frame = pd.DataFrame(
+        {"Uniprot": ["P1", "P2"], "Site": [5, np.nan], "C:x": [1.5, 2.0]},
+        index=pd.Index([10, 11], name="rowid"),
+    ).iloc[:1]
+    path = str(tmp_path / "sites.parquet")
+    frame.to_parquet(path)
+    dataset = m1.load_ptm_dataset(path, [])
+    assert dataset.valid, dataset.validation.errors
+    assert dataset.headers == ["Uniprot", "Site", "C:x"]
+    assert dataset.rows == [["P1", "5", "1.5"]]
+
+
+def test_dataset_frame_appends_annotation_columns(tmp_path):
+    dataset = m1.load_ptm_dataset(write(tmp_path, "a.csv", "Uniprot,Site,C:x\nP1,5,1.5\nP2,6,-2\n"), [])
+    payload = dataset.to_payload()
+    payload["headers"] = payload["headers"] + ["PSP: ON_FUNCTION"]
+    payload["rows"] = [payload["rows"][0] + ["activity, induced"], payload["rows"][1]]
+    frame = m1.dataset_frame(payload, "ptm")
+    assert list(frame.columns) == ["Uniprot", "Site", "C:x", "PSP: ON_FUNCTION"]
+    assert frame["PSP: ON_FUNCTION"].tolist() == ["activity, induced", ""]
+    assert np.shares_memory(frame["C:x"].to_numpy(), dataset.frame["C:x"].to_numpy())
+    assert m1.dataset_frame(dataset.to_payload(), "ptm") is dataset.frame
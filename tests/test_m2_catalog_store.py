@@ -0,0 +1,103 @@
+import json
+
+import numpy as np
+import pytest
+
+from MapKinase_WebApp import m2_protein_catalog as m2
+from MapKinase_WebApp.c1_versioned_dirs import current_version_dir
+
+CATALOG = {
+    "P31749": {"label": "AKT1", "gene_symbol": "AKT1", "fold_change_1": 1.5, "fc_color_1": [1, 2, 3],
+               "PTMs": {"S473": {"fold_change_1": -0.5}}},
+    "P28482": {"label": "ERK2", "gene_symbol": "MAPK1", "fold_change_1": -2.0, "backup_label": "p42"},
+    "Q9Y6K9": {"label": "NEMO", "gene_symbol": "ikbkg", "fold_change_1": "n/a"},
+    "P00533": {"gene_symbol": "EGFR", "fold_change_1": True},
+    "O15111": {},
+}
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(m2, "_STORE_CACHE", {})
+    return str(tmp_path / "catalog")
+
+
+def test_records_round_trip_by_uniprot(store_dir):
+    m2.write_protein_catalog_store(CATALOG, store_dir, {"source": "test"})
+    store = m2.open_protein_catalog_store(store_dir)
+    assert len(store) == len(CATALOG)
+    assert store.metadata == {"source": "test"}
+    assert list(store.uniprot_ids) == sorted(CATALOG)
+    for uniprot_id, record in CATALOG.items():
+        assert uniprot_id in store
+        assert store.get(uniprot_id) == record
+    assert store.get("P99999") is None and "" not in store and None not in store
+    assert store.get_many(["P28482", "P99999", "O15111"]) == {"P28482": CATALOG["P28482"], "O15111": {}}
+    assert store.to_dict() == CATALOG
+
+
+def test_records_round_trip_by_symbol(store_dir):
+    m2.write_protein_catalog_store(CATALOG, store_dir)
+    store = m2.open_protein_catalog_store(store_dir)
+    # Labels and gene symbols are both indexed, case-insensitively; UniProt IDs win over symbols.
+    assert store.find("erk2") == ["P28482"]
+    assert store.find("MAPK1") == ["P28482"]
+    assert store.find("IKBKG") == ["Q9Y6K9"]
+    assert store.find("egfr") == ["P00533"]
+    assert store.find("P31749") == ["P31749"]
+    assert store.find("unknown") == [] and store.find("") == []
+    row = store.row_for("P31749")
+    assert store.rows_for_symbol("akt1") == [row]
+    assert store.labels[store.row_for("O15111")] == "O15111"
+    assert store.search("^p2|nemo") == [("P28482", "ERK2"), ("Q9Y6K9", "NEMO")]
+    assert store.search("(") == []
+
+
+def test_fold_change_matrix_keeps_numbers_only(store_dir):
+    m2.write_protein_catalog_store(CATALOG, store_dir)
+    store = m2.open_protein_catalog_store(store_dir)
+    assert store.fold_change_keys == ["fold_change_1"]
+    values = {uid: store.fold_changes[store.row_for(uid), 0] for uid in CATALOG}
+    assert values["P31749"] == 1.5 and values["P28482"] == -2.0
+    assert all(np.isnan(values[uid]) for uid in ("Q9Y6K9", "P00533", "O15111"))
+
+
+def test_summary_keeps_listing_fields(store_dir):
+    m2.write_protein_catalog_store(CATALOG, store_dir)
+    summary = m2.open_protein_catalog_store(store_dir).summary()
+    assert summary["P31749"] == {"label": "AKT1", "gene_symbol": "AKT1", "fold_change_1": 1.5, "fc_color_1": [1, 2, 3]}
+    assert summary["P28482"]["backup_label"] == "p42"
+
+
+def test_empty_catalog_round_trips(store_dir):
+    m2.write_protein_catalog_store({}, store_dir)
+    store = m2.open_protein_catalog_store(store_dir)
+    assert len(store) == 0
+    assert store.get("P31749") is None and store.find("AKT1") == []
+    assert store.to_dict() == {}
+
+
+def test_rewrite_publishes_new_version_and_keeps_open_store(store_dir):
+    m2.write_protein_catalog_store(CATALOG, store_dir)
+    first = m2.open_protein_catalog_store(store_dir)
+    assert m2.open_protein_catalog_store(store_dir) is first
+    m2.write_protein_catalog_store({"P31749": {"label": "AKT1 v2"}}, store_dir)
+    second = m2.open_protein_catalog_store(store_dir)
+    assert second is not first
+    assert second.directory == current_version_dir(store_dir) != first.directory
+    assert second.get("P31749") == {"label": "AKT1 v2"} and len(second) == 1
+    # The store opened before the rewrite still reads its own version.
+    assert first.get("P28482") == CATALOG["P28482"]
+
+
+def test_store_is_built_from_catalog_json(store_dir):
+    with open(f"{store_dir}.json", "w", encoding="utf-8") as fh:
+        json.dump({"protein_catalog": CATALOG, "metadata": {"built": "json"}}, fh)
+    store = m2.open_protein_catalog_store(f"{store_dir}.json")
+    assert store.metadata == {"built": "json"}
+    assert store.get("P28482") == CATALOG["P28482"]
+    assert m2.get_catalog_records({"path": f"{store_dir}.json"}, ["P31749", "P99999"]) == {"P31749": CATALOG["P31749"]}
+
+
+def test_missing_store_opens_as_none(store_dir):
+    assert m2.open_protein_catalog_store(store_dir) is None
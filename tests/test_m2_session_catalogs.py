@@ -0,0 +1,109 @@
+import os
+import threading
+
+import pytest
+
+from MapKinase_WebApp import m2_protein_catalog as m2
+
+
+def settings(value):
+    return {"max_positive": value}
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    builds = []
+
+    def build_catalog(data_override=None, settings_override=None):
+        builds.append(settings_override)
+        label = f"AKT1-{settings_override['max_positive']}"
+        return {"protein_catalog": {"P31749": {"label": label}}, "metadata": {"label": label}}
+
+    monkeypatch.setattr(m2, "_STORE_CACHE", {})
+    monkeypatch.setattr(m2, "build_global_protein_catalog", build_catalog)
+    registry = m2.SessionCatalogRegistry(str(tmp_path / "sessions"), max_entries=2)
+    registry.built = builds
+    return registry
+
+
+def label(info):
+    return m2.get_catalog_records(info, ["P31749"])["P31749"]["label"]
+
+
+def test_identical_data_shares_one_catalog(registry):
+    first = registry.acquire("s1", settings_override=settings(1))
+    second = registry.acquire("s2", settings_override=settings(1))
+    assert first == second
+    assert first["catalog_key"] == m2.protein_catalog_key(settings_override=settings(1))
+    assert label(first) == "AKT1-1"
+    assert len(registry.built) == 1
+    assert registry.stats() == {"entries": 1, "referenced": 1, "sessions": 2, "hits": 1, "builds": 1}
+
+
+def test_different_data_gets_its_own_catalog(registry):
+    first = registry.acquire("s1", settings_override=settings(1))
+    second = registry.acquire("s2", settings_override=settings(2))
+    assert first["catalog_key"] != second["catalog_key"]
+    assert (label(first), label(second)) == ("AKT1-1", "AKT1-2")
+    assert registry.stats()["builds"] == 2
+
+
+def test_stores_left_on_disk_are_reused(registry):
+    info = registry.acquire("s1", settings_override=settings(1))
+    fresh = m2.SessionCatalogRegistry(registry.directory, max_entries=2)
+    assert fresh.acquire("s9", settings_override=settings(1)) == info
+    assert fresh.stats()["builds"] == 0 and fresh.stats()["hits"] == 1
+    assert len(registry.built) == 1
+
+
+def test_concurrent_sessions_build_once(registry):
+    barrier = threading.Barrier(6)
+    results = []
+
+    def acquire(session_id):
+        barrier.wait()
+        results.append(registry.acquire(session_id, settings_override=settings(1)))
+
+    threads = [threading.Thread(target=acquire, args=(f"s{i}",)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(registry.built) == 1
+    assert all(result == results[0] for result in results)
+
+
+def test_lru_evicts_only_unreferenced_catalogs(registry):
+    held = registry.acquire("s1", settings_override=settings(1))
+    dropped = registry.acquire("s2", settings_override=settings(2))
+    registry.release("s2")
+    kept = registry.acquire("s3", settings_override=settings(3))
+    # Over the limit: the unreferenced catalog goes (memory and disk); the older, held one stays.
+    assert registry.stats()["entries"] == 2
+    assert not os.path.exists(dropped["store_path"])
+    assert os.path.isdir(held["store_path"]) and os.path.isdir(kept["store_path"])
+    assert label(held) == "AKT1-1"
+    registry.acquire("s4", settings_override=settings(4))
+    # Every catalog is referenced, so the registry holds more than max_entries rather than evict one.
+    assert registry.stats() == {"entries": 3, "referenced": 3, "sessions": 3, "hits": 0, "builds": 4}
+
+
+def test_release_drops_the_session_reference(registry):
+    info = registry.acquire("s1", settings_override=settings(1))
+    registry.acquire("s2", settings_override=settings(1))
+    registry.release("s1")
+    assert registry.stats()["referenced"] == 1 and registry.stats()["sessions"] == 1
+    registry.release("s2")
+    registry.release("s2")
+    assert registry.stats()["referenced"] == 0 and registry.stats()["sessions"] == 0
+    # Released catalogs stay cached until the limit is exceeded.
+    assert registry.acquire("s3", settings_override=settings(1)) == info
+    assert len(registry.built) == 1
+
+
+def test_rebinding_a_session_releases_its_previous_catalog(registry):
+    first = registry.acquire("s1", settings_override=settings(1))
+    registry.acquire("s1", settings_override=settings(2))
+    registry.acquire("s2", settings_override=settings(3))
+    assert registry.stats()["entries"] == 2
+    assert not os.path.exists(first["store_path"])
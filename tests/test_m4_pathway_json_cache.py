@@ -0,0 +1,60 @@
+import hashlib
+
+import pytest
+
+from MapKinase_WebApp import m1_file_processor as m1
+from MapKinase_WebApp import m4_json
+
+
+@pytest.fixture(autouse=True)
+def upload_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(m1, "UPLOAD_CACHE_DIR", str(tmp_path / "upload_cache"))
+    monkeypatch.setattr(m1, "_LOADED_DATASETS", m1.OrderedDict())
+
+
+def entry_digest(entry):
+    digest = hashlib.sha256()
+    m4_json._hash_dataset_entry(digest, entry)
+    return digest.hexdigest()
+
+
+def ptm_entry(tmp_path, notes):
+    path = tmp_path / "ptm.csv"
+    path.write_text("Uniprot,Site,C:x\nP1,5,1.5\nP2,6,-2\n", encoding="utf-8")
+    payload = m1.load_ptm_dataset(str(path), []).to_payload()
+    payload["headers"] = payload["headers"] + ["PSP: NOTES"]
+    payload["rows"] = [row + [note] for row, note in zip(payload["rows"], notes)]
+    return {
+        "data_headers": payload["headers"],
+        "data_rows": payload["rows"],
+        "dataframe": m1.dataset_frame(payload, "ptm"),
+        "dataset_key": payload["dataset_key"],
+    }
+
+
+def test_uploaded_columns_are_not_rehashed(tmp_path, monkeypatch):
+    entry = ptm_entry(tmp_path, ["a", "b"])
+    key = entry_digest(entry)
+    calls = []
+    original = m4_json.pd.util.hash_pandas_object
+
+    def counting(frame, *args, **kwargs):
+        calls.append(list(frame.columns))
+        return original(frame, *args, **kwargs)
+
+    monkeypatch.setattr(m4_json.pd.util, "hash_pandas_object", counting)
+    assert entry_digest(entry) == key
+    assert calls == [["PSP: NOTES"]]
+
+
+def test_annotation_columns_change_the_key(tmp_path):
+    assert entry_digest(ptm_entry(tmp_path, ["a", "b"])) != entry_digest(ptm_entry(tmp_path, ["a", "c"]))
+
+
+def test_unloaded_upload_falls_back_to_content(tmp_path):
+    entry = ptm_entry(tmp_path, ["a", "b"])
+    keyed = entry_digest(entry)
+    m1._LOADED_DATASETS.clear()
+    assert entry_digest(entry) != keyed
+    changed = dict(entry, data_rows=[entry["data_rows"][0], ["P2", "6", "-3", "b"]])
+    assert entry_digest(changed) != entry_digest(entry)
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+from MapKinase_WebApp.m4_json import PathwayProcessor
+from MapKinase_WebApp.m13_color_gradient import get_gradient
+
+
+def make_processor(frame):
+    processor = PathwayProcessor.__new__(PathwayProcessor)
+    processor.proteomic_data = frame
+    processor.hsa_id_column = "KEGG_hsa"
+    processor.prot_uniprot_column = "Uniprot_ID"
+    processor.gene_name_column = "Gene Symbol"
+    processor.protein_tooltip_columns = ["Gene Symbol"]
+    processor.fold_change_columns = ["C:a"]
+    processor.outline_columns = ["O:a"]
+    processor._gradient = get_gradient((255, 0, 0), (0, 0, 255), -2, 2)
+    processor._build_protein_index()
+    return processor
+
+
+def first_row_by_mask(frame, key):
+    """The lookup the index replaces: boolean mask over the ID column, first match."""
+    matches = frame.index[frame["KEGG_hsa"] == key]
+    return int(frame.index.get_loc(matches[0])) if len(matches) else None
+
+
+FRAME = pd.DataFrame({
+    "KEGG_hsa": ["hsa:207", "hsa:5594", "hsa:207", None, np.nan, "hsa:1956"],
+    "Uniprot_ID": ["P31749", "P28482", "P31751", "Q00000", "Q11111", "P00533"],
+    "Gene Symbol": ["AKT1", "MAPK1", "AKT2", "NONE", "NAN", "EGFR"],
+    "C:a": [1.5, "-2", "0.5", "3", "bad", ""],
+    "O:a": ["1", "", "2", "", "", "NA"],
+})
+
+
+def test_row_lookup_matches_mask_scan():
+    processor = make_processor(FRAME)
+    for key in ("hsa:207", "hsa:5594", "hsa:1956", "hsa:9999"):
+        assert processor._protein_row(key) == first_row_by_mask(FRAME, key)
+    row = processor._protein_row("hsa:5594")
+    assert processor._protein_raw_value(row, "Uniprot_ID") == "P28482"
+    assert processor._protein_numeric_value(row, "C:a") == -2.0
+    assert processor._protein_numeric_value(row, "O:a") is None
+    assert processor._protein_color(row, "C:a") == list(processor._gradient.map_lists([-2.0])[0])
+
+
+def test_duplicate_ids_resolve_to_first_row():
+    processor = make_processor(FRAME)
+    row = processor._protein_row("hsa:207")
+    assert row == 0
+    assert processor._protein_raw_value(row, "Gene Symbol") == "AKT1"
+    assert processor._protein_numeric_value(row, "C:a") == 1.5
+
+
+def test_empty_ids_are_not_indexed():
+    processor = make_processor(FRAME)
+    assert set(processor._protein_row_index) == {"hsa:207", "hsa:5594", "hsa:1956"}
+    assert processor._protein_row(None) is None
+    assert processor._protein_row(np.nan) is None
+
+
+def test_missing_id_column_gives_empty_index():
+    processor = make_processor(FRAME.drop(columns=["KEGG_hsa"]))
+    assert processor._protein_row_index == {}
+    assert processor._protein_row("hsa:207") is None
@@ -0,0 +1,58 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from MapKinase_WebApp import m4_json
+
+
+def shared_payload(frame):
+    shared, blocks = m4_json._share_ptm_frame(frame)
+    payload = {
+        'frames': {'ptm_0': shared},
+        'groups': {'ptm_0': {'P1': np.array([0, 1])}},
+        'attributes': {'negative_color': (255, 0, 0), 'positive_color': (0, 0, 255),
+                       'max_negative': -2, 'max_positive': 2},
+    }
+    return payload, blocks
+
+
+def worker_column_sum(column):
+    frame = m4_json._PTM_WORKER_STATE['processor']._ptm_site_index['ptm_0']['frame']
+    return float(frame[column].sum()), frame[column].to_numpy().flags.writeable
+
+
+FRAME = pd.DataFrame({'Uniprot': ['P1', 'P1', 'P2'], 'site': [5, 9, 3], 'C:x': [1.5, -0.5, np.nan]})
+
+
+def test_worker_views_shared_columns_without_copying():
+    payload, blocks = shared_payload(FRAME)
+    try:
+        m4_json._init_ptm_worker(payload)
+        frame = m4_json._PTM_WORKER_STATE['processor']._ptm_site_index['ptm_0']['frame']
+        pd.testing.assert_frame_equal(frame, FRAME)
+        for col in ('site', 'C:x'):
+            block = next(shm for shm in m4_json._PTM_WORKER_STATE['blocks'] if shm.name == payload['frames']['ptm_0']['numeric'][col][0])
+            assert np.shares_memory(frame[col].to_numpy(), np.frombuffer(block.buf, dtype=np.uint8))
+            with pytest.raises(ValueError):
+                frame[col].to_numpy()[0] = 0
+        del frame
+        m4_json._close_ptm_worker_blocks()
+        assert m4_json._PTM_WORKER_STATE == {}
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+
+def test_pool_workers_read_shared_columns():
+    payload, blocks = shared_payload(FRAME)
+    try:
+        with ProcessPoolExecutor(max_workers=2, initializer=m4_json._init_ptm_worker, initargs=(payload,)) as executor:
+            results = list(executor.map(worker_column_sum, ['site', 'site', 'C:x']))
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+    assert results == [(17.0, False), (17.0, False), (1.0, False)]